@@ -22,15 +22,21 @@ limitations under the License.
 """
 import json
 import re
+import signal
 import sys
 import time
 
 from boto.exception import JSONResponseError, BotoServerError
 
-from dynamic_dynamodb.aws import dynamodb
-from dynamic_dynamodb.core import gsi, table
+from dynamic_dynamodb import (
+    event_listener, journal, lease, log_handler, metrics, profiling,
+    retry_policy, sharding, timing)
+from dynamic_dynamodb.aws import api_accountant, dynamodb
+from dynamic_dynamodb.core import (
+    capacity_budget, gsi, table, throttle_watcher)
 from dynamic_dynamodb.daemon import Daemon
-from dynamic_dynamodb.config_handler import get_global_option, get_table_option
+from dynamic_dynamodb.config_handler import (
+    get_configured_tables, get_global_option, get_table_option)
 from dynamic_dynamodb.log_handler import LOGGER as logger
 
 CHECK_STATUS = {
@@ -47,6 +53,12 @@ class DynamicDynamoDBDaemon(Daemon):
         :param check_interval: Delay in seconds between checks
         """
         try:
+            log_handler.start_listener()
+            lease.start()
+            throttle_watcher.start()
+            event_listener.start()
+            metrics.start()
+
             while True:
                 execute()
         except Exception as error:
@@ -55,9 +67,19 @@ class DynamicDynamoDBDaemon(Daemon):
 
 def main():
     """ Main function called from dynamic-dynamodb """
+    signal.signal(signal.SIGUSR1, profiling.toggle)
+    signal.signal(signal.SIGUSR2, timing.log_report)
+    signal.signal(signal.SIGQUIT, profiling.dump_stacks)
+
+    # Daemons start the log listener after forking
+    if get_global_option('daemon') not in ['start', 'restart']:
+        log_handler.start_listener()
+
     try:
         if get_global_option('show_config'):
             print json.dumps(config.get_configuration(), indent=2)
+        elif get_global_option('journal_query'):
+            journal.run_query()
         elif get_global_option('daemon'):
             daemon = DynamicDynamoDBDaemon(
                 '{0}/dynamic-dynamodb.{1}.pid'.format(
@@ -83,6 +105,24 @@ def main():
                 daemon.restart()
                 logger.info('Daemon restarted')
 
+            elif get_global_option('daemon') == 'timing-report':
+                daemon.send_signal(signal.SIGUSR2)
+                print(
+                    'The timing report is written to the log '
+                    'of the running daemon')
+
+            elif get_global_option('daemon') == 'profile':
+                daemon.send_signal(signal.SIGUSR1)
+                print(
+                    'Profiling of the running daemon toggled, '
+                    'see its log for the result')
+
+            elif get_global_option('daemon') == 'dump-stacks':
+                daemon.send_signal(signal.SIGQUIT)
+                print(
+                    'The thread stacks are written to the log '
+                    'of the running daemon')
+
             elif get_global_option('daemon') in ['foreground', 'fg']:
                 logger.debug('Starting daemon in foreground')
                 daemon.run()
@@ -90,13 +130,18 @@ def main():
 
             else:
                 print(
-                    'Valid options for --daemon are start, '
-                    'stop, restart, and foreground')
+                    'Valid options for --daemon are start, stop, restart, '
+                    'foreground, timing-report, profile and dump-stacks')
                 sys.exit(1)
         else:
+            lease.start()
             if get_global_option('run_once'):
                 execute()
             else:
+                throttle_watcher.start()
+                event_listener.start()
+                metrics.start()
+
                 while True:
                     execute()
 
@@ -106,119 +151,379 @@ def main():
 
 def execute():
     """ Ensure provisioning """
-    boto_server_error_retries = 3
+    cycle_start = time.time()
+    profiling.start_cycle()
+
+    # Only the tables of this shard, throttled tables first, idle tables
+    # last and deferred when the API call budget runs short
+    tables, _ = api_accountant.prioritize(
+        sharding.select(dynamodb.get_tables_and_gsis()))
 
     # Ensure provisioning
-    for table_name, table_key in sorted(dynamodb.get_tables_and_gsis()):
-        try:
-            table_num_consec_read_checks = \
-                CHECK_STATUS['tables'][table_name]['reads']
-        except KeyError:
-            table_num_consec_read_checks = 0
+    for table_name, table_key in tables:
+        __run_table_check(
+            table_name, __ensure_table_and_gsis, table_name, table_key)
 
-        try:
-            table_num_consec_write_checks = \
-                CHECK_STATUS['tables'][table_name]['writes']
-        except KeyError:
-            table_num_consec_write_checks = 0
+        # Emergency scale-ups and alarms should not wait for all tables
+        __handle_queued_events()
+
+    # Hand out the capacity budget to the queued increases
+    capacity_budget.apply()
+
+    metrics.observe('cycle_duration_seconds', time.time() - cycle_start)
+    timing.end_cycle()
+    profiling.end_cycle()
+    api_accountant.end_cycle()
+    log_handler.set_context()
+
+    # Sleep between the checks
+    if not get_global_option('run_once'):
+        logger.debug('Sleeping {0} seconds until next check'.format(
+            get_global_option('check_interval')))
+        __wait(get_global_option('check_interval'))
+
+
+def __run_table_check(table_name, function, *args):
+    """ Run a check of a table, handling its deadline and failures
+
+    Tables suspended by the retry policy are skipped.
+
+    :type table_name: str
+    :param table_name: Name of the DynamoDB table
+    :type function: function
+    :param function: Check to run
+    :param args: Arguments to the check
+    """
+    if retry_policy.is_suspended(table_name):
+        return
+
+    api_accountant.set_table(table_name)
+    retry_policy.set_deadline(get_global_option('table_deadline'))
+    try:
+        function(*args)
+        retry_policy.record_success(table_name)
+
+    except JSONResponseError as error:
+        exception = error.body['__type'].split('#')[1]
+
+        if exception == 'ResourceNotFoundException':
+            logger.error('{0} - Table {1} does not exist anymore'.format(
+                table_name,
+                table_name))
+            return
+
+        logger.error('{0} - {1}: {2}'.format(
+            table_name, exception, error.body.get('message')))
+        retry_policy.record_failure(table_name)
+
+    except BotoServerError as error:
+        logger.error(
+            '{0} - Unknown boto error ({1}). Status: "{2}". '
+            'Reason: "{3}". Message: {4}'.format(
+                table_name,
+                retry_policy.classify(error),
+                error.status,
+                error.reason,
+                error.message))
+        logger.error(
+            'Please bug report if this error persists')
+        retry_policy.record_failure(table_name)
+
+    except retry_policy.DeadlineExceeded as error:
+        logger.error(
+            '{0} - Abandoning the table for this check: {1}'.format(
+                table_name, error))
+        metrics.inc('table_deadlines_exceeded_total', table=table_name)
+        retry_policy.record_failure(table_name)
+
+    except retry_policy.NETWORK_ERRORS as error:
+        logger.error('{0} - Connection error: {1}'.format(
+            table_name, error))
+        retry_policy.record_failure(table_name)
+
+    finally:
+        retry_policy.set_deadline(None)
+
+
+def __ensure_table_and_gsis(table_name, table_key):
+    """ Ensure provisioning for a table and its configured GSIs
+
+    :type table_name: str
+    :param table_name: Name of the DynamoDB table
+    :type table_key: str
+    :param table_key: Table configuration option key name
+    """
+    __ensure_table(table_name, table_key)
+
+    gsi_names = set()
+    # Add regexp table names
+    for gst_instance in dynamodb.table_gsis(table_name):
+        gsi_name = gst_instance[u'IndexName']
 
         try:
-            # The return var shows how many times the scale-down criteria
-            #  has been met. This is coupled with a var in config,
-            # "num_intervals_scale_down", to delay the scale-down
-            table_num_consec_read_checks, table_num_consec_write_checks = \
-                table.ensure_provisioning(
-                    table_name,
-                    table_key,
-                    table_num_consec_read_checks,
-                    table_num_consec_write_checks)
+            gsi_keys = get_table_option(table_key, 'gsis').keys()
+
+        except AttributeError:
+            # Continue if there are not GSIs configured
+            continue
+
+        for gsi_key in gsi_keys:
+            try:
+                if re.match(gsi_key, gsi_name):
+                    logger.debug(
+                        'Table {0} GSI {1} matches '
+                        'GSI config key {2}'.format(
+                            table_name, gsi_name, gsi_key))
+                    gsi_names.add((gsi_name, gsi_key))
+
+            except re.error:
+                logger.error('Invalid regular expression: "{0}"'.format(
+                    gsi_key))
+                sys.exit(1)
 
-            CHECK_STATUS['tables'][table_name] = {
-                'reads': table_num_consec_read_checks,
-                'writes': table_num_consec_write_checks
-            }
+    for gsi_name, gsi_key in sorted(gsi_names):
+        __ensure_gsi(table_name, table_key, gsi_name, gsi_key)
 
-            gsi_names = set()
-            # Add regexp table names
-            for gst_instance in dynamodb.table_gsis(table_name):
-                gsi_name = gst_instance[u'IndexName']
 
-                try:
-                    gsi_keys = get_table_option(table_key, 'gsis').keys()
-
-                except AttributeError:
-                    # Continue if there are not GSIs configured
-                    continue
-
-                for gsi_key in gsi_keys:
-                    try:
-                        if re.match(gsi_key, gsi_name):
-                            logger.debug(
-                                'Table {0} GSI {1} matches '
-                                'GSI config key {2}'.format(
-                                    table_name, gsi_name, gsi_key))
-                            gsi_names.add((gsi_name, gsi_key))
-
-                    except re.error:
-                        logger.error('Invalid regular expression: "{0}"'.format(
-                            gsi_key))
-                        sys.exit(1)
-
-            for gsi_name, gsi_key in sorted(gsi_names):
-                unique_gsi_name = ':'.join([table_name, gsi_name])
-                try:
-                    gsi_num_consec_read_checks = \
-                        CHECK_STATUS['gsis'][unique_gsi_name]['reads']
-                except KeyError:
-                    gsi_num_consec_read_checks = 0
+def __ensure_table(table_name, table_key):
+    """ Ensure provisioning for a table and update the check status
 
-                try:
-                    gsi_num_consec_write_checks = \
-                        CHECK_STATUS['gsis'][unique_gsi_name]['writes']
-                except KeyError:
-                    gsi_num_consec_write_checks = 0
-
-                gsi_num_consec_read_checks, gsi_num_consec_write_checks = \
-                    gsi.ensure_provisioning(
-                        table_name,
-                        table_key,
-                        gsi_name,
-                        gsi_key,
-                        gsi_num_consec_read_checks,
-                        gsi_num_consec_write_checks)
-
-                CHECK_STATUS['gsis'][unique_gsi_name] = {
-                    'reads': gsi_num_consec_read_checks,
-                    'writes': gsi_num_consec_write_checks
-                }
-
-        except JSONResponseError as error:
-            exception = error.body['__type'].split('#')[1]
-
-            if exception == 'ResourceNotFoundException':
-                logger.error('{0} - Table {1} does not exist anymore'.format(
-                    table_name,
-                    table_name))
-                continue
-
-        except BotoServerError as error:
-            if boto_server_error_retries > 0:
-                logger.error(
-                    'Unknown boto error. Status: "{0}". '
-                    'Reason: "{1}". Message: {2}'.format(
-                        error.status,
-                        error.reason,
-                        error.message))
-                logger.error(
-                    'Please bug report if this error persists')
-                boto_server_error_retries -= 1
-                continue
+    :type table_name: str
+    :param table_name: Name of the DynamoDB table
+    :type table_key: str
+    :param table_key: Table configuration option key name
+    """
+    timing.set_target(table_name)
+    log_handler.set_context(table_name)
 
-            else:
-                raise
+    try:
+        table_num_consec_read_checks = \
+            CHECK_STATUS['tables'][table_name]['reads']
+    except KeyError:
+        table_num_consec_read_checks = 0
 
-    # Sleep between the checks
-    if not get_global_option('run_once'):
-        logger.debug('Sleeping {0} seconds until next check'.format(
-            get_global_option('check_interval')))
-        time.sleep(get_global_option('check_interval'))
+    try:
+        table_num_consec_write_checks = \
+            CHECK_STATUS['tables'][table_name]['writes']
+    except KeyError:
+        table_num_consec_write_checks = 0
+
+    # State kept by the scaling policy, updated in place
+    try:
+        table_policy_state = CHECK_STATUS['tables'][table_name]['policy']
+    except KeyError:
+        table_policy_state = {}
+
+    # Time of the latest changes, for the cooldowns
+    try:
+        table_cooldown_state = CHECK_STATUS['tables'][table_name]['cooldown']
+    except KeyError:
+        table_cooldown_state = {}
+
+    # The return var shows how many times the scale-down criteria
+    #  has been met. This is coupled with a var in config,
+    # "num_intervals_scale_down", to delay the scale-down
+    table_num_consec_read_checks, table_num_consec_write_checks = \
+        table.ensure_provisioning(
+            table_name,
+            table_key,
+            table_num_consec_read_checks,
+            table_num_consec_write_checks,
+            table_policy_state,
+            table_cooldown_state)
+
+    CHECK_STATUS['tables'][table_name] = {
+        'reads': table_num_consec_read_checks,
+        'writes': table_num_consec_write_checks,
+        'policy': table_policy_state,
+        'cooldown': table_cooldown_state
+    }
+    throttle_watcher.watch_table(table_name, table_key)
+
+
+def __ensure_gsi(table_name, table_key, gsi_name, gsi_key):
+    """ Ensure provisioning for a GSI and update the check status
+
+    :type table_name: str
+    :param table_name: Name of the DynamoDB table
+    :type table_key: str
+    :param table_key: Table configuration option key name
+    :type gsi_name: str
+    :param gsi_name: Name of the GSI
+    :type gsi_key: str
+    :param gsi_key: GSI configuration option key name
+    """
+    unique_gsi_name = ':'.join([table_name, gsi_name])
+    timing.set_target(table_name, gsi_name)
+    log_handler.set_context(table_name, gsi_name)
+
+    try:
+        gsi_num_consec_read_checks = \
+            CHECK_STATUS['gsis'][unique_gsi_name]['reads']
+    except KeyError:
+        gsi_num_consec_read_checks = 0
+
+    try:
+        gsi_num_consec_write_checks = \
+            CHECK_STATUS['gsis'][unique_gsi_name]['writes']
+    except KeyError:
+        gsi_num_consec_write_checks = 0
+
+    # State kept by the scaling policy, updated in place
+    try:
+        gsi_policy_state = CHECK_STATUS['gsis'][unique_gsi_name]['policy']
+    except KeyError:
+        gsi_policy_state = {}
+
+    # Time of the latest changes, for the cooldowns
+    try:
+        gsi_cooldown_state = CHECK_STATUS['gsis'][unique_gsi_name]['cooldown']
+    except KeyError:
+        gsi_cooldown_state = {}
+
+    gsi_num_consec_read_checks, gsi_num_consec_write_checks = \
+        gsi.ensure_provisioning(
+            table_name,
+            table_key,
+            gsi_name,
+            gsi_key,
+            gsi_num_consec_read_checks,
+            gsi_num_consec_write_checks,
+            gsi_policy_state,
+            gsi_cooldown_state)
+
+    CHECK_STATUS['gsis'][unique_gsi_name] = {
+        'reads': gsi_num_consec_read_checks,
+        'writes': gsi_num_consec_write_checks,
+        'policy': gsi_policy_state,
+        'cooldown': gsi_cooldown_state
+    }
+    throttle_watcher.watch_gsi(table_name, table_key, gsi_name, gsi_key)
+
+
+def __handle_event(table_name, gsi_name=None, throttled=None):
+    """ Ensure provisioning for a table or GSI named in an event
+
+    The increases are queued for the capacity budget, the caller hands out
+    the budget with capacity_budget.apply().
+
+    :type table_name: str
+    :param table_name: Name of the DynamoDB table
+    :type gsi_name: str
+    :param gsi_name: Name of the GSI, if the event concerns a GSI
+    :type throttled: tuple
+    :param throttled: The throttled kinds, if the event is an emergency
+        scale-up queued by the throttle watcher
+    """
+    table_key = None
+    for key_name in get_configured_tables():
+        if re.match(key_name, table_name):
+            table_key = key_name
+            break
+
+    if not table_key:
+        logger.warning(
+            '{0} - Ignoring event for table without configuration'.format(
+                table_name))
+        return
+
+    if not sharding.owns(table_name):
+        logger.debug(
+            '{0} - Ignoring event for table of another shard'.format(
+                table_name))
+        return
+
+    __run_table_check(
+        table_name,
+        __handle_table_event,
+        table_name,
+        table_key,
+        gsi_name,
+        throttled)
+
+
+def __handle_table_event(table_name, table_key, gsi_name, throttled):
+    """ Ensure provisioning for a configured table or GSI named in an event
+
+    :type table_name: str
+    :param table_name: Name of the DynamoDB table
+    :type table_key: str
+    :param table_key: Table configuration option key name
+    :type gsi_name: str
+    :param gsi_name: Name of the GSI, if the event concerns a GSI
+    :type throttled: tuple
+    :param throttled: The throttled kinds, if the event is an emergency
+        scale-up queued by the throttle watcher
+    """
+    if not gsi_name:
+        if throttled:
+            throttle_watcher.scale_up(
+                table_name,
+                table_key,
+                None,
+                None,
+                throttled,
+                CHECK_STATUS['tables'].setdefault(
+                    table_name, {}).setdefault('cooldown', {}))
+            return
+
+        logger.info('{0} - Ensuring provisioning after event'.format(
+            table_name))
+        __ensure_table(table_name, table_key)
+        return
+
+    for gsi_key in sorted((get_table_option(table_key, 'gsis') or {})):
+        if re.match(gsi_key, gsi_name):
+            if throttled:
+                throttle_watcher.scale_up(
+                    table_name,
+                    table_key,
+                    gsi_name,
+                    gsi_key,
+                    throttled,
+                    CHECK_STATUS['gsis'].setdefault(
+                        ':'.join([table_name, gsi_name]),
+                        {}).setdefault('cooldown', {}))
+                return
+
+            logger.info(
+                '{0} - GSI: {1} - Ensuring provisioning '
+                'after event'.format(table_name, gsi_name))
+            __ensure_gsi(table_name, table_key, gsi_name, gsi_key)
+            return
+
+    logger.warning(
+        '{0} - GSI: {1} - Ignoring event for GSI '
+        'without configuration'.format(table_name, gsi_name))
+
+
+def __wait(seconds):
+    """ Wait until the next check, handling incoming events meanwhile
+
+    :type seconds: int
+    :param seconds: Number of seconds to wait
+    """
+    wait_until = time.time() + seconds
+
+    while True:
+        remaining = wait_until - time.time()
+        if remaining <= 0:
+            return
+
+        event = event_listener.get_event(remaining)
+        if event:
+            __handle_event(*event)
+            capacity_budget.apply()
+
+
+def __handle_queued_events():
+    """ Handle the events queued while checking the tables
+
+    The increases join the capacity budget allocation of the current check.
+    """
+    while True:
+        event = event_listener.get_event(0)
+        if not event:
+            return
+
+        __handle_event(*event)
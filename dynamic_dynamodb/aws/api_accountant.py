@@ -0,0 +1,305 @@
+# -*- coding: utf-8 -*-
+""" Accounting of the AWS API calls
+
+Every call made through the instrumented connections passes through the
+accountant, which counts the calls per operation and per table in each
+check, and paces them with one token bucket per operation. The rates are
+set with api-rate-limits, e.g.
+
+    describe_table:10,update_table:2,get_metric_statistics:20
+
+in calls per second, and should stay below the AWS quotas of the account.
+A call that would exceed its rate waits for a token. When AWS throttles an
+operation anyway, its bucket is drained so the following calls back off.
+
+With api-cycle-budget set, each check may make at most that many calls.
+The tables are then checked by priority, throttled tables first and idle
+tables last, and the tables whose expected number of calls (the calls
+their previous check made) do not fit in the budget left are deferred to
+the next check. An idle table is deferred at most MAX_DEFERRALS checks in
+a row.
+"""
+import sys
+import threading
+import time
+
+from dynamic_dynamodb import metrics, retry_policy, timing
+from dynamic_dynamodb.log_handler import LOGGER as logger
+from dynamic_dynamodb.config_handler import get_global_option
+
+# Consumed capacity in percent below which a table counts as idle
+IDLE_PERCENT = 1.0
+
+# Maximum number of checks in a row an idle table is deferred
+MAX_DEFERRALS = 3
+
+# Calls in the current check, {(service, operation): calls}
+CYCLE_CALLS = {}
+
+# Calls per table in the current and in the previous check
+TABLE_CALLS = {}
+TABLE_COSTS = {}
+
+# Throttled and idle state of the tables in their latest check
+TABLE_STATE = {}
+
+# Number of checks in a row each table has been deferred
+DEFERRALS = {}
+
+CALLS_LOCK = threading.Lock()
+
+# Table being checked, per thread
+LOCAL = threading.local()
+
+
+class TokenBucket(object):
+    """ Token bucket pacing calls to a fixed rate """
+    def __init__(self, rate):
+        """ Create a full bucket
+
+        :type rate: float
+        :param rate: Calls per second, also the size of the bucket
+        """
+        self.rate = float(rate)
+        self.capacity = max(1.0, self.rate)
+        self.tokens = self.capacity
+        self.updated = time.time()
+        self.lock = threading.Lock()
+
+    def acquire(self):
+        """ Take a token, waiting for it if the bucket is empty
+
+        The token is reserved before waiting, so concurrent callers are
+        served in order.
+
+        :returns: float -- Seconds waited
+        """
+        with self.lock:
+            self.refill()
+            self.tokens -= 1
+            wait = -self.tokens / self.rate if self.tokens < 0 else 0.0
+
+        if wait > 0:
+            time.sleep(wait)
+
+        return wait
+
+    def drain(self):
+        """ Empty the bucket, making the next calls wait a second """
+        with self.lock:
+            self.refill()
+            self.tokens = min(self.tokens, 0.0) - self.rate
+
+    def refill(self):
+        """ Add the tokens accumulated since the last update """
+        now = time.time()
+        self.tokens = min(
+            self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+
+def parse_rate_limits(rate_limits):
+    """ Parse the api-rate-limits option
+
+    :type rate_limits: str
+    :param rate_limits: Example: 'describe_table:10,update_table:2'
+    :returns: dict -- {operation: TokenBucket}
+    :raises: ValueError -- If the option is malformatted
+    """
+    buckets = {}
+    if not rate_limits:
+        return buckets
+
+    for limit in rate_limits.split(','):
+        try:
+            operation, rate = [part.strip() for part in limit.split(':')]
+            rate = float(rate)
+        except ValueError:
+            raise ValueError(
+                'Malformatted API rate limit {0!r}, expected '
+                'operation:calls per second'.format(limit.strip()))
+
+        if rate <= 0:
+            raise ValueError(
+                'The API rate limit of {0} must be positive'.format(operation))
+
+        buckets[operation] = TokenBucket(rate)
+
+    return buckets
+
+
+try:
+    BUCKETS = parse_rate_limits(get_global_option('api_rate_limits'))
+except ValueError as error:
+    print('Error in api-rate-limits: {0}'.format(error))
+    sys.exit(1)
+
+
+def acquire(service, operation):
+    """ Count an API call and wait for its rate limit
+
+    :type service: str
+    :param service: Service name, e.g. dynamodb
+    :type operation: str
+    :param operation: API method called, e.g. describe_table
+    """
+    table_name = getattr(LOCAL, 'table_name', None)
+    with CALLS_LOCK:
+        key = (service, operation)
+        CYCLE_CALLS[key] = CYCLE_CALLS.get(key, 0) + 1
+        if table_name:
+            TABLE_CALLS[table_name] = TABLE_CALLS.get(table_name, 0) + 1
+
+    bucket = BUCKETS.get(operation)
+    if bucket is None:
+        return
+
+    waited = bucket.acquire()
+    if waited:
+        metrics.observe(
+            'api_rate_limit_wait_seconds', waited, operation=operation)
+        timing.record('aws:rate-limit', waited)
+
+
+def record_error(service, operation, error):
+    """ Back off an operation throttled by AWS
+
+    :type service: str
+    :param service: Service name, e.g. dynamodb
+    :type operation: str
+    :param operation: API method called, e.g. describe_table
+    :type error: Exception
+    :param error: Error raised by the call
+    """
+    if retry_policy.classify(error) != retry_policy.THROTTLING:
+        return
+
+    metrics.inc('api_throttled_total', service=service, operation=operation)
+    logger.warning(
+        'AWS throttled {0} {1}, slowing down the calls', service, operation)
+
+    bucket = BUCKETS.get(operation)
+    if bucket:
+        bucket.drain()
+
+
+def set_table(table_name):
+    """ Set the table the calls in this thread are counted for
+
+    :type table_name: str
+    :param table_name: Name of the DynamoDB table, None to stop counting
+    """
+    LOCAL.table_name = table_name
+    if table_name:
+        TABLE_STATE[table_name] = {'throttled': False, 'idle': True}
+
+
+def observe(table_name, consumed_percent, throttled_events):
+    """ Update the throttled and idle state of a table
+
+    Called for the table and each of its GSIs, for reads and writes. The
+    table is throttled if any of them is throttled, and idle if all are.
+
+    :type table_name: str
+    :param table_name: Name of the DynamoDB table
+    :type consumed_percent: float
+    :param consumed_percent: Consumed units in percent of provisioned
+    :type throttled_events: int
+    :param throttled_events: Throttled events in the lookback period
+    """
+    state = TABLE_STATE.setdefault(
+        table_name, {'throttled': False, 'idle': True})
+    if throttled_events:
+        state['throttled'] = True
+    if throttled_events or (consumed_percent or 0) >= IDLE_PERCENT:
+        state['idle'] = False
+
+
+def prioritize(tables):
+    """ Order the tables for this check and defer what is over budget
+
+    :type tables: list
+    :param tables: [(table_name, table_key), ...]
+    :returns: (list, list) -- Tables to check now and deferred tables,
+        both as [(table_name, table_key), ...]
+    """
+    ordered = sorted(tables, key=__priority)
+
+    budget = get_global_option('api_cycle_budget')
+    if not budget:
+        return ordered, []
+
+    with CALLS_LOCK:
+        remaining = budget - sum(CYCLE_CALLS.values())
+    known_costs = [TABLE_COSTS[name] for name, _ in tables
+                   if name in TABLE_COSTS]
+    default_cost = 0
+    if known_costs:
+        default_cost = sum(known_costs) / float(len(known_costs))
+
+    selected = []
+    deferred = []
+    for table_name, table_key in ordered:
+        cost = TABLE_COSTS.get(table_name, default_cost)
+
+        # Always make progress, even when a single table is over budget
+        if selected and cost > remaining:
+            deferred.append((table_name, table_key))
+            DEFERRALS[table_name] = DEFERRALS.get(table_name, 0) + 1
+            continue
+
+        selected.append((table_name, table_key))
+        DEFERRALS.pop(table_name, None)
+        remaining -= cost
+
+    metrics.set_gauge('deferred_tables', len(deferred))
+    if deferred:
+        logger.warning(
+            'API call budget of {0:d} calls per check exceeded, deferring '
+            '{1:d} tables to the next check: {2}',
+            budget,
+            len(deferred),
+            ', '.join([table_name for table_name, _ in deferred]))
+
+    return selected, deferred
+
+
+def end_cycle():
+    """ Log the calls of the check and start counting a new one """
+    global CYCLE_CALLS
+    global TABLE_CALLS
+
+    with CALLS_LOCK:
+        calls = CYCLE_CALLS
+        CYCLE_CALLS = {}
+        TABLE_COSTS.update(TABLE_CALLS)
+        TABLE_CALLS = {}
+    set_table(None)
+
+    logger.debug(
+        'AWS API calls in this check: {0}',
+        ', '.join([
+            '{0}:{1} {2:d}'.format(service, operation, count)
+            for (service, operation), count in sorted(calls.items())
+        ]) or 'none')
+
+
+def __priority(table):
+    """ Sort key checking throttled tables first and idle tables last
+
+    :type table: tuple
+    :param table: (table_name, table_key)
+    :returns: tuple -- Sort key
+    """
+    table_name = table[0]
+    state = TABLE_STATE.get(table_name, {})
+    deferrals = DEFERRALS.get(table_name, 0)
+
+    if state.get('throttled'):
+        group = 0
+    elif state.get('idle') and deferrals < MAX_DEFERRALS:
+        group = 2
+    else:
+        group = 1
+
+    return (group, -deferrals, table_name)
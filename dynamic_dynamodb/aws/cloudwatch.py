@@ -1,5 +1,6 @@
 # -*- coding: utf-8 -*-
 """ Ensure connections to CloudWatch """
+from dynamic_dynamodb.aws import instrumentation
 from dynamic_dynamodb.log_handler import LOGGER as logger
 from dynamic_dynamodb.config_handler import get_global_option
 
@@ -36,4 +37,5 @@ def __get_connection_cloudwatch():
     return connection
 
 
-CLOUDWATCH_CONNECTION = __get_connection_cloudwatch()
+CLOUDWATCH_CONNECTION = instrumentation.instrument(
+    __get_connection_cloudwatch(), 'cloudwatch')
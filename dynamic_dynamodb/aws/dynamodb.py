@@ -1,21 +1,86 @@
 # -*- coding: utf-8 -*-
 """ Handle most tasks related to DynamoDB interaction """
+import datetime
+import json
 import re
 import sys
 import time
-import datetime
 
 from boto import dynamodb2
+from boto.dynamodb2.exceptions import ConditionalCheckFailedException
 from boto.dynamodb2.table import Table
 from boto.exception import DynamoDBResponseError, JSONResponseError
 
+from dynamic_dynamodb import retry_policy
 from dynamic_dynamodb.log_handler import LOGGER as logger
+from dynamic_dynamodb.config import maintenance_calendar
+from dynamic_dynamodb.core import cooldown
 from dynamic_dynamodb.config_handler import (
     get_configured_tables,
     get_global_option,
     get_gsi_option,
     get_table_option)
-from dynamic_dynamodb.aws import sns
+from dynamic_dynamodb.aws import instrumentation, sns
+
+# Seconds to cache the account limits. The limits rarely change
+ACCOUNT_LIMITS_TTL = 3600
+
+# Cached account limits, (timestamp, limits)
+ACCOUNT_LIMITS = (0, None)
+
+# Seconds to cache the capacity provisioned in the account. Changes made by
+# the capacity budget are added to the cached total right away
+ACCOUNT_PROVISIONING_TTL = 900
+
+# Cached account provisioning, (timestamp, provisioning)
+ACCOUNT_PROVISIONING = (0, None)
+
+# Start of the next maintenance window while outside the windows, keyed by
+# (maintenance_windows, timezone)
+NEXT_WINDOW_STARTS = {}
+
+
+def get_gsi_next_window_start(table_name, table_key, gsi_name, gsi_key):
+    """ Get the start of the next maintenance window of a GSI
+
+    :type table_name: str
+    :param table_name: Name of the DynamoDB table
+    :type table_key: str
+    :param table_key: Table configuration option key name
+    :type gsi_name: str
+    :param gsi_name: Name of the GSI
+    :type gsi_key: str
+    :param gsi_key: GSI configuration option key name
+    :returns: datetime.datetime -- Start in UTC, None if decreases are allowed
+    """
+    maintenance_windows = get_gsi_option(
+        table_key, gsi_key, 'maintenance_windows')
+    if not maintenance_windows:
+        return None
+
+    return __get_next_window_start(
+        '{0} - GSI: {1}'.format(table_name, gsi_name),
+        maintenance_windows,
+        get_gsi_option(table_key, gsi_key, 'maintenance_windows_timezone'))
+
+
+def get_table_next_window_start(table_name, key_name):
+    """ Get the start of the next maintenance window of a table
+
+    :type table_name: str
+    :param table_name: Name of the DynamoDB table
+    :type key_name: str
+    :param key_name: Configuration option key name
+    :returns: datetime.datetime -- Start in UTC, None if decreases are allowed
+    """
+    maintenance_windows = get_table_option(key_name, 'maintenance_windows')
+    if not maintenance_windows:
+        return None
+
+    return __get_next_window_start(
+        table_name,
+        maintenance_windows,
+        get_table_option(key_name, 'maintenance_windows_timezone'))
 
 
 def get_tables_and_gsis():
@@ -85,6 +150,175 @@ def get_table(table_name):
     return table
 
 
+def get_account_limits():
+    """ Return the provisioned capacity limits of the account
+
+    The limits are cached for ACCOUNT_LIMITS_TTL seconds.
+
+    :returns: dict -- {'reads': int, 'writes': int}
+    """
+    global ACCOUNT_LIMITS
+
+    timestamp, limits = ACCOUNT_LIMITS
+    if limits and time.time() - timestamp < ACCOUNT_LIMITS_TTL:
+        return limits
+
+    try:
+        response = DYNAMODB_CONNECTION.make_request(
+            'DescribeLimits', json.dumps({}))
+    except JSONResponseError:
+        raise
+
+    limits = {
+        'reads': int(response[u'AccountMaxReadCapacityUnits']),
+        'writes': int(response[u'AccountMaxWriteCapacityUnits'])
+    }
+    logger.debug(
+        'Account limits are {0:d} read units and {1:d} write units'.format(
+            limits['reads'], limits['writes']))
+
+    ACCOUNT_LIMITS = (time.time(), limits)
+
+    return limits
+
+
+def get_account_provisioning():
+    """ Return the capacity provisioned on all tables and GSIs in the account
+
+    Listing the capacity takes a DescribeTable call per table, so the total
+    is cached for ACCOUNT_PROVISIONING_TTL seconds.
+
+    :returns: dict -- {'reads': int, 'writes': int}
+    """
+    global ACCOUNT_PROVISIONING
+
+    timestamp, provisioning = ACCOUNT_PROVISIONING
+    if provisioning and time.time() - timestamp < ACCOUNT_PROVISIONING_TTL:
+        return dict(provisioning)
+
+    provisioning = {'reads': 0, 'writes': 0}
+
+    try:
+        table_list = DYNAMODB_CONNECTION.list_tables()
+        while True:
+            for table_name in table_list[u'TableNames']:
+                desc = DYNAMODB_CONNECTION.describe_table(table_name)[u'Table']
+                throughputs = [desc[u'ProvisionedThroughput']]
+                for gsi in desc.get(u'GlobalSecondaryIndexes', []):
+                    throughputs.append(gsi[u'ProvisionedThroughput'])
+
+                for throughput in throughputs:
+                    provisioning['reads'] += int(
+                        throughput[u'ReadCapacityUnits'])
+                    provisioning['writes'] += int(
+                        throughput[u'WriteCapacityUnits'])
+
+            if u'LastEvaluatedTableName' in table_list:
+                table_list = DYNAMODB_CONNECTION.list_tables(
+                    table_list[u'LastEvaluatedTableName'])
+            else:
+                break
+    except JSONResponseError:
+        raise
+
+    logger.debug(
+        'Account provisioning is {0:d} read units and {1:d} '
+        'write units'.format(provisioning['reads'], provisioning['writes']))
+    ACCOUNT_PROVISIONING = (time.time(), provisioning)
+
+    return dict(provisioning)
+
+
+def add_account_provisioning(reads, writes):
+    """ Add a change of provisioning to the cached account total
+
+    :type reads: int
+    :param reads: Change of the provisioned read units
+    :type writes: int
+    :param writes: Change of the provisioned write units
+    """
+    provisioning = ACCOUNT_PROVISIONING[1]
+    if provisioning:
+        provisioning['reads'] += reads
+        provisioning['writes'] += writes
+
+
+@retry_policy.retried
+def get_table_billing_mode(table_name):
+    """ Return the billing mode of the table
+
+    :type table_name: str
+    :param table_name: Name of the DynamoDB table
+    :returns: (str, float) -- PROVISIONED or PAY_PER_REQUEST, and the time
+        of the latest switch to PAY_PER_REQUEST or None
+    """
+    try:
+        desc = DYNAMODB_CONNECTION.describe_table(table_name)
+    except JSONResponseError:
+        raise
+
+    summary = desc[u'Table'].get(u'BillingModeSummary', {})
+
+    return (
+        summary.get(u'BillingMode', 'PROVISIONED'),
+        summary.get(u'LastUpdateToPayPerRequestDateTime'))
+
+
+def update_table_billing_mode(
+        table_name, billing_mode, reads=None, writes=None, gsi_units=None):
+    """ Switch the billing mode of the table
+
+    :type table_name: str
+    :param table_name: Name of the DynamoDB table
+    :type billing_mode: str
+    :param billing_mode: PROVISIONED or PAY_PER_REQUEST
+    :type reads: int
+    :param reads: Read units to provision when switching to PROVISIONED
+    :type writes: int
+    :param writes: Write units to provision when switching to PROVISIONED
+    :type gsi_units: dict
+    :param gsi_units: Provisioning for each GSI when switching to
+        PROVISIONED. Key: gsi_name, value: (reads, writes)
+    """
+    body = {
+        'TableName': table_name,
+        'BillingMode': billing_mode
+    }
+
+    if billing_mode == 'PROVISIONED':
+        body['ProvisionedThroughput'] = {
+            'ReadCapacityUnits': reads,
+            'WriteCapacityUnits': writes
+        }
+        if gsi_units:
+            body['GlobalSecondaryIndexUpdates'] = [
+                {
+                    'Update': {
+                        'IndexName': gsi_name,
+                        'ProvisionedThroughput': {
+                            'ReadCapacityUnits': gsi_reads,
+                            'WriteCapacityUnits': gsi_writes
+                        }
+                    }
+                }
+                for gsi_name, (gsi_reads, gsi_writes) in sorted(
+                    gsi_units.items())
+            ]
+
+    logger.info('{0} - Switching billing mode to {1}'.format(
+        table_name, billing_mode))
+
+    # Return if dry-run
+    if get_global_option('dry_run'):
+        return
+
+    try:
+        DYNAMODB_CONNECTION.make_request('UpdateTable', json.dumps(body))
+    except JSONResponseError:
+        raise
+
+
+@retry_policy.retried
 def get_gsi_status(table_name, gsi_name):
     """ Return the DynamoDB table
 
@@ -104,6 +338,7 @@ def get_gsi_status(table_name, gsi_name):
             return gsi[u'IndexStatus']
 
 
+@retry_policy.retried
 def get_provisioned_gsi_read_units(table_name, gsi_name):
     """ Returns the number of provisioned read units for the table
 
@@ -130,6 +365,7 @@ def get_provisioned_gsi_read_units(table_name, gsi_name):
     return read_units
 
 
+@retry_policy.retried
 def get_provisioned_gsi_write_units(table_name, gsi_name):
     """ Returns the number of provisioned write units for the table
 
@@ -156,6 +392,7 @@ def get_provisioned_gsi_write_units(table_name, gsi_name):
     return write_units
 
 
+@retry_policy.retried
 def get_provisioned_table_read_units(table_name):
     """ Returns the number of provisioned read units for the table
 
@@ -176,6 +413,7 @@ def get_provisioned_table_read_units(table_name):
     return read_units
 
 
+@retry_policy.retried
 def get_provisioned_table_write_units(table_name):
     """ Returns the number of provisioned write units for the table
 
@@ -196,6 +434,7 @@ def get_provisioned_table_write_units(table_name):
     return write_units
 
 
+@retry_policy.retried
 def get_table_status(table_name):
     """ Return the DynamoDB table
 
@@ -261,7 +500,8 @@ def list_tables():
 
 
 def update_table_provisioning(
-        table_name, key_name, reads, writes, retry_with_only_increase=False):
+        table_name, key_name, reads, writes, retry_with_only_increase=False,
+        cooldown_state=None):
     """ Update provisioning for a given table
 
     :type table_name: str
@@ -274,6 +514,10 @@ def update_table_provisioning(
     :param writes: New number of provisioned write units
     :type retry_with_only_increase: bool
     :param retry_with_only_increase: Set to True to ensure only increases
+    :type cooldown_state: dict
+    :param cooldown_state: Cooldown state to record the changes made in
+    :returns: str -- Outcome: updated, dry-run, failed, unchanged,
+        down-scaling-disabled or outside-maintenance-window
     """
     table = get_table(table_name)
     current_reads = int(get_provisioned_table_read_units(table_name))
@@ -294,7 +538,7 @@ def update_table_provisioning(
             logger.info(
                 '{0} - No need to scale up reads nor writes'.format(
                     table_name))
-            return
+            return 'down-scaling-disabled'
 
     if retry_with_only_increase:
         # Ensure that we are only doing increases
@@ -308,7 +552,7 @@ def update_table_provisioning(
             logger.info(
                 '{0} - No need to scale up reads nor writes'.format(
                     table_name))
-            return
+            return 'unchanged'
 
         logger.info(
             '{0} - Retrying to update provisioning, excluding any decreases. '
@@ -318,7 +562,10 @@ def update_table_provisioning(
     # Check that we are in the right time frame
     maintenance_windows = get_table_option(key_name, 'maintenance_windows')
     if maintenance_windows:
-        if not __is_table_maintenance_window(table_name, maintenance_windows):
+        if not __is_table_maintenance_window(
+                table_name,
+                maintenance_windows,
+                get_table_option(key_name, 'maintenance_windows_timezone')):
             logger.warning(
                 '{0} - We are outside a maintenace window. '
                 'Will only perform up scaling activites'.format(table_name))
@@ -334,7 +581,7 @@ def update_table_provisioning(
                 logger.info(
                     '{0} - No need to scale up reads nor writes'.format(
                         table_name))
-                return
+                return 'outside-maintenance-window'
 
         else:
             logger.info(
@@ -347,7 +594,7 @@ def update_table_provisioning(
 
     # Return if dry-run
     if get_global_option('dry_run'):
-        return
+        return 'dry-run'
 
     try:
         table.update(
@@ -382,6 +629,11 @@ def update_table_provisioning(
             ''.join(message),
             sns_message_types,
             subject='Updated provisioning for table {0}'.format(table_name))
+
+        __record_cooldown(
+            cooldown_state, current_reads, reads, current_writes, writes)
+
+        return 'updated'
     except JSONResponseError as error:
         exception = error.body['__type'].split('#')[1]
         know_exceptions = [
@@ -410,17 +662,20 @@ def update_table_provisioning(
             logger.info(
                 '{0} - Will retry to update provisioning '
                 'with only increases'.format(table_name))
-            update_table_provisioning(
+            return update_table_provisioning(
                 table_name,
                 key_name,
                 reads,
                 writes,
-                retry_with_only_increase=True)
+                retry_with_only_increase=True,
+                cooldown_state=cooldown_state)
+
+        return 'failed'
 
 
 def update_gsi_provisioning(
         table_name, table_key, gsi_name, gsi_key,
-        reads, writes, retry_with_only_increase=False):
+        reads, writes, retry_with_only_increase=False, cooldown_state=None):
     """ Update provisioning on a global secondary index
 
     :type table_name: str
@@ -437,6 +692,10 @@ def update_gsi_provisioning(
     :param writes: Number of writes to provision
     :type retry_with_only_increase: bool
     :param retry_with_only_increase: Set to True to ensure only increases
+    :type cooldown_state: dict
+    :param cooldown_state: Cooldown state to record the changes made in
+    :returns: str -- Outcome: updated, dry-run, failed, unchanged,
+        down-scaling-disabled or outside-maintenance-window
     """
     current_reads = int(get_provisioned_gsi_read_units(table_name, gsi_name))
     current_writes = int(get_provisioned_gsi_write_units(table_name, gsi_name))
@@ -459,7 +718,7 @@ def update_gsi_provisioning(
             logger.info(
                 '{0} - No need to scale up reads nor writes'.format(
                     table_name))
-            return
+            return 'down-scaling-disabled'
 
     if retry_with_only_increase:
         # Ensure that we are only doing increases
@@ -473,7 +732,7 @@ def update_gsi_provisioning(
             logger.info(
                 '{0} - GSI: {1} - No need to scale up reads nor writes'.format(
                     table_name, gsi_name))
-            return
+            return 'unchanged'
 
         logger.info(
             '{0} - GSI: {1} - Retrying to update provisioning, '
@@ -484,7 +743,12 @@ def update_gsi_provisioning(
     # Check that we are in the right time frame
     m_windows = get_gsi_option(table_key, gsi_key, 'maintenance_windows')
     if m_windows:
-        if not __is_gsi_maintenance_window(table_name, gsi_name, m_windows):
+        if not __is_gsi_maintenance_window(
+                table_name,
+                gsi_name,
+                m_windows,
+                get_gsi_option(
+                    table_key, gsi_key, 'maintenance_windows_timezone')):
             logger.warning(
                 '{0} - GSI: {1} - We are outside a maintenace window. '
                 'Will only perform up scaling activites'.format(
@@ -504,7 +768,7 @@ def update_gsi_provisioning(
                     'No need to scale up reads nor writes'.format(
                         table_name,
                         gsi_name))
-                return
+                return 'outside-maintenance-window'
 
         else:
             logger.info(
@@ -520,7 +784,7 @@ def update_gsi_provisioning(
 
     # Return if dry-run
     if get_global_option('dry_run'):
-        return
+        return 'dry-run'
 
     try:
         DYNAMODB_CONNECTION.update_table(
@@ -569,6 +833,10 @@ def update_gsi_provisioning(
             sns_message_types,
             subject='Updated provisioning for GSI {0}'.format(gsi_name))
 
+        __record_cooldown(
+            cooldown_state, current_reads, reads, current_writes, writes)
+
+        return 'updated'
     except JSONResponseError as error:
         exception = error.body['__type'].split('#')[1]
         know_exceptions = ['LimitExceededException']
@@ -589,16 +857,20 @@ def update_gsi_provisioning(
             logger.info(
                 '{0} - GSI: {1} - Will retry to update provisioning '
                 'with only increases'.format(table_name, gsi_name))
-            update_gsi_provisioning(
+            return update_gsi_provisioning(
                 table_name,
                 table_key,
                 gsi_name,
                 gsi_key,
                 reads,
                 writes,
-                retry_with_only_increase=True)
+                retry_with_only_increase=True,
+                cooldown_state=cooldown_state)
 
+        return 'failed'
 
+
+@retry_policy.retried
 def table_gsis(table_name):
     """ Returns a list of GSIs for the given table
 
@@ -617,12 +889,101 @@ def table_gsis(table_name):
     return []
 
 
+def put_lease(lease_table, lease_name, owner, duration):
+    """ Take or renew a lease in the lease table
+
+    The lease is taken if it is free, expired or already held by the owner.
+    The lease table needs a string hash key named lease.
+
+    :type lease_table: str
+    :param lease_table: Name of the lease table
+    :type lease_name: str
+    :param lease_name: Name of the lease
+    :type owner: str
+    :param owner: Unique name of the instance taking the lease
+    :type duration: float
+    :param duration: Seconds until the lease expires
+    :returns: bool -- True if the owner holds the lease
+    """
+    now = time.time()
+    try:
+        DYNAMODB_CONNECTION.put_item(
+            lease_table,
+            {
+                'lease': {'S': lease_name},
+                'owner': {'S': owner},
+                'expires': {'N': str(now + duration)}
+            },
+            condition_expression=(
+                'attribute_not_exists(#lease) OR #owner = :owner OR '
+                '#expires < :now'),
+            expression_attribute_names={
+                '#lease': 'lease',
+                '#owner': 'owner',
+                '#expires': 'expires'
+            },
+            expression_attribute_values={
+                ':owner': {'S': owner},
+                ':now': {'N': str(now)}
+            })
+    except ConditionalCheckFailedException:
+        return False
+
+    return True
+
+
+def delete_lease(lease_table, lease_name, owner):
+    """ Release a lease held by the owner
+
+    :type lease_table: str
+    :param lease_table: Name of the lease table
+    :type lease_name: str
+    :param lease_name: Name of the lease
+    :type owner: str
+    :param owner: Unique name of the instance holding the lease
+    """
+    try:
+        DYNAMODB_CONNECTION.delete_item(
+            lease_table,
+            {'lease': {'S': lease_name}},
+            condition_expression='#owner = :owner',
+            expression_attribute_names={'#owner': 'owner'},
+            expression_attribute_values={':owner': {'S': owner}})
+    except ConditionalCheckFailedException:
+        pass
+
+
+def __record_cooldown(
+        cooldown_state, current_reads, reads, current_writes, writes):
+    """ Record the changes made for the cooldowns
+
+    :type cooldown_state: dict
+    :param cooldown_state: Cooldown state, None to record nothing
+    :type current_reads: int
+    :param current_reads: Reads provisioned before the update
+    :type reads: int
+    :param reads: Reads provisioned by the update
+    :type current_writes: int
+    :param current_writes: Writes provisioned before the update
+    :type writes: int
+    :param writes: Writes provisioned by the update
+    """
+    if cooldown_state is None:
+        return
+
+    if reads != current_reads:
+        cooldown.record('reads', cooldown_state)
+    if writes != current_writes:
+        cooldown.record('writes', cooldown_state)
+
+
 def __get_connection_dynamodb(retries=3):
     """ Ensure connection to DynamoDB
 
     :type retries: int
     :param retries: Number of times to retry to connect to DynamoDB
     """
+    attempt = 0
     connected = False
     region = get_global_option('region')
 
@@ -647,10 +1008,13 @@ def __get_connection_dynamodb(retries=3):
                 logger.error('Failed to connect to DynamoDB. Giving up.')
                 raise
             else:
+                delay = retry_policy.backoff_delay(attempt)
                 logger.error(
-                    'Failed to connect to DynamoDB. Retrying in 5 seconds')
+                    'Failed to connect to DynamoDB. '
+                    'Retrying in {0:.1f} seconds'.format(delay))
                 retries -= 1
-                time.sleep(5)
+                attempt += 1
+                time.sleep(delay)
         else:
             connected = True
             logger.debug('Connected to DynamoDB in {0}'.format(region))
@@ -658,7 +1022,48 @@ def __get_connection_dynamodb(retries=3):
     return connection
 
 
-def __is_gsi_maintenance_window(table_name, gsi_name, maintenance_windows):
+def __get_next_window_start(log_tag, maintenance_windows, timezone):
+    """ Get the start of the next maintenance window
+
+    The start is cached until it has passed, so checks outside the windows
+    do not look up the calendar again.
+
+    :type log_tag: str
+    :param log_tag: Prefix for the log
+    :type maintenance_windows: str
+    :param maintenance_windows: Example: 'Mon-Fri 22:00-06:00,Sat 00:00-23:59'
+    :type timezone: str
+    :param timezone: Timezone of the maintenance windows
+    :returns: datetime.datetime -- Start in UTC, None within a window or if
+        the windows are malformatted
+    """
+    now = datetime.datetime.utcnow()
+    cache_key = (maintenance_windows, timezone)
+    next_window_start = NEXT_WINDOW_STARTS.get(cache_key)
+    if next_window_start and now < next_window_start:
+        return next_window_start
+
+    NEXT_WINDOW_STARTS.pop(cache_key, None)
+    try:
+        calendar = maintenance_calendar.get_calendar(
+            maintenance_windows, timezone)
+    except ValueError as error:
+        logger.error('{0} - Malformatted maintenance window: {1}'.format(
+            log_tag, error))
+        return None
+
+    if calendar.is_open(now):
+        return None
+
+    next_window_start = calendar.next_window_start(now)
+    if next_window_start:
+        NEXT_WINDOW_STARTS[cache_key] = next_window_start
+
+    return next_window_start
+
+
+def __is_gsi_maintenance_window(
+        table_name, gsi_name, maintenance_windows, timezone):
     """ Checks that the current time is within the maintenance window
 
     :type table_name: str
@@ -666,60 +1071,64 @@ def __is_gsi_maintenance_window(table_name, gsi_name, maintenance_windows):
     :type gsi_name: str
     :param gsi_name: Name of the GSI
     :type maintenance_windows: str
-    :param maintenance_windows: Example: '00:00-01:00,10:00-11:00'
+    :param maintenance_windows: Example: 'Mon-Fri 22:00-06:00,Sat 00:00-23:59'
+    :type timezone: str
+    :param timezone: Timezone of the maintenance windows
     :returns: bool -- True if within maintenance window
     """
-    # Example string '00:00-01:00,10:00-11:00'
-    maintenance_window_list = []
-    for window in maintenance_windows.split(','):
-        try:
-            start, end = window.split('-', 1)
-        except ValueError:
-            logger.error(
-                '{0} - GSI: {1} - '
-                'Malformatted maintenance window'.format(table_name, gsi_name))
-            return False
+    return __is_maintenance_window(
+        '{0} - GSI: {1}'.format(table_name, gsi_name),
+        maintenance_windows,
+        timezone)
+
+
+def __is_maintenance_window(log_tag, maintenance_windows, timezone):
+    """ Checks that the current time is within the maintenance window
 
-        maintenance_window_list.append((start, end))
+    The windows are compiled to a calendar on the first call, so this is a
+    constant time lookup.
 
-    now = datetime.datetime.utcnow().strftime('%H%M')
-    for maintenance_window in maintenance_window_list:
-        start = ''.join(maintenance_window[0].split(':'))
-        end = ''.join(maintenance_window[1].split(':'))
-        if now >= start and now <= end:
-            return True
+    :type log_tag: str
+    :param log_tag: Prefix for the log
+    :type maintenance_windows: str
+    :param maintenance_windows: Example: 'Mon-Fri 22:00-06:00,Sat 00:00-23:59'
+    :type timezone: str
+    :param timezone: Timezone of the maintenance windows
+    :returns: bool -- True if within maintenance window
+    """
+    try:
+        calendar = maintenance_calendar.get_calendar(
+            maintenance_windows, timezone)
+    except ValueError as error:
+        logger.error('{0} - Malformatted maintenance window: {1}'.format(
+            log_tag, error))
+        return False
+
+    if calendar.is_open():
+        return True
+
+    next_window_start = calendar.next_window_start()
+    if next_window_start:
+        logger.info(
+            '{0} - Decreases are deferred to the next maintenance window, '
+            'starting {1} UTC'.format(
+                log_tag, next_window_start.strftime('%Y-%m-%d %H:%M')))
 
     return False
 
 
-def __is_table_maintenance_window(table_name, maintenance_windows):
+def __is_table_maintenance_window(table_name, maintenance_windows, timezone):
     """ Checks that the current time is within the maintenance window
 
     :type table_name: str
     :param table_name: Name of the DynamoDB table
     :type maintenance_windows: str
-    :param maintenance_windows: Example: '00:00-01:00,10:00-11:00'
+    :param maintenance_windows: Example: 'Mon-Fri 22:00-06:00,Sat 00:00-23:59'
+    :type timezone: str
+    :param timezone: Timezone of the maintenance windows
     :returns: bool -- True if within maintenance window
     """
-    # Example string '00:00-01:00,10:00-11:00'
-    maintenance_window_list = []
-    for window in maintenance_windows.split(','):
-        try:
-            start, end = window.split('-', 1)
-        except ValueError:
-            logger.error(
-                '{0} - Malformatted maintenance window'.format(table_name))
-            return False
-
-        maintenance_window_list.append((start, end))
-
-    now = datetime.datetime.utcnow().strftime('%H%M')
-    for maintenance_window in maintenance_window_list:
-        start = ''.join(maintenance_window[0].split(':'))
-        end = ''.join(maintenance_window[1].split(':'))
-        if now >= start and now <= end:
-            return True
-
-    return False
+    return __is_maintenance_window(table_name, maintenance_windows, timezone)
 
-DYNAMODB_CONNECTION = __get_connection_dynamodb()
+DYNAMODB_CONNECTION = instrumentation.instrument(
+    __get_connection_dynamodb(), 'dynamodb')
@@ -0,0 +1,95 @@
+# -*- coding: utf-8 -*-
+""" Instrumented AWS connections
+
+The connections are wrapped in a proxy that counts and times every API
+method called on them, for the metrics endpoint and the timing report. The
+calls are paced by the API accountant, and are not made once the deadline
+of the table being evaluated has passed.
+
+The socket timeout of the connections is set to api-socket-timeout, so a
+hung request fails instead of blocking the check.
+"""
+import time
+
+from dynamic_dynamodb import metrics, retry_policy, timing
+from dynamic_dynamodb.aws import api_accountant
+from dynamic_dynamodb.config_handler import get_global_option
+
+
+class InstrumentedConnection(object):
+    """ Proxy for a boto connection recording the API calls """
+    def __init__(self, connection, service):
+        """ Wrap a connection
+
+        :type connection: boto connection
+        :param connection: Connection to wrap
+        :type service: str
+        :param service: Service name used in the metrics, e.g. dynamodb
+        """
+        self.__dict__['_connection'] = connection
+        self.__dict__['_service'] = service
+
+    def __getattr__(self, name):
+        """ Get an attribute of the connection, wrapping public methods """
+        attribute = getattr(self._connection, name)
+        if name.startswith('_') or not callable(attribute):
+            return attribute
+
+        service = self._service
+        operation = name
+        if name == 'make_request':
+            # The operation is passed as the action argument
+            operation = None
+
+        def call(*args, **kwargs):
+            """ Call the connection method and record the call """
+            label = operation or (args and args[0]) or kwargs.get('action')
+            retry_policy.check_deadline('{0} {1}'.format(service, label))
+            api_accountant.acquire(service, label)
+            start = time.time()
+            try:
+                return attribute(*args, **kwargs)
+            except Exception as error:
+                api_accountant.record_error(service, label, error)
+                if retry_policy.is_timeout(error):
+                    metrics.inc(
+                        'api_timeouts_total',
+                        service=service,
+                        operation=label)
+                metrics.inc(
+                    'api_errors_total',
+                    service=service,
+                    operation=label,
+                    error=type(error).__name__)
+                raise
+            finally:
+                elapsed = time.time() - start
+                metrics.inc(
+                    'api_calls_total', service=service, operation=label)
+                metrics.observe(
+                    'api_call_duration_seconds', elapsed, service=service)
+                timing.record(
+                    'aws:{0}:{1}'.format(service, label), elapsed)
+
+        return call
+
+    def __setattr__(self, name, value):
+        """ Set attributes on the wrapped connection """
+        setattr(self._connection, name, value)
+
+
+def instrument(connection, service):
+    """ Wrap a connection to record its API calls
+
+    :type connection: boto connection
+    :param connection: Connection to wrap
+    :type service: str
+    :param service: Service name used in the metrics, e.g. dynamodb
+    :returns: InstrumentedConnection
+    """
+    socket_timeout = get_global_option('api_socket_timeout')
+    if socket_timeout:
+        # Used by boto when opening the HTTP connections
+        connection.http_connection_kwargs['timeout'] = socket_timeout
+
+    return InstrumentedConnection(connection, service)
@@ -1,12 +1,55 @@
 # -*- coding: utf-8 -*-
-""" Handles SNS connection and communication """
+""" Handles SNS connection and communication
+
+Notifications are not sent from the scaling path. They are put on a bounded
+queue and sent by a background dispatcher thread. Messages to the same topic
+arriving within sns-coalesce-window seconds are deduplicated and sent as one
+digest, split into several notifications if it exceeds the SNS message size
+limit.
+"""
+import atexit
+import threading
+import time
+import Queue
+
 from boto import sns
 from boto.exception import BotoServerError
 
+from dynamic_dynamodb import metrics, retry_policy
+from dynamic_dynamodb.aws import instrumentation
 from dynamic_dynamodb.log_handler import LOGGER as logger
 from dynamic_dynamodb.config_handler import (
     get_gsi_option, get_table_option, get_global_option)
 
+# Number of attempts when publishing to SNS fails
+PUBLISH_ATTEMPTS = 4
+
+# Seconds to wait at most after the first failed attempt, doubled for
+# each retry
+PUBLISH_BACKOFF = 1
+
+# SNS rejects messages larger than 256 KB
+MAX_MESSAGE_BYTES = 256 * 1024
+
+# Appended to messages cut at MAX_MESSAGE_BYTES
+TRUNCATED_MARKER = '\n[truncated]'
+
+# Separator between the messages of a digest
+DIGEST_SEPARATOR = '\n\n'
+
+# How long to wait for queued notifications to be sent on exit
+FLUSH_TIMEOUT = 30
+
+# Put on the queue to make the dispatcher send everything it holds
+FLUSH_MARKER = object()
+
+SNS_QUEUE = Queue.Queue(maxsize=get_global_option('sns_queue_size'))
+metrics.register_gauge('queue_depth', SNS_QUEUE.qsize, queue='sns')
+
+DISPATCHER = None
+DISPATCHER_LOCK = threading.Lock()
+FLUSHED = threading.Event()
+
 
 def publish_gsi_notification(
         table_key, gsi_key, message, message_types, subject=None):
@@ -54,6 +97,7 @@ def publish_table_notification(table_key, message, message_types, subject=None):
         - scale-down
         - high-throughput-alarm
         - low-throughput-alarm
+        - billing-mode
     :type subject: str
     :param subject: Subject to use for e-mail notifications
     :returns: None
@@ -69,7 +113,9 @@ def publish_table_notification(table_key, message, message_types, subject=None):
 
 
 def __publish(topic, message, subject=None):
-    """ Publish a message to a SNS topic
+    """ Queue a message for the SNS dispatcher
+
+    This never blocks. If the queue is full the message is dropped.
 
     :type topic: str
     :param topic: SNS topic to publish the message to
@@ -79,16 +125,202 @@ def __publish(topic, message, subject=None):
     :param subject: Subject to use for e-mail notifications
     :returns: None
     """
+    __ensure_dispatcher()
+
     try:
-        SNS_CONNECTION.publish(topic=topic, message=message, subject=subject)
-        logger.info('Sent SNS notification to {0}'.format(topic))
-    except BotoServerError as error:
-        logger.error('Problem sending SNS notification: {0}'.format(
-            error.message))
+        SNS_QUEUE.put_nowait((topic, message, subject))
+    except Queue.Full:
+        logger.warning(
+            'SNS notification queue is full, dropping notification '
+            'to {0}'.format(topic))
 
     return
 
 
+def __ensure_dispatcher():
+    """ Start the dispatcher thread unless it is already running """
+    global DISPATCHER
+
+    with DISPATCHER_LOCK:
+        if DISPATCHER and DISPATCHER.is_alive():
+            return
+
+        DISPATCHER = threading.Thread(target=__dispatch, name='sns-dispatcher')
+        DISPATCHER.daemon = True
+        DISPATCHER.start()
+
+
+def __dispatch():
+    """ Send queued notifications, coalescing them per topic """
+    # Key: topic, value: (time of the first message, [(subject, message)])
+    pending = {}
+
+    while True:
+        timeout = None
+        if pending:
+            oldest = min([first for first, _ in pending.values()])
+            timeout = max(
+                0, oldest + get_global_option('sns_coalesce_window') -
+                time.time())
+
+        try:
+            item = SNS_QUEUE.get(timeout=timeout)
+        except Queue.Empty:
+            item = None
+
+        if item is FLUSH_MARKER:
+            for topic in pending.keys():
+                __send(topic, pending.pop(topic)[1])
+            FLUSHED.set()
+            continue
+
+        if item:
+            topic, message, subject = item
+            first, messages = pending.setdefault(topic, (time.time(), []))
+            if (subject, message) not in messages:
+                messages.append((subject, message))
+
+        for topic, (first, messages) in pending.items():
+            if (time.time() - first >=
+                    get_global_option('sns_coalesce_window')):
+                del pending[topic]
+                __send(topic, messages)
+
+
+def __send(topic, messages):
+    """ Publish one or more messages to a SNS topic as a digest
+
+    The digest is split into several notifications if it does not fit in
+    one SNS message.
+
+    :type topic: str
+    :param topic: SNS topic to publish the message to
+    :type messages: list
+    :param messages: List of (subject, message) tuples
+    :returns: None
+    """
+    for subject, message in __build_digests(messages):
+        __send_message(topic, subject, message)
+
+
+def __build_digests(messages):
+    """ Group messages into notifications within MAX_MESSAGE_BYTES
+
+    :type messages: list
+    :param messages: List of (subject, message) tuples
+    :returns: list -- List of (subject, message) tuples to send
+    """
+    if len(messages) == 1:
+        subject, message = messages[0]
+        return [(subject, __truncate(message, MAX_MESSAGE_BYTES))]
+
+    batches = [[]]
+    batch_size = 0
+    for part_subject, part_message in messages:
+        part = __truncate(
+            '{0}\n{1}'.format(part_subject or '', part_message).strip(),
+            MAX_MESSAGE_BYTES - len(DIGEST_SEPARATOR))
+        part_size = __get_size(part) + len(DIGEST_SEPARATOR)
+
+        if batches[-1] and batch_size + part_size > MAX_MESSAGE_BYTES:
+            batches.append([])
+            batch_size = 0
+
+        batches[-1].append(part)
+        batch_size += part_size
+
+    digests = []
+    for number, batch in enumerate(batches, 1):
+        subject = 'Dynamic DynamoDB - {0:d} notifications'.format(len(batch))
+        if len(batches) > 1:
+            subject = '{0} ({1:d}/{2:d})'.format(
+                subject, number, len(batches))
+        digests.append((subject, DIGEST_SEPARATOR.join(batch)))
+
+    return digests
+
+
+def __truncate(message, max_bytes):
+    """ Cut a message to at most max_bytes bytes of UTF-8
+
+    :type message: str
+    :param message: Message
+    :type max_bytes: int
+    :param max_bytes: Maximum size in bytes
+    :returns: str -- The message, marked if it was cut
+    """
+    if __get_size(message) <= max_bytes:
+        return message
+
+    if isinstance(message, unicode):
+        message = message.encode('utf-8')
+
+    # Drop any multi-byte character split by the cut
+    return message[:max_bytes - len(TRUNCATED_MARKER)].decode(
+        'utf-8', 'ignore') + TRUNCATED_MARKER
+
+
+def __get_size(message):
+    """ Get the size of a message in bytes of UTF-8
+
+    :type message: str
+    :param message: Message
+    :returns: int -- Size in bytes
+    """
+    if isinstance(message, unicode):
+        return len(message.encode('utf-8'))
+
+    return len(message)
+
+
+def __send_message(topic, subject, message):
+    """ Publish a message to a SNS topic, retrying on failures
+
+    :type topic: str
+    :param topic: SNS topic to publish the message to
+    :type subject: str
+    :param subject: Subject to use for e-mail notifications
+    :type message: str
+    :param message: Message to send via SNS
+    :returns: None
+    """
+    for attempt in range(PUBLISH_ATTEMPTS):
+        try:
+            SNS_CONNECTION.publish(
+                topic=topic, message=message, subject=subject)
+            logger.info('Sent SNS notification to {0}'.format(topic))
+            return
+        except BotoServerError as error:
+            logger.error('Problem sending SNS notification: {0}'.format(
+                error.message))
+        except Exception as error:
+            logger.error('Problem sending SNS notification: {0}'.format(
+                error))
+
+        if attempt < PUBLISH_ATTEMPTS - 1:
+            time.sleep(retry_policy.backoff_delay(
+                attempt, PUBLISH_BACKOFF, PUBLISH_BACKOFF * 2 ** attempt))
+
+    logger.error('Giving up sending SNS notification to {0}'.format(topic))
+
+
+def __flush():
+    """ Send all queued notifications before exiting """
+    if not DISPATCHER or not DISPATCHER.is_alive():
+        return
+
+    FLUSHED.clear()
+    try:
+        SNS_QUEUE.put(FLUSH_MARKER, timeout=FLUSH_TIMEOUT)
+    except Queue.Full:
+        logger.warning('Could not send queued SNS notifications on exit')
+        return
+
+    FLUSHED.wait(FLUSH_TIMEOUT)
+
+atexit.register(__flush)
+
+
 def __get_connection_SNS():
     """ Ensure connection to SNS """
     region = get_global_option('region')
@@ -120,4 +352,5 @@ def __get_connection_SNS():
     logger.debug('Connected to SNS in {0}'.format(region))
     return connection
 
-SNS_CONNECTION = __get_connection_SNS()
+SNS_CONNECTION = instrumentation.instrument(
+    __get_connection_SNS(), 'sns')
@@ -29,14 +29,14 @@ def decrease_reads_in_percent(
 
     if updated_provisioning < min_provisioned_reads:
         logger.info(
-            '{0} - Reached provisioned reads min limit: {1:d}'.format(
-                log_tag, int(min_provisioned_reads)))
+            '{0} - Reached provisioned reads min limit: {1:d}',
+            log_tag, int(min_provisioned_reads))
 
         return min_provisioned_reads
 
     logger.debug(
-        '{0} - Read provisioning will be decreased to {1:d} units'.format(
-            log_tag, int(updated_provisioning)))
+        '{0} - Read provisioning will be decreased to {1:d} units',
+        log_tag, int(updated_provisioning))
 
     return updated_provisioning
 
@@ -63,16 +63,14 @@ def decrease_reads_in_units(
 
     if updated_provisioning < min_provisioned_reads:
         logger.info(
-            '{0} - Reached provisioned reads min limit: {1:d}'.format(
-                log_tag,
-                int(min_provisioned_reads)))
+            '{0} - Reached provisioned reads min limit: {1:d}',
+            log_tag, int(min_provisioned_reads))
 
         return min_provisioned_reads
 
     logger.debug(
-        '{0} - Read provisioning will be decreased to {1:d} units'.format(
-            log_tag,
-            int(updated_provisioning)))
+        '{0} - Read provisioning will be decreased to {1:d} units',
+        log_tag, int(updated_provisioning))
 
     return updated_provisioning
 
@@ -101,16 +99,14 @@ def decrease_writes_in_percent(
 
     if updated_provisioning < min_provisioned_writes:
         logger.info(
-            '{0} - Reached provisioned writes min limit: {1:d}'.format(
-                log_tag,
-                int(min_provisioned_writes)))
+            '{0} - Reached provisioned writes min limit: {1:d}',
+            log_tag, int(min_provisioned_writes))
 
         return min_provisioned_writes
 
     logger.debug(
-        '{0} - Write provisioning will be decreased to {1:d} units'.format(
-            log_tag,
-            int(updated_provisioning)))
+        '{0} - Write provisioning will be decreased to {1:d} units',
+        log_tag, int(updated_provisioning))
 
     return updated_provisioning
 
@@ -137,16 +133,14 @@ def decrease_writes_in_units(
 
     if updated_provisioning < min_provisioned_writes:
         logger.info(
-            '{0} - Reached provisioned writes min limit: {1:d}'.format(
-                log_tag,
-                int(min_provisioned_writes)))
+            '{0} - Reached provisioned writes min limit: {1:d}',
+            log_tag, int(min_provisioned_writes))
 
         return min_provisioned_writes
 
     logger.debug(
-        '{0} - Write provisioning will be decreased to {1:d} units'.format(
-            log_tag,
-            int(updated_provisioning)))
+        '{0} - Write provisioning will be decreased to {1:d} units',
+        log_tag, int(updated_provisioning))
 
     return updated_provisioning
 
@@ -185,16 +179,14 @@ def increase_reads_in_percent(
     if max_provisioned_reads > 0:
         if updated_provisioning > max_provisioned_reads:
             logger.info(
-                '{0} - Reached provisioned reads max limit: {1}'.format(
-                    log_tag,
-                    max_provisioned_reads))
+                '{0} - Reached provisioned reads max limit: {1}',
+                log_tag, max_provisioned_reads)
 
             return max_provisioned_reads
 
     logger.debug(
-        '{0} - Read provisioning will be increased to {1} units'.format(
-            log_tag,
-            updated_provisioning))
+        '{0} - Read provisioning will be increased to {1} units',
+        log_tag, updated_provisioning)
 
     return updated_provisioning
 
@@ -231,16 +223,14 @@ def increase_reads_in_units(
     if max_provisioned_reads > 0:
         if updated_provisioning > max_provisioned_reads:
             logger.info(
-                '{0} - Reached provisioned reads max limit: {1}'.format(
-                    log_tag,
-                    max_provisioned_reads))
+                '{0} - Reached provisioned reads max limit: {1}',
+                log_tag, max_provisioned_reads)
 
             return max_provisioned_reads
 
     logger.debug(
-        '{0} - Read provisioning will be increased to {1:d} units'.format(
-            log_tag,
-            int(updated_provisioning)))
+        '{0} - Read provisioning will be increased to {1:d} units',
+        log_tag, int(updated_provisioning))
 
     return updated_provisioning
 
@@ -280,16 +270,14 @@ def increase_writes_in_percent(
         if updated_provisioning > max_provisioned_writes:
 
             logger.info(
-                '{0} - Reached provisioned writes max limit: {1}'.format(
-                    log_tag,
-                    max_provisioned_writes))
+                '{0} - Reached provisioned writes max limit: {1}',
+                log_tag, max_provisioned_writes)
 
             return max_provisioned_writes
 
     logger.debug(
-        '{0} - Write provisioning will be increased to {1:d} units'.format(
-            log_tag,
-            int(updated_provisioning)))
+        '{0} - Write provisioning will be increased to {1:d} units',
+        log_tag, int(updated_provisioning))
 
     return updated_provisioning
 
@@ -325,16 +313,14 @@ def increase_writes_in_units(
     if max_provisioned_writes > 0:
         if updated_provisioning > max_provisioned_writes:
             logger.info(
-                '{0} - Reached provisioned writes max limit: {1}'.format(
-                    log_tag,
-                    max_provisioned_writes))
+                '{0} - Reached provisioned writes max limit: {1}',
+                log_tag, max_provisioned_writes)
 
             return max_provisioned_writes
 
     logger.debug(
-        '{0} - Write provisioning will be increased to {1:d} units'.format(
-            log_tag,
-            int(updated_provisioning)))
+        '{0} - Write provisioning will be increased to {1:d} units',
+        log_tag, int(updated_provisioning))
 
     return updated_provisioning
 
@@ -358,6 +344,65 @@ def is_consumed_over_proposed(
     return consumption_based_current_provisioning > proposed_provisioning
 
 
+def target_tracking_units(
+        current_provisioning, consumed_units_percent, throttled_events,
+        lookback_period, target_utilization, damping, min_provisioned,
+        max_provisioned, log_tag):
+    """ Calculate the provisioning needed to reach the target utilization
+
+    Throttled events are added to the consumed capacity, as each throttled
+    request would have consumed at least one unit.
+
+    :type current_provisioning: int
+    :param current_provisioning: The current provisioning
+    :type consumed_units_percent: float
+    :param consumed_units_percent: Percent of consumed units
+    :type throttled_events: int
+    :param throttled_events: Number of throttled events during the lookback
+    :type lookback_period: int
+    :param lookback_period: Number of minutes the metrics cover
+    :type target_utilization: float
+    :param target_utilization: Target consumption in percent of provisioning
+    :type damping: float
+    :param damping: Part of the distance to the target to move, 0 to 1
+    :type min_provisioned: int
+    :param min_provisioned: Configured min provisioning
+    :type max_provisioned: int
+    :param max_provisioned: Configured max provisioning
+    :type log_tag: str
+    :param log_tag: Prefix for the log
+    :returns: int -- New provisioning value
+    """
+    consumed_units = (
+        float(current_provisioning) * float(consumed_units_percent) / 100)
+    throttled_units = float(throttled_events) / (float(lookback_period) * 60)
+    required_provisioning = int(math.ceil(
+        (consumed_units + throttled_units) /
+        (float(target_utilization) / 100)))
+
+    updated_provisioning = int(math.ceil(
+        current_provisioning +
+        float(damping) * (required_provisioning - current_provisioning)))
+
+    if min_provisioned and updated_provisioning < int(min_provisioned):
+        updated_provisioning = int(min_provisioned)
+
+    if max_provisioned and updated_provisioning > int(max_provisioned):
+        logger.info(
+            '{0} - Reached provisioned max limit: {1}',
+            log_tag, max_provisioned)
+
+        return int(max_provisioned)
+
+    logger.debug(
+        '{0} - Target utilization {1}% requires {2:d} units, '
+        'proposing {3:d} units',
+        log_tag, target_utilization, required_provisioning,
+        updated_provisioning)
+
+    return max(updated_provisioning, 1)
+
+
 def __get_min_reads(current_provisioning, min_provisioned_reads, log_tag):
     """ Get the minimum number of reads to current_provisioning
 
@@ -380,11 +425,12 @@ def __get_min_reads(current_provisioning, min_provisioned_reads, log_tag):
             logger.debug(
                 '{0} - '
                 'Cannot reach min-provisioned-reads as max scale up '
-                'is 100% of current provisioning'.format(log_tag))
+                'is 100% of current provisioning',
+                log_tag)
 
     logger.debug(
-        '{0} - Setting min provisioned reads to {1}'.format(
-            log_tag, min_provisioned_reads))
+        '{0} - Setting min provisioned reads to {1}',
+        log_tag, min_provisioned_reads)
 
     return reads
 
@@ -411,10 +457,11 @@ def __get_min_writes(current_provisioning, min_provisioned_writes, log_tag):
             logger.debug(
                 '{0} - '
                 'Cannot reach min-provisioned-writes as max scale up '
-                'is 100% of current provisioning'.format(log_tag))
+                'is 100% of current provisioning',
+                log_tag)
 
     logger.debug(
-        '{0} - Setting min provisioned writes to {1}'.format(
-            log_tag, min_provisioned_writes))
+        '{0} - Setting min provisioned writes to {1}',
+        log_tag, min_provisioned_writes)
 
     return writes
@@ -3,6 +3,8 @@
 import sys
 from dynamic_dynamodb.config import config_file_parser
 from dynamic_dynamodb.config import command_line_parser
+from dynamic_dynamodb.config import maintenance_calendar
+from dynamic_dynamodb.config import scale_table
 
 try:
     from collections import OrderedDict as ordereddict
@@ -19,26 +21,75 @@ DEFAULT_OPTIONS = {
         'show_config': False,
         'pid_file_dir': '/tmp',
         'run_once': False,
+        'journal_query': False,
+        'journal_since': None,
+        'journal_until': None,
+        'journal_table': None,
+        'journal_summary': False,
 
         # [global]
         'region': 'us-east-1',
+        'retry_attempts': 5,
+        'retry_base_delay': 0.5,
+        'retry_max_delay': 10.0,
+        'table_deadline': 120,
+        'table_failure_threshold': 3,
         'aws_access_key_id': None,
         'aws_secret_access_key': None,
+        'api_cycle_budget': None,
+        'api_rate_limits': (
+            'describe_table:10,update_table:2,get_metric_statistics:20'),
+        'api_socket_timeout': 30,
+        'shard_count': 1,
+        'shard_index': 0,
+        'lease_backend': None,
+        'lease_dir': '/tmp',
+        'lease_duration': 60,
+        'lease_table': None,
+        'capacity_budget_monthly_cost': None,
+        'capacity_budget_read_units': None,
+        'capacity_budget_use_account_limits': False,
+        'capacity_budget_write_units': None,
         'check_interval': 300,
         'circuit_breaker_url': None,
-        'circuit_breaker_timeout': 10000.00
+        'circuit_breaker_timeout': 10000.00,
+        'circuit_breaker_batch_url': None,
+        'circuit_breaker_cache_ttl': 0,
+        'enable_throttle_watcher': False,
+        'event_listener_host': '127.0.0.1',
+        'event_listener_port': None,
+        'metrics_host': '127.0.0.1',
+        'metrics_port': None,
+        'timing_report_cycles': 10,
+        'profile_cycles': 5,
+        'profile_dir': '/tmp',
+        'journal_dir': None,
+        'journal_segment_size': 64,
+        'journal_retention': 90,
+        'on_demand_read_request_cost': 0.125,
+        'on_demand_write_request_cost': 0.625,
+        'read_unit_monthly_cost': 0.0949,
+        'sns_coalesce_window': 5,
+        'sns_queue_size': 1000,
+        'throttle_watcher_interval': 60,
+        'throttle_watcher_cooldown': 300,
+        'write_unit_monthly_cost': 0.4745
     },
     'logging': {
         # [logging]
         'log_file': None,
         'log_level': 'info',
-        'log_config_file': None
+        'log_config_file': None,
+        'log_format': 'standard',
+        'log_sample_rate': 1,
+        'log_async': False
     },
     'table': {
         'reads-upper-alarm-threshold': 0,
         'reads-lower-alarm-threshold': 0,
         'writes-upper-alarm-threshold': 0,
         'writes-lower-alarm-threshold': 0,
+        'alarm_reminder_interval': 0,
         'enable_reads_autoscaling': True,
         'enable_writes_autoscaling': True,
         'enable_reads_up_scaling': True,
@@ -48,6 +99,7 @@ DEFAULT_OPTIONS = {
         'reads_lower_threshold': 30,
         'reads_upper_threshold': 90,
         'throttled_reads_upper_threshold': 0,
+        'reads_target_utilization': None,
         'increase_reads_with': 50,
         'decrease_reads_with': 50,
         'increase_reads_unit': 'percent',
@@ -55,6 +107,13 @@ DEFAULT_OPTIONS = {
         'writes_lower_threshold': 30,
         'writes_upper_threshold': 90,
         'throttled_writes_upper_threshold': 0,
+        'writes_target_utilization': None,
+        'target_tracking_damping': 1.0,
+        'scaling_policy': 'threshold',
+        'scaling_deadband': 10,
+        'pid_kp': 0.1,
+        'pid_ki': 0.5,
+        'pid_kd': 0.05,
         'increase_writes_with': 50,
         'decrease_writes_with': 50,
         'increase_writes_unit': 'percent',
@@ -70,9 +129,18 @@ DEFAULT_OPTIONS = {
         'allow_scaling_down_reads_on_0_percent': False,
         'allow_scaling_down_writes_on_0_percent': False,
         'always_decrease_rw_together': False,
+        'enable_burst_credit_model': False,
+        'scale_gsi_writes_with_table': False,
+        'capacity_priority': 0,
+        'billing_mode_advisor': False,
+        'consumed_statistic': 'average',
+        'increase_cooldown': 0,
+        'decrease_cooldown': 0,
+        'enable_billing_mode_switching': False,
         'lookback_window_start': 15,
         'lookback_period': 5,
         'maintenance_windows': None,
+        'maintenance_windows_timezone': 'UTC',
         'sns_topic_arn': None,
         'sns_message_types': [],
         'increase_consumed_reads_unit': None,
@@ -103,6 +171,7 @@ DEFAULT_OPTIONS = {
         'reads-lower-alarm-threshold': 0,
         'writes-upper-alarm-threshold': 0,
         'writes-lower-alarm-threshold': 0,
+        'alarm_reminder_interval': 0,
         'enable_reads_autoscaling': True,
         'enable_writes_autoscaling': True,
         'enable_reads_up_scaling': True,
@@ -112,6 +181,7 @@ DEFAULT_OPTIONS = {
         'reads_lower_threshold': 30,
         'reads_upper_threshold': 90,
         'throttled_reads_upper_threshold': 0,
+        'reads_target_utilization': None,
         'increase_reads_with': 50,
         'decrease_reads_with': 50,
         'increase_reads_unit': 'percent',
@@ -119,6 +189,13 @@ DEFAULT_OPTIONS = {
         'writes_lower_threshold': 30,
         'writes_upper_threshold': 90,
         'throttled_writes_upper_threshold': 0,
+        'writes_target_utilization': None,
+        'target_tracking_damping': 1.0,
+        'scaling_policy': 'threshold',
+        'scaling_deadband': 10,
+        'pid_kp': 0.1,
+        'pid_ki': 0.5,
+        'pid_kd': 0.05,
         'increase_writes_with': 50,
         'decrease_writes_with': 50,
         'increase_writes_unit': 'percent',
@@ -134,9 +211,18 @@ DEFAULT_OPTIONS = {
         'allow_scaling_down_reads_on_0_percent': False,
         'allow_scaling_down_writes_on_0_percent': False,
         'always_decrease_rw_together': False,
+        'enable_burst_credit_model': False,
+        'scale_gsi_writes_with_table': False,
+        'capacity_priority': 0,
+        'billing_mode_advisor': False,
+        'consumed_statistic': 'average',
+        'increase_cooldown': 0,
+        'decrease_cooldown': 0,
+        'enable_billing_mode_switching': False,
         'lookback_window_start': 15,
         'lookback_period': 5,
         'maintenance_windows': None,
+        'maintenance_windows_timezone': 'UTC',
         'sns_topic_arn': None,
         'sns_message_types': [],
         'increase_consumed_reads_unit': None,
@@ -196,6 +282,7 @@ def get_configuration():
         configuration['tables'] = __get_config_table_options(conf_file_options)
 
     # Ensure some basic rules
+    __check_global_rules(configuration)
     __check_gsi_rules(configuration)
     __check_logging_rules(configuration)
     __check_table_rules(configuration)
@@ -482,6 +569,64 @@ def __check_gsi_rules(configuration):
                         option, gsi_name))
                     sys.exit(1)
 
+            for option in [
+                    'reads_target_utilization', 'writes_target_utilization']:
+                if gsi[option] and not 0 < gsi[option] <= 100:
+                    print(
+                        '{0} must be between 0 and 100 for GSI {1}'.format(
+                            option, gsi_name))
+                    sys.exit(1)
+
+            if not 0 < gsi['target_tracking_damping'] <= 1:
+                print(
+                    'target_tracking_damping must be between 0 and 1 '
+                    'for GSI {0}'.format(gsi_name))
+                sys.exit(1)
+
+            if gsi.get('maintenance_windows'):
+                try:
+                    maintenance_calendar.get_calendar(
+                        gsi['maintenance_windows'],
+                        gsi.get('maintenance_windows_timezone'))
+                except ValueError as error:
+                    print(
+                        'Invalid maintenance-windows for GSI {0}: {1}'.format(
+                            gsi_name, error))
+                    sys.exit(1)
+
+            for option in scale_table.SCALE_OPTIONS:
+                try:
+                    gsi[option] = scale_table.compile_scale(
+                        gsi.get(option))
+                except ValueError as error:
+                    print('Invalid {0} for GSI {1}: {2}'.format(
+                        option, gsi_name, error))
+                    sys.exit(1)
+
+            valid_consumed_statistics = [
+                'average', 'median', 'trimmed-mean', 'p90', 'ewma']
+            if gsi['consumed_statistic'] not in valid_consumed_statistics:
+                print(
+                    'consumed-statistic must be one of {0} for GSI {1}'.format(
+                        ', '.join(valid_consumed_statistics), gsi_name))
+                sys.exit(1)
+
+            valid_scaling_policies = ['threshold', 'target-tracking', 'pid']
+            if gsi['scaling_policy'] not in valid_scaling_policies:
+                print(
+                    'scaling-policy must be one of {0} for GSI {1}'.format(
+                        ', '.join(valid_scaling_policies), gsi_name))
+                sys.exit(1)
+
+            if gsi['scaling_policy'] != 'threshold' and not (
+                    gsi['reads_target_utilization'] and
+                    gsi['writes_target_utilization']):
+                print(
+                    'reads-target-utilization and writes-target-utilization '
+                    'must be set when using the {0} scaling policy '
+                    'for GSI {1}'.format(gsi['scaling_policy'], gsi_name))
+                sys.exit(1)
+
             if (int(gsi['min_provisioned_reads']) >
                     int(gsi['max_provisioned_reads'])):
                 print(
@@ -502,6 +647,31 @@ def __check_gsi_rules(configuration):
                 sys.exit(1)
 
 
+def __check_global_rules(configuration):
+    """ Check that the global values are proper """
+    shard_count = configuration['global']['shard_count']
+    if shard_count < 1:
+        print('shard-count must be at least 1')
+        sys.exit(1)
+    if not 0 <= configuration['global']['shard_index'] < shard_count:
+        print('shard-index must be between 0 and shard-count - 1')
+        sys.exit(1)
+
+    lease_backend = configuration['global']['lease_backend']
+    valid_lease_backends = ['file', 'dynamodb']
+    if lease_backend and lease_backend not in valid_lease_backends:
+        print('lease-backend must be one of {0}'.format(
+            ', '.join(valid_lease_backends)))
+        sys.exit(1)
+    if lease_backend == 'dynamodb' and not configuration['global'][
+            'lease_table']:
+        print('lease-table must be set when using the dynamodb lease-backend')
+        sys.exit(1)
+    if configuration['global']['lease_duration'] <= 0:
+        print('lease-duration must be positive')
+        sys.exit(1)
+
+
 def __check_logging_rules(configuration):
     """ Check that the logging values are proper """
     valid_log_levels = [
@@ -515,6 +685,12 @@ def __check_logging_rules(configuration):
             ', '.join(valid_log_levels)))
         sys.exit(1)
 
+    valid_log_formats = ['standard', 'json']
+    if configuration['logging']['log_format'] not in valid_log_formats:
+        print('Log format must be one of {0}'.format(
+            ', '.join(valid_log_formats)))
+        sys.exit(1)
+
 
 def __check_table_rules(configuration):
     """ Do some basic checks on the configuration """
@@ -595,7 +771,8 @@ def __check_table_rules(configuration):
             'scale-up',
             'scale-down',
             'high-throughput-alarm',
-            'low-throughput-alarm']
+            'low-throughput-alarm',
+            'billing-mode']
 
         if table['sns_message_types']:
             for sns_type in table['sns_message_types']:
@@ -645,6 +822,59 @@ def __check_table_rules(configuration):
                     option, table_name))
                 sys.exit(1)
 
+        for option in [
+                'reads_target_utilization', 'writes_target_utilization']:
+            if table[option] and not 0 < table[option] <= 100:
+                print('{0} must be between 0 and 100 for table {1}'.format(
+                    option, table_name))
+                sys.exit(1)
+
+        if not 0 < table['target_tracking_damping'] <= 1:
+            print(
+                'target_tracking_damping must be between 0 and 1 '
+                'for table {0}'.format(table_name))
+            sys.exit(1)
+
+        if table.get('maintenance_windows'):
+            try:
+                maintenance_calendar.get_calendar(
+                    table['maintenance_windows'],
+                    table.get('maintenance_windows_timezone'))
+            except ValueError as error:
+                print('Invalid maintenance-windows for table {0}: {1}'.format(
+                    table_name, error))
+                sys.exit(1)
+
+        for option in scale_table.SCALE_OPTIONS:
+            try:
+                table[option] = scale_table.compile_scale(table.get(option))
+            except ValueError as error:
+                print('Invalid {0} for table {1}: {2}'.format(
+                    option, table_name, error))
+                sys.exit(1)
+
+        valid_consumed_statistics = [
+            'average', 'median', 'trimmed-mean', 'p90', 'ewma']
+        if table['consumed_statistic'] not in valid_consumed_statistics:
+            print('consumed-statistic must be one of {0} for table {1}'.format(
+                ', '.join(valid_consumed_statistics), table_name))
+            sys.exit(1)
+
+        valid_scaling_policies = ['threshold', 'target-tracking', 'pid']
+        if table['scaling_policy'] not in valid_scaling_policies:
+            print('scaling-policy must be one of {0} for table {1}'.format(
+                ', '.join(valid_scaling_policies), table_name))
+            sys.exit(1)
+
+        if table['scaling_policy'] != 'threshold' and not (
+                table['reads_target_utilization'] and
+                table['writes_target_utilization']):
+            print(
+                'reads-target-utilization and writes-target-utilization '
+                'must be set when using the {0} scaling policy '
+                'for table {1}'.format(table['scaling_policy'], table_name))
+            sys.exit(1)
+
         if (int(table['min_provisioned_reads']) >
                 int(table['max_provisioned_reads'])):
             print(
@@ -37,6 +37,10 @@ def parse():
         '--log-level',
         choices=['debug', 'info', 'warning', 'error'],
         help='Log level to use (default: info)')
+    parser.add_argument(
+        '--log-format',
+        choices=['standard', 'json'],
+        help='Log format to use (default: standard)')
     parser.add_argument(
         '--log-config-file',
         help=(
@@ -58,7 +62,11 @@ def parse():
         '--daemon',
         help=(
             'Run Dynamic DynamoDB in daemon mode. Valid modes are '
-            '[start|stop|restart|foreground]'))
+            '[start|stop|restart|foreground|timing-report|profile|'
+            'dump-stacks]. timing-report writes the slowest tables and '
+            'phases of a running daemon to its log, profile toggles '
+            'profiling of the next profile-cycles checks and dump-stacks '
+            'writes the stacks of all threads to the log'))
     daemon_ag.add_argument(
         '--instance',
         default='default',
@@ -71,6 +79,45 @@ def parse():
         '--pid-file-dir',
         default='/tmp',
         help='Directory where pid file is located in. Defaults to /tmp')
+    daemon_ag.add_argument(
+        '--shard-index',
+        type=int,
+        help=(
+            'Shard of the tables checked by this instance, from 0 to '
+            '--shard-count - 1 (default: 0)'))
+    daemon_ag.add_argument(
+        '--shard-count',
+        type=int,
+        help=(
+            'Number of instances sharing the tables. The tables are '
+            'assigned to the shards by consistent hashing of their names '
+            '(default: 1)'))
+    journal_ag = parser.add_argument_group('Decision journal options')
+    journal_ag.add_argument(
+        '--journal-query',
+        action='store_true',
+        help=(
+            'Print the provisioning decisions in the journal-dir journal '
+            'and exit'))
+    journal_ag.add_argument(
+        '--journal-since',
+        help=(
+            'Only decisions after this UTC time, e.g. 2014-06-01, '
+            '2014-06-01T12:00 or relative to now, e.g. 12h, 7d or 2w'))
+    journal_ag.add_argument(
+        '--journal-until',
+        help='Only decisions before this UTC time, see --journal-since')
+    journal_ag.add_argument(
+        '--journal-table',
+        help=(
+            'Only decisions on these tables. '
+            'The name is treated as a regular expression'))
+    journal_ag.add_argument(
+        '--journal-summary',
+        action='store_true',
+        help=(
+            'Print the number of decisions, increases, decreases and '
+            'outcomes per table and GSI instead of each decision'))
     dynamodb_ag = parser.add_argument_group('DynamoDB options')
     dynamodb_ag.add_argument(
         '-r', '--region',
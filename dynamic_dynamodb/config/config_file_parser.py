@@ -67,6 +67,12 @@ TABLE_CONFIG_OPTIONS = [
         'required': False,
         'type': 'int'
     },
+    {
+        'key': 'reads_target_utilization',
+        'option': 'reads-target-utilization',
+        'required': False,
+        'type': 'float'
+    },
     {
         'key': 'increase_reads_with',
         'option': 'increase-reads-with',
@@ -109,6 +115,48 @@ TABLE_CONFIG_OPTIONS = [
         'required': False,
         'type': 'int'
     },
+    {
+        'key': 'writes_target_utilization',
+        'option': 'writes-target-utilization',
+        'required': False,
+        'type': 'float'
+    },
+    {
+        'key': 'target_tracking_damping',
+        'option': 'target-tracking-damping',
+        'required': False,
+        'type': 'float'
+    },
+    {
+        'key': 'scaling_policy',
+        'option': 'scaling-policy',
+        'required': False,
+        'type': 'str'
+    },
+    {
+        'key': 'scaling_deadband',
+        'option': 'scaling-deadband',
+        'required': False,
+        'type': 'float'
+    },
+    {
+        'key': 'pid_kp',
+        'option': 'pid-kp',
+        'required': False,
+        'type': 'float'
+    },
+    {
+        'key': 'pid_ki',
+        'option': 'pid-ki',
+        'required': False,
+        'type': 'float'
+    },
+    {
+        'key': 'pid_kd',
+        'option': 'pid-kd',
+        'required': False,
+        'type': 'float'
+    },
     {
         'key': 'increase_writes_with',
         'option': 'increase-writes-with',
@@ -163,6 +211,12 @@ TABLE_CONFIG_OPTIONS = [
         'required': False,
         'type': 'str'
     },
+    {
+        'key': 'maintenance_windows_timezone',
+        'option': 'maintenance-windows-timezone',
+        'required': False,
+        'type': 'str'
+    },
     {
         'key': 'allow_scaling_down_reads_on_0_percent',
         'option': 'allow-scaling-down-reads-on-0-percent',
@@ -181,6 +235,54 @@ TABLE_CONFIG_OPTIONS = [
         'required': False,
         'type': 'bool'
     },
+    {
+        'key': 'enable_burst_credit_model',
+        'option': 'enable-burst-credit-model',
+        'required': False,
+        'type': 'bool'
+    },
+    {
+        'key': 'scale_gsi_writes_with_table',
+        'option': 'scale-gsi-writes-with-table',
+        'required': False,
+        'type': 'bool'
+    },
+    {
+        'key': 'capacity_priority',
+        'option': 'capacity-priority',
+        'required': False,
+        'type': 'int'
+    },
+    {
+        'key': 'increase_cooldown',
+        'option': 'increase-cooldown',
+        'required': False,
+        'type': 'int'
+    },
+    {
+        'key': 'decrease_cooldown',
+        'option': 'decrease-cooldown',
+        'required': False,
+        'type': 'int'
+    },
+    {
+        'key': 'consumed_statistic',
+        'option': 'consumed-statistic',
+        'required': False,
+        'type': 'str'
+    },
+    {
+        'key': 'billing_mode_advisor',
+        'option': 'billing-mode-advisor',
+        'required': False,
+        'type': 'bool'
+    },
+    {
+        'key': 'enable_billing_mode_switching',
+        'option': 'enable-billing-mode-switching',
+        'required': False,
+        'type': 'bool'
+    },
     {
         'key': 'sns_topic_arn',
         'option': 'sns-topic-arn',
@@ -241,6 +343,12 @@ TABLE_CONFIG_OPTIONS = [
         'required': False,
         'type': 'int'
     },
+    {
+        'key': 'alarm_reminder_interval',
+        'option': 'alarm-reminder-interval',
+        'required': False,
+        'type': 'int'
+    },
     {
         'key': 'lookback_window_start',
         'option': 'lookback-window-start',
@@ -511,6 +619,240 @@ def parse(config_path):
                     'required': False,
                     'type': 'float'
                 },
+                {
+                    'key': 'circuit_breaker_batch_url',
+                    'option': 'circuit-breaker-batch-url',
+                    'required': False,
+                    'type': 'str'
+                },
+                {
+                    'key': 'circuit_breaker_cache_ttl',
+                    'option': 'circuit-breaker-cache-ttl',
+                    'required': False,
+                    'type': 'float'
+                },
+                {
+                    'key': 'enable_throttle_watcher',
+                    'option': 'enable-throttle-watcher',
+                    'required': False,
+                    'type': 'bool'
+                },
+                {
+                    'key': 'throttle_watcher_interval',
+                    'option': 'throttle-watcher-interval',
+                    'required': False,
+                    'type': 'int'
+                },
+                {
+                    'key': 'throttle_watcher_cooldown',
+                    'option': 'throttle-watcher-cooldown',
+                    'required': False,
+                    'type': 'int'
+                },
+                {
+                    'key': 'api_cycle_budget',
+                    'option': 'api-cycle-budget',
+                    'required': False,
+                    'type': 'int'
+                },
+                {
+                    'key': 'api_rate_limits',
+                    'option': 'api-rate-limits',
+                    'required': False,
+                    'type': 'str'
+                },
+                {
+                    'key': 'api_socket_timeout',
+                    'option': 'api-socket-timeout',
+                    'required': False,
+                    'type': 'float'
+                },
+                {
+                    'key': 'event_listener_host',
+                    'option': 'event-listener-host',
+                    'required': False,
+                    'type': 'str'
+                },
+                {
+                    'key': 'event_listener_port',
+                    'option': 'event-listener-port',
+                    'required': False,
+                    'type': 'int'
+                },
+                {
+                    'key': 'metrics_host',
+                    'option': 'metrics-host',
+                    'required': False,
+                    'type': 'str'
+                },
+                {
+                    'key': 'metrics_port',
+                    'option': 'metrics-port',
+                    'required': False,
+                    'type': 'int'
+                },
+                {
+                    'key': 'timing_report_cycles',
+                    'option': 'timing-report-cycles',
+                    'required': False,
+                    'type': 'int'
+                },
+                {
+                    'key': 'profile_cycles',
+                    'option': 'profile-cycles',
+                    'required': False,
+                    'type': 'int'
+                },
+                {
+                    'key': 'profile_dir',
+                    'option': 'profile-dir',
+                    'required': False,
+                    'type': 'str'
+                },
+                {
+                    'key': 'journal_dir',
+                    'option': 'journal-dir',
+                    'required': False,
+                    'type': 'str'
+                },
+                {
+                    'key': 'journal_segment_size',
+                    'option': 'journal-segment-size',
+                    'required': False,
+                    'type': 'float'
+                },
+                {
+                    'key': 'journal_retention',
+                    'option': 'journal-retention',
+                    'required': False,
+                    'type': 'float'
+                },
+                {
+                    'key': 'retry_attempts',
+                    'option': 'retry-attempts',
+                    'required': False,
+                    'type': 'int'
+                },
+                {
+                    'key': 'retry_base_delay',
+                    'option': 'retry-base-delay',
+                    'required': False,
+                    'type': 'float'
+                },
+                {
+                    'key': 'retry_max_delay',
+                    'option': 'retry-max-delay',
+                    'required': False,
+                    'type': 'float'
+                },
+                {
+                    'key': 'table_deadline',
+                    'option': 'table-deadline',
+                    'required': False,
+                    'type': 'float'
+                },
+                {
+                    'key': 'table_failure_threshold',
+                    'option': 'table-failure-threshold',
+                    'required': False,
+                    'type': 'int'
+                },
+                {
+                    'key': 'shard_count',
+                    'option': 'shard-count',
+                    'required': False,
+                    'type': 'int'
+                },
+                {
+                    'key': 'shard_index',
+                    'option': 'shard-index',
+                    'required': False,
+                    'type': 'int'
+                },
+                {
+                    'key': 'lease_backend',
+                    'option': 'lease-backend',
+                    'required': False,
+                    'type': 'str'
+                },
+                {
+                    'key': 'lease_dir',
+                    'option': 'lease-dir',
+                    'required': False,
+                    'type': 'str'
+                },
+                {
+                    'key': 'lease_duration',
+                    'option': 'lease-duration',
+                    'required': False,
+                    'type': 'float'
+                },
+                {
+                    'key': 'lease_table',
+                    'option': 'lease-table',
+                    'required': False,
+                    'type': 'str'
+                },
+                {
+                    'key': 'sns_coalesce_window',
+                    'option': 'sns-coalesce-window',
+                    'required': False,
+                    'type': 'float'
+                },
+                {
+                    'key': 'sns_queue_size',
+                    'option': 'sns-queue-size',
+                    'required': False,
+                    'type': 'int'
+                },
+                {
+                    'key': 'on_demand_read_request_cost',
+                    'option': 'on-demand-read-request-cost',
+                    'required': False,
+                    'type': 'float'
+                },
+                {
+                    'key': 'on_demand_write_request_cost',
+                    'option': 'on-demand-write-request-cost',
+                    'required': False,
+                    'type': 'float'
+                },
+                {
+                    'key': 'capacity_budget_use_account_limits',
+                    'option': 'capacity-budget-use-account-limits',
+                    'required': False,
+                    'type': 'bool'
+                },
+                {
+                    'key': 'capacity_budget_read_units',
+                    'option': 'capacity-budget-read-units',
+                    'required': False,
+                    'type': 'int'
+                },
+                {
+                    'key': 'capacity_budget_write_units',
+                    'option': 'capacity-budget-write-units',
+                    'required': False,
+                    'type': 'int'
+                },
+                {
+                    'key': 'capacity_budget_monthly_cost',
+                    'option': 'capacity-budget-monthly-cost',
+                    'required': False,
+                    'type': 'float'
+                },
+                {
+                    'key': 'read_unit_monthly_cost',
+                    'option': 'read-unit-monthly-cost',
+                    'required': False,
+                    'type': 'float'
+                },
+                {
+                    'key': 'write_unit_monthly_cost',
+                    'option': 'write-unit-monthly-cost',
+                    'required': False,
+                    'type': 'float'
+                },
             ])
 
     #
@@ -538,6 +880,24 @@ def parse(config_path):
                     'option': 'log-config-file',
                     'required': False,
                     'type': 'str'
+                },
+                {
+                    'key': 'log_format',
+                    'option': 'log-format',
+                    'required': False,
+                    'type': 'str'
+                },
+                {
+                    'key': 'log_sample_rate',
+                    'option': 'log-sample-rate',
+                    'required': False,
+                    'type': 'int'
+                },
+                {
+                    'key': 'log_async',
+                    'option': 'log-async',
+                    'required': False,
+                    'type': 'bool'
                 }
             ])
 
@@ -0,0 +1,237 @@
+# -*- coding: utf-8 -*-
+""" Maintenance window calendar
+
+The maintenance-windows option is a comma separated list of windows on the
+form
+
+    [DAYS ]HH:MM-HH:MM
+
+where DAYS is a weekday (Mon) or a range of weekdays (Mon-Fri, Fri-Mon).
+Without DAYS the window applies to every day. A window ending before it
+starts runs past midnight, and belongs to the day it starts on. The end
+minute is part of the window. Example:
+
+    Mon-Fri 22:00-06:00,Sat 00:00-23:59
+
+The windows are compiled once into a bitmap with one entry per minute of
+the week, in the timezone set by maintenance-windows-timezone. Named
+timezones require pytz. UTC and fixed offsets such as UTC+02:00 work
+without it.
+"""
+import datetime
+import re
+from bisect import bisect_right
+
+try:
+    import pytz
+except ImportError:
+    pytz = None
+
+DAYS = ['mon', 'tue', 'wed', 'thu', 'fri', 'sat', 'sun']
+
+MINUTES_PER_DAY = 24 * 60
+
+MINUTES_PER_WEEK = 7 * MINUTES_PER_DAY
+
+WINDOW_REGEXP = re.compile(
+    r'^(?:(?P<first_day>[a-z]{3})(?:-(?P<last_day>[a-z]{3}))?\s+)?'
+    r'(?P<start>\d{1,2}:\d{2})-(?P<end>\d{1,2}:\d{2})$')
+
+OFFSET_REGEXP = re.compile(
+    r'^(?:utc|gmt)?(?P<sign>[+-])(?P<hours>\d{1,2}):?(?P<minutes>\d{2})?$')
+
+# Compiled calendars, keyed by (maintenance_windows, timezone)
+CALENDARS = {}
+
+
+class MaintenanceCalendar(object):
+    """ Minute of the week bitmap of maintenance windows """
+    def __init__(self, minutes, tzinfo):
+        """ Create a calendar
+
+        :type minutes: bytearray
+        :param minutes: One entry per minute of the week, Monday 00:00
+            first, 1 if the minute is within a window
+        :type tzinfo: datetime.timedelta or pytz timezone
+        :param tzinfo: Fixed UTC offset or timezone of the windows
+        """
+        self.minutes = minutes
+        self.__tzinfo = tzinfo
+        self.starts = [
+            minute for minute in xrange(MINUTES_PER_WEEK)
+            if minutes[minute] and not minutes[minute - 1]]
+
+        # A calendar covering the whole week has no starts
+        if not self.starts and minutes[0]:
+            self.starts = [0]
+
+    def is_open(self, now=None):
+        """ Tell if the time is within a maintenance window
+
+        :type now: datetime.datetime
+        :param now: Time in UTC, defaults to the current time
+        :returns: bool -- True if within a maintenance window
+        """
+        return bool(self.minutes[self.__minute_of_week(now)])
+
+    def next_window_start(self, now=None):
+        """ Get the start of the next maintenance window
+
+        :type now: datetime.datetime
+        :param now: Time in UTC, defaults to the current time
+        :returns: datetime.datetime or None -- Start in UTC, None if there
+            are no windows
+        """
+        if not self.starts:
+            return None
+
+        if now is None:
+            now = datetime.datetime.utcnow()
+
+        minute = self.__minute_of_week(now)
+        index = bisect_right(self.starts, minute)
+        if index < len(self.starts):
+            delta = self.starts[index] - minute
+        else:
+            delta = self.starts[0] + MINUTES_PER_WEEK - minute
+
+        return now.replace(second=0, microsecond=0) + \
+            datetime.timedelta(minutes=delta)
+
+    def __minute_of_week(self, now):
+        """ Get the minute of the week in the calendar timezone
+
+        :type now: datetime.datetime
+        :param now: Time in UTC, defaults to the current time
+        :returns: int -- Minutes since Monday 00:00
+        """
+        if now is None:
+            now = datetime.datetime.utcnow()
+
+        if isinstance(self.__tzinfo, datetime.timedelta):
+            local = now + self.__tzinfo
+        else:
+            local = pytz.utc.localize(now).astimezone(self.__tzinfo)
+
+        return (
+            local.weekday() * MINUTES_PER_DAY +
+            local.hour * 60 + local.minute)
+
+
+def get_calendar(maintenance_windows, timezone='UTC'):
+    """ Get a compiled calendar, compiling it on the first call
+
+    :type maintenance_windows: str
+    :param maintenance_windows: Example: 'Mon-Fri 22:00-06:00'
+    :type timezone: str
+    :param timezone: Timezone of the windows
+    :returns: MaintenanceCalendar
+    :raises: ValueError -- If the windows or the timezone are invalid
+    """
+    key = (maintenance_windows, timezone or 'UTC')
+    if key not in CALENDARS:
+        CALENDARS[key] = parse(*key)
+
+    return CALENDARS[key]
+
+
+def parse(maintenance_windows, timezone='UTC'):
+    """ Compile maintenance windows into a calendar
+
+    :type maintenance_windows: str
+    :param maintenance_windows: Example: 'Mon-Fri 22:00-06:00'
+    :type timezone: str
+    :param timezone: Timezone of the windows
+    :returns: MaintenanceCalendar
+    :raises: ValueError -- If the windows or the timezone are invalid
+    """
+    tzinfo = __get_tzinfo(timezone or 'UTC')
+
+    minutes = bytearray(MINUTES_PER_WEEK)
+    for window in maintenance_windows.split(','):
+        match = WINDOW_REGEXP.match(window.strip().lower())
+        if not match:
+            raise ValueError(
+                'Malformatted maintenance window {0!r}'.format(window))
+
+        start = __parse_time(match.group('start'))
+        end = __parse_time(match.group('end'))
+        if end < start:
+            end += MINUTES_PER_DAY
+
+        for day in __parse_days(
+                match.group('first_day'), match.group('last_day')):
+            offset = day * MINUTES_PER_DAY
+            for minute in xrange(offset + start, offset + end + 1):
+                minutes[minute % MINUTES_PER_WEEK] = 1
+
+    return MaintenanceCalendar(minutes, tzinfo)
+
+
+def __get_tzinfo(timezone):
+    """ Get the timezone as a fixed offset or a pytz timezone
+
+    :type timezone: str
+    :param timezone: UTC, a fixed offset or a timezone name
+    :returns: datetime.timedelta or pytz timezone
+    :raises: ValueError -- If the timezone is unknown
+    """
+    if timezone.lower() in ['utc', 'gmt', 'z']:
+        return datetime.timedelta(0)
+
+    match = OFFSET_REGEXP.match(timezone.lower())
+    if match:
+        offset = datetime.timedelta(
+            hours=int(match.group('hours')),
+            minutes=int(match.group('minutes') or 0))
+        if match.group('sign') == '-':
+            offset = -offset
+        return offset
+
+    if pytz is None:
+        raise ValueError(
+            'Timezone {0!r} requires pytz, use a fixed offset such as '
+            'UTC+02:00 or install pytz'.format(timezone))
+
+    try:
+        return pytz.timezone(timezone)
+    except pytz.UnknownTimeZoneError:
+        raise ValueError('Unknown timezone {0!r}'.format(timezone))
+
+
+def __parse_days(first_day, last_day):
+    """ Get the weekdays of a window
+
+    :type first_day: str
+    :param first_day: First weekday, None for every day
+    :type last_day: str
+    :param last_day: Last weekday, None for a single day
+    :returns: list -- Weekday numbers, Monday is 0
+    """
+    if first_day is None:
+        return range(7)
+
+    for day in [first_day, last_day]:
+        if day is not None and day not in DAYS:
+            raise ValueError('Unknown weekday {0!r}'.format(day))
+
+    first = DAYS.index(first_day)
+    if last_day is None:
+        return [first]
+
+    last = DAYS.index(last_day)
+    return [day % 7 for day in xrange(first, first + (last - first) % 7 + 1)]
+
+
+def __parse_time(value):
+    """ Get minutes since midnight
+
+    :type value: str
+    :param value: Example: '22:00'
+    :returns: int -- Minutes since midnight
+    """
+    hours, minutes = [int(part) for part in value.split(':')]
+    if hours > 23 or minutes > 59:
+        raise ValueError('Invalid time {0!r}'.format(value))
+
+    return hours * 60 + minutes
@@ -0,0 +1,164 @@
+# -*- coding: utf-8 -*-
+""" Compiled scale dicts
+
+The *-scale options map thresholds to scaling amounts. They are compiled
+when the configuration is loaded, so that the thresholds are validated and
+sorted once and each lookup is a bisect instead of a sort.
+"""
+from bisect import bisect_left, bisect_right
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+# Options holding scale dicts, compiled when the configuration is loaded
+SCALE_OPTIONS = [
+    'increase_consumed_reads_scale',
+    'increase_consumed_writes_scale',
+    'increase_throttled_by_provisioned_reads_scale',
+    'increase_throttled_by_provisioned_writes_scale',
+    'increase_throttled_by_consumed_reads_scale',
+    'increase_throttled_by_consumed_writes_scale',
+    'decrease_consumed_reads_scale',
+    'decrease_consumed_writes_scale'
+]
+
+
+class ScaleTable(dict):
+    """ Scale dict with its thresholds and values in sorted arrays
+
+    It is still a dict, so it prints and serializes like the configured
+    scale dict.
+    """
+    def __init__(self, scale):
+        """ Compile a scale dict
+
+        :type scale: dict
+        :param scale: Thresholds mapped to scaling amounts
+        """
+        dict.__init__(self, scale)
+        self.thresholds = sorted(self.keys())
+        self.values = [self[threshold] for threshold in self.thresholds]
+
+
+def compile_scale(scale):
+    """ Compile a scale dict
+
+    :type scale: dict
+    :param scale: Thresholds mapped to scaling amounts, or None
+    :returns: ScaleTable or None -- None if the scale is empty
+    :raises: ValueError -- If the scale is not a valid scale dict
+    """
+    if not scale:
+        return None
+
+    if isinstance(scale, ScaleTable):
+        return scale
+
+    if not isinstance(scale, dict):
+        raise ValueError('Expected a dict, got {0!r}'.format(scale))
+
+    for threshold, value in scale.items():
+        if not __is_number(threshold) or not __is_number(value):
+            raise ValueError(
+                'Thresholds and values must be numbers, '
+                'got {0!r}: {1!r}'.format(threshold, value))
+        if value < 0:
+            raise ValueError(
+                'Values must not be negative, got {0!r}: {1!r}'.format(
+                    threshold, value))
+
+    return ScaleTable(scale)
+
+
+def lookup_increase(scale, current_value):
+    """ Get the amount for the highest threshold at or below the value
+
+    :type scale: ScaleTable or dict
+    :param scale: Compiled scale
+    :type current_value: float
+    :param current_value: The current consumed units or throttled events
+    :returns: float -- The amount to scale by, 0 below all thresholds
+    """
+    scale = compile_scale(scale)
+    if not scale:
+        return 0
+
+    index = bisect_right(scale.thresholds, current_value)
+    if index == 0:
+        return 0
+
+    return scale.values[index - 1]
+
+
+def lookup_decrease(scale, current_value):
+    """ Get the amount for the lowest threshold at or above the value
+
+    :type scale: ScaleTable or dict
+    :param scale: Compiled scale
+    :type current_value: float
+    :param current_value: The current consumed units or throttled events
+    :returns: float -- The amount to scale by, 0 above all thresholds
+    """
+    scale = compile_scale(scale)
+    if not scale:
+        return 0
+
+    index = bisect_left(scale.thresholds, current_value)
+    if index == len(scale.thresholds):
+        return 0
+
+    return scale.values[index]
+
+
+def lookup_increase_many(scale, current_values):
+    """ Vectorized lookup_increase, for replays and simulations
+
+    Uses numpy when it is installed.
+
+    :type scale: ScaleTable or dict
+    :param scale: Compiled scale
+    :type current_values: list
+    :param current_values: Current values
+    :returns: list -- The amount to scale by for each value
+    """
+    scale = compile_scale(scale)
+    if not scale:
+        return [0] * len(current_values)
+
+    if numpy is None:
+        return [lookup_increase(scale, value) for value in current_values]
+
+    indexes = numpy.searchsorted(
+        scale.thresholds, current_values, side='right')
+    return numpy.concatenate(([0], scale.values))[indexes].tolist()
+
+
+def lookup_decrease_many(scale, current_values):
+    """ Vectorized lookup_decrease, for replays and simulations
+
+    Uses numpy when it is installed.
+
+    :type scale: ScaleTable or dict
+    :param scale: Compiled scale
+    :type current_values: list
+    :param current_values: Current values
+    :returns: list -- The amount to scale by for each value
+    """
+    scale = compile_scale(scale)
+    if not scale:
+        return [0] * len(current_values)
+
+    if numpy is None:
+        return [lookup_decrease(scale, value) for value in current_values]
+
+    indexes = numpy.searchsorted(
+        scale.thresholds, current_values, side='left')
+    return numpy.concatenate((scale.values, [0]))[indexes].tolist()
+
+
+def __is_number(value):
+    """ Tell if the value is an int or a float, but not a bool """
+    return isinstance(value, (int, long, float)) and \
+        not isinstance(value, bool)
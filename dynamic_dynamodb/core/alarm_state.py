@@ -0,0 +1,70 @@
+# -*- coding: utf-8 -*-
+""" State tracking for the throughput alarms
+
+Each alarm is either OK, ALARM or INSUFFICIENT. Alarms start out as
+INSUFFICIENT until they have been evaluated once. Notifications are only
+sent when an alarm changes state, or as a reminder when an alarm has been in
+the ALARM state for alarm-reminder-interval seconds.
+"""
+import time
+
+OK = 'OK'
+ALARM = 'ALARM'
+INSUFFICIENT = 'INSUFFICIENT'
+
+# Alarm states. Key: (table_name, gsi_name, alarm_name),
+# value: (state, time of the latest notification)
+STATES = {}
+
+
+def evaluate(table_name, gsi_name, alarm_name, triggered, reminder_interval):
+    """ Update the alarm state and tell if a notification should be sent
+
+    :type table_name: str
+    :param table_name: Name of the DynamoDB table
+    :type gsi_name: str
+    :param gsi_name: Name of the GSI, None for tables
+    :type alarm_name: str
+    :param alarm_name: Name of the alarm, e.g. high-throughput-alarm
+    :type triggered: bool
+    :param triggered: True if the alarm threshold is crossed
+    :type reminder_interval: int
+    :param reminder_interval: Seconds between reminders while in ALARM.
+        0 or None disables the reminders
+    :returns: str or None -- ALARM or OK if a notification should be sent
+    """
+    key = (table_name, gsi_name, alarm_name)
+    state, last_notification = STATES.get(key, (INSUFFICIENT, None))
+    now = time.time()
+
+    if triggered:
+        if state != ALARM:
+            STATES[key] = (ALARM, now)
+            return ALARM
+
+        if (reminder_interval and
+                now - last_notification >= reminder_interval):
+            STATES[key] = (ALARM, now)
+            return ALARM
+
+        return None
+
+    STATES[key] = (OK, last_notification)
+    if state == ALARM:
+        return OK
+
+    return None
+
+
+def get_state(table_name, gsi_name, alarm_name):
+    """ Get the current state of an alarm
+
+    :type table_name: str
+    :param table_name: Name of the DynamoDB table
+    :type gsi_name: str
+    :param gsi_name: Name of the GSI, None for tables
+    :type alarm_name: str
+    :param alarm_name: Name of the alarm, e.g. high-throughput-alarm
+    :returns: str -- OK, ALARM or INSUFFICIENT
+    """
+    return STATES.get((table_name, gsi_name, alarm_name), (INSUFFICIENT,))[0]
@@ -0,0 +1,435 @@
+# -*- coding: utf-8 -*-
+""" Billing mode detection and advice
+
+Tables in on-demand (PAY_PER_REQUEST) mode have no provisioning to manage,
+so they are skipped by the checks. The billing mode of each table is looked
+up once every SAMPLE_INTERVAL seconds and after each switch made by us, and
+cached in between for the table and GSI checks and the throttle watcher.
+
+With billing-mode-advisor enabled, the consumption of the table is sampled
+once an hour and kept in memory. From at least MIN_HISTORY_HOURS of samples
+the monthly cost of both billing modes is estimated, and a switch is
+recommended when the other mode is SWITCH_MARGIN cheaper. With
+enable-billing-mode-switching the table is also switched, at most once
+every SWITCH_INTERVAL seconds.
+"""
+import math
+import re
+import time
+
+from boto.exception import JSONResponseError, BotoServerError
+
+from dynamic_dynamodb import lease, timing
+from dynamic_dynamodb.aws import dynamodb, sns
+from dynamic_dynamodb.statistics import gsi as gsi_stats
+from dynamic_dynamodb.statistics import table as table_stats
+from dynamic_dynamodb.log_handler import LOGGER as logger
+from dynamic_dynamodb.config_handler import (
+    get_global_option, get_gsi_option, get_table_option)
+
+PROVISIONED = 'PROVISIONED'
+PAY_PER_REQUEST = 'PAY_PER_REQUEST'
+
+# Seconds between two consumption samples, and minutes covered by a sample
+SAMPLE_INTERVAL = 3600
+SAMPLE_MINUTES = 60
+
+# Hours of samples to keep, and hours needed before giving advice
+HISTORY_HOURS = 14 * 24
+MIN_HISTORY_HOURS = 24
+
+# How much cheaper the other billing mode must be to recommend a switch
+SWITCH_MARGIN = 0.2
+
+# AWS allows one billing mode switch per table every 24 hours
+SWITCH_INTERVAL = 86400
+
+# Utilization (%) assumed when estimating the provisioning of on-demand
+# tables, and when switching to provisioned mode
+PROVISIONED_TARGET_UTILIZATION = 70.0
+
+HOURS_PER_MONTH = 730
+
+# Latest seen billing mode. Key: table_name, value: (billing_mode,
+# last_switch, time of the lookup)
+BILLING_MODES = {}
+
+# Consumption samples. Key: table_name, value: list of samples, oldest first
+HISTORY = {}
+
+# Time of the latest billing mode switch made by us. Key: table_name
+LAST_SWITCH = {}
+
+# Latest recommendation sent. Key: table_name
+RECOMMENDATIONS = {}
+
+
+def get_billing_mode(table_name):
+    """ Get the billing mode of the table
+
+    The billing mode is looked up if the cached mode is older than
+    SAMPLE_INTERVAL seconds or was dropped by a switch.
+
+    :type table_name: str
+    :param table_name: Name of the DynamoDB table
+    :returns: (str, float) -- Billing mode and the time of the latest
+        switch to PAY_PER_REQUEST or None
+    """
+    try:
+        billing_mode, last_switch, looked_up = BILLING_MODES[table_name]
+        if time.time() - looked_up < SAMPLE_INTERVAL:
+            return billing_mode, last_switch
+    except KeyError:
+        pass
+
+    billing_mode, last_switch = dynamodb.get_table_billing_mode(table_name)
+    BILLING_MODES[table_name] = (billing_mode, last_switch, time.time())
+
+    return billing_mode, last_switch
+
+
+def is_on_demand(table_name):
+    """ Tell if the table is on-demand, see get_billing_mode()
+
+    :type table_name: str
+    :param table_name: Name of the DynamoDB table
+    :returns: bool -- True if the table is in PAY_PER_REQUEST mode
+    """
+    return get_billing_mode(table_name)[0] == PAY_PER_REQUEST
+
+
+def estimate_monthly_costs(
+        samples, read_unit_cost, write_unit_cost,
+        read_request_cost, write_request_cost):
+    """ Estimate the monthly cost in both billing modes
+
+    Each sample is a dict with the consumed read_units and write_units
+    during the sample, the peak_reads and peak_writes per second, the
+    provisioned_reads and provisioned_writes (None for on-demand tables)
+    and the number of hours the sample covers.
+
+    :type samples: list
+    :param samples: Consumption samples
+    :type read_unit_cost: float
+    :param read_unit_cost: Monthly cost of one provisioned read unit
+    :type write_unit_cost: float
+    :param write_unit_cost: Monthly cost of one provisioned write unit
+    :type read_request_cost: float
+    :param read_request_cost: Cost of one million on-demand read units
+    :type write_request_cost: float
+    :param write_request_cost: Cost of one million on-demand write units
+    :returns: (float, float) -- Provisioned cost and on-demand cost
+    """
+    hours = sum(sample['hours'] for sample in samples)
+    if not hours:
+        return 0.0, 0.0
+
+    provisioned_cost = 0.0
+    on_demand_cost = 0.0
+    for sample in samples:
+        reads = sample['provisioned_reads']
+        if reads is None:
+            reads = get_required_units(sample['peak_reads'])
+        writes = sample['provisioned_writes']
+        if writes is None:
+            writes = get_required_units(sample['peak_writes'])
+
+        provisioned_cost += sample['hours'] * (
+            reads * read_unit_cost +
+            writes * write_unit_cost) / HOURS_PER_MONTH
+        on_demand_cost += (
+            sample['read_units'] * read_request_cost +
+            sample['write_units'] * write_request_cost) / 1000000
+
+    return (
+        provisioned_cost / hours * HOURS_PER_MONTH,
+        on_demand_cost / hours * HOURS_PER_MONTH)
+
+
+def get_required_units(peak_units):
+    """ Get the provisioning needed for a peak consumption
+
+    :type peak_units: float
+    :param peak_units: Peak consumed units per second
+    :returns: int -- Units to provision
+    """
+    return max(int(math.ceil(
+        peak_units * 100 / PROVISIONED_TARGET_UTILIZATION)), 1)
+
+
+def recommend(billing_mode, provisioned_cost, on_demand_cost):
+    """ Recommend a billing mode
+
+    :type billing_mode: str
+    :param billing_mode: Current billing mode
+    :type provisioned_cost: float
+    :param provisioned_cost: Estimated monthly cost in provisioned mode
+    :type on_demand_cost: float
+    :param on_demand_cost: Estimated monthly cost in on-demand mode
+    :returns: str -- Recommended billing mode
+    """
+    if billing_mode == PROVISIONED:
+        if on_demand_cost < provisioned_cost * (1 - SWITCH_MARGIN):
+            return PAY_PER_REQUEST
+    elif provisioned_cost < on_demand_cost * (1 - SWITCH_MARGIN):
+        return PROVISIONED
+
+    return billing_mode
+
+
+@timing.timed('billing-mode')
+def check(table_name, key_name, billing_mode, last_switch):
+    """ Sample the consumption and advise on or switch the billing mode
+
+    :type table_name: str
+    :param table_name: Name of the DynamoDB table
+    :type key_name: str
+    :param key_name: Configuration option key name
+    :type billing_mode: str
+    :param billing_mode: Current billing mode
+    :type last_switch: float
+    :param last_switch: Time of the latest switch to PAY_PER_REQUEST
+    :returns: bool -- True if the billing mode was switched
+    """
+    try:
+        __sample(table_name, key_name, billing_mode)
+    except JSONResponseError as error:
+        logger.warning('{0} - Could not sample the consumption: {1}'.format(
+            table_name, error))
+        return False
+    except BotoServerError as error:
+        logger.warning('{0} - Could not sample the consumption: {1}'.format(
+            table_name, error))
+        return False
+
+    samples = HISTORY.get(table_name, [])
+    if sum(sample['hours'] for sample in samples) < MIN_HISTORY_HOURS:
+        return False
+
+    provisioned_cost, on_demand_cost = estimate_monthly_costs(
+        samples,
+        get_global_option('read_unit_monthly_cost'),
+        get_global_option('write_unit_monthly_cost'),
+        get_global_option('on_demand_read_request_cost'),
+        get_global_option('on_demand_write_request_cost'))
+    logger.debug(
+        '{0} - Estimated monthly cost: {1:.2f} provisioned, '
+        '{2:.2f} on-demand'.format(
+            table_name, provisioned_cost, on_demand_cost))
+
+    recommended = recommend(billing_mode, provisioned_cost, on_demand_cost)
+    if recommended == billing_mode:
+        RECOMMENDATIONS.pop(table_name, None)
+        return False
+
+    if RECOMMENDATIONS.get(table_name) != recommended:
+        RECOMMENDATIONS[table_name] = recommended
+        message = (
+            '{0} - Switching to {1} billing is estimated to save {2:.2f} '
+            'a month ({3:.2f} provisioned, {4:.2f} on-demand)'.format(
+                table_name,
+                recommended,
+                abs(provisioned_cost - on_demand_cost),
+                provisioned_cost,
+                on_demand_cost))
+        logger.warning(message)
+        sns.publish_table_notification(
+            key_name,
+            message,
+            ['billing-mode'],
+            subject='Billing mode recommendation for table {0}'.format(
+                table_name))
+
+    if not get_table_option(key_name, 'enable_billing_mode_switching'):
+        return False
+
+    return __switch(table_name, key_name, recommended, last_switch)
+
+
+def __sample(table_name, key_name, billing_mode):
+    """ Add a consumption sample if SAMPLE_INTERVAL has passed
+
+    :type table_name: str
+    :param table_name: Name of the DynamoDB table
+    :type key_name: str
+    :param key_name: Configuration option key name
+    :type billing_mode: str
+    :param billing_mode: Current billing mode
+    """
+    samples = HISTORY.setdefault(table_name, [])
+    now = time.time()
+    if samples and now - samples[-1]['timestamp'] < SAMPLE_INTERVAL:
+        return
+
+    reads = table_stats.get_consumed_read_units_history(
+        table_name,
+        get_table_option(key_name, 'lookback_window_start'),
+        get_table_option(key_name, 'lookback_period'),
+        SAMPLE_MINUTES)
+    writes = table_stats.get_consumed_write_units_history(
+        table_name,
+        get_table_option(key_name, 'lookback_window_start'),
+        get_table_option(key_name, 'lookback_period'),
+        SAMPLE_MINUTES)
+
+    provisioned_reads = provisioned_writes = None
+    gsi_peaks = {}
+    if billing_mode == PROVISIONED:
+        provisioned_reads = dynamodb.get_provisioned_table_read_units(
+            table_name)
+        provisioned_writes = dynamodb.get_provisioned_table_write_units(
+            table_name)
+    else:
+        # The GSI peaks size the GSIs when switching to provisioned mode
+        for gsi in dynamodb.table_gsis(table_name):
+            gsi_name = gsi[u'IndexName']
+            gsi_peaks[gsi_name] = (
+                max(gsi_stats.get_consumed_read_units_history(
+                    table_name,
+                    gsi_name,
+                    get_table_option(key_name, 'lookback_window_start'),
+                    get_table_option(key_name, 'lookback_period'),
+                    SAMPLE_MINUTES) or [0]),
+                max(gsi_stats.get_consumed_write_units_history(
+                    table_name,
+                    gsi_name,
+                    get_table_option(key_name, 'lookback_window_start'),
+                    get_table_option(key_name, 'lookback_period'),
+                    SAMPLE_MINUTES) or [0]))
+
+    samples.append({
+        'timestamp': now,
+        'hours': float(SAMPLE_MINUTES) / 60,
+        'read_units': sum(reads) * 60,
+        'write_units': sum(writes) * 60,
+        'peak_reads': max(reads or [0]),
+        'peak_writes': max(writes or [0]),
+        'provisioned_reads': provisioned_reads,
+        'provisioned_writes': provisioned_writes,
+        'gsi_peaks': gsi_peaks
+    })
+
+    del samples[:-HISTORY_HOURS]
+
+
+def __switch(table_name, key_name, billing_mode, last_switch):
+    """ Switch the billing mode, respecting the AWS switch limit
+
+    :type table_name: str
+    :param table_name: Name of the DynamoDB table
+    :type key_name: str
+    :param key_name: Configuration option key name
+    :type billing_mode: str
+    :param billing_mode: Billing mode to switch to
+    :type last_switch: float
+    :param last_switch: Time of the latest switch to PAY_PER_REQUEST
+    :returns: bool -- True if the billing mode was switched
+    """
+    now = time.time()
+    latest_switch = max(last_switch or 0, LAST_SWITCH.get(table_name, 0))
+    if now - latest_switch < SWITCH_INTERVAL:
+        logger.info(
+            '{0} - Not switching billing mode, the latest switch was '
+            '{1:.0f} seconds ago'.format(table_name, now - latest_switch))
+        return False
+
+    if not lease.is_leader():
+        logger.info(
+            '{0} - Standing by, not switching billing mode'.format(
+                table_name))
+        return False
+
+    if dynamodb.get_table_status(table_name) != 'ACTIVE':
+        logger.info(
+            '{0} - Not switching billing mode until the table '
+            'is ACTIVE'.format(table_name))
+        return False
+
+    reads = writes = None
+    gsi_units = {}
+    if billing_mode == PROVISIONED:
+        # Provision for the peak of the latest day
+        samples = HISTORY[table_name][-MIN_HISTORY_HOURS:]
+        reads = __limit_units(
+            get_required_units(max(s['peak_reads'] for s in samples)),
+            get_table_option(key_name, 'min_provisioned_reads'),
+            get_table_option(key_name, 'max_provisioned_reads'))
+        writes = __limit_units(
+            get_required_units(max(s['peak_writes'] for s in samples)),
+            get_table_option(key_name, 'min_provisioned_writes'),
+            get_table_option(key_name, 'max_provisioned_writes'))
+
+        for gsi in dynamodb.table_gsis(table_name):
+            gsi_name = gsi[u'IndexName']
+            gsi_peaks = [
+                s['gsi_peaks'].get(gsi_name, (0, 0)) for s in samples]
+            gsi_units[gsi_name] = (
+                __limit_units(
+                    get_required_units(max(peak[0] for peak in gsi_peaks)),
+                    __get_gsi_option(
+                        key_name, gsi_name, 'min_provisioned_reads'),
+                    __get_gsi_option(
+                        key_name, gsi_name, 'max_provisioned_reads')),
+                __limit_units(
+                    get_required_units(max(peak[1] for peak in gsi_peaks)),
+                    __get_gsi_option(
+                        key_name, gsi_name, 'min_provisioned_writes'),
+                    __get_gsi_option(
+                        key_name, gsi_name, 'max_provisioned_writes')))
+
+    dynamodb.update_table_billing_mode(
+        table_name, billing_mode, reads, writes, gsi_units)
+
+    sns.publish_table_notification(
+        key_name,
+        '{0} - Billing mode switched to {1}'.format(table_name, billing_mode),
+        ['billing-mode'],
+        subject='Switched billing mode for table {0}'.format(table_name))
+
+    LAST_SWITCH[table_name] = now
+
+    # Look up the billing mode again in the next check
+    BILLING_MODES.pop(table_name, None)
+    RECOMMENDATIONS.pop(table_name, None)
+
+    # The history of the old mode says little about the new one
+    del HISTORY[table_name]
+
+    return True
+
+
+def __get_gsi_option(key_name, gsi_name, option):
+    """ Get an option of the first GSI configuration matching the GSI
+
+    :type key_name: str
+    :param key_name: Table configuration option key name
+    :type gsi_name: str
+    :param gsi_name: Name of the GSI
+    :type option: str
+    :param option: Option name
+    :returns: Option value, None if no GSI configuration matches
+    """
+    for gsi_key in sorted(get_table_option(key_name, 'gsis') or {}):
+        if re.match(gsi_key, gsi_name):
+            return get_gsi_option(key_name, gsi_key, option)
+
+    return None
+
+
+def __limit_units(units, min_units, max_units):
+    """ Keep the units within the configured minimum and maximum
+
+    :type units: int
+    :param units: Units
+    :type min_units: int
+    :param min_units: Minimum units, None for no minimum
+    :type max_units: int
+    :param max_units: Maximum units, None for no maximum
+    :returns: int -- Units within the limits
+    """
+    if min_units:
+        units = max(units, int(min_units))
+    if max_units:
+        units = min(units, int(max_units))
+
+    return units
@@ -0,0 +1,101 @@
+# -*- coding: utf-8 -*-
+""" Burst credit model
+
+DynamoDB keeps up to 300 seconds of unused capacity, which a table can spend
+when it consumes more than it has provisioned. This module estimates the
+remaining burst credits from the per-minute consumption history, so that
+short spikes that the credits can absorb do not cause a scale-up.
+
+The provisioning is assumed to have been constant during the history, and
+the credits are assumed to be empty at the start of the history. Both
+assumptions make the estimate err on the low side.
+"""
+import math
+
+from dynamic_dynamodb.log_handler import LOGGER as logger
+
+# Number of seconds of unused capacity that DynamoDB keeps
+BURST_SECONDS = 300
+
+# Number of minutes of consumption history to estimate the credits from
+HISTORY_MINUTES = 20
+
+# Seconds from deciding on a scale-up until the new capacity is available
+SCALE_UP_LEAD_TIME = 60
+
+
+def estimate_credits(provisioned_units, consumed_history):
+    """ Estimate the remaining burst credits
+
+    :type provisioned_units: int
+    :param provisioned_units: Provisioned units
+    :type consumed_history: list
+    :param consumed_history: Consumed units per second for each minute,
+        oldest first
+    :returns: float -- Remaining burst credits, in unit seconds
+    """
+    max_credits = float(provisioned_units) * BURST_SECONDS
+
+    credits = 0.0
+    for consumed_units in consumed_history:
+        credits += (provisioned_units - consumed_units) * 60
+        credits = max(0.0, min(max_credits, credits))
+
+    return credits
+
+
+def get_provisioning(
+        current_provisioning, calculated_provisioning, consumed_history,
+        upper_threshold, horizon, log_tag):
+    """ Adjust a scale-up using the burst credit estimate
+
+    If the consumption is within the provisioning, the credits are not
+    spent and the proposed provisioning is used. If the credits last longer
+    than horizon seconds at the current consumption, the scale-up is not
+    needed yet. If they run out sooner, the
+    provisioning is raised to at least the current consumption over the upper
+    threshold, so that the table does not throttle when the credits are gone.
+
+    :type current_provisioning: int
+    :param current_provisioning: The current provisioning
+    :type calculated_provisioning: int
+    :param calculated_provisioning: The proposed provisioning
+    :type consumed_history: list
+    :param consumed_history: Consumed units per second for each minute,
+        oldest first
+    :type upper_threshold: float
+    :param upper_threshold: Upper consumption threshold in percent
+    :type horizon: int
+    :param horizon: Seconds until the next opportunity to scale up
+    :type log_tag: str
+    :param log_tag: Prefix for the log
+    :returns: int -- Provisioning to use
+    """
+    if not consumed_history:
+        return calculated_provisioning
+
+    credits = estimate_credits(current_provisioning, consumed_history)
+    consumed_units = consumed_history[-1]
+    overage = consumed_units - current_provisioning
+
+    # Consuming less than provisioned, the credits are not being spent
+    if overage <= 0:
+        return calculated_provisioning
+
+    if credits / overage > horizon + SCALE_UP_LEAD_TIME:
+        logger.info(
+            '{0} - Burst credits ({1:.0f} unit seconds) can absorb the '
+            'current consumption, not scaling up'.format(log_tag, credits))
+        return current_provisioning
+
+    logger.info(
+        '{0} - Burst credits ({1:.0f} unit seconds) will run out in '
+        '{2:.0f} seconds, scaling up'.format(
+            log_tag, credits, credits / overage))
+
+    if upper_threshold:
+        required_provisioning = int(math.ceil(
+            consumed_units * 100 / float(upper_threshold)))
+        return max(calculated_provisioning, required_provisioning)
+
+    return calculated_provisioning
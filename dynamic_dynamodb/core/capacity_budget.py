@@ -0,0 +1,304 @@
+# -*- coding: utf-8 -*-
+""" Account level capacity budget
+
+When a capacity budget is configured, increases decided for the tables and
+GSIs are not sent to DynamoDB right away. They are collected during the
+check, and when all tables have been checked the budget left in the account
+is handed out among them. Throttled tables and GSIs go first, then the ones
+with the highest capacity-priority, then the smallest increases. Each
+request gets as much of its increase as fits in the budget that is left, so
+a request may be granted partially. Decreases in a request always go
+through and add to the budget of the following requests.
+
+The budget is the tightest of the account limits (DescribeLimits), the
+configured capacity-budget-read-units and capacity-budget-write-units, and
+the configured capacity-budget-monthly-cost.
+"""
+from boto.exception import JSONResponseError, BotoServerError
+
+from dynamic_dynamodb import journal, lease, metrics
+from dynamic_dynamodb.aws import dynamodb
+from dynamic_dynamodb.core import gsi_coupling
+from dynamic_dynamodb.log_handler import LOGGER as logger
+from dynamic_dynamodb.config_handler import get_global_option
+
+# Increases waiting for the allocation. List of dicts, see request()
+REQUESTS = []
+metrics.register_gauge(
+    'queue_depth', lambda: len(REQUESTS), queue='capacity-budget')
+
+
+def is_enabled():
+    """ Tell if a capacity budget is configured
+
+    :returns: bool -- True if increases should go through the budget
+    """
+    return bool(
+        get_global_option('capacity_budget_use_account_limits') or
+        get_global_option('capacity_budget_read_units') or
+        get_global_option('capacity_budget_write_units') or
+        get_global_option('capacity_budget_monthly_cost'))
+
+
+def request(
+        table_name, table_key, gsi_name, gsi_key,
+        current_reads, current_writes, reads, writes, throttled, priority,
+        cooldown_state=None):
+    """ Queue a provisioning change for the allocation
+
+    :type table_name: str
+    :param table_name: Name of the DynamoDB table
+    :type table_key: str
+    :param table_key: Table configuration option key name
+    :type gsi_name: str
+    :param gsi_name: Name of the GSI, None for tables
+    :type gsi_key: str
+    :param gsi_key: GSI configuration option key name, None for tables
+    :type current_reads: int
+    :param current_reads: Currently provisioned reads
+    :type current_writes: int
+    :param current_writes: Currently provisioned writes
+    :type reads: int
+    :param reads: Requested reads
+    :type writes: int
+    :param writes: Requested writes
+    :type throttled: bool
+    :param throttled: True if the table or GSI is being throttled
+    :type priority: int
+    :param priority: Configured capacity-priority
+    :type cooldown_state: dict
+    :param cooldown_state: Cooldown state of the table or GSI, recorded
+        when the change is made
+    """
+    for queued in REQUESTS:
+        if (queued['table_name'], queued['gsi_name']) == (
+                table_name, gsi_name):
+            REQUESTS.remove(queued)
+            break
+
+    REQUESTS.append({
+        'table_name': table_name,
+        'table_key': table_key,
+        'gsi_name': gsi_name,
+        'gsi_key': gsi_key,
+        'current_reads': int(current_reads),
+        'current_writes': int(current_writes),
+        'reads': int(reads),
+        'writes': int(writes),
+        'throttled': bool(throttled),
+        'priority': priority or 0,
+        'cooldown_state': cooldown_state
+    })
+
+
+def allocate(
+        requests, provisioned_reads, provisioned_writes,
+        max_reads, max_writes, monthly_cost,
+        read_unit_cost, write_unit_cost):
+    """ Divide the budget left among the requests
+
+    :type requests: list
+    :param requests: Requests, see request()
+    :type provisioned_reads: int
+    :param provisioned_reads: Reads provisioned in the account
+    :type provisioned_writes: int
+    :param provisioned_writes: Writes provisioned in the account
+    :type max_reads: int
+    :param max_reads: Maximum reads in the account, None for no limit
+    :type max_writes: int
+    :param max_writes: Maximum writes in the account, None for no limit
+    :type monthly_cost: float
+    :param monthly_cost: Maximum monthly cost, None for no limit
+    :type read_unit_cost: float
+    :param read_unit_cost: Monthly cost of one read unit
+    :type write_unit_cost: float
+    :param write_unit_cost: Monthly cost of one write unit
+    :returns: list -- (request, reads, writes) in the order to apply them
+    """
+    infinity = float('inf')
+
+    read_room = infinity
+    if max_reads is not None:
+        read_room = max_reads - provisioned_reads
+    write_room = infinity
+    if max_writes is not None:
+        write_room = max_writes - provisioned_writes
+    cost_room = infinity
+    if monthly_cost is not None:
+        cost_room = monthly_cost - (
+            provisioned_reads * read_unit_cost +
+            provisioned_writes * write_unit_cost)
+
+    # Decreases are always applied and free up budget
+    for req in requests:
+        if req['reads'] < req['current_reads']:
+            released = req['current_reads'] - req['reads']
+            read_room += released
+            cost_room += released * read_unit_cost
+        if req['writes'] < req['current_writes']:
+            released = req['current_writes'] - req['writes']
+            write_room += released
+            cost_room += released * write_unit_cost
+
+    def sort_key(req):
+        """ Throttled first, then by priority, then the smallest increase """
+        increase = (
+            max(req['reads'] - req['current_reads'], 0) * read_unit_cost +
+            max(req['writes'] - req['current_writes'], 0) * write_unit_cost)
+        return (not req['throttled'], -req['priority'], increase)
+
+    allocations = []
+    for req in sorted(requests, key=sort_key):
+        reads = req['reads']
+        if reads > req['current_reads']:
+            granted = __grant(
+                reads - req['current_reads'],
+                read_room,
+                cost_room,
+                read_unit_cost)
+            read_room -= granted
+            cost_room -= granted * read_unit_cost
+            reads = req['current_reads'] + granted
+
+        writes = req['writes']
+        if writes > req['current_writes']:
+            granted = __grant(
+                writes - req['current_writes'],
+                write_room,
+                cost_room,
+                write_unit_cost)
+            write_room -= granted
+            cost_room -= granted * write_unit_cost
+            writes = req['current_writes'] + granted
+
+        allocations.append((req, reads, writes))
+
+    return allocations
+
+
+def apply():
+    """ Allocate the budget to the queued requests and update DynamoDB """
+    if not REQUESTS:
+        return
+
+    requests = list(REQUESTS)
+    del REQUESTS[:]
+
+    # The lease was lost since the increases were queued
+    if not lease.is_leader():
+        logger.warning(
+            'Standing by, dropping {0:d} queued increases', len(requests))
+        return
+
+    try:
+        provisioning = dynamodb.get_account_provisioning()
+
+        max_reads = get_global_option('capacity_budget_read_units')
+        max_writes = get_global_option('capacity_budget_write_units')
+        if get_global_option('capacity_budget_use_account_limits'):
+            limits = dynamodb.get_account_limits()
+            max_reads = min(max_reads or limits['reads'], limits['reads'])
+            max_writes = min(max_writes or limits['writes'], limits['writes'])
+    except JSONResponseError as error:
+        logger.error(
+            'Could not read the account capacity, not applying {0:d} '
+            'queued increases: {1}', len(requests), error)
+        return
+    except BotoServerError as error:
+        logger.error(
+            'Could not read the account capacity, not applying {0:d} '
+            'queued increases: {1}', len(requests), error)
+        return
+
+    allocations = allocate(
+        requests,
+        provisioning['reads'],
+        provisioning['writes'],
+        max_reads,
+        max_writes,
+        get_global_option('capacity_budget_monthly_cost'),
+        get_global_option('read_unit_monthly_cost'),
+        get_global_option('write_unit_monthly_cost'))
+
+    for req, reads, writes in allocations:
+        if req['gsi_name']:
+            log_tag = '{0} - GSI: {1}'.format(
+                req['table_name'], req['gsi_name'])
+        else:
+            log_tag = req['table_name']
+
+        if reads < req['reads'] or writes < req['writes']:
+            logger.warning(
+                '{0} - Capacity budget exceeded. Requested {1:d} reads and '
+                '{2:d} writes, granted {3:d} reads and {4:d} writes',
+                log_tag, req['reads'], req['writes'], reads, writes)
+
+        if (reads == req['current_reads'] and
+                writes == req['current_writes']):
+            logger.info('{0} - No changes to perform', log_tag)
+            continue
+
+        try:
+            if req['gsi_name']:
+                outcome = dynamodb.update_gsi_provisioning(
+                    req['table_name'],
+                    req['table_key'],
+                    req['gsi_name'],
+                    req['gsi_key'],
+                    reads,
+                    writes,
+                    cooldown_state=req.get('cooldown_state'))
+            else:
+                outcome = dynamodb.update_table_provisioning(
+                    req['table_name'],
+                    req['table_key'],
+                    reads,
+                    writes,
+                    cooldown_state=req.get('cooldown_state'))
+        except JSONResponseError as error:
+            logger.error(
+                '{0} - Failed updating provisioning: {1}', log_tag, error)
+            outcome = 'failed'
+        except BotoServerError as error:
+            logger.error(
+                '{0} - Failed updating provisioning: {1}', log_tag, error)
+            outcome = 'failed'
+
+        if outcome == 'updated':
+            dynamodb.add_account_provisioning(
+                reads - req['current_reads'], writes - req['current_writes'])
+
+            # Let the GSIs follow the table write increase
+            if not req['gsi_name'] and writes > req['current_writes']:
+                gsi_coupling.table_writes_granted(req['table_name'], writes)
+
+        journal.clear()
+        journal.observe('reads', req['current_reads'], None, None)
+        journal.observe('writes', req['current_writes'], None, None)
+        journal.write(
+            req['table_name'],
+            req['gsi_name'],
+            req['gsi_key'] or req['table_key'],
+            reads,
+            writes,
+            'budget-{0}'.format(outcome))
+
+
+def __grant(increase, unit_room, cost_room, unit_cost):
+    """ Get how much of an increase fits in the budget
+
+    :type increase: int
+    :param increase: Requested increase in units
+    :type unit_room: float
+    :param unit_room: Units left in the budget
+    :type cost_room: float
+    :param cost_room: Monthly cost left in the budget
+    :type unit_cost: float
+    :param unit_cost: Monthly cost of one unit
+    :returns: int -- Granted increase in units
+    """
+    granted = min(increase, unit_room)
+    if unit_cost and cost_room != float('inf'):
+        granted = min(granted, cost_room / unit_cost)
+
+    return max(int(granted), 0)
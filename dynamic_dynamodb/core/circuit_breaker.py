@@ -2,17 +2,46 @@
 """ Circuit breaker functionality """
 import re
 import sys
+import threading
+import time
 
 import requests
 
+from dynamic_dynamodb import timing
 from dynamic_dynamodb.log_handler import LOGGER as logger
 from dynamic_dynamodb.config_handler import get_global_option, \
     get_table_option, get_gsi_option
 
+URL_PATTERN = re.compile(
+    r'^(?P<scheme>http(s)?://)'
+    r'((?P<username>.+):(?P<password>.+)@){0,1}'
+    r'(?P<url>.*)$'
+)
 
+# One session for all circuit breaker calls, keeping connections alive
+SESSION = requests.Session()
+
+# Parsed circuit breaker URLs. Key: configured URL, value: (url, auth)
+PARSED_URLS = {}
+
+# Cached circuit breaker states.
+# Key: (url, headers), value: (timestamp, is_open)
+CACHE = {}
+
+# Cached batch responses. Key: url, value: (timestamp, states)
+BATCH_CACHE = {}
+
+CACHE_LOCK = threading.Lock()
+
+
+@timing.timed('circuit-breaker')
 def is_open(table_name=None, table_key=None, gsi_name=None, gsi_key=None):
     """ Checks whether the circuit breaker is open
 
+    The batch endpoint is asked first, if configured. Tables and GSIs that
+    it does not answer for fall back to the circuit breaker URL. Without a
+    URL they are closed, unless the batch call failed.
+
     :param table_name: Name of the table being checked
     :param table_key: Configuration key for table
     :param gsi_name: Name of the GSI being checked
@@ -21,13 +50,6 @@ def is_open(table_name=None, table_key=None, gsi_name=None, gsi_key=None):
     """
     logger.debug('Checking circuit breaker status')
 
-    # Parse the URL to make sure it is OK
-    pattern = re.compile(
-        r'^(?P<scheme>http(s)?://)'
-        r'((?P<username>.+):(?P<password>.+)@){0,1}'
-        r'(?P<url>.*)$'
-    )
-
     url = timeout = None
     if gsi_name:
         url = get_gsi_option(table_key, gsi_key, 'circuit_breaker_url')
@@ -40,22 +62,32 @@ def is_open(table_name=None, table_key=None, gsi_name=None, gsi_key=None):
         url = get_global_option('circuit_breaker_url')
         timeout = get_global_option('circuit_breaker_timeout')
 
-    match = pattern.match(url)
-    if not match:
-        logger.error('Malformatted URL: {0}'.format(url))
-        sys.exit(1)
+    # Ask the batch endpoint first, if there is one
+    if table_name and get_global_option('circuit_breaker_batch_url'):
+        name = table_name
+        if gsi_name:
+            name = ':'.join([table_name, gsi_name])
 
-    use_basic_auth = False
-    if match.group('username') and match.group('password'):
-        use_basic_auth = True
+        states = __get_batch_states(
+            get_global_option('circuit_breaker_batch_url'),
+            get_global_option('circuit_breaker_timeout'))
+        if states and name in states:
+            if states[name]:
+                logger.warning('Circuit breaker is open for {0}'.format(name))
+            else:
+                logger.info('Circuit breaker is closed')
+            return states[name]
 
-    # Make the actual URL to call
-    auth = ()
-    if use_basic_auth:
-        url = '{scheme}{url}'.format(
-            scheme=match.group('scheme'),
-            url=match.group('url'))
-        auth = (match.group('username'), match.group('password'))
+        if not url:
+            if states is None:
+                logger.warning(
+                    'Circuit breaker batch endpoint failed, treating '
+                    'the circuit as open')
+                return True
+            logger.info('Circuit breaker is closed')
+            return False
+
+    url, auth = __parse_url(url)
 
     headers = {}
     if table_name:
@@ -63,16 +95,23 @@ def is_open(table_name=None, table_key=None, gsi_name=None, gsi_key=None):
     if gsi_name:
         headers["x-gsi-name"] = gsi_name
 
+    cache_key = (url, tuple(sorted(headers.items())))
+    cached = __get_cached(CACHE, cache_key)
+    if cached is not None:
+        logger.debug('Using cached circuit breaker state')
+        return cached
+
     # Make the actual request
+    circuit_open = True
     try:
-        response = requests.get(
+        response = SESSION.get(
             url,
             auth=auth,
             timeout=timeout / 1000.00,
             headers=headers)
         if int(response.status_code) >= 200 and int(response.status_code) < 300:
             logger.info('Circuit breaker is closed')
-            return False
+            circuit_open = False
         else:
             logger.warning(
                 'Circuit breaker returned with status code {0:d}'.format(
@@ -94,4 +133,120 @@ def is_open(table_name=None, table_key=None, gsi_name=None, gsi_key=None):
             'Please file a bug at '
             'https://github.com/sebdah/dynamic-dynamodb/issues')
 
-    return True
+    __set_cached(CACHE, cache_key, circuit_open)
+
+    return circuit_open
+
+
+def __get_batch_states(batch_url, timeout):
+    """ Get the circuit breaker state for many tables and GSIs at once
+
+    The batch endpoint should return a JSON object where the keys are table
+    names or table_name:gsi_name and the values are either "open" or
+    "closed". Any value other than "closed" counts as open.
+
+    :type batch_url: str
+    :param batch_url: URL of the batch endpoint
+    :type timeout: float
+    :param timeout: Request timeout in ms
+    :returns: dict or None -- {name: is_open}, None if the call failed
+    """
+    cached = __get_cached(BATCH_CACHE, batch_url)
+    if cached is not None:
+        return cached
+
+    url, auth = __parse_url(batch_url)
+    try:
+        response = SESSION.get(url, auth=auth, timeout=timeout / 1000.00)
+        if int(response.status_code) < 200 or \
+                int(response.status_code) >= 300:
+            logger.warning(
+                'Circuit breaker batch endpoint returned with '
+                'status code {0:d}'.format(response.status_code))
+            return None
+
+        states = {}
+        for name, state in response.json().items():
+            states[name] = (str(state).lower() != 'closed')
+    except requests.exceptions.RequestException as error:
+        logger.warning('Circuit breaker batch endpoint: {0}'.format(error))
+        return None
+    except (AttributeError, ValueError) as error:
+        logger.warning(
+            'Circuit breaker batch endpoint returned an invalid '
+            'response: {0}'.format(error))
+        return None
+
+    __set_cached(BATCH_CACHE, batch_url, states)
+
+    return states
+
+
+def __get_cached(cache, key):
+    """ Return a cached value if it has not expired
+
+    :type cache: dict
+    :param cache: Cache to look in
+    :param key: Cache key
+    :returns: Cached value or None
+    """
+    ttl = get_global_option('circuit_breaker_cache_ttl')
+    if not ttl:
+        return None
+
+    with CACHE_LOCK:
+        try:
+            timestamp, value = cache[key]
+        except KeyError:
+            return None
+
+    if time.time() - timestamp > ttl:
+        return None
+
+    return value
+
+
+def __set_cached(cache, key, value):
+    """ Store a value in the cache
+
+    :type cache: dict
+    :param cache: Cache to store in
+    :param key: Cache key
+    :param value: Value to cache
+    """
+    if not get_global_option('circuit_breaker_cache_ttl'):
+        return
+
+    with CACHE_LOCK:
+        cache[key] = (time.time(), value)
+
+
+def __parse_url(url):
+    """ Split basic auth credentials from the circuit breaker URL
+
+    :type url: str
+    :param url: Configured circuit breaker URL
+    :returns: (str, tuple) -- URL to call and basic auth credentials
+    """
+    try:
+        return PARSED_URLS[url]
+    except KeyError:
+        pass
+
+    match = URL_PATTERN.match(url)
+    if not match:
+        logger.error('Malformatted URL: {0}'.format(url))
+        sys.exit(1)
+
+    # Make the actual URL to call
+    auth = ()
+    request_url = url
+    if match.group('username') and match.group('password'):
+        request_url = '{scheme}{url}'.format(
+            scheme=match.group('scheme'),
+            url=match.group('url'))
+        auth = (match.group('username'), match.group('password'))
+
+    PARSED_URLS[url] = (request_url, auth)
+
+    return PARSED_URLS[url]
@@ -0,0 +1,68 @@
+# -*- coding: utf-8 -*-
+""" Cooldown gate for provisioning changes
+
+The gate is applied to the reads and the writes separately, just before the
+provisioning is updated. An increase is held back until increase-cooldown
+seconds have passed since the latest change of the same kind, and a
+decrease until decrease-cooldown seconds have passed. The time of the
+latest change is kept in the state dict stored by execute() together with
+the check counters. A change is only recorded once DynamoDB has accepted
+it, so changes that are queued, held back or failed do not start a
+cooldown.
+"""
+import time
+
+from dynamic_dynamodb.log_handler import LOGGER as logger
+
+
+def gate(
+        kind, current_units, units, state,
+        increase_cooldown, decrease_cooldown, log_tag):
+    """ Hold back a change that is within its cooldown
+
+    :type kind: str
+    :param kind: reads or writes
+    :type current_units: int
+    :param current_units: Currently provisioned units
+    :type units: int
+    :param units: Proposed units
+    :type state: dict
+    :param state: Cooldown state, see record()
+    :type increase_cooldown: int
+    :param increase_cooldown: Seconds after a change before increasing
+    :type decrease_cooldown: int
+    :param decrease_cooldown: Seconds after a change before decreasing
+    :type log_tag: str
+    :param log_tag: Prefix for the log
+    :returns: int -- Units to provision
+    """
+    if units == current_units or kind not in state:
+        return units
+
+    if units > current_units:
+        cooldown = increase_cooldown
+        direction = 'increase'
+    else:
+        cooldown = decrease_cooldown
+        direction = 'decrease'
+
+    elapsed = time.time() - state[kind]
+    if cooldown and elapsed < cooldown:
+        logger.info(
+            '{0} - Not performing {1} {2}, the latest change was {3:.0f} '
+            'seconds ago ({2}-cooldown is {4:d} seconds)',
+            log_tag, kind, direction, elapsed, int(cooldown))
+        return current_units
+
+    return units
+
+
+def record(kind, state):
+    """ Record a change of the provisioning
+
+    :type kind: str
+    :param kind: reads or writes
+    :type state: dict
+    :param state: Cooldown state, updated in place
+    """
+    state[kind] = time.time()
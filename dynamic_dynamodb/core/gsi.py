@@ -2,17 +2,21 @@
 """ Core components """
 from boto.exception import JSONResponseError, BotoServerError
 
-from dynamic_dynamodb import calculators
-from dynamic_dynamodb.aws import dynamodb, sns
-from dynamic_dynamodb.core import circuit_breaker
+from dynamic_dynamodb import calculators, journal, lease, metrics, timing
+from dynamic_dynamodb.aws import api_accountant, dynamodb, sns
+from dynamic_dynamodb.core import (
+    alarm_state, billing_advisor, burst_credits, capacity_budget,
+    circuit_breaker, cooldown, gsi_coupling, scaling_policies)
 from dynamic_dynamodb.statistics import gsi as gsi_stats
 from dynamic_dynamodb.log_handler import LOGGER as logger
+from dynamic_dynamodb.config import scale_table
 from dynamic_dynamodb.config_handler import get_global_option, get_gsi_option
 
 
 def ensure_provisioning(
         table_name, table_key, gsi_name, gsi_key,
-        num_consec_read_checks, num_consec_write_checks):
+        num_consec_read_checks, num_consec_write_checks, policy_state=None,
+        cooldown_state=None):
     """ Ensure that provisioning is correct for Global Secondary Indexes
 
     :type table_name: str
@@ -27,64 +31,112 @@ def ensure_provisioning(
     :param num_consec_read_checks: How many consecutive checks have we had
     :type num_consec_write_checks: int
     :param num_consec_write_checks: How many consecutive checks have we had
+    :type policy_state: dict
+    :param policy_state: State kept by the scaling policy between checks
+    :type cooldown_state: dict
+    :param cooldown_state: Time of the latest reads and writes changes
     :returns: (int, int) -- num_consec_read_checks, num_consec_write_checks
     """
-    if get_global_option('circuit_breaker_url') or get_gsi_option(
-            table_key, gsi_key, 'circuit_breaker_url'):
+    if policy_state is None:
+        policy_state = {}
+    if cooldown_state is None:
+        cooldown_state = {}
+
+    journal.clear()
+
+    if (get_global_option('circuit_breaker_url') or
+            get_global_option('circuit_breaker_batch_url') or
+            get_gsi_option(table_key, gsi_key, 'circuit_breaker_url')):
         if circuit_breaker.is_open(table_name, table_key, gsi_name, gsi_key):
             logger.warning('Circuit breaker is OPEN!')
             return (0, 0)
 
+    if billing_advisor.is_on_demand(table_name):
+        logger.info(
+            '{0} - GSI: {1} - Table is in on-demand (PAY_PER_REQUEST) mode, '
+            'no provisioning to manage',
+            table_name, gsi_name)
+        return (0, 0)
+
     logger.info(
-        '{0} - Will ensure provisioning for global secondary index {1}'.format(
-            table_name, gsi_name))
+        '{0} - Will ensure provisioning for global secondary index {1}',
+        table_name, gsi_name)
 
     # Handle throughput alarm checks
     __ensure_provisioning_alarm(table_name, table_key, gsi_name, gsi_key)
 
     try:
-        read_update_needed, updated_read_units, num_consec_read_checks = \
-            __ensure_provisioning_reads(
-                table_name,
-                table_key,
-                gsi_name,
-                gsi_key,
-                num_consec_read_checks)
-        write_update_needed, updated_write_units, num_consec_write_checks = \
-            __ensure_provisioning_writes(
+        if get_gsi_option(table_key, gsi_key, 'scaling_policy') != 'threshold':
+            read_update_needed, updated_read_units, num_consec_read_checks = \
+                __ensure_provisioning_policy(
+                    table_name,
+                    table_key,
+                    gsi_name,
+                    gsi_key,
+                    'reads',
+                    policy_state.setdefault('reads', {}),
+                    num_consec_read_checks)
+            write_update_needed, updated_write_units, \
+                num_consec_write_checks = __ensure_provisioning_policy(
+                    table_name,
+                    table_key,
+                    gsi_name,
+                    gsi_key,
+                    'writes',
+                    policy_state.setdefault('writes', {}),
+                    num_consec_write_checks)
+        else:
+            read_update_needed, updated_read_units, num_consec_read_checks = \
+                __ensure_provisioning_reads(
+                    table_name,
+                    table_key,
+                    gsi_name,
+                    gsi_key,
+                    num_consec_read_checks)
+            write_update_needed, updated_write_units, \
+                num_consec_write_checks = __ensure_provisioning_writes(
+                    table_name,
+                    table_key,
+                    gsi_name,
+                    gsi_key,
+                    num_consec_write_checks)
+
+        # Handle throughput updates
+        if read_update_needed or write_update_needed:
+            logger.info(
+                '{0} - GSI: {1} - Changing provisioning to {2:d} '
+                'read units and {3:d} write units',
+                table_name, gsi_name, int(updated_read_units),
+                int(updated_write_units), decision='update')
+            outcome = __update_throughput(
                 table_name,
                 table_key,
                 gsi_name,
                 gsi_key,
-                num_consec_write_checks)
+                updated_read_units,
+                updated_write_units,
+                cooldown_state)
 
-        if read_update_needed:
-            num_consec_read_checks = 0
+            # Keep the check counts of deferred decreases, so that they are
+            # made as soon as the maintenance window opens
+            if outcome != 'outside-maintenance-window':
+                if read_update_needed:
+                    num_consec_read_checks = 0
 
-        if write_update_needed:
-            num_consec_write_checks = 0
+                if write_update_needed:
+                    num_consec_write_checks = 0
 
-        # Handle throughput updates
-        if read_update_needed or write_update_needed:
-            logger.info(
-                '{0} - GSI: {1} - Changing provisioning to {2:d} '
-                'read units and {3:d} write units'.format(
-                    table_name,
-                    gsi_name,
-                    int(updated_read_units),
-                    int(updated_write_units)))
-            __update_throughput(
+            journal.write(
                 table_name,
-                table_key,
                 gsi_name,
                 gsi_key,
                 updated_read_units,
-                updated_write_units)
+                updated_write_units,
+                outcome)
         else:
             logger.info(
-                '{0} - GSI: {1} - No need to change provisioning'.format(
-                    table_name,
-                    gsi_name))
+                '{0} - GSI: {1} - No need to change provisioning',
+                table_name, gsi_name, decision='none')
     except JSONResponseError:
         raise
     except BotoServerError:
@@ -93,6 +145,32 @@ def ensure_provisioning(
     return num_consec_read_checks, num_consec_write_checks
 
 
+def emergency_scale_up(
+        table_name, table_key, gsi_name, gsi_key, read_units, write_units,
+        cooldown_state):
+    """ Make an emergency scale-up decided by the throttle watcher
+
+    :type table_name: str
+    :param table_name: Name of the DynamoDB table
+    :type table_key: str
+    :param table_key: Table configuration option key name
+    :type gsi_name: str
+    :param gsi_name: Name of the GSI
+    :type gsi_key: str
+    :param gsi_key: GSI configuration option key name
+    :type read_units: int
+    :param read_units: New read unit provisioning
+    :type write_units: int
+    :param write_units: New write unit provisioning
+    :type cooldown_state: dict
+    :param cooldown_state: Time of the latest reads and writes changes
+    :returns: str -- Outcome, see __update_throughput()
+    """
+    return __update_throughput(
+        table_name, table_key, gsi_name, gsi_key, read_units, write_units,
+        cooldown_state)
+
+
 def __calculate_always_decrease_rw_values(
         table_name, gsi_name, read_units, provisioned_reads,
         write_units, provisioned_writes):
@@ -123,7 +201,8 @@ def __calculate_always_decrease_rw_values(
         logger.info(
             '{0} - GSI: {1} - Reads could be decreased, '
             'but we are waiting for writes to get lower than the threshold '
-            'before scaling down'.format(table_name, gsi_name))
+            'before scaling down',
+            table_name, gsi_name)
 
         read_units = provisioned_reads
 
@@ -131,13 +210,176 @@ def __calculate_always_decrease_rw_values(
         logger.info(
             '{0} - GSI: {1} - Writes could be decreased, '
             'but we are waiting for reads to get lower than the threshold '
-            'before scaling down'.format(table_name, gsi_name))
+            'before scaling down',
+            table_name, gsi_name)
 
         write_units = provisioned_writes
 
     return (read_units, write_units)
 
 
+@timing.timed('scaling-policy')
+def __ensure_provisioning_policy(
+        table_name, table_key, gsi_name, gsi_key, kind, policy_state,
+        num_consec_checks):
+    """ Ensure that provisioning is correct using a scaling policy
+
+    :type table_name: str
+    :param table_name: Name of the DynamoDB table
+    :type table_key: str
+    :param table_key: Table configuration option key name
+    :type gsi_name: str
+    :param gsi_name: Name of the GSI
+    :type gsi_key: str
+    :param gsi_key: Configuration option key name
+    :type kind: str
+    :param kind: Either reads or writes
+    :type policy_state: dict
+    :param policy_state: State kept by the scaling policy between checks
+    :type num_consec_checks: int
+    :param num_consec_checks: How many consecutive checks proposed a
+        scale down
+    :returns: (bool, int, int) -- update_needed, updated_units,
+        num_consec_checks
+    """
+    try:
+        lookback_window_start = get_gsi_option(
+            table_key, gsi_key, 'lookback_window_start')
+        lookback_period = get_gsi_option(
+            table_key, gsi_key, 'lookback_period')
+        if kind == 'reads':
+            current_units = dynamodb.get_provisioned_gsi_read_units(
+                table_name, gsi_name)
+        else:
+            current_units = dynamodb.get_provisioned_gsi_write_units(
+                table_name, gsi_name)
+
+        if not get_gsi_option(
+                table_key, gsi_key, 'enable_{0}_autoscaling'.format(kind)):
+            logger.info(
+                '{0} - GSI: {1} - Autoscaling of {2} has been disabled',
+                table_name, gsi_name, kind)
+            return False, current_units, num_consec_checks
+
+        if kind == 'reads':
+            consumed_units_percent = gsi_stats.get_consumed_read_units_percent(
+                table_name,
+                gsi_name,
+                lookback_window_start,
+                lookback_period,
+                get_gsi_option(table_key, gsi_key, 'consumed_statistic'))
+            throttled_count = gsi_stats.get_throttled_read_event_count(
+                table_name, gsi_name, lookback_window_start, lookback_period)
+        else:
+            consumed_units_percent = \
+                gsi_stats.get_consumed_write_units_percent(
+                    table_name,
+                    gsi_name,
+                    lookback_window_start,
+                    lookback_period,
+                    get_gsi_option(table_key, gsi_key, 'consumed_statistic'))
+            throttled_count = gsi_stats.get_throttled_write_event_count(
+                table_name, gsi_name, lookback_window_start, lookback_period)
+    except JSONResponseError:
+        raise
+    except BotoServerError:
+        raise
+
+    metrics.record_capacity(
+        table_name, gsi_name, kind,
+        current_units, consumed_units_percent, throttled_count)
+    journal.observe(
+        kind, current_units, consumed_units_percent, throttled_count)
+    api_accountant.observe(
+        table_name, consumed_units_percent, throttled_count)
+
+    if kind == 'writes':
+        gsi_coupling.observe_gsi_writes(
+            table_name, gsi_name, current_units * consumed_units_percent / 100)
+
+    options = {}
+    for option in scaling_policies.OPTIONS:
+        options[option] = get_gsi_option(table_key, gsi_key, option)
+
+    updated_units = scaling_policies.calculate(
+        get_gsi_option(table_key, gsi_key, 'scaling_policy'),
+        current_units,
+        consumed_units_percent,
+        throttled_count,
+        lookback_period,
+        get_gsi_option(
+            table_key, gsi_key, '{0}_target_utilization'.format(kind)),
+        options,
+        policy_state,
+        '{0} - GSI: {1}'.format(table_name, gsi_name))
+
+    # Follow a base table write increase
+    if kind == 'writes' and get_gsi_option(
+            table_key, gsi_key, 'scale_gsi_writes_with_table'):
+        updated_units = max(
+            updated_units,
+            gsi_coupling.get_gsi_write_units(table_name, gsi_name))
+
+    if (updated_units > current_units and not get_gsi_option(
+            table_key, gsi_key, 'enable_{0}_up_scaling'.format(kind))):
+        logger.debug(
+            '{0} - GSI: {1} - Up scaling event detected. No action taken as '
+            'scaling up {2} has been disabled in the configuration',
+            table_name, gsi_name, kind)
+        updated_units = current_units
+    elif (updated_units < current_units and not get_gsi_option(
+            table_key, gsi_key, 'enable_{0}_down_scaling'.format(kind))):
+        logger.debug(
+            '{0} - GSI: {1} - Down scaling event detected. No action taken as '
+            'scaling down {2} has been disabled in the configuration',
+            table_name, gsi_name, kind)
+        updated_units = current_units
+
+    # Hold back scale downs until enough consecutive checks propose one
+    num_checks_before_scale_down = get_gsi_option(
+        table_key, gsi_key,
+        'num_{0}_checks_before_scale_down'.format(kind[:-1]))
+    if updated_units < current_units:
+        num_consec_checks += 1
+        if num_consec_checks < num_checks_before_scale_down:
+            updated_units = current_units
+    else:
+        num_consec_checks = 0
+
+    logger.info(
+        '{0} - GSI: {1} - Consecutive {2} checks {3}/{4}',
+        table_name, gsi_name, kind[:-1], num_consec_checks,
+        num_checks_before_scale_down)
+
+    # Stay within the configured min and max provisioning
+    max_provisioned_units = get_gsi_option(
+        table_key, gsi_key, 'max_provisioned_{0}'.format(kind))
+    if max_provisioned_units and updated_units > int(max_provisioned_units):
+        updated_units = int(max_provisioned_units)
+        logger.info(
+            '{0} - GSI: {1} - Will not increase {2} over '
+            'max-provisioned-{2} limit ({3} {2})',
+            table_name, gsi_name, kind, updated_units)
+
+    min_provisioned_units = get_gsi_option(
+        table_key, gsi_key, 'min_provisioned_{0}'.format(kind))
+    if min_provisioned_units and updated_units < int(min_provisioned_units):
+        updated_units = int(min_provisioned_units)
+        logger.info(
+            '{0} - GSI: {1} - Will not decrease {2} below '
+            'min-provisioned-{2} limit ({3} {2})',
+            table_name, gsi_name, kind, updated_units)
+
+    if updated_units != current_units:
+        metrics.record_scaling_decision(
+            table_name, gsi_name, kind,
+            'up' if updated_units > current_units else 'down',
+            get_gsi_option(table_key, gsi_key, 'scaling_policy'))
+
+    return updated_units != current_units, updated_units, num_consec_checks
+
+
+@timing.timed('reads')
 def __ensure_provisioning_reads(
         table_name, table_key, gsi_name, gsi_key, num_consec_read_checks):
     """ Ensure that provisioning is correct
@@ -158,8 +400,8 @@ def __ensure_provisioning_reads(
     if not get_gsi_option(table_key, gsi_key, 'enable_reads_autoscaling'):
         logger.info(
             '{0} - GSI: {1} - '
-            'Autoscaling of reads has been disabled'.format(
-                table_name, gsi_name))
+            'Autoscaling of reads has been disabled',
+            table_name, gsi_name)
         return False, dynamodb.get_provisioned_gsi_read_units(
             table_name, gsi_name), 0
 
@@ -173,7 +415,11 @@ def __ensure_provisioning_reads(
             table_name, gsi_name)
         consumed_read_units_percent = \
             gsi_stats.get_consumed_read_units_percent(
-                table_name, gsi_name, lookback_window_start, lookback_period)
+                table_name,
+                gsi_name,
+                lookback_window_start,
+                lookback_period,
+                get_gsi_option(table_key, gsi_key, 'consumed_statistic'))
         throttled_read_count = \
             gsi_stats.get_throttled_read_event_count(
                 table_name, gsi_name, lookback_window_start, lookback_period)
@@ -239,6 +485,10 @@ def __ensure_provisioning_reads(
             get_gsi_option(table_key, gsi_key, 'decrease_consumed_reads_with')
         decrease_consumed_reads_scale = \
             get_gsi_option(table_key, gsi_key, 'decrease_consumed_reads_scale')
+        reads_target_utilization = \
+            get_gsi_option(table_key, gsi_key, 'reads_target_utilization')
+        target_tracking_damping = \
+            get_gsi_option(table_key, gsi_key, 'target_tracking_damping')
     except JSONResponseError:
         raise
     except BotoServerError:
@@ -247,6 +497,15 @@ def __ensure_provisioning_reads(
     # Set the updated units to the current read unit value
     updated_read_units = current_read_units
 
+    metrics.record_capacity(
+        table_name, gsi_name, 'reads', current_read_units,
+        consumed_read_units_percent, throttled_read_count)
+    journal.observe(
+        'reads', current_read_units,
+        consumed_read_units_percent, throttled_read_count)
+    api_accountant.observe(
+        table_name, consumed_read_units_percent, throttled_read_count)
+
     # Reset consecutive reads if num_read_checks_reset_percent is reached
     if num_read_checks_reset_percent:
 
@@ -255,11 +514,9 @@ def __ensure_provisioning_reads(
             logger.info(
                 '{0} - GSI: {1} - Resetting the number of consecutive '
                 'read checks. Reason: Consumed percent {2} is '
-                'greater than reset percent: {3}'.format(
-                    table_name,
-                    gsi_name,
-                    consumed_read_units_percent,
-                    num_read_checks_reset_percent))
+                'greater than reset percent: {3}',
+                table_name, gsi_name, consumed_read_units_percent,
+                num_read_checks_reset_percent)
 
             num_consec_read_checks = 0
 
@@ -267,8 +524,8 @@ def __ensure_provisioning_reads(
     if not get_gsi_option(table_key, gsi_key, 'enable_reads_up_scaling'):
         logger.debug(
             '{0} - GSI: {1} - Up scaling event detected. No action taken as '
-            'scaling up reads has been disabled in the configuration'.format(
-                table_name, gsi_name))
+            'scaling up reads has been disabled in the configuration',
+            table_name, gsi_name)
 
     else:
 
@@ -428,6 +685,21 @@ def __ensure_provisioning_reads(
                         consumed_read_units_percent,
                         '{0} - GSI: {1}'.format(table_name, gsi_name))
 
+        # Increase needed to reach the target utilization
+        target_calculated_provisioning = 0
+        if reads_target_utilization:
+            target_calculated_provisioning = \
+                calculators.target_tracking_units(
+                    current_read_units,
+                    consumed_read_units_percent,
+                    throttled_read_count,
+                    lookback_period,
+                    reads_target_utilization,
+                    target_tracking_damping,
+                    min_provisioned_reads,
+                    max_provisioned_reads,
+                    '{0} - GSI: {1}'.format(table_name, gsi_name))
+
         # Determine which metric requires the most scaling
         if (throttled_by_provisioned_calculated_provisioning
                 > calculated_provisioning):
@@ -449,12 +721,31 @@ def __ensure_provisioning_reads(
         if throttled_count_calculated_provisioning > calculated_provisioning:
             calculated_provisioning = throttled_count_calculated_provisioning
             scale_reason = "due to throttled events threshold being exceeded"
+        if target_calculated_provisioning > calculated_provisioning:
+            calculated_provisioning = target_calculated_provisioning
+            scale_reason = "due to target utilization being exceeded"
+
+        # Let the burst credits absorb short spikes
+        if (calculated_provisioning > current_read_units and
+                not throttled_read_count and
+                get_gsi_option(
+                    table_key, gsi_key, 'enable_burst_credit_model')):
+            calculated_provisioning = __get_burst_credit_provisioning(
+                table_name,
+                table_key,
+                gsi_name,
+                gsi_key,
+                'reads',
+                current_read_units,
+                calculated_provisioning)
 
         if calculated_provisioning > current_read_units:
             logger.info(
                 '{0} - GSI: {1} - Resetting the number of consecutive '
-                'read checks. Reason: scale up {2}'.format(
-                    table_name, gsi_name, scale_reason))
+                'read checks. Reason: scale up {2}',
+                table_name, gsi_name, scale_reason, decision='scale-up')
+            metrics.record_scaling_decision(
+                table_name, gsi_name, 'reads', 'up', scale_reason)
             num_consec_read_checks = 0
             update_needed = True
             updated_read_units = calculated_provisioning
@@ -479,8 +770,8 @@ def __ensure_provisioning_reads(
             logger.debug(
                 '{0} - GSI: {1} - Down scaling event detected. '
                 'No action taken as scaling '
-                'down reads has been disabled in the configuration'.format(
-                    table_name, gsi_name))
+                'down reads has been disabled in the configuration',
+                table_name, gsi_name)
         # Exit if reads == 0% and downscaling has been disabled at 0%
         elif (consumed_read_units_percent == 0 and not
                 get_gsi_option(
@@ -490,7 +781,8 @@ def __ensure_provisioning_reads(
             logger.info(
                 '{0} - GSI: {1} - Down scaling event detected. '
                 'No action taken as scaling down reads is not done when'
-                ' usage is at 0%'.format(table_name, gsi_name))
+                ' usage is at 0%',
+                table_name, gsi_name)
         else:
             if consumed_calculated_provisioning:
                 if decrease_consumed_reads_unit == 'percent':
@@ -536,6 +828,9 @@ def __ensure_provisioning_reads(
                 if num_consec_read_checks >= num_read_checks_before_scale_down:
                     update_needed = True
                     updated_read_units = calculated_provisioning
+                    metrics.record_scaling_decision(
+                        table_name, gsi_name, 'reads', 'down',
+                        'low consumption')
 
     # Never go over the configured max provisioning
     if max_provisioned_reads:
@@ -545,10 +840,8 @@ def __ensure_provisioning_reads(
             logger.info(
                 '{0} - GSI: {1} - Will not increase writes over '
                 'gsi-max-provisioned-reads '
-                'limit ({2} writes)'.format(
-                    table_name,
-                    gsi_name,
-                    updated_read_units))
+                'limit ({2} writes)',
+                table_name, gsi_name, updated_read_units)
 
     # Ensure that we have met the min-provisioning
     if min_provisioned_reads:
@@ -558,10 +851,8 @@ def __ensure_provisioning_reads(
             logger.info(
                 '{0} - GSI: {1} - Increasing reads to '
                 'meet gsi-min-provisioned-reads '
-                'limit ({2} reads)'.format(
-                    table_name,
-                    gsi_name,
-                    updated_read_units))
+                'limit ({2} reads)',
+                table_name, gsi_name, updated_read_units)
 
     if calculators.is_consumed_over_proposed(
             current_read_units,
@@ -571,17 +862,18 @@ def __ensure_provisioning_reads(
         updated_read_units = current_read_units
         logger.info(
             '{0} - GSI: {1} - Consumed is over proposed read units. Will leave '
-            'table at current setting.'.format(table_name, gsi_name))
+            'table at current setting.',
+            table_name, gsi_name)
 
-    logger.info('{0} - GSI: {1} - Consecutive read checks {2}/{3}'.format(
-        table_name,
-        gsi_name,
-        num_consec_read_checks,
-        num_read_checks_before_scale_down))
+    logger.info(
+        '{0} - GSI: {1} - Consecutive read checks {2}/{3}',
+        table_name, gsi_name, num_consec_read_checks,
+        num_read_checks_before_scale_down)
 
     return update_needed, updated_read_units, num_consec_read_checks
 
 
+@timing.timed('writes')
 def __ensure_provisioning_writes(
         table_name, table_key, gsi_name, gsi_key, num_consec_write_checks):
     """ Ensure that provisioning of writes is correct
@@ -602,8 +894,8 @@ def __ensure_provisioning_writes(
     if not get_gsi_option(table_key, gsi_key, 'enable_writes_autoscaling'):
         logger.info(
             '{0} - GSI: {1} - '
-            'Autoscaling of writes has been disabled'.format(
-                table_name, gsi_name))
+            'Autoscaling of writes has been disabled',
+            table_name, gsi_name)
         return False, dynamodb.get_provisioned_gsi_write_units(
             table_name, gsi_name), 0
 
@@ -617,7 +909,11 @@ def __ensure_provisioning_writes(
             table_name, gsi_name)
         consumed_write_units_percent = \
             gsi_stats.get_consumed_write_units_percent(
-                table_name, gsi_name, lookback_window_start, lookback_period)
+                table_name,
+                gsi_name,
+                lookback_window_start,
+                lookback_period,
+                get_gsi_option(table_key, gsi_key, 'consumed_statistic'))
         throttled_write_count = \
             gsi_stats.get_throttled_write_event_count(
                 table_name, gsi_name, lookback_window_start, lookback_period)
@@ -686,6 +982,10 @@ def __ensure_provisioning_writes(
         decrease_consumed_writes_scale = \
             get_gsi_option(
                 table_key, gsi_key, 'decrease_consumed_writes_scale')
+        writes_target_utilization = \
+            get_gsi_option(table_key, gsi_key, 'writes_target_utilization')
+        target_tracking_damping = \
+            get_gsi_option(table_key, gsi_key, 'target_tracking_damping')
     except JSONResponseError:
         raise
     except BotoServerError:
@@ -694,6 +994,20 @@ def __ensure_provisioning_writes(
     # Set the updated units to the current write unit value
     updated_write_units = current_write_units
 
+    metrics.record_capacity(
+        table_name, gsi_name, 'writes', current_write_units,
+        consumed_write_units_percent, throttled_write_count)
+    journal.observe(
+        'writes', current_write_units,
+        consumed_write_units_percent, throttled_write_count)
+    api_accountant.observe(
+        table_name, consumed_write_units_percent, throttled_write_count)
+
+    gsi_coupling.observe_gsi_writes(
+        table_name,
+        gsi_name,
+        current_write_units * consumed_write_units_percent / 100)
+
     # Reset consecutive write count if num_write_checks_reset_percent
     # is reached
     if num_write_checks_reset_percent:
@@ -703,11 +1017,9 @@ def __ensure_provisioning_writes(
             logger.info(
                 '{0} - GSI: {1} - Resetting the number of consecutive '
                 'write checks. Reason: Consumed percent {2} is '
-                'greater than reset percent: {3}'.format(
-                    table_name,
-                    gsi_name,
-                    consumed_write_units_percent,
-                    num_write_checks_reset_percent))
+                'greater than reset percent: {3}',
+                table_name, gsi_name, consumed_write_units_percent,
+                num_write_checks_reset_percent)
 
             num_consec_write_checks = 0
 
@@ -715,8 +1027,8 @@ def __ensure_provisioning_writes(
     if not get_gsi_option(table_key, gsi_key, 'enable_writes_up_scaling'):
         logger.debug(
             '{0} - GSI: {1} - Up scaling event detected. No action taken as '
-            'scaling up writes has been disabled in the configuration'.format(
-                table_name, gsi_name))
+            'scaling up writes has been disabled in the configuration',
+            table_name, gsi_name)
 
     else:
 
@@ -871,6 +1183,27 @@ def __ensure_provisioning_writes(
                         consumed_write_units_percent,
                         '{0} - GSI: {1}'.format(table_name, gsi_name))
 
+        # Increase needed to reach the target utilization
+        target_calculated_provisioning = 0
+        if writes_target_utilization:
+            target_calculated_provisioning = \
+                calculators.target_tracking_units(
+                    current_write_units,
+                    consumed_write_units_percent,
+                    throttled_write_count,
+                    lookback_period,
+                    writes_target_utilization,
+                    target_tracking_damping,
+                    min_provisioned_writes,
+                    max_provisioned_writes,
+                    '{0} - GSI: {1}'.format(table_name, gsi_name))
+
+        # Increase needed to follow a base table write increase
+        coupled_calculated_provisioning = 0
+        if get_gsi_option(table_key, gsi_key, 'scale_gsi_writes_with_table'):
+            coupled_calculated_provisioning = \
+                gsi_coupling.get_gsi_write_units(table_name, gsi_name)
+
         # Determine which metric requires the most scaling
         if (throttled_by_provisioned_calculated_provisioning
                 > calculated_provisioning):
@@ -892,12 +1225,34 @@ def __ensure_provisioning_writes(
         if throttled_count_calculated_provisioning > calculated_provisioning:
             calculated_provisioning = throttled_count_calculated_provisioning
             scale_reason = "due to throttled events threshold being exceeded"
+        if target_calculated_provisioning > calculated_provisioning:
+            calculated_provisioning = target_calculated_provisioning
+            scale_reason = "due to target utilization being exceeded"
+        if coupled_calculated_provisioning > calculated_provisioning:
+            calculated_provisioning = coupled_calculated_provisioning
+            scale_reason = "due to the base table writes being increased"
+
+        # Let the burst credits absorb short spikes
+        if (calculated_provisioning > current_write_units and
+                not throttled_write_count and
+                get_gsi_option(
+                    table_key, gsi_key, 'enable_burst_credit_model')):
+            calculated_provisioning = __get_burst_credit_provisioning(
+                table_name,
+                table_key,
+                gsi_name,
+                gsi_key,
+                'writes',
+                current_write_units,
+                calculated_provisioning)
 
         if calculated_provisioning > current_write_units:
             logger.info(
                 '{0} - GSI: {1} - Resetting the number of consecutive '
-                'write checks. Reason: scale up {2}'.format(
-                    table_name, gsi_name, scale_reason))
+                'write checks. Reason: scale up {2}',
+                table_name, gsi_name, scale_reason, decision='scale-up')
+            metrics.record_scaling_decision(
+                table_name, gsi_name, 'writes', 'up', scale_reason)
             num_consec_write_checks = 0
             update_needed = True
             updated_write_units = calculated_provisioning
@@ -923,15 +1278,16 @@ def __ensure_provisioning_writes(
             logger.debug(
                 '{0} - GSI: {1} - Down scaling event detected. '
                 'No action taken as scaling '
-                'down writes has been disabled in the configuration'.format(
-                    table_name, gsi_name))
+                'down writes has been disabled in the configuration',
+                table_name, gsi_name)
         # Exit if writes == 0% and downscaling has been disabled at 0%
         elif (consumed_write_units_percent == 0 and not get_gsi_option(
                 table_key, gsi_key, 'allow_scaling_down_writes_on_0_percent')):
             logger.info(
                 '{0} - GSI: {1} - Down scaling event detected. '
                 'No action taken as scaling down writes is not done when'
-                ' usage is at 0%'.format(table_name, gsi_name))
+                ' usage is at 0%',
+                table_name, gsi_name)
         else:
             if consumed_calculated_provisioning:
                 if decrease_consumed_writes_unit == 'percent':
@@ -978,6 +1334,9 @@ def __ensure_provisioning_writes(
                         num_write_checks_before_scale_down:
                     update_needed = True
                     updated_write_units = calculated_provisioning
+                    metrics.record_scaling_decision(
+                        table_name, gsi_name, 'writes', 'down',
+                        'low consumption')
 
     # Never go over the configured max provisioning
     if max_provisioned_writes:
@@ -987,10 +1346,8 @@ def __ensure_provisioning_writes(
             logger.info(
                 '{0} - GSI: {1} - '
                 'Will not increase writes over gsi-max-provisioned-writes '
-                'limit ({2} writes)'.format(
-                    table_name,
-                    gsi_name,
-                    updated_write_units))
+                'limit ({2} writes)',
+                table_name, gsi_name, updated_write_units)
 
     # Ensure that we have met the min-provisioning
     if min_provisioned_writes:
@@ -1000,10 +1357,8 @@ def __ensure_provisioning_writes(
             logger.info(
                 '{0} - GSI: {1} - Increasing writes to '
                 'meet gsi-min-provisioned-writes '
-                'limit ({2} writes)'.format(
-                    table_name,
-                    gsi_name,
-                    updated_write_units))
+                'limit ({2} writes)',
+                table_name, gsi_name, updated_write_units)
 
     if calculators.is_consumed_over_proposed(
             current_write_units,
@@ -1013,19 +1368,67 @@ def __ensure_provisioning_writes(
         updated_write_units = current_write_units
         logger.info(
             '{0} - GSI: {1} - Consumed is over proposed write units. Will leave '
-            'table at current setting.'.format(table_name, gsi_name))
+            'table at current setting.',
+            table_name, gsi_name)
 
-    logger.info('{0} - GSI: {1} - Consecutive write checks {2}/{3}'.format(
-        table_name,
-        gsi_name,
-        num_consec_write_checks,
-        num_write_checks_before_scale_down))
+    logger.info(
+        '{0} - GSI: {1} - Consecutive write checks {2}/{3}',
+        table_name, gsi_name, num_consec_write_checks,
+        num_write_checks_before_scale_down)
 
     return update_needed, updated_write_units, num_consec_write_checks
 
 
+def __get_burst_credit_provisioning(
+        table_name, table_key, gsi_name, gsi_key, kind, current_units,
+        calculated_provisioning):
+    """ Adjust a scale-up using the burst credit model
+
+    :type table_name: str
+    :param table_name: Name of the DynamoDB table
+    :type table_key: str
+    :param table_key: Table configuration option key name
+    :type gsi_name: str
+    :param gsi_name: Name of the GSI
+    :type gsi_key: str
+    :param gsi_key: Configuration option key name
+    :type kind: str
+    :param kind: Either reads or writes
+    :type current_units: int
+    :param current_units: Currently provisioned units
+    :type calculated_provisioning: int
+    :param calculated_provisioning: Proposed provisioning
+    :returns: int -- Provisioning to use
+    """
+    if kind == 'reads':
+        consumed_history = gsi_stats.get_consumed_read_units_history(
+            table_name,
+            gsi_name,
+            get_gsi_option(table_key, gsi_key, 'lookback_window_start'),
+            get_gsi_option(table_key, gsi_key, 'lookback_period'),
+            burst_credits.HISTORY_MINUTES)
+    else:
+        consumed_history = gsi_stats.get_consumed_write_units_history(
+            table_name,
+            gsi_name,
+            get_gsi_option(table_key, gsi_key, 'lookback_window_start'),
+            get_gsi_option(table_key, gsi_key, 'lookback_period'),
+            burst_credits.HISTORY_MINUTES)
+
+    return burst_credits.get_provisioning(
+        current_units,
+        calculated_provisioning,
+        consumed_history,
+        get_gsi_option(
+            table_key, gsi_key, '{0}_upper_threshold'.format(kind)),
+        get_global_option('check_interval'),
+        '{0} - GSI: {1}'.format(table_name, gsi_name))
+
+
+@timing.timed('update')
 def __update_throughput(
-        table_name, table_key, gsi_name, gsi_key, read_units, write_units):
+        table_name, table_key, gsi_name, gsi_key, read_units, write_units,
+        cooldown_state):
     """ Update throughput on the GSI
 
     :type table_name: str
@@ -1040,7 +1443,18 @@ def __update_throughput(
     :param read_units: New read unit provisioning
     :type write_units: int
     :param write_units: New write unit provisioning
+    :type cooldown_state: dict
+    :param cooldown_state: Time of the latest reads and writes changes
+    :returns: str -- Outcome, see dynamodb.update_gsi_provisioning() for
+        the outcomes of the update
     """
+    # Leave the changes to the instance holding the lease
+    if not lease.is_leader():
+        logger.info(
+            '{0} - GSI: {1} - Standing by, not changing the provisioning',
+            table_name, gsi_name)
+        return 'standby'
+
     try:
         current_ru = dynamodb.get_provisioned_gsi_read_units(
             table_name, gsi_name)
@@ -1055,13 +1469,15 @@ def __update_throughput(
     except JSONResponseError:
         raise
 
-    logger.debug('{0} - GSI: {1} - GSI status is {2}'.format(
-        table_name, gsi_name, gsi_status))
+    logger.debug(
+        '{0} - GSI: {1} - GSI status is {2}',
+        table_name, gsi_name, gsi_status)
     if gsi_status != 'ACTIVE':
         logger.warning(
             '{0} - GSI: {1} - Not performing throughput changes when GSI '
-            'status is {2}'.format(table_name, gsi_name, gsi_status))
-        return
+            'status is {2}',
+            table_name, gsi_name, gsi_status)
+        return 'not-active'
 
     # If this setting is True, we will only scale down when
     # BOTH reads AND writes are low
@@ -1075,19 +1491,94 @@ def __update_throughput(
             current_wu)
 
         if read_units == current_ru and write_units == current_wu:
-            logger.info('{0} - GSI: {1} - No changes to perform'.format(
-                table_name, gsi_name))
-            return
+            logger.info(
+                '{0} - GSI: {1} - No changes to perform',
+                table_name, gsi_name)
+            return 'held-rw-together'
+
+    # Defer decreases until the next maintenance window opens
+    next_window_start = dynamodb.get_gsi_next_window_start(
+        table_name, table_key, gsi_name, gsi_key)
+    if next_window_start:
+        read_units = max(read_units, current_ru)
+        write_units = max(write_units, current_wu)
+
+        if read_units == current_ru and write_units == current_wu:
+            logger.info(
+                '{0} - GSI: {1} - Decreases are deferred to the next '
+                'maintenance window, starting {2} UTC',
+                table_name, gsi_name,
+                next_window_start.strftime('%Y-%m-%d %H:%M'))
+            return 'outside-maintenance-window'
+
+    # Hold back changes within their cooldown
+    read_units = cooldown.gate(
+        'reads',
+        current_ru,
+        read_units,
+        cooldown_state,
+        get_gsi_option(table_key, gsi_key, 'increase_cooldown'),
+        get_gsi_option(table_key, gsi_key, 'decrease_cooldown'),
+        '{0} - GSI: {1}'.format(table_name, gsi_name))
+    write_units = cooldown.gate(
+        'writes',
+        current_wu,
+        write_units,
+        cooldown_state,
+        get_gsi_option(table_key, gsi_key, 'increase_cooldown'),
+        get_gsi_option(table_key, gsi_key, 'decrease_cooldown'),
+        '{0} - GSI: {1}'.format(table_name, gsi_name))
+
+    if read_units == current_ru and write_units == current_wu:
+        logger.info(
+            '{0} - GSI: {1} - No changes to perform',
+            table_name, gsi_name)
+        return 'cooldown'
+
+    # Leave increases to the capacity budget allocation
+    if capacity_budget.is_enabled() and (
+            read_units > current_ru or write_units > current_wu):
+        lookback_window_start = get_gsi_option(
+            table_key, gsi_key, 'lookback_window_start')
+        lookback_period = get_gsi_option(
+            table_key, gsi_key, 'lookback_period')
+        throttled = (
+            gsi_stats.get_throttled_read_event_count(
+                table_name, gsi_name, lookback_window_start,
+                lookback_period) or
+            gsi_stats.get_throttled_write_event_count(
+                table_name, gsi_name, lookback_window_start,
+                lookback_period))
+
+        logger.info(
+            '{0} - GSI: {1} - Queueing the provisioning change for the '
+            'capacity budget allocation',
+            table_name, gsi_name)
+        capacity_budget.request(
+            table_name,
+            table_key,
+            gsi_name,
+            gsi_key,
+            current_ru,
+            current_wu,
+            read_units,
+            write_units,
+            throttled,
+            get_gsi_option(table_key, gsi_key, 'capacity_priority'),
+            cooldown_state)
+        return 'budget-queued'
 
-    dynamodb.update_gsi_provisioning(
+    return dynamodb.update_gsi_provisioning(
         table_name,
         table_key,
         gsi_name,
         gsi_key,
         int(read_units),
-        int(write_units))
+        int(write_units),
+        cooldown_state=cooldown_state)
 
 
+@timing.timed('alarms')
 def __ensure_provisioning_alarm(table_name, table_key, gsi_name, gsi_key):
     """ Ensure that provisioning alarm threshold is not exceeded
 
@@ -1168,11 +1659,22 @@ def __ensure_provisioning_alarm(table_name, table_key, gsi_name, gsi_key):
                 consumed_write_units_percent,
                 writes_lower_alarm_threshold))
 
-    # Send alert if needed
-    if upper_alert_triggered:
+    # Send alert if the alarm state has changed. The upper alarm takes
+    # precedence over the lower alarm
+    reminder_interval = get_gsi_option(
+        table_key, gsi_key, 'alarm_reminder_interval')
+    upper_alert = alarm_state.evaluate(
+        table_name, gsi_name, 'high-throughput-alarm',
+        upper_alert_triggered, reminder_interval)
+    lower_alert = alarm_state.evaluate(
+        table_name, gsi_name, 'low-throughput-alarm',
+        lower_alert_triggered and not upper_alert_triggered,
+        reminder_interval)
+
+    if upper_alert == alarm_state.ALARM:
         logger.info(
-            '{0} - GSI: {1} - Will send high provisioning alert'.format(
-                table_name, gsi_name))
+            '{0} - GSI: {1} - Will send high provisioning alert',
+            table_name, gsi_name)
         sns.publish_gsi_notification(
             table_key,
             gsi_key,
@@ -1180,10 +1682,23 @@ def __ensure_provisioning_alarm(table_name, table_key, gsi_name, gsi_key):
             ['high-throughput-alarm'],
             subject='ALARM: High Throughput for Table {0} - GSI: {1}'.format(
                 table_name, gsi_name))
-    elif lower_alert_triggered:
+    elif upper_alert == alarm_state.OK:
         logger.info(
-            '{0} - GSI: {1} - Will send low provisioning alert'.format(
+            '{0} - GSI: {1} - Will send high provisioning recovery',
+            table_name, gsi_name)
+        sns.publish_gsi_notification(
+            table_key,
+            gsi_key,
+            '{0} - GSI: {1} - Consumed capacity is no longer above the upper '
+            'alarm thresholds\n'.format(table_name, gsi_name),
+            ['high-throughput-alarm'],
+            subject='OK: High Throughput for Table {0} - GSI: {1}'.format(
                 table_name, gsi_name))
+
+    if lower_alert == alarm_state.ALARM:
+        logger.info(
+            '{0} - GSI: {1} - Will send low provisioning alert',
+            table_name, gsi_name)
         sns.publish_gsi_notification(
             table_key,
             gsi_key,
@@ -1191,11 +1706,28 @@ def __ensure_provisioning_alarm(table_name, table_key, gsi_name, gsi_key):
             ['low-throughput-alarm'],
             subject='ALARM: Low Throughput for Table {0} - GSI: {1}'.format(
                 table_name, gsi_name))
-    else:
-        logger.debug(
-            '{0} - GSI: {1} - Throughput alarm thresholds not crossed'.format(
+    elif lower_alert == alarm_state.OK:
+        logger.info(
+            '{0} - GSI: {1} - Will send low provisioning recovery',
+            table_name, gsi_name)
+        sns.publish_gsi_notification(
+            table_key,
+            gsi_key,
+            '{0} - GSI: {1} - Consumed capacity is no longer below the lower '
+            'alarm thresholds\n'.format(table_name, gsi_name),
+            ['low-throughput-alarm'],
+            subject='OK: Low Throughput for Table {0} - GSI: {1}'.format(
                 table_name, gsi_name))
 
+    if not upper_alert_triggered and not lower_alert_triggered:
+        logger.debug(
+            '{0} - GSI: {1} - Throughput alarm thresholds not crossed',
+            table_name, gsi_name)
+    elif not upper_alert and not lower_alert:
+        logger.debug(
+            '{0} - GSI: {1} - Throughput alarm state unchanged',
+            table_name, gsi_name)
+
 
 def scale_reader(provision_increase_scale, current_value):
     """
@@ -1207,17 +1739,7 @@ def scale_reader(provision_increase_scale, current_value):
     :param current_value: the current consumed units or throttled events
     :returns: (int) The amount to scale provisioning by
     """
-
-    scale_value = 0
-    if provision_increase_scale:
-        for limits in sorted(provision_increase_scale.keys()):
-            if current_value < limits:
-                return scale_value
-            else:
-                scale_value = provision_increase_scale.get(limits)
-        return scale_value
-    else:
-        return scale_value
+    return scale_table.lookup_increase(provision_increase_scale, current_value)
 
 
 def scale_reader_decrease(provision_decrease_scale, current_value):
@@ -1230,13 +1752,4 @@ def scale_reader_decrease(provision_decrease_scale, current_value):
     :param current_value: the current consumed units or throttled events
     :returns: (int) The amount to scale provisioning by
     """
-    scale_value = 0
-    if provision_decrease_scale:
-        for limits in sorted(provision_decrease_scale.keys(), reverse=True):
-            if current_value > limits:
-                return scale_value
-            else:
-                scale_value = provision_decrease_scale.get(limits)
-        return scale_value
-    else:
-        return scale_value
+    return scale_table.lookup_decrease(provision_decrease_scale, current_value)
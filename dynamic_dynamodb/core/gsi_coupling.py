@@ -0,0 +1,117 @@
+# -*- coding: utf-8 -*-
+""" Couple GSI write provisioning to the base table writes
+
+Every write to a table also consumes write capacity on its GSIs. This module
+learns the ratio between the consumed GSI writes and the consumed table
+writes, and when the table writes have been increased it proposes a
+matching increase for the GSIs. The tables are checked before their GSIs, so
+the GSI increase is made in the same check as the table increase. Table
+increases granted by the capacity budget are only made at the end of the
+check, and the GSIs follow them in the next check.
+"""
+import math
+
+# Weight of the latest observation in the moving average of the ratios
+RATIO_SMOOTHING = 0.2
+
+# Latest consumed write units per second. Key: table_name
+TABLE_WRITES = {}
+
+# Write increases made in the current check.
+# Key: table_name, value: new write provisioning
+PENDING_INCREASES = {}
+
+# Write increases granted by the capacity budget, for the next check.
+# Key: table_name, value: new write provisioning
+GRANTED_INCREASES = {}
+
+# Learned GSI to table write ratios. Key: (table_name, gsi_name)
+RATIOS = {}
+
+
+def clear_pending_increase(table_name):
+    """ Clear any increase pending from the previous check of the table
+
+    An increase granted by the capacity budget at the end of the previous
+    check becomes pending for this check.
+
+    :type table_name: str
+    :param table_name: Name of the DynamoDB table
+    """
+    PENDING_INCREASES.pop(table_name, None)
+    if table_name in GRANTED_INCREASES:
+        PENDING_INCREASES[table_name] = GRANTED_INCREASES.pop(table_name)
+
+
+def observe_table_writes(table_name, consumed_units):
+    """ Record the consumed table writes
+
+    :type table_name: str
+    :param table_name: Name of the DynamoDB table
+    :type consumed_units: float
+    :param consumed_units: Consumed write units per second
+    """
+    TABLE_WRITES[table_name] = consumed_units
+
+
+def table_writes_increased(table_name, write_units):
+    """ Record that the table writes were increased in this check
+
+    :type table_name: str
+    :param table_name: Name of the DynamoDB table
+    :type write_units: int
+    :param write_units: New write provisioning
+    """
+    PENDING_INCREASES[table_name] = write_units
+
+
+def table_writes_granted(table_name, write_units):
+    """ Record a table write increase granted by the capacity budget
+
+    :type table_name: str
+    :param table_name: Name of the DynamoDB table
+    :type write_units: int
+    :param write_units: New write provisioning
+    """
+    GRANTED_INCREASES[table_name] = write_units
+
+
+def observe_gsi_writes(table_name, gsi_name, consumed_units):
+    """ Update the learned write ratio for a GSI
+
+    :type table_name: str
+    :param table_name: Name of the DynamoDB table
+    :type gsi_name: str
+    :param gsi_name: Name of the GSI
+    :type consumed_units: float
+    :param consumed_units: Consumed GSI write units per second
+    """
+    table_writes = TABLE_WRITES.get(table_name)
+    if not table_writes:
+        return
+
+    ratio = float(consumed_units) / table_writes
+    key = (table_name, gsi_name)
+    if key in RATIOS:
+        ratio = RATIO_SMOOTHING * ratio + (1 - RATIO_SMOOTHING) * RATIOS[key]
+
+    RATIOS[key] = ratio
+
+
+def get_gsi_write_units(table_name, gsi_name):
+    """ Get the GSI writes matching a table write increase
+
+    :type table_name: str
+    :param table_name: Name of the DynamoDB table
+    :type gsi_name: str
+    :param gsi_name: Name of the GSI
+    :returns: int -- Write units, 0 if no table increase is pending
+    """
+    if table_name not in PENDING_INCREASES:
+        return 0
+
+    ratio = RATIOS.get((table_name, gsi_name))
+    if not ratio:
+        return 0
+
+    return int(math.ceil(ratio * PENDING_INCREASES[table_name]))
@@ -0,0 +1,181 @@
+# -*- coding: utf-8 -*-
+""" Pluggable scaling policies
+
+The default threshold policy is implemented in core.table and core.gsi. The
+policies in this module are selected with the scaling-policy option. They
+propose a new provisioning from the current provisioning and consumption,
+and keep any state they need between the checks in the state dict passed to
+them. The state dict is stored by execute() together with the check counters.
+
+A policy is a function with the signature
+
+    policy(current_provisioning, consumed_units_percent, throttled_events,
+           lookback_period, target_utilization, options, state, log_tag)
+
+returning the proposed provisioning as an int. New policies are added to
+POLICIES.
+"""
+import math
+
+from dynamic_dynamodb.log_handler import LOGGER as logger
+
+# Lowest utilization (%) used by the PID controller
+PID_MIN_UTILIZATION = 1.0
+
+# Options read for the policies, passed to the policies in the options dict
+OPTIONS = [
+    'pid_kp',
+    'pid_ki',
+    'pid_kd',
+    'scaling_deadband',
+    'target_tracking_damping'
+]
+
+
+def calculate(
+        policy, current_provisioning, consumed_units_percent,
+        throttled_events, lookback_period, target_utilization, options,
+        state, log_tag):
+    """ Propose a new provisioning using the given policy
+
+    Changes smaller than scaling-deadband percent of the current provisioning
+    are ignored, so that small fluctuations do not cause UpdateTable calls.
+
+    :type policy: str
+    :param policy: Name of the scaling policy
+    :type current_provisioning: int
+    :param current_provisioning: The current provisioning
+    :type consumed_units_percent: float
+    :param consumed_units_percent: Percent of consumed units
+    :type throttled_events: int
+    :param throttled_events: Number of throttled events during the lookback
+    :type lookback_period: int
+    :param lookback_period: Number of minutes the metrics cover
+    :type target_utilization: float
+    :param target_utilization: Target consumption in percent of provisioning
+    :type options: dict
+    :param options: Policy options, see OPTIONS
+    :type state: dict
+    :param state: Policy state, kept between the checks
+    :type log_tag: str
+    :param log_tag: Prefix for the log
+    :returns: int -- Proposed provisioning
+    """
+    proposed_provisioning = POLICIES[policy](
+        current_provisioning,
+        consumed_units_percent,
+        throttled_events,
+        lookback_period,
+        target_utilization,
+        options,
+        state,
+        log_tag)
+    proposed_provisioning = max(int(proposed_provisioning), 1)
+
+    change = abs(proposed_provisioning - current_provisioning)
+    deadband = options.get('scaling_deadband')
+    if deadband and change * 100.0 < current_provisioning * deadband:
+        logger.debug(
+            '{0} - Proposed change of {1:d} units is within the '
+            'scaling deadband'.format(log_tag, change))
+        return current_provisioning
+
+    return proposed_provisioning
+
+
+def __get_utilization(
+        current_provisioning, consumed_units_percent, throttled_events,
+        lookback_period):
+    """ Get the utilization in percent, including throttled demand
+
+    Each throttled request would have consumed at least one unit.
+
+    :returns: float -- Utilization in percent of the current provisioning
+    """
+    throttled_units = float(throttled_events) / (float(lookback_period) * 60)
+    return (
+        float(consumed_units_percent) +
+        throttled_units / float(current_provisioning) * 100)
+
+
+def __target_tracking(
+        current_provisioning, consumed_units_percent, throttled_events,
+        lookback_period, target_utilization, options, state, log_tag):
+    """ Move the provisioning towards the target utilization, up and down
+
+    :returns: int -- Proposed provisioning
+    """
+    utilization = __get_utilization(
+        current_provisioning,
+        consumed_units_percent,
+        throttled_events,
+        lookback_period)
+    required_provisioning = int(math.ceil(
+        current_provisioning * utilization / float(target_utilization)))
+
+    proposed_provisioning = int(math.ceil(
+        current_provisioning +
+        float(options.get('target_tracking_damping') or 1) *
+        (required_provisioning - current_provisioning)))
+
+    logger.debug(
+        '{0} - Target tracking: utilization {1:.2f}%, '
+        'proposing {2:d} units'.format(
+            log_tag, utilization, proposed_provisioning))
+
+    return proposed_provisioning
+
+
+def __pid(
+        current_provisioning, consumed_units_percent, throttled_events,
+        lookback_period, target_utilization, options, state, log_tag):
+    """ PID controller towards the target utilization
+
+    The error is log(utilization / target), which is the log of the relative
+    change needed to reach the target. The controller is on velocity form, so
+    the output is the (log) change of the provisioning and the provisioning
+    itself acts as the integral. This avoids integral windup, and with only
+    pid-ki set to 1 it moves straight to the target. The two previous errors
+    are kept in state for the proportional and derivative terms.
+
+    :returns: int -- Proposed provisioning
+    """
+    utilization = __get_utilization(
+        current_provisioning,
+        consumed_units_percent,
+        throttled_events,
+        lookback_period)
+
+    # Avoid log(0) for idle tables
+    utilization = max(utilization, PID_MIN_UTILIZATION)
+    error = math.log(utilization / float(target_utilization))
+    previous_error = state.get('error', error)
+    second_previous_error = state.get('previous_error', previous_error)
+
+    output = (
+        options['pid_kp'] * (error - previous_error) +
+        options['pid_ki'] * error +
+        options['pid_kd'] * (
+            error - 2 * previous_error + second_previous_error))
+
+    state['previous_error'] = previous_error
+    state['error'] = error
+
+    proposed_provisioning = int(math.ceil(
+        current_provisioning * math.exp(output)))
+
+    logger.debug(
+        '{0} - PID: utilization {1:.2f}%, error {2:.3f}, '
+        'output {3:.3f}, proposing {4:d} units'.format(
+            log_tag,
+            utilization,
+            error,
+            output,
+            proposed_provisioning))
+
+    return proposed_provisioning
+
+POLICIES = {
+    'target-tracking': __target_tracking,
+    'pid': __pid
+}
@@ -2,18 +2,23 @@
 """ Core components """
 from boto.exception import JSONResponseError, BotoServerError
 
-from dynamic_dynamodb import calculators
-from dynamic_dynamodb.aws import dynamodb, sns
-from dynamic_dynamodb.core import circuit_breaker
+from dynamic_dynamodb import calculators, journal, lease, metrics, timing
+from dynamic_dynamodb.aws import api_accountant, dynamodb, sns
+from dynamic_dynamodb.core import (
+    alarm_state, billing_advisor, burst_credits, capacity_budget,
+    circuit_breaker, cooldown, gsi_coupling, scaling_policies)
 from dynamic_dynamodb.statistics import table as table_stats
 from dynamic_dynamodb.log_handler import LOGGER as logger
+from dynamic_dynamodb.config import scale_table
 from dynamic_dynamodb.config_handler import get_table_option, get_global_option
 
 
 def ensure_provisioning(
         table_name, key_name,
         num_consec_read_checks,
-        num_consec_write_checks):
+        num_consec_write_checks,
+        policy_state=None,
+        cooldown_state=None):
     """ Ensure that provisioning is correct
 
     :type table_name: str
@@ -24,52 +29,104 @@ def ensure_provisioning(
     :param num_consec_read_checks: How many consecutive checks have we had
     :type num_consec_write_checks: int
     :param num_consec_write_checks: How many consecutive checks have we had
+    :type policy_state: dict
+    :param policy_state: State kept by the scaling policy between checks
+    :type cooldown_state: dict
+    :param cooldown_state: Time of the latest reads and writes changes
     :returns: (int, int) -- num_consec_read_checks, num_consec_write_checks
     """
+    if policy_state is None:
+        policy_state = {}
+    if cooldown_state is None:
+        cooldown_state = {}
+
+    gsi_coupling.clear_pending_increase(table_name)
+    journal.clear()
 
-    if get_global_option('circuit_breaker_url') or get_table_option(
-            key_name, 'circuit_breaker_url'):
+    if (get_global_option('circuit_breaker_url') or
+            get_global_option('circuit_breaker_batch_url') or
+            get_table_option(key_name, 'circuit_breaker_url')):
         if circuit_breaker.is_open(table_name, key_name):
             logger.warning('Circuit breaker is OPEN!')
             return (0, 0)
 
+    billing_mode, last_switch = billing_advisor.get_billing_mode(table_name)
+    if (get_table_option(key_name, 'billing_mode_advisor') and
+            billing_advisor.check(
+                table_name, key_name, billing_mode, last_switch)):
+        return (0, 0)
+
+    if billing_mode == billing_advisor.PAY_PER_REQUEST:
+        logger.info(
+            '{0} - Table is in on-demand (PAY_PER_REQUEST) mode, '
+            'no provisioning to manage',
+            table_name)
+        return (0, 0)
+
     # Handle throughput alarm checks
     __ensure_provisioning_alarm(table_name, key_name)
 
     try:
-        read_update_needed, updated_read_units, num_consec_read_checks = \
-            __ensure_provisioning_reads(
-                table_name,
-                key_name,
-                num_consec_read_checks)
-        write_update_needed, updated_write_units, num_consec_write_checks = \
-            __ensure_provisioning_writes(
-                table_name,
-                key_name,
-                num_consec_write_checks)
-
-        if read_update_needed:
-            num_consec_read_checks = 0
-
-        if write_update_needed:
-            num_consec_write_checks = 0
+        if get_table_option(key_name, 'scaling_policy') != 'threshold':
+            read_update_needed, updated_read_units, num_consec_read_checks = \
+                __ensure_provisioning_policy(
+                    table_name,
+                    key_name,
+                    'reads',
+                    policy_state.setdefault('reads', {}),
+                    num_consec_read_checks)
+            write_update_needed, updated_write_units, \
+                num_consec_write_checks = __ensure_provisioning_policy(
+                    table_name,
+                    key_name,
+                    'writes',
+                    policy_state.setdefault('writes', {}),
+                    num_consec_write_checks)
+        else:
+            read_update_needed, updated_read_units, num_consec_read_checks = \
+                __ensure_provisioning_reads(
+                    table_name,
+                    key_name,
+                    num_consec_read_checks)
+            write_update_needed, updated_write_units, \
+                num_consec_write_checks = __ensure_provisioning_writes(
+                    table_name,
+                    key_name,
+                    num_consec_write_checks)
 
         # Handle throughput updates
         if read_update_needed or write_update_needed:
             logger.info(
                 '{0} - Changing provisioning to {1:d} '
-                'read units and {2:d} write units'.format(
-                    table_name,
-                    int(updated_read_units),
-                    int(updated_write_units)))
-            __update_throughput(
+                'read units and {2:d} write units',
+                table_name, int(updated_read_units), int(updated_write_units),
+                decision='update')
+            outcome = __update_throughput(
                 table_name,
                 key_name,
                 updated_read_units,
-                updated_write_units)
+                updated_write_units,
+                cooldown_state)
+
+            # Keep the check counts of deferred decreases, so that they are
+            # made as soon as the maintenance window opens
+            if outcome != 'outside-maintenance-window':
+                if read_update_needed:
+                    num_consec_read_checks = 0
+
+                if write_update_needed:
+                    num_consec_write_checks = 0
+            journal.write(
+                table_name,
+                None,
+                key_name,
+                updated_read_units,
+                updated_write_units,
+                outcome)
         else:
-            logger.info('{0} - No need to change provisioning'.format(
-                table_name))
+            logger.info(
+                '{0} - No need to change provisioning',
+                table_name, decision='none')
     except JSONResponseError:
         raise
     except BotoServerError:
@@ -78,6 +135,26 @@ def ensure_provisioning(
     return num_consec_read_checks, num_consec_write_checks
 
 
+def emergency_scale_up(
+        table_name, key_name, read_units, write_units, cooldown_state):
+    """ Make an emergency scale-up decided by the throttle watcher
+
+    :type table_name: str
+    :param table_name: Name of the DynamoDB table
+    :type key_name: str
+    :param key_name: Configuration option key name
+    :type read_units: int
+    :param read_units: New read unit provisioning
+    :type write_units: int
+    :param write_units: New write unit provisioning
+    :type cooldown_state: dict
+    :param cooldown_state: Time of the latest reads and writes changes
+    :returns: str -- Outcome, see __update_throughput()
+    """
+    return __update_throughput(
+        table_name, key_name, read_units, write_units, cooldown_state)
+
+
 def __calculate_always_decrease_rw_values(
         table_name, read_units, provisioned_reads,
         write_units, provisioned_writes):
@@ -106,7 +183,8 @@ def __calculate_always_decrease_rw_values(
         logger.info(
             '{0} - Reads could be decreased, but we are waiting for '
             'writes to get lower than the threshold before '
-            'scaling down'.format(table_name))
+            'scaling down',
+            table_name)
 
         read_units = provisioned_reads
 
@@ -114,13 +192,162 @@ def __calculate_always_decrease_rw_values(
         logger.info(
             '{0} - Writes could be decreased, but we are waiting for '
             'reads to get lower than the threshold before '
-            'scaling down'.format(table_name))
+            'scaling down',
+            table_name)
 
         write_units = provisioned_writes
 
     return (read_units, write_units)
 
 
+@timing.timed('scaling-policy')
+def __ensure_provisioning_policy(
+        table_name, key_name, kind, policy_state, num_consec_checks):
+    """ Ensure that provisioning is correct using a scaling policy
+
+    :type table_name: str
+    :param table_name: Name of the DynamoDB table
+    :type key_name: str
+    :param key_name: Configuration option key name
+    :type kind: str
+    :param kind: Either reads or writes
+    :type policy_state: dict
+    :param policy_state: State kept by the scaling policy between checks
+    :type num_consec_checks: int
+    :param num_consec_checks: How many consecutive checks proposed a
+        scale down
+    :returns: (bool, int, int) -- update_needed, updated_units,
+        num_consec_checks
+    """
+    try:
+        lookback_window_start = get_table_option(
+            key_name, 'lookback_window_start')
+        lookback_period = get_table_option(key_name, 'lookback_period')
+        if kind == 'reads':
+            current_units = dynamodb.get_provisioned_table_read_units(
+                table_name)
+        else:
+            current_units = dynamodb.get_provisioned_table_write_units(
+                table_name)
+
+        if not get_table_option(key_name, 'enable_{0}_autoscaling'.format(
+                kind)):
+            logger.info(
+                '{0} - Autoscaling of {1} has been disabled',
+                table_name, kind)
+            return False, current_units, num_consec_checks
+
+        if kind == 'reads':
+            consumed_units_percent = \
+                table_stats.get_consumed_read_units_percent(
+                    table_name,
+                    lookback_window_start,
+                    lookback_period,
+                    get_table_option(key_name, 'consumed_statistic'))
+            throttled_count = table_stats.get_throttled_read_event_count(
+                table_name, lookback_window_start, lookback_period)
+        else:
+            consumed_units_percent = \
+                table_stats.get_consumed_write_units_percent(
+                    table_name,
+                    lookback_window_start,
+                    lookback_period,
+                    get_table_option(key_name, 'consumed_statistic'))
+            throttled_count = table_stats.get_throttled_write_event_count(
+                table_name, lookback_window_start, lookback_period)
+    except JSONResponseError:
+        raise
+    except BotoServerError:
+        raise
+
+    metrics.record_capacity(
+        table_name, None, kind,
+        current_units, consumed_units_percent, throttled_count)
+    journal.observe(
+        kind, current_units, consumed_units_percent, throttled_count)
+    api_accountant.observe(
+        table_name, consumed_units_percent, throttled_count)
+
+    if kind == 'writes':
+        gsi_coupling.observe_table_writes(
+            table_name, current_units * consumed_units_percent / 100)
+
+    options = {}
+    for option in scaling_policies.OPTIONS:
+        options[option] = get_table_option(key_name, option)
+
+    updated_units = scaling_policies.calculate(
+        get_table_option(key_name, 'scaling_policy'),
+        current_units,
+        consumed_units_percent,
+        throttled_count,
+        lookback_period,
+        get_table_option(key_name, '{0}_target_utilization'.format(kind)),
+        options,
+        policy_state,
+        table_name)
+
+    if (updated_units > current_units and
+            not get_table_option(key_name, 'enable_{0}_up_scaling'.format(
+                kind))):
+        logger.debug(
+            '{0} - Up scaling event detected. No action taken as scaling '
+            'up {1} has been disabled in the configuration',
+            table_name, kind)
+        updated_units = current_units
+    elif (updated_units < current_units and
+            not get_table_option(key_name, 'enable_{0}_down_scaling'.format(
+                kind))):
+        logger.debug(
+            '{0} - Down scaling event detected. No action taken as scaling '
+            'down {1} has been disabled in the configuration',
+            table_name, kind)
+        updated_units = current_units
+
+    # Hold back scale downs until enough consecutive checks propose one
+    num_checks_before_scale_down = get_table_option(
+        key_name, 'num_{0}_checks_before_scale_down'.format(kind[:-1]))
+    if updated_units < current_units:
+        num_consec_checks += 1
+        if num_consec_checks < num_checks_before_scale_down:
+            updated_units = current_units
+    else:
+        num_consec_checks = 0
+
+    logger.info(
+        '{0} - Consecutive {1} checks {2}/{3}',
+        table_name, kind[:-1], num_consec_checks,
+        num_checks_before_scale_down)
+
+    # Stay within the configured min and max provisioning
+    max_provisioned_units = get_table_option(
+        key_name, 'max_provisioned_{0}'.format(kind))
+    if max_provisioned_units and updated_units > int(max_provisioned_units):
+        updated_units = int(max_provisioned_units)
+        logger.info(
+            '{0} - Will not increase {1} over max-provisioned-{1} '
+            'limit ({2} {1})',
+            table_name, kind, updated_units)
+
+    min_provisioned_units = get_table_option(
+        key_name, 'min_provisioned_{0}'.format(kind))
+    if min_provisioned_units and updated_units < int(min_provisioned_units):
+        updated_units = int(min_provisioned_units)
+        logger.info(
+            '{0} - Will not decrease {1} below min-provisioned-{1} '
+            'limit ({2} {1})',
+            table_name, kind, updated_units)
+
+    if updated_units != current_units:
+        metrics.record_scaling_decision(
+            table_name, None, kind,
+            'up' if updated_units > current_units else 'down',
+            get_table_option(key_name, 'scaling_policy'))
+
+    return updated_units != current_units, updated_units, num_consec_checks
+
+
+@timing.timed('reads')
 def __ensure_provisioning_reads(table_name, key_name, num_consec_read_checks):
     """ Ensure that provisioning is correct
 
@@ -135,7 +362,8 @@ def __ensure_provisioning_reads(table_name, key_name, num_consec_read_checks):
     """
     if not get_table_option(key_name, 'enable_reads_autoscaling'):
         logger.info(
-            '{0} - Autoscaling of reads has been disabled'.format(table_name))
+            '{0} - Autoscaling of reads has been disabled',
+            table_name)
         return False, dynamodb.get_provisioned_table_read_units(table_name), 0
 
     update_needed = False
@@ -147,7 +375,10 @@ def __ensure_provisioning_reads(table_name, key_name, num_consec_read_checks):
             table_name)
         consumed_read_units_percent = \
             table_stats.get_consumed_read_units_percent(
-                table_name, lookback_window_start, lookback_period)
+                table_name,
+                lookback_window_start,
+                lookback_period,
+                get_table_option(key_name, 'consumed_statistic'))
         throttled_read_count = \
             table_stats.get_throttled_read_event_count(
                 table_name, lookback_window_start, lookback_period)
@@ -203,6 +434,10 @@ def __ensure_provisioning_reads(table_name, key_name, num_consec_read_checks):
             get_table_option(key_name, 'decrease_consumed_reads_with')
         decrease_consumed_reads_scale = \
             get_table_option(key_name, 'decrease_consumed_reads_scale')
+        reads_target_utilization = \
+            get_table_option(key_name, 'reads_target_utilization')
+        target_tracking_damping = \
+            get_table_option(key_name, 'target_tracking_damping')
     except JSONResponseError:
         raise
     except BotoServerError:
@@ -211,6 +446,15 @@ def __ensure_provisioning_reads(table_name, key_name, num_consec_read_checks):
     # Set the updated units to the current read unit value
     updated_read_units = current_read_units
 
+    metrics.record_capacity(
+        table_name, None, 'reads', current_read_units,
+        consumed_read_units_percent, throttled_read_count)
+    journal.observe(
+        'reads', current_read_units,
+        consumed_read_units_percent, throttled_read_count)
+    api_accountant.observe(
+        table_name, consumed_read_units_percent, throttled_read_count)
+
     # Reset consecutive reads if num_read_checks_reset_percent is reached
     if num_read_checks_reset_percent:
 
@@ -219,10 +463,9 @@ def __ensure_provisioning_reads(table_name, key_name, num_consec_read_checks):
             logger.info(
                 '{0} - Resetting the number of consecutive '
                 'read checks. Reason: Consumed percent {1} is '
-                'greater than reset percent: {2}'.format(
-                    table_name,
-                    consumed_read_units_percent,
-                    num_read_checks_reset_percent))
+                'greater than reset percent: {2}',
+                table_name, consumed_read_units_percent,
+                num_read_checks_reset_percent)
 
             num_consec_read_checks = 0
 
@@ -230,8 +473,8 @@ def __ensure_provisioning_reads(table_name, key_name, num_consec_read_checks):
     if not get_table_option(key_name, 'enable_reads_up_scaling'):
         logger.debug(
             '{0} - Up scaling event detected. No action taken as scaling '
-            'up reads has been disabled in the configuration'.format(
-                table_name))
+            'up reads has been disabled in the configuration',
+            table_name)
 
     else:
 
@@ -361,6 +604,21 @@ def __ensure_provisioning_reads(table_name, key_name, num_consec_read_checks):
                         consumed_read_units_percent,
                         table_name)
 
+        # Increase needed to reach the target utilization
+        target_calculated_provisioning = 0
+        if reads_target_utilization:
+            target_calculated_provisioning = \
+                calculators.target_tracking_units(
+                    current_read_units,
+                    consumed_read_units_percent,
+                    throttled_read_count,
+                    lookback_period,
+                    reads_target_utilization,
+                    target_tracking_damping,
+                    min_provisioned_reads,
+                    max_provisioned_reads,
+                    table_name)
+
         # Determine which metric requires the most scaling
         if (throttled_by_provisioned_calculated_provisioning
                 > calculated_provisioning):
@@ -382,12 +640,28 @@ def __ensure_provisioning_reads(table_name, key_name, num_consec_read_checks):
         if throttled_count_calculated_provisioning > calculated_provisioning:
             calculated_provisioning = throttled_count_calculated_provisioning
             scale_reason = "due to throttled events threshold being exceeded"
+        if target_calculated_provisioning > calculated_provisioning:
+            calculated_provisioning = target_calculated_provisioning
+            scale_reason = "due to target utilization being exceeded"
+
+        # Let the burst credits absorb short spikes
+        if (calculated_provisioning > current_read_units and
+                not throttled_read_count and
+                get_table_option(key_name, 'enable_burst_credit_model')):
+            calculated_provisioning = __get_burst_credit_provisioning(
+                table_name,
+                key_name,
+                'reads',
+                current_read_units,
+                calculated_provisioning)
 
         if calculated_provisioning > current_read_units:
             logger.info(
                 '{0} - Resetting the number of consecutive '
-                'read checks. Reason: scale up {1}'.format(
-                    table_name, scale_reason))
+                'read checks. Reason: scale up {1}',
+                table_name, scale_reason, decision='scale-up')
+            metrics.record_scaling_decision(
+                table_name, None, 'reads', 'up', scale_reason)
             num_consec_read_checks = 0
             update_needed = True
             updated_read_units = calculated_provisioning
@@ -411,16 +685,16 @@ def __ensure_provisioning_reads(table_name, key_name, num_consec_read_checks):
         if not get_table_option(key_name, 'enable_reads_down_scaling'):
             logger.debug(
                 '{0} - Down scaling event detected. No action taken as scaling'
-                ' down reads has been disabled in the configuration'.format(
-                    table_name))
+                ' down reads has been disabled in the configuration',
+                table_name)
         # Exit if reads == 0% and downscaling has been disabled at 0%
         elif (consumed_read_units_percent == 0 and not
                 get_table_option(
                     key_name, 'allow_scaling_down_reads_on_0_percent')):
             logger.info(
                 '{0} - Down scaling event detected. No action taken as scaling'
-                ' down reads is not done when usage is at 0%'.format(
-                    table_name))
+                ' down reads is not done when usage is at 0%',
+                table_name)
         else:
             if consumed_calculated_provisioning:
                 if decrease_consumed_reads_unit == 'percent':
@@ -466,6 +740,9 @@ def __ensure_provisioning_reads(table_name, key_name, num_consec_read_checks):
                 if num_consec_read_checks >= num_read_checks_before_scale_down:
                     update_needed = True
                     updated_read_units = calculated_provisioning
+                    metrics.record_scaling_decision(
+                        table_name, None, 'reads', 'down',
+                        'low consumption')
 
     # Never go over the configured max provisioning
     if max_provisioned_reads:
@@ -474,7 +751,8 @@ def __ensure_provisioning_reads(table_name, key_name, num_consec_read_checks):
             updated_read_units = int(max_provisioned_reads)
             logger.info(
                 'Will not increase writes over max-provisioned-reads '
-                'limit ({0} writes)'.format(updated_read_units))
+                'limit ({0} writes)',
+                updated_read_units)
 
     # Ensure that we have met the min-provisioning
     if min_provisioned_reads:
@@ -483,7 +761,8 @@ def __ensure_provisioning_reads(table_name, key_name, num_consec_read_checks):
             updated_read_units = int(min_provisioned_reads)
             logger.info(
                 '{0} - Increasing reads to meet min-provisioned-reads '
-                'limit ({1} reads)'.format(table_name, updated_read_units))
+                'limit ({1} reads)',
+                table_name, updated_read_units)
 
     if calculators.is_consumed_over_proposed(
             current_read_units,
@@ -493,16 +772,17 @@ def __ensure_provisioning_reads(table_name, key_name, num_consec_read_checks):
         updated_read_units = current_read_units
         logger.info(
             '{0} - Consumed is over proposed read units. Will leave table at '
-            'current setting.'.format(table_name))
+            'current setting.',
+            table_name)
 
-    logger.info('{0} - Consecutive read checks {1}/{2}'.format(
-        table_name,
-        num_consec_read_checks,
-        num_read_checks_before_scale_down))
+    logger.info(
+        '{0} - Consecutive read checks {1}/{2}',
+        table_name, num_consec_read_checks, num_read_checks_before_scale_down)
 
     return update_needed, updated_read_units, num_consec_read_checks
 
 
+@timing.timed('writes')
 def __ensure_provisioning_writes(
         table_name, key_name, num_consec_write_checks):
     """ Ensure that provisioning of writes is correct
@@ -518,7 +798,8 @@ def __ensure_provisioning_writes(
     """
     if not get_table_option(key_name, 'enable_writes_autoscaling'):
         logger.info(
-            '{0} - Autoscaling of writes has been disabled'.format(table_name))
+            '{0} - Autoscaling of writes has been disabled',
+            table_name)
         return False, dynamodb.get_provisioned_table_write_units(table_name), 0
 
     update_needed = False
@@ -530,7 +811,10 @@ def __ensure_provisioning_writes(
             table_name)
         consumed_write_units_percent = \
             table_stats.get_consumed_write_units_percent(
-                table_name, lookback_window_start, lookback_period)
+                table_name,
+                lookback_window_start,
+                lookback_period,
+                get_table_option(key_name, 'consumed_statistic'))
         throttled_write_count = \
             table_stats.get_throttled_write_event_count(
                 table_name, lookback_window_start, lookback_period)
@@ -586,6 +870,10 @@ def __ensure_provisioning_writes(
             get_table_option(key_name, 'decrease_consumed_writes_with')
         decrease_consumed_writes_scale = \
             get_table_option(key_name, 'decrease_consumed_writes_scale')
+        writes_target_utilization = \
+            get_table_option(key_name, 'writes_target_utilization')
+        target_tracking_damping = \
+            get_table_option(key_name, 'target_tracking_damping')
     except JSONResponseError:
         raise
     except BotoServerError:
@@ -594,6 +882,18 @@ def __ensure_provisioning_writes(
     # Set the updated units to the current read unit value
     updated_write_units = current_write_units
 
+    metrics.record_capacity(
+        table_name, None, 'writes', current_write_units,
+        consumed_write_units_percent, throttled_write_count)
+    journal.observe(
+        'writes', current_write_units,
+        consumed_write_units_percent, throttled_write_count)
+    api_accountant.observe(
+        table_name, consumed_write_units_percent, throttled_write_count)
+
+    gsi_coupling.observe_table_writes(
+        table_name, current_write_units * consumed_write_units_percent / 100)
+
     # Reset consecutive write count if num_write_checks_reset_percent
     # is reached
     if num_write_checks_reset_percent:
@@ -603,10 +903,9 @@ def __ensure_provisioning_writes(
             logger.info(
                 '{0} - Resetting the number of consecutive '
                 'write checks. Reason: Consumed percent {1} is '
-                'greater than reset percent: {2}'.format(
-                    table_name,
-                    consumed_write_units_percent,
-                    num_write_checks_reset_percent))
+                'greater than reset percent: {2}',
+                table_name, consumed_write_units_percent,
+                num_write_checks_reset_percent)
 
             num_consec_write_checks = 0
 
@@ -614,8 +913,8 @@ def __ensure_provisioning_writes(
     if not get_table_option(key_name, 'enable_writes_up_scaling'):
         logger.debug(
             '{0} - Up scaling event detected. No action taken as scaling '
-            'up writes has been disabled in the configuration'.format(
-                table_name))
+            'up writes has been disabled in the configuration',
+            table_name)
 
     else:
 
@@ -745,6 +1044,21 @@ def __ensure_provisioning_writes(
                         consumed_write_units_percent,
                         table_name)
 
+        # Increase needed to reach the target utilization
+        target_calculated_provisioning = 0
+        if writes_target_utilization:
+            target_calculated_provisioning = \
+                calculators.target_tracking_units(
+                    current_write_units,
+                    consumed_write_units_percent,
+                    throttled_write_count,
+                    lookback_period,
+                    writes_target_utilization,
+                    target_tracking_damping,
+                    min_provisioned_writes,
+                    max_provisioned_writes,
+                    table_name)
+
         # Determine which metric requires the most scaling
         if (throttled_by_provisioned_calculated_provisioning >
                 calculated_provisioning):
@@ -766,12 +1080,28 @@ def __ensure_provisioning_writes(
         if throttled_count_calculated_provisioning > calculated_provisioning:
             calculated_provisioning = throttled_count_calculated_provisioning
             scale_reason = "due to throttled events threshold being exceeded"
+        if target_calculated_provisioning > calculated_provisioning:
+            calculated_provisioning = target_calculated_provisioning
+            scale_reason = "due to target utilization being exceeded"
+
+        # Let the burst credits absorb short spikes
+        if (calculated_provisioning > current_write_units and
+                not throttled_write_count and
+                get_table_option(key_name, 'enable_burst_credit_model')):
+            calculated_provisioning = __get_burst_credit_provisioning(
+                table_name,
+                key_name,
+                'writes',
+                current_write_units,
+                calculated_provisioning)
 
         if calculated_provisioning > current_write_units:
             logger.info(
                 '{0} - Resetting the number of consecutive '
-                'write checks. Reason: scale up {1}'.format(
-                    table_name, scale_reason))
+                'write checks. Reason: scale up {1}',
+                table_name, scale_reason, decision='scale-up')
+            metrics.record_scaling_decision(
+                table_name, None, 'writes', 'up', scale_reason)
             num_consec_write_checks = 0
             update_needed = True
             updated_write_units = calculated_provisioning
@@ -795,22 +1125,23 @@ def __ensure_provisioning_writes(
         if not get_table_option(key_name, 'enable_writes_down_scaling'):
             logger.debug(
                 '{0} - Down scaling event detected. No action taken as scaling'
-                ' down writes has been disabled in the configuration'.format(
-                    table_name))
+                ' down writes has been disabled in the configuration',
+                table_name)
         # Exit if writes == 0% and downscaling has been disabled at 0%
         elif (consumed_write_units_percent == 0 and not
                 get_table_option(
                     key_name, 'allow_scaling_down_writes_on_0_percent')):
             logger.info(
                 '{0} - Down scaling event detected. No action taken as scaling'
-                ' down writes is not done when usage is at 0%'.format(
-                    table_name))
+                ' down writes is not done when usage is at 0%',
+                table_name)
         # Exit if writes are still throttled
         elif (throttled_writes_upper_threshold
               and throttled_write_count > throttled_writes_upper_threshold):
             logger.info(
                 '{0} - Down scaling event detected. No action taken as there'
-                ' are still throttled writes'.format(table_name))
+                ' are still throttled writes',
+                table_name)
         else:
             if consumed_calculated_provisioning:
                 if decrease_consumed_writes_unit == 'percent':
@@ -857,6 +1188,9 @@ def __ensure_provisioning_writes(
                         num_write_checks_before_scale_down:
                     update_needed = True
                     updated_write_units = calculated_provisioning
+                    metrics.record_scaling_decision(
+                        table_name, None, 'writes', 'down',
+                        'low consumption')
 
     # Never go over the configured max provisioning
     if max_provisioned_writes:
@@ -865,7 +1199,8 @@ def __ensure_provisioning_writes(
             updated_write_units = int(max_provisioned_writes)
             logger.info(
                 'Will not increase writes over max-provisioned-writes '
-                'limit ({0} writes)'.format(updated_write_units))
+                'limit ({0} writes)',
+                updated_write_units)
 
     # Ensure that we have met the min-provisioning
     if min_provisioned_writes:
@@ -874,7 +1209,8 @@ def __ensure_provisioning_writes(
             updated_write_units = int(min_provisioned_writes)
             logger.info(
                 '{0} - Increasing writes to meet min-provisioned-writes '
-                'limit ({1} writes)'.format(table_name, updated_write_units))
+                'limit ({1} writes)',
+                table_name, updated_write_units)
 
     if calculators.is_consumed_over_proposed(
             current_write_units,
@@ -884,17 +1220,58 @@ def __ensure_provisioning_writes(
         updated_write_units = current_write_units
         logger.info(
             '{0} - Consumed is over proposed write units. Will leave table at '
-            'current setting.'.format(table_name))
+            'current setting.',
+            table_name)
 
-    logger.info('{0} - Consecutive write checks {1}/{2}'.format(
-        table_name,
-        num_consec_write_checks,
-        num_write_checks_before_scale_down))
+    logger.info(
+        '{0} - Consecutive write checks {1}/{2}',
+        table_name, num_consec_write_checks,
+        num_write_checks_before_scale_down)
 
     return update_needed, updated_write_units, num_consec_write_checks
 
 
-def __update_throughput(table_name, key_name, read_units, write_units):
+def __get_burst_credit_provisioning(
+        table_name, key_name, kind, current_units, calculated_provisioning):
+    """ Adjust a scale-up using the burst credit model
+
+    :type table_name: str
+    :param table_name: Name of the DynamoDB table
+    :type key_name: str
+    :param key_name: Configuration option key name
+    :type kind: str
+    :param kind: Either reads or writes
+    :type current_units: int
+    :param current_units: Currently provisioned units
+    :type calculated_provisioning: int
+    :param calculated_provisioning: Proposed provisioning
+    :returns: int -- Provisioning to use
+    """
+    if kind == 'reads':
+        consumed_history = table_stats.get_consumed_read_units_history(
+            table_name,
+            get_table_option(key_name, 'lookback_window_start'),
+            get_table_option(key_name, 'lookback_period'),
+            burst_credits.HISTORY_MINUTES)
+    else:
+        consumed_history = table_stats.get_consumed_write_units_history(
+            table_name,
+            get_table_option(key_name, 'lookback_window_start'),
+            get_table_option(key_name, 'lookback_period'),
+            burst_credits.HISTORY_MINUTES)
+
+    return burst_credits.get_provisioning(
+        current_units,
+        calculated_provisioning,
+        consumed_history,
+        get_table_option(key_name, '{0}_upper_threshold'.format(kind)),
+        get_global_option('check_interval'),
+        table_name)
+
+
+@timing.timed('update')
+def __update_throughput(
+        table_name, key_name, read_units, write_units, cooldown_state):
     """ Update throughput on the DynamoDB table
 
     :type table_name: str
@@ -905,7 +1282,18 @@ def __update_throughput(table_name, key_name, read_units, write_units):
     :param read_units: New read unit provisioning
     :type write_units: int
     :param write_units: New write unit provisioning
+    :type cooldown_state: dict
+    :param cooldown_state: Time of the latest reads and writes changes
+    :returns: str -- Outcome, see dynamodb.update_table_provisioning() for
+        the outcomes of the update
     """
+    # Leave the changes to the instance holding the lease
+    if not lease.is_leader():
+        logger.info(
+            '{0} - Standing by, not changing the provisioning',
+            table_name)
+        return 'standby'
+
     try:
         current_ru = dynamodb.get_provisioned_table_read_units(table_name)
         current_wu = dynamodb.get_provisioned_table_write_units(table_name)
@@ -917,12 +1305,15 @@ def __update_throughput(table_name, key_name, read_units, write_units):
         table_status = dynamodb.get_table_status(table_name)
     except JSONResponseError:
         raise
-    logger.debug('{0} - Table status is {1}'.format(table_name, table_status))
+    logger.debug(
+        '{0} - Table status is {1}',
+        table_name, table_status)
     if table_status != 'ACTIVE':
         logger.warning(
             '{0} - Not performing throughput changes when table '
-            'is {1}'.format(table_name, table_status))
-        return
+            'is {1}',
+            table_name, table_status)
+        return 'not-active'
 
     # If this setting is True, we will only scale down when
     # BOTH reads AND writes are low
@@ -935,16 +1326,94 @@ def __update_throughput(table_name, key_name, read_units, write_units):
             current_wu)
 
         if read_units == current_ru and write_units == current_wu:
-            logger.info('{0} - No changes to perform'.format(table_name))
-            return
+            logger.info(
+                '{0} - No changes to perform',
+                table_name)
+            return 'held-rw-together'
+
+    # Defer decreases until the next maintenance window opens
+    next_window_start = dynamodb.get_table_next_window_start(
+        table_name, key_name)
+    if next_window_start:
+        read_units = max(read_units, current_ru)
+        write_units = max(write_units, current_wu)
+
+        if read_units == current_ru and write_units == current_wu:
+            logger.info(
+                '{0} - Decreases are deferred to the next maintenance '
+                'window, starting {1} UTC',
+                table_name, next_window_start.strftime('%Y-%m-%d %H:%M'))
+            return 'outside-maintenance-window'
+
+    # Hold back changes within their cooldown
+    read_units = cooldown.gate(
+        'reads',
+        current_ru,
+        read_units,
+        cooldown_state,
+        get_table_option(key_name, 'increase_cooldown'),
+        get_table_option(key_name, 'decrease_cooldown'),
+        table_name)
+    write_units = cooldown.gate(
+        'writes',
+        current_wu,
+        write_units,
+        cooldown_state,
+        get_table_option(key_name, 'increase_cooldown'),
+        get_table_option(key_name, 'decrease_cooldown'),
+        table_name)
+
+    if read_units == current_ru and write_units == current_wu:
+        logger.info(
+            '{0} - No changes to perform',
+            table_name)
+        return 'cooldown'
 
-    dynamodb.update_table_provisioning(
+    # Leave increases to the capacity budget allocation
+    if capacity_budget.is_enabled() and (
+            read_units > current_ru or write_units > current_wu):
+        lookback_window_start = get_table_option(
+            key_name, 'lookback_window_start')
+        lookback_period = get_table_option(key_name, 'lookback_period')
+        throttled = (
+            table_stats.get_throttled_read_event_count(
+                table_name, lookback_window_start, lookback_period) or
+            table_stats.get_throttled_write_event_count(
+                table_name, lookback_window_start, lookback_period))
+
+        logger.info(
+            '{0} - Queueing the provisioning change for the '
+            'capacity budget allocation',
+            table_name)
+        capacity_budget.request(
+            table_name,
+            key_name,
+            None,
+            None,
+            current_ru,
+            current_wu,
+            read_units,
+            write_units,
+            throttled,
+            get_table_option(key_name, 'capacity_priority'),
+            cooldown_state)
+        return 'budget-queued'
+
+    outcome = dynamodb.update_table_provisioning(
         table_name,
         key_name,
         int(read_units),
-        int(write_units))
+        int(write_units),
+        cooldown_state=cooldown_state)
+
+    # Let the GSIs follow the table write increase
+    if outcome == 'updated' and write_units > current_wu:
+        gsi_coupling.table_writes_increased(table_name, int(write_units))
 
+    return outcome
 
+
+@timing.timed('alarms')
 def __ensure_provisioning_alarm(table_name, key_name):
     """ Ensure that provisioning alarm threshold is not exceeded
 
@@ -1017,26 +1486,65 @@ def __ensure_provisioning_alarm(table_name, key_name):
                 consumed_write_units_percent,
                 writes_lower_alarm_threshold))
 
-    # Send alert if needed
-    if upper_alert_triggered:
+    # Send alert if the alarm state has changed. The upper alarm takes
+    # precedence over the lower alarm
+    reminder_interval = get_table_option(key_name, 'alarm_reminder_interval')
+    upper_alert = alarm_state.evaluate(
+        table_name, None, 'high-throughput-alarm',
+        upper_alert_triggered, reminder_interval)
+    lower_alert = alarm_state.evaluate(
+        table_name, None, 'low-throughput-alarm',
+        lower_alert_triggered and not upper_alert_triggered,
+        reminder_interval)
+
+    if upper_alert == alarm_state.ALARM:
         logger.info(
-            '{0} - Will send high provisioning alert'.format(table_name))
+            '{0} - Will send high provisioning alert',
+            table_name)
         sns.publish_table_notification(
             key_name,
             ''.join(upper_alert_message),
             ['high-throughput-alarm'],
             subject='ALARM: High Throughput for Table {0}'.format(table_name))
-    elif lower_alert_triggered:
+    elif upper_alert == alarm_state.OK:
+        logger.info(
+            '{0} - Will send high provisioning recovery',
+            table_name)
+        sns.publish_table_notification(
+            key_name,
+            '{0} - Consumed capacity is no longer above the upper '
+            'alarm thresholds\n'.format(table_name),
+            ['high-throughput-alarm'],
+            subject='OK: High Throughput for Table {0}'.format(table_name))
+
+    if lower_alert == alarm_state.ALARM:
         logger.info(
-            '{0} - Will send low provisioning alert'.format(table_name))
+            '{0} - Will send low provisioning alert',
+            table_name)
         sns.publish_table_notification(
             key_name,
             ''.join(lower_alert_message),
             ['low-throughput-alarm'],
             subject='ALARM: Low Throughput for Table {0}'.format(table_name))
-    else:
-        logger.debug('{0} - Throughput alarm thresholds not crossed'.format(
-            table_name))
+    elif lower_alert == alarm_state.OK:
+        logger.info(
+            '{0} - Will send low provisioning recovery',
+            table_name)
+        sns.publish_table_notification(
+            key_name,
+            '{0} - Consumed capacity is no longer below the lower '
+            'alarm thresholds\n'.format(table_name),
+            ['low-throughput-alarm'],
+            subject='OK: Low Throughput for Table {0}'.format(table_name))
+
+    if not upper_alert_triggered and not lower_alert_triggered:
+        logger.debug(
+            '{0} - Throughput alarm thresholds not crossed',
+            table_name)
+    elif not upper_alert and not lower_alert:
+        logger.debug(
+            '{0} - Throughput alarm state unchanged',
+            table_name)
 
 
 def scale_reader(provision_increase_scale, current_value):
@@ -1049,17 +1557,7 @@ def scale_reader(provision_increase_scale, current_value):
     :param current_value: the current consumed units or throttled events
     :returns: (int) The amount to scale provisioning by
     """
-
-    scale_value = 0
-    if provision_increase_scale:
-        for limits in sorted(provision_increase_scale.keys()):
-            if current_value < limits:
-                return scale_value
-            else:
-                scale_value = provision_increase_scale.get(limits)
-        return scale_value
-    else:
-        return scale_value
+    return scale_table.lookup_increase(provision_increase_scale, current_value)
 
 
 def scale_reader_decrease(provision_decrease_scale, current_value):
@@ -1072,13 +1570,4 @@ def scale_reader_decrease(provision_decrease_scale, current_value):
     :param current_value: the current consumed units or throttled events
     :returns: (int) The amount to scale provisioning by
     """
-    scale_value = 0
-    if provision_decrease_scale:
-        for limits in sorted(provision_decrease_scale.keys(), reverse=True):
-            if current_value > limits:
-                return scale_value
-            else:
-                scale_value = provision_decrease_scale.get(limits)
-        return scale_value
-    else:
-        return scale_value
+    return scale_table.lookup_decrease(provision_decrease_scale, current_value)
@@ -0,0 +1,472 @@
+# -*- coding: utf-8 -*-
+""" Emergency scale-ups for throttled tables and GSIs
+
+The throttle watcher runs in a background thread next to the regular check
+loop. It only looks at the throttle metrics of the tables and GSIs that the
+check loop has seen, but it does so every throttle-watcher-interval seconds.
+That way a heavily throttled table does not have to wait for the rest of the
+tables and the check-interval sleep before it is scaled up.
+
+The watcher only detects the throttling. The scale-ups are queued as events
+for the main loop, which makes them with scale_up() between the table checks
+or while waiting for the next check. They go through the same cooldowns,
+capacity budget and GSI coupling as the changes of the regular checks, and
+are journaled with a throttle-watcher- prefix on their outcome.
+"""
+import threading
+import time
+
+from boto.exception import JSONResponseError, BotoServerError
+
+from dynamic_dynamodb import calculators, event_listener, journal, lease
+from dynamic_dynamodb.aws import dynamodb
+from dynamic_dynamodb.core import billing_advisor, gsi, table
+from dynamic_dynamodb.statistics import gsi as gsi_stats
+from dynamic_dynamodb.statistics import table as table_stats
+from dynamic_dynamodb.log_handler import LOGGER as logger
+from dynamic_dynamodb.config_handler import (
+    get_global_option, get_gsi_option, get_table_option)
+
+# Only look at the latest complete minute of CloudWatch data
+LOOKBACK_WINDOW_START = 2
+LOOKBACK_PERIOD = 1
+
+# Tables and GSIs to watch. This is populated by the check loop.
+# Key: (table_name, gsi_name), value: (table_key, gsi_key)
+WATCHED = {}
+
+# Time of the latest emergency scale-up. Key: (table_name, gsi_name)
+LAST_SCALE_UP = {}
+
+WATCHED_LOCK = threading.Lock()
+
+
+def watch_table(table_name, table_key):
+    """ Add a table to the set of watched tables
+
+    :type table_name: str
+    :param table_name: Name of the DynamoDB table
+    :type table_key: str
+    :param table_key: Table configuration option key name
+    """
+    with WATCHED_LOCK:
+        WATCHED[(table_name, None)] = (table_key, None)
+
+
+def watch_gsi(table_name, table_key, gsi_name, gsi_key):
+    """ Add a GSI to the set of watched GSIs
+
+    :type table_name: str
+    :param table_name: Name of the DynamoDB table
+    :type table_key: str
+    :param table_key: Table configuration option key name
+    :type gsi_name: str
+    :param gsi_name: Name of the GSI
+    :type gsi_key: str
+    :param gsi_key: GSI configuration option key name
+    """
+    with WATCHED_LOCK:
+        WATCHED[(table_name, gsi_name)] = (table_key, gsi_key)
+
+
+def start():
+    """ Start the throttle watcher thread if it is enabled
+
+    :returns: threading.Thread or None
+    """
+    if not get_global_option('enable_throttle_watcher'):
+        return None
+
+    logger.info(
+        'Starting throttle watcher, checking throttling '
+        'every {0} seconds'.format(
+            get_global_option('throttle_watcher_interval')))
+
+    thread = threading.Thread(target=__run, name='throttle-watcher')
+    thread.daemon = True
+    thread.start()
+
+    return thread
+
+
+def check():
+    """ Check the throttle metrics for all watched tables and GSIs once """
+    # Standbys leave the emergency scale-ups to the leader
+    if not lease.is_leader():
+        return
+
+    with WATCHED_LOCK:
+        watched = sorted(WATCHED.items())
+
+    for (table_name, gsi_name), (table_key, gsi_key) in watched:
+        try:
+            if gsi_name:
+                __check_gsi(table_name, table_key, gsi_name, gsi_key)
+            else:
+                __check_table(table_name, table_key)
+        except JSONResponseError as error:
+            logger.error('{0} - Throttle watcher: {1}'.format(
+                table_name, error))
+        except BotoServerError as error:
+            logger.error(
+                '{0} - Throttle watcher: Unknown boto error. '
+                'Status: "{1}". Reason: "{2}". Message: {3}'.format(
+                    table_name,
+                    error.status,
+                    error.reason,
+                    error.message))
+
+
+def scale_up(
+        table_name, table_key, gsi_name, gsi_key, throttled, cooldown_state):
+    """ Make an emergency scale-up queued by the watcher
+
+    :type table_name: str
+    :param table_name: Name of the DynamoDB table
+    :type table_key: str
+    :param table_key: Table configuration option key name
+    :type gsi_name: str
+    :param gsi_name: Name of the GSI, None for tables
+    :type gsi_key: str
+    :param gsi_key: GSI configuration option key name, None for tables
+    :type throttled: tuple
+    :param throttled: The throttled kinds, 'reads' and/or 'writes'
+    :type cooldown_state: dict
+    :param cooldown_state: Time of the latest reads and writes changes
+    :returns: str -- Outcome of the provisioning update
+    """
+    if gsi_name:
+        return __scale_up_gsi(
+            table_name, table_key, gsi_name, gsi_key, throttled,
+            cooldown_state)
+
+    return __scale_up_table(table_name, table_key, throttled, cooldown_state)
+
+
+def __run():
+    """ Run the throttle checks forever """
+    while True:
+        try:
+            check()
+        except Exception as error:
+            logger.exception(error)
+
+        time.sleep(get_global_option('throttle_watcher_interval'))
+
+
+def __check_table(table_name, table_key):
+    """ Queue a scale-up for a table if it is being throttled
+
+    :type table_name: str
+    :param table_name: Name of the DynamoDB table
+    :type table_key: str
+    :param table_key: Table configuration option key name
+    """
+    throttled_reads_upper_threshold = get_table_option(
+        table_key, 'throttled_reads_upper_threshold')
+    throttled_writes_upper_threshold = get_table_option(
+        table_key, 'throttled_writes_upper_threshold')
+
+    if not throttled_reads_upper_threshold and \
+            not throttled_writes_upper_threshold:
+        return
+
+    if __in_cooldown(table_name, None):
+        return
+
+    if billing_advisor.is_on_demand(table_name):
+        return
+
+    reads_throttled = False
+    if (throttled_reads_upper_threshold and
+            get_table_option(table_key, 'enable_reads_up_scaling')):
+        reads_throttled = table_stats.get_throttled_read_event_count(
+            table_name,
+            LOOKBACK_WINDOW_START,
+            LOOKBACK_PERIOD) > throttled_reads_upper_threshold
+
+    writes_throttled = False
+    if (throttled_writes_upper_threshold and
+            get_table_option(table_key, 'enable_writes_up_scaling')):
+        writes_throttled = table_stats.get_throttled_write_event_count(
+            table_name,
+            LOOKBACK_WINDOW_START,
+            LOOKBACK_PERIOD) > throttled_writes_upper_threshold
+
+    __queue_scale_up(table_name, None, reads_throttled, writes_throttled)
+
+
+def __check_gsi(table_name, table_key, gsi_name, gsi_key):
+    """ Queue a scale-up for a GSI if it is being throttled
+
+    :type table_name: str
+    :param table_name: Name of the DynamoDB table
+    :type table_key: str
+    :param table_key: Table configuration option key name
+    :type gsi_name: str
+    :param gsi_name: Name of the GSI
+    :type gsi_key: str
+    :param gsi_key: GSI configuration option key name
+    """
+    throttled_reads_upper_threshold = get_gsi_option(
+        table_key, gsi_key, 'throttled_reads_upper_threshold')
+    throttled_writes_upper_threshold = get_gsi_option(
+        table_key, gsi_key, 'throttled_writes_upper_threshold')
+
+    if not throttled_reads_upper_threshold and \
+            not throttled_writes_upper_threshold:
+        return
+
+    if __in_cooldown(table_name, gsi_name):
+        return
+
+    if billing_advisor.is_on_demand(table_name):
+        return
+
+    reads_throttled = False
+    if (throttled_reads_upper_threshold and
+            get_gsi_option(table_key, gsi_key, 'enable_reads_up_scaling')):
+        reads_throttled = gsi_stats.get_throttled_read_event_count(
+            table_name,
+            gsi_name,
+            LOOKBACK_WINDOW_START,
+            LOOKBACK_PERIOD) > throttled_reads_upper_threshold
+
+    writes_throttled = False
+    if (throttled_writes_upper_threshold and
+            get_gsi_option(table_key, gsi_key, 'enable_writes_up_scaling')):
+        writes_throttled = gsi_stats.get_throttled_write_event_count(
+            table_name,
+            gsi_name,
+            LOOKBACK_WINDOW_START,
+            LOOKBACK_PERIOD) > throttled_writes_upper_threshold
+
+    __queue_scale_up(
+        table_name, gsi_name, reads_throttled, writes_throttled)
+
+
+def __queue_scale_up(table_name, gsi_name, reads_throttled, writes_throttled):
+    """ Queue an emergency scale-up for the main loop
+
+    :type table_name: str
+    :param table_name: Name of the DynamoDB table
+    :type gsi_name: str
+    :param gsi_name: Name of the GSI, None for tables
+    :type reads_throttled: bool
+    :param reads_throttled: True if the reads are throttled
+    :type writes_throttled: bool
+    :param writes_throttled: True if the writes are throttled
+    """
+    if not reads_throttled and not writes_throttled:
+        return
+
+    throttled = tuple(
+        kind for kind, is_throttled in [
+            ('reads', reads_throttled), ('writes', writes_throttled)]
+        if is_throttled)
+
+    if not event_listener.put_event((table_name, gsi_name, throttled)):
+        logger.warning(
+            '{0} - Throttle watcher: Event queue is full, '
+            'dropping the emergency scale-up',
+            ':'.join([name for name in (table_name, gsi_name) if name]))
+        return
+
+    logger.info(
+        '{0} - Throttle watcher: Throttled {1}, queueing an emergency '
+        'scale-up',
+        ':'.join([name for name in (table_name, gsi_name) if name]),
+        ' and '.join(throttled))
+    LAST_SCALE_UP[(table_name, gsi_name)] = time.time()
+
+
+def __scale_up_table(table_name, table_key, throttled, cooldown_state):
+    """ Scale up a throttled table
+
+    :type table_name: str
+    :param table_name: Name of the DynamoDB table
+    :type table_key: str
+    :param table_key: Table configuration option key name
+    :type throttled: tuple
+    :param throttled: The throttled kinds, 'reads' and/or 'writes'
+    :type cooldown_state: dict
+    :param cooldown_state: Time of the latest reads and writes changes
+    :returns: str -- Outcome of the provisioning update
+    """
+    current_reads = reads = dynamodb.get_provisioned_table_read_units(
+        table_name)
+    current_writes = writes = dynamodb.get_provisioned_table_write_units(
+        table_name)
+
+    if 'reads' in throttled:
+        reads = __increase_units(
+            reads,
+            get_table_option(table_key, 'increase_reads_with'),
+            get_table_option(table_key, 'increase_reads_unit'),
+            get_table_option(table_key, 'max_provisioned_reads'),
+            calculators.increase_reads_in_percent,
+            calculators.increase_reads_in_units,
+            table_name)
+
+    if 'writes' in throttled:
+        writes = __increase_units(
+            writes,
+            get_table_option(table_key, 'increase_writes_with'),
+            get_table_option(table_key, 'increase_writes_unit'),
+            get_table_option(table_key, 'max_provisioned_writes'),
+            calculators.increase_writes_in_percent,
+            calculators.increase_writes_in_units,
+            table_name)
+
+    logger.warning(
+        '{0} - Throttle watcher: Emergency scale-up to {1:d} read units '
+        'and {2:d} write units',
+        table_name, int(reads), int(writes))
+
+    outcome = table.emergency_scale_up(
+        table_name, table_key, reads, writes, cooldown_state)
+    __write_journal(
+        table_name, None, table_key, current_reads, current_writes,
+        reads, writes, outcome)
+
+    return outcome
+
+
+def __scale_up_gsi(
+        table_name, table_key, gsi_name, gsi_key, throttled, cooldown_state):
+    """ Scale up a throttled GSI
+
+    :type table_name: str
+    :param table_name: Name of the DynamoDB table
+    :type table_key: str
+    :param table_key: Table configuration option key name
+    :type gsi_name: str
+    :param gsi_name: Name of the GSI
+    :type gsi_key: str
+    :param gsi_key: GSI configuration option key name
+    :type throttled: tuple
+    :param throttled: The throttled kinds, 'reads' and/or 'writes'
+    :type cooldown_state: dict
+    :param cooldown_state: Time of the latest reads and writes changes
+    :returns: str -- Outcome of the provisioning update
+    """
+    current_reads = reads = dynamodb.get_provisioned_gsi_read_units(
+        table_name, gsi_name)
+    current_writes = writes = dynamodb.get_provisioned_gsi_write_units(
+        table_name, gsi_name)
+    log_tag = '{0} - GSI: {1}'.format(table_name, gsi_name)
+
+    if 'reads' in throttled:
+        reads = __increase_units(
+            reads,
+            get_gsi_option(table_key, gsi_key, 'increase_reads_with'),
+            get_gsi_option(table_key, gsi_key, 'increase_reads_unit'),
+            get_gsi_option(table_key, gsi_key, 'max_provisioned_reads'),
+            calculators.increase_reads_in_percent,
+            calculators.increase_reads_in_units,
+            log_tag)
+
+    if 'writes' in throttled:
+        writes = __increase_units(
+            writes,
+            get_gsi_option(table_key, gsi_key, 'increase_writes_with'),
+            get_gsi_option(table_key, gsi_key, 'increase_writes_unit'),
+            get_gsi_option(table_key, gsi_key, 'max_provisioned_writes'),
+            calculators.increase_writes_in_percent,
+            calculators.increase_writes_in_units,
+            log_tag)
+
+    logger.warning(
+        '{0} - Throttle watcher: Emergency scale-up to {1:d} read units '
+        'and {2:d} write units',
+        log_tag, int(reads), int(writes))
+
+    outcome = gsi.emergency_scale_up(
+        table_name, table_key, gsi_name, gsi_key, reads, writes,
+        cooldown_state)
+    __write_journal(
+        table_name, gsi_name, gsi_key, current_reads, current_writes,
+        reads, writes, outcome)
+
+    return outcome
+
+
+def __write_journal(
+        table_name, gsi_name, key_name, current_reads, current_writes,
+        reads, writes, outcome):
+    """ Journal an emergency scale-up
+
+    :type table_name: str
+    :param table_name: Name of the DynamoDB table
+    :type gsi_name: str
+    :param gsi_name: Name of the GSI, None for tables
+    :type key_name: str
+    :param key_name: Configuration option key name
+    :type current_reads: int
+    :param current_reads: Provisioned read units before the scale-up
+    :type current_writes: int
+    :param current_writes: Provisioned write units before the scale-up
+    :type reads: int
+    :param reads: Decided read unit provisioning
+    :type writes: int
+    :param writes: Decided write unit provisioning
+    :type outcome: str
+    :param outcome: Outcome of the provisioning update
+    """
+    journal.clear()
+    journal.observe('reads', current_reads, None, None)
+    journal.observe('writes', current_writes, None, None)
+    journal.write(
+        table_name,
+        gsi_name,
+        key_name,
+        reads,
+        writes,
+        'throttle-watcher-{0}'.format(outcome))
+
+
+def __in_cooldown(table_name, gsi_name):
+    """ Check if an emergency scale-up was made recently
+
+    :type table_name: str
+    :param table_name: Name of the DynamoDB table
+    :type gsi_name: str
+    :param gsi_name: Name of the GSI, None for tables
+    :returns: bool -- True if we should not scale up again yet
+    """
+    try:
+        last_scale_up = LAST_SCALE_UP[(table_name, gsi_name)]
+    except KeyError:
+        return False
+
+    return (time.time() - last_scale_up <
+            get_global_option('throttle_watcher_cooldown'))
+
+
+def __increase_units(
+        current_provisioning, increase_with, increase_unit,
+        max_provisioned, increase_in_percent, increase_in_units, log_tag):
+    """ Calculate the emergency provisioning
+
+    :type current_provisioning: int
+    :param current_provisioning: The current provisioning
+    :type increase_with: int
+    :param increase_with: How many percent or units to increase with
+    :type increase_unit: str
+    :param increase_unit: Either percent or units
+    :type max_provisioned: int
+    :param max_provisioned: Configured max provisioning
+    :type increase_in_percent: function
+    :param increase_in_percent: Calculator for percent based increases
+    :type increase_in_units: function
+    :param increase_in_units: Calculator for unit based increases
+    :type log_tag: str
+    :param log_tag: Prefix for the log
+    :returns: int -- New provisioning value
+    """
+    if increase_unit == 'percent':
+        return increase_in_percent(
+            current_provisioning, increase_with, max_provisioned, 0, log_tag)
+
+    return increase_in_units(
+        current_provisioning, increase_with, max_provisioned, 0, log_tag)
@@ -129,6 +129,28 @@ class Daemon:
                 print str(err)
                 sys.exit(1)
 
+    def send_signal(self, signum):
+        """ Send a signal to the running daemon """
+        # Get the pid from the pidfile
+        try:
+            pf = file(self.pidfile, 'r')
+            pid = int(pf.read().strip())
+            pf.close()
+        except IOError:
+            pid = None
+
+        if not pid:
+            sys.stderr.write(
+                "pidfile {0} does not exist. Daemon not running?\n".format(
+                    self.pidfile))
+            sys.exit(1)
+
+        try:
+            os.kill(pid, signum)
+        except OSError as err:
+            sys.stderr.write("{0}\n".format(err))
+            sys.exit(1)
+
     def restart(self, *args, **kwargs):
         """ Restart the daemon """
         self.stop()
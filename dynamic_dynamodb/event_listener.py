@@ -0,0 +1,200 @@
+# -*- coding: utf-8 -*-
+""" Listener for CloudWatch alarm notifications
+
+When event-listener-port is set, Dynamic DynamoDB accepts CloudWatch alarm
+notifications over HTTP, for example from an SNS HTTP subscription. The
+table or GSI named in the alarm dimensions is queued and handled by the main
+loop right away, instead of waiting for the next check.
+
+Accepted request bodies are SNS notifications wrapping a CloudWatch alarm,
+bare CloudWatch alarm messages and simple messages on the form
+{"table": "my_table", "gsi": "my_gsi"}.
+
+The throttle watcher queues its emergency scale-ups on the same queue.
+"""
+import json
+import threading
+import time
+import BaseHTTPServer
+import Queue
+
+from dynamic_dynamodb import metrics
+from dynamic_dynamodb.log_handler import LOGGER as logger
+from dynamic_dynamodb.config_handler import get_global_option
+
+EVENT_QUEUE = Queue.Queue(maxsize=1000)
+metrics.register_gauge('queue_depth', EVENT_QUEUE.qsize, queue='events')
+
+
+class AlarmRequestHandler(BaseHTTPServer.BaseHTTPRequestHandler):
+    """ Handle incoming alarm notifications """
+    def do_POST(self):
+        """ Queue the table or GSI named in the notification """
+        try:
+            length = int(self.headers.getheader('content-length') or 0)
+            event = parse_notification(self.rfile.read(length))
+        except (ValueError, KeyError, TypeError, AttributeError) as error:
+            logger.warning('Event listener: Invalid notification: {0}'.format(
+                error))
+            self.__respond(400)
+            return
+
+        if not event:
+            self.__respond(204)
+            return
+
+        if not put_event(event):
+            logger.warning(
+                'Event listener: Queue is full, dropping event for {0}'.format(
+                    ':'.join([name for name in event if name])))
+            self.__respond(503)
+            return
+
+        self.__respond(202)
+
+    def log_message(self, format, *args):
+        """ Send the request log to our logger instead of stderr """
+        logger.debug('Event listener: {0} - {1}'.format(
+            self.client_address[0], format % args))
+
+    def __respond(self, status_code):
+        """ Send an empty response
+
+        :type status_code: int
+        :param status_code: HTTP status code
+        """
+        self.send_response(status_code)
+        self.send_header('Content-Length', '0')
+        self.end_headers()
+
+
+def put_event(event):
+    """ Queue an event for the main loop
+
+    :type event: tuple
+    :param event: (table_name, gsi_name) or, for emergency scale-ups,
+        (table_name, gsi_name, throttled)
+    :returns: bool -- False if the queue is full
+    """
+    try:
+        EVENT_QUEUE.put_nowait(event)
+    except Queue.Full:
+        return False
+
+    return True
+
+
+def get_event(timeout):
+    """ Wait for the next event
+
+    If neither the event listener nor the throttle watcher is enabled this
+    is a plain sleep.
+
+    :type timeout: float
+    :param timeout: Maximum number of seconds to wait
+    :returns: tuple or None -- (table_name, gsi_name) or (table_name,
+        gsi_name, throttled), gsi_name may be None
+    """
+    if not (get_global_option('event_listener_port') or
+            get_global_option('enable_throttle_watcher')):
+        time.sleep(timeout)
+        return None
+
+    try:
+        return EVENT_QUEUE.get(timeout=timeout)
+    except Queue.Empty:
+        return None
+
+
+def parse_notification(body):
+    """ Extract the table and GSI name from a notification
+
+    :type body: str
+    :param body: Request body
+    :returns: tuple or None -- (table_name, gsi_name), gsi_name may be None.
+        None is returned if the notification does not require any action
+    """
+    message = json.loads(body)
+    if not isinstance(message, dict):
+        raise ValueError('Expected a JSON object')
+
+    # SNS HTTP(S) subscriptions must be confirmed by the operator
+    if message.get('Type') == 'SubscriptionConfirmation':
+        logger.warning(
+            'Event listener: Received SNS subscription confirmation. '
+            'Confirm the subscription by visiting {0}'.format(
+                message.get('SubscribeURL')))
+        return None
+
+    # Unwrap SNS notifications
+    if message.get('Type') == 'Notification':
+        if not isinstance(message.get('Message'), basestring):
+            raise ValueError('No Message found in the SNS notification')
+        message = json.loads(message['Message'])
+        if not isinstance(message, dict):
+            raise ValueError('Expected a JSON object in the SNS message')
+
+    # Simple notification format
+    if 'table' in message:
+        return __check_names(message['table'], message.get('gsi'))
+
+    # CloudWatch alarms, only act on alarms entering the ALARM state
+    if message.get('NewStateValue', 'ALARM') != 'ALARM':
+        return None
+
+    trigger = message.get('Trigger') or {}
+    if not isinstance(trigger, dict):
+        raise ValueError('Expected a JSON object in the alarm Trigger')
+
+    dimensions = {}
+    for dimension in trigger.get('Dimensions') or []:
+        if not isinstance(dimension, dict):
+            raise ValueError('Expected JSON objects in the alarm Dimensions')
+        dimensions[dimension.get('name')] = dimension.get('value')
+
+    if 'TableName' not in dimensions:
+        raise ValueError('No TableName dimension found in the alarm')
+
+    return __check_names(
+        dimensions['TableName'],
+        dimensions.get('GlobalSecondaryIndexName'))
+
+
+def __check_names(table_name, gsi_name):
+    """ Make sure that the table and GSI names are strings
+
+    :type table_name: str
+    :param table_name: Name of the DynamoDB table
+    :type gsi_name: str
+    :param gsi_name: Name of the GSI, may be None
+    :returns: tuple -- (table_name, gsi_name)
+    """
+    if not table_name or not isinstance(table_name, basestring):
+        raise ValueError('Expected the table name to be a string')
+
+    if gsi_name is not None and not isinstance(gsi_name, basestring):
+        raise ValueError('Expected the GSI name to be a string')
+
+    return (table_name, gsi_name)
+
+
+def start():
+    """ Start the event listener thread if it is enabled
+
+    :returns: threading.Thread or None
+    """
+    port = get_global_option('event_listener_port')
+    if not port:
+        return None
+
+    host = get_global_option('event_listener_host')
+    server = BaseHTTPServer.HTTPServer((host, port), AlarmRequestHandler)
+    logger.info('Listening for alarm notifications on {0}:{1:d}'.format(
+        host, port))
+
+    thread = threading.Thread(
+        target=server.serve_forever, name='event-listener')
+    thread.daemon = True
+    thread.start()
+
+    return thread
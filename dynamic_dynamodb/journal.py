@@ -0,0 +1,486 @@
+# -*- coding: utf-8 -*-
+""" Append-only journal of the provisioning decisions
+
+When journal-dir is set, every decision to change the provisioning of a
+table or GSI is written to the journal, together with the inputs it was
+based on and its outcome. The records are JSON objects, one per line:
+
+    {"time": 1700000000.0, "table": "my_table", "gsi": null,
+     "key": "^my_table$", "outcome": "updated",
+     "reads": {"provisioned": 10, "consumed_percent": 95.2,
+               "throttled": 4, "updated": 15},
+     "writes": {...}}
+
+The journal is split into segments named after the time of their first
+record, decisions.<time>.jsonl. A new segment is started when the current
+one grows over journal-segment-size MB, and segments older than
+journal-retention days are removed. Each segment has a sparse time index,
+decisions.<time>.idx, with the time and byte offset of a record every
+INDEX_INTERVAL bytes. Queries only read the segments overlapping the time
+range, starting at the closest indexed offset.
+
+The journal is queried with --journal-query, see query() and run_query().
+"""
+import datetime
+import json
+import os
+import os.path
+import re
+import sys
+import threading
+import time
+from bisect import bisect_left
+
+from dynamic_dynamodb.log_handler import LOGGER as logger
+from dynamic_dynamodb.config_handler import get_global_option
+
+# Bytes written between two time index entries
+INDEX_INTERVAL = 64 * 1024
+
+SEGMENT_REGEXP = re.compile(r'^decisions\.(?P<start>\d+(?:\.\d+)?)\.jsonl$')
+
+RELATIVE_TIME_REGEXP = re.compile(r'^(?P<value>\d+)(?P<unit>[mhdw])$')
+
+TIME_FORMATS = [
+    '%Y-%m-%d',
+    '%Y-%m-%dT%H:%M',
+    '%Y-%m-%dT%H:%M:%S',
+    '%Y-%m-%d %H:%M',
+    '%Y-%m-%d %H:%M:%S'
+]
+
+UNIT_SECONDS = {
+    'm': 60,
+    'h': 60 * 60,
+    'd': 24 * 60 * 60,
+    'w': 7 * 24 * 60 * 60
+}
+
+# Inputs of the table or GSI being checked, per thread
+LOCAL = threading.local()
+
+WRITER = None
+WRITER_LOCK = threading.Lock()
+
+
+class JournalWriter(object):
+    """ Writer of the journal segments and their time indexes """
+    def __init__(self, directory, segment_size, retention=None):
+        """ Open the journal, continuing the latest segment
+
+        :type directory: str
+        :param directory: Directory of the segments
+        :type segment_size: int
+        :param segment_size: Size in bytes at which a new segment is started
+        :type retention: float
+        :param retention: Days to keep the segments, None to keep them all
+        """
+        self.directory = directory
+        self.segment_size = segment_size
+        self.retention = retention
+        self.segment = None
+        self.index = None
+        self.last_indexed = None
+
+        if not os.path.isdir(directory):
+            os.makedirs(directory)
+
+        segments = list_segments(directory)
+        if segments and os.path.getsize(segments[-1][1]) < segment_size:
+            self.open_segment(segments[-1][1])
+
+    def open_segment(self, path):
+        """ Open a segment and its index for appending
+
+        :type path: str
+        :param path: Path of the segment
+        """
+        self.close()
+        self.segment = open(path, 'ab')
+        self.segment.seek(0, os.SEEK_END)
+        self.index = open(index_path(path), 'ab+')
+
+        # Continue the index from its last entry
+        self.last_indexed = None
+        self.index.seek(0)
+        for line in self.index:
+            if line.strip():
+                self.last_indexed = int(line.split()[1])
+        self.index.seek(0, os.SEEK_END)
+
+    def close(self):
+        """ Close the current segment """
+        for handle in [self.segment, self.index]:
+            if handle:
+                handle.close()
+        self.segment = None
+        self.index = None
+
+    def write(self, record):
+        """ Append a record
+
+        :type record: dict
+        :param record: Record with a time key
+        """
+        if self.segment is None or self.segment.tell() >= self.segment_size:
+            self.rotate(record['time'])
+
+        offset = self.segment.tell()
+        self.segment.write(json.dumps(record, sort_keys=True) + '\n')
+        self.segment.flush()
+
+        if (self.last_indexed is None or
+                offset - self.last_indexed >= INDEX_INTERVAL):
+            self.index.write('{0!r} {1:d}\n'.format(record['time'], offset))
+            self.index.flush()
+            self.last_indexed = offset
+
+    def rotate(self, start):
+        """ Start a new segment and remove the expired ones
+
+        :type start: float
+        :param start: Time of the first record in the new segment
+        """
+        self.open_segment(os.path.join(
+            self.directory, 'decisions.{0:.3f}.jsonl'.format(start)))
+
+        if not self.retention:
+            return
+
+        segments = list_segments(self.directory)
+        cutoff = start - self.retention * UNIT_SECONDS['d']
+        for (_, path), (next_start, _) in zip(segments, segments[1:]):
+            # A segment expires when its last record is past the retention
+            if next_start >= cutoff:
+                break
+
+            logger.info('Removing expired journal segment {0}', path)
+            for expired in [path, index_path(path)]:
+                if os.path.exists(expired):
+                    os.remove(expired)
+
+
+def observe(kind, provisioned_units, consumed_percent, throttled_events):
+    """ Keep the inputs of a decision on the table or GSI being checked
+
+    :type kind: str
+    :param kind: reads or writes
+    :type provisioned_units: int
+    :param provisioned_units: Provisioned units
+    :type consumed_percent: float
+    :param consumed_percent: Consumed units in percent of provisioned
+    :type throttled_events: int
+    :param throttled_events: Throttled events in the lookback period
+    """
+    if not hasattr(LOCAL, 'inputs'):
+        LOCAL.inputs = {}
+
+    LOCAL.inputs[kind] = {
+        'provisioned': provisioned_units,
+        'consumed_percent': consumed_percent,
+        'throttled': throttled_events
+    }
+
+
+def clear():
+    """ Forget the inputs of the previous table or GSI """
+    LOCAL.inputs = {}
+
+
+def write(table_name, gsi_name, key_name, read_units, write_units, outcome):
+    """ Write a decision to the journal, if the journal is enabled
+
+    :type table_name: str
+    :param table_name: Name of the DynamoDB table
+    :type gsi_name: str
+    :param gsi_name: Name of the GSI, None for tables
+    :type key_name: str
+    :param key_name: Configuration option key name
+    :type read_units: int
+    :param read_units: Decided read unit provisioning
+    :type write_units: int
+    :param write_units: Decided write unit provisioning
+    :type outcome: str
+    :param outcome: What came out of the decision, e.g. updated or cooldown
+    """
+    global WRITER
+
+    if not get_global_option('journal_dir'):
+        return
+
+    inputs = getattr(LOCAL, 'inputs', {})
+    record = {
+        'time': round(time.time(), 3),
+        'table': table_name,
+        'gsi': gsi_name,
+        'key': key_name,
+        'outcome': outcome
+    }
+    for kind, units in [('reads', read_units), ('writes', write_units)]:
+        record[kind] = dict(inputs.get(kind, {}))
+        record[kind]['updated'] = int(units)
+
+    try:
+        with WRITER_LOCK:
+            if WRITER is None:
+                WRITER = JournalWriter(
+                    os.path.expanduser(get_global_option('journal_dir')),
+                    int(get_global_option('journal_segment_size') *
+                        1024 * 1024),
+                    get_global_option('journal_retention'))
+            WRITER.write(record)
+    except (IOError, OSError) as error:
+        logger.error('Could not write to the decision journal: {0}', error)
+
+
+def list_segments(directory):
+    """ List the journal segments, oldest first
+
+    :type directory: str
+    :param directory: Directory of the segments
+    :returns: list -- [(start time, path), ...]
+    """
+    segments = []
+    for filename in os.listdir(directory):
+        match = SEGMENT_REGEXP.match(filename)
+        if match:
+            segments.append((
+                float(match.group('start')),
+                os.path.join(directory, filename)))
+
+    return sorted(segments)
+
+
+def index_path(segment_path):
+    """ Get the path of the time index of a segment
+
+    :type segment_path: str
+    :param segment_path: Path of the segment
+    :returns: str -- Path of the index
+    """
+    return re.sub(r'\.jsonl$', '.idx', segment_path)
+
+
+def query(directory, since=None, until=None, table_regexp=None):
+    """ Read the decisions in a time range
+
+    :type directory: str
+    :param directory: Directory of the segments
+    :type since: float
+    :param since: Earliest time, None for the start of the journal
+    :type until: float
+    :param until: Latest time, None for the end of the journal
+    :type table_regexp: str
+    :param table_regexp: Only decisions on matching table names
+    :returns: generator -- Records, oldest first
+    """
+    if table_regexp:
+        table_regexp = re.compile(table_regexp)
+
+    segments = list_segments(directory)
+    ends = [start for start, _ in segments[1:]] + [None]
+    for (start, path), end in zip(segments, ends):
+        if until is not None and start > until:
+            break
+        if since is not None and end is not None and end < since:
+            continue
+
+        with open(path, 'rb') as segment:
+            segment.seek(__get_offset(path, since))
+            for line in segment:
+                try:
+                    record = json.loads(line)
+                except ValueError:
+                    # Partially written record
+                    continue
+
+                if since is not None and record['time'] < since:
+                    continue
+                if until is not None and record['time'] > until:
+                    return
+                if table_regexp and not table_regexp.search(record['table']):
+                    continue
+
+                yield record
+
+
+def summarize(records):
+    """ Aggregate decisions per table or GSI
+
+    :type records: iterable
+    :param records: Records from query()
+    :returns: dict -- {target: {'decisions': int, 'reads_up': int,
+        'reads_down': int, 'writes_up': int, 'writes_down': int,
+        'outcomes': {outcome: int}}}
+    """
+    summary = {}
+    for record in records:
+        target = record['table']
+        if record.get('gsi'):
+            target = '{0}:{1}'.format(record['table'], record['gsi'])
+
+        totals = summary.setdefault(target, {
+            'decisions': 0,
+            'reads_up': 0,
+            'reads_down': 0,
+            'writes_up': 0,
+            'writes_down': 0,
+            'outcomes': {}
+        })
+        totals['decisions'] += 1
+        totals['outcomes'][record['outcome']] = \
+            totals['outcomes'].get(record['outcome'], 0) + 1
+
+        for kind in ['reads', 'writes']:
+            provisioned = record[kind].get('provisioned')
+            if provisioned is None:
+                continue
+            if record[kind]['updated'] > provisioned:
+                totals['{0}_up'.format(kind)] += 1
+            elif record[kind]['updated'] < provisioned:
+                totals['{0}_down'.format(kind)] += 1
+
+    return summary
+
+
+def parse_time(value, now=None):
+    """ Parse a query time
+
+    :type value: str
+    :param value: UTC time such as 2014-06-01 or 2014-06-01T12:00, or a
+        time relative to now such as 30m, 12h, 7d or 2w
+    :type now: float
+    :param now: Current time, defaults to time.time()
+    :returns: float -- Seconds since the epoch
+    :raises: ValueError -- If the time is malformatted
+    """
+    if now is None:
+        now = time.time()
+
+    match = RELATIVE_TIME_REGEXP.match(value.strip())
+    if match:
+        return now - int(match.group('value')) * \
+            UNIT_SECONDS[match.group('unit')]
+
+    for time_format in TIME_FORMATS:
+        try:
+            parsed = datetime.datetime.strptime(value.strip(), time_format)
+        except ValueError:
+            continue
+        return (parsed - datetime.datetime(1970, 1, 1)).total_seconds()
+
+    raise ValueError('Malformatted time {0!r}'.format(value))
+
+
+def run_query():
+    """ Print the decisions matching the --journal-* options """
+    directory = get_global_option('journal_dir')
+    if not directory:
+        print('Set journal-dir to query the decision journal')
+        sys.exit(1)
+
+    try:
+        since = until = None
+        if get_global_option('journal_since'):
+            since = parse_time(get_global_option('journal_since'))
+        if get_global_option('journal_until'):
+            until = parse_time(get_global_option('journal_until'))
+    except ValueError as error:
+        print(error)
+        sys.exit(1)
+
+    records = query(
+        os.path.expanduser(directory),
+        since,
+        until,
+        get_global_option('journal_table'))
+
+    if not get_global_option('journal_summary'):
+        for record in records:
+            print(__format_record(record))
+        return
+
+    summary = summarize(records)
+    for target in sorted(
+            summary, key=lambda item: summary[item]['decisions'],
+            reverse=True):
+        totals = summary[target]
+        print(
+            '{0}: {1:d} decisions, reads {2:d} up {3:d} down, '
+            'writes {4:d} up {5:d} down ({6})'.format(
+                target,
+                totals['decisions'],
+                totals['reads_up'],
+                totals['reads_down'],
+                totals['writes_up'],
+                totals['writes_down'],
+                ', '.join([
+                    '{0} {1:d}'.format(outcome, count)
+                    for outcome, count in sorted(totals['outcomes'].items())
+                ])))
+
+
+def __format_record(record):
+    """ Format a record as one line of text
+
+    :type record: dict
+    :param record: Journal record
+    :returns: str -- Line
+    """
+    target = record['table']
+    if record.get('gsi'):
+        target = '{0}:{1}'.format(record['table'], record['gsi'])
+
+    parts = []
+    for kind in ['reads', 'writes']:
+        values = record[kind]
+        if values.get('provisioned') is None:
+            parts.append('{0} -> {1:d}'.format(kind, values['updated']))
+            continue
+
+        part = '{0} {1:d} -> {2:d}'.format(
+            kind, int(values['provisioned']), values['updated'])
+        if values.get('consumed_percent') is not None:
+            part += ' ({0:.1f}% consumed, {1:d} throttled)'.format(
+                values['consumed_percent'], int(values['throttled'] or 0))
+        parts.append(part)
+
+    return '{0} {1} [{2}] {3}: {4}'.format(
+        datetime.datetime.utcfromtimestamp(record['time']).strftime(
+            '%Y-%m-%dT%H:%M:%SZ'),
+        target,
+        record['key'],
+        record['outcome'],
+        ', '.join(parts))
+
+
+def __get_offset(path, since):
+    """ Get the offset to start reading a segment from
+
+    :type path: str
+    :param path: Path of the segment
+    :type since: float
+    :param since: Earliest time, None for the start of the segment
+    :returns: int -- Byte offset
+    """
+    if since is None or not os.path.exists(index_path(path)):
+        return 0
+
+    times = []
+    offsets = []
+    with open(index_path(path), 'rb') as index:
+        for line in index:
+            try:
+                entry_time, offset = line.split()
+                times.append(float(entry_time))
+                offsets.append(int(offset))
+            except ValueError:
+                # Partially written entry
+                continue
+
+    # The last entry older than since, records before it are all older
+    position = bisect_left(times, since) - 1
+    if position < 0:
+        return 0
+
+    return offsets[position]
@@ -0,0 +1,192 @@
+# -*- coding: utf-8 -*-
+""" Leases coordinating redundant Dynamic DynamoDB instances
+
+Instances running for redundancy compete for a lease, one per shard. Only
+the instance holding the lease of its shard changes the provisioning. The
+other instances keep checking the tables as standbys, so their statistics,
+scaling policy state and cooldowns are up to date and they can take over
+as soon as the lease is free.
+
+The lease-backend option selects where the lease is kept:
+
+- file: an exclusive lock on a file in lease-dir, for instances on the same
+  host. The lock is released when the process holding it exits.
+- dynamodb: an item in the lease-table DynamoDB table, for instances on
+  different hosts. The lease expires lease-duration seconds after it was
+  last renewed, and the holder stops acting a third of the duration before
+  that, leaving a margin for clock differences between the hosts.
+
+The lease is renewed in a background thread every third of lease-duration.
+"""
+import atexit
+import fcntl
+import os
+import socket
+import threading
+import time
+
+from boto.exception import BotoServerError
+
+from dynamic_dynamodb import metrics, retry_policy
+from dynamic_dynamodb.aws import dynamodb
+from dynamic_dynamodb.log_handler import LOGGER as logger
+from dynamic_dynamodb.config_handler import get_global_option
+
+# Time until which this instance may act as the holder of the lease
+HELD_UNTIL = 0
+
+# Open lock file, when the file backend holds the lease
+LOCK_FILE = None
+
+
+def get_lease_name():
+    """ Get the name of the lease of this instance's shard
+
+    :returns: str -- Lease name
+    """
+    return 'dynamic-dynamodb-shard-{0:d}-of-{1:d}'.format(
+        get_global_option('shard_index'), get_global_option('shard_count'))
+
+
+def get_owner():
+    """ Get the unique name of this instance
+
+    :returns: str -- Host name, process id and instance name
+    """
+    return '{0}:{1:d}:{2}'.format(
+        socket.gethostname(), os.getpid(), get_global_option('instance'))
+
+
+def is_leader():
+    """ Tell if this instance may change the provisioning
+
+    :returns: bool -- True if no lease is configured or the lease is held
+    """
+    if not get_global_option('lease_backend'):
+        return True
+
+    return time.time() < HELD_UNTIL
+
+
+def renew():
+    """ Take or renew the lease
+
+    :returns: bool -- True if this instance holds the lease
+    """
+    global HELD_UNTIL
+
+    was_leader = is_leader()
+    duration = get_global_option('lease_duration')
+    started = time.time()
+
+    try:
+        if get_global_option('lease_backend') == 'file':
+            held = __renew_file()
+        else:
+            held = dynamodb.put_lease(
+                get_global_option('lease_table'),
+                get_lease_name(),
+                get_owner(),
+                duration)
+    except (BotoServerError, IOError) + retry_policy.NETWORK_ERRORS as error:
+        logger.error('Could not renew the lease: {0}', error)
+        held = False
+
+    if held:
+        HELD_UNTIL = started + duration * 2 / 3.0
+    else:
+        HELD_UNTIL = 0
+
+    metrics.set_gauge('leader', int(held))
+    if held and not was_leader:
+        logger.info(
+            'Took the lease {0}, changing the provisioning', get_lease_name())
+    elif was_leader and not held:
+        logger.warning(
+            'Lost the lease {0}, leaving the provisioning to the leader',
+            get_lease_name())
+
+    return held
+
+
+def release():
+    """ Release the lease, letting a standby take over right away """
+    global HELD_UNTIL
+    global LOCK_FILE
+
+    if not is_leader() or not get_global_option('lease_backend'):
+        return
+
+    HELD_UNTIL = 0
+    if LOCK_FILE:
+        LOCK_FILE.close()
+        LOCK_FILE = None
+        return
+
+    try:
+        dynamodb.delete_lease(
+            get_global_option('lease_table'), get_lease_name(), get_owner())
+    except (BotoServerError,) + retry_policy.NETWORK_ERRORS as error:
+        logger.warning('Could not release the lease: {0}', error)
+
+
+def start():
+    """ Take the lease if possible and start renewing it
+
+    :returns: threading.Thread or None
+    """
+    if not get_global_option('lease_backend'):
+        return None
+
+    logger.info(
+        'Using the {0} lease {1}, renewing it every {2:.0f} seconds',
+        get_global_option('lease_backend'),
+        get_lease_name(),
+        get_global_option('lease_duration') / 3.0)
+
+    if not renew():
+        logger.info(
+            'The lease {0} is held by another instance, standing by',
+            get_lease_name())
+    atexit.register(release)
+
+    thread = threading.Thread(target=__run, name='lease')
+    thread.daemon = True
+    thread.start()
+
+    return thread
+
+
+def __renew_file():
+    """ Take the lock file of the lease
+
+    :returns: bool -- True if this process holds the lock
+    """
+    global LOCK_FILE
+
+    if LOCK_FILE:
+        return True
+
+    lock_file = open(
+        os.path.join(
+            get_global_option('lease_dir'),
+            '{0}.lock'.format(get_lease_name())),
+        'a')
+    try:
+        fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+    except IOError:
+        lock_file.close()
+        return False
+
+    LOCK_FILE = lock_file
+    return True
+
+
+def __run():
+    """ Renew the lease forever """
+    while True:
+        time.sleep(get_global_option('lease_duration') / 3.0)
+        try:
+            renew()
+        except Exception as error:
+            logger.exception(error)
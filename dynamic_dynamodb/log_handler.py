@@ -17,14 +17,293 @@ WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
 See the License for the specific language governing permissions and
 limitations under the License.
 """
+import atexit
+import json
 import logging
 import os.path
 import sys
+import threading
+import Queue
 
 from logutils import dictconfig
+from logutils.queue import QueueHandler, QueueListener
 
 import config_handler
 
+# Structured fields attached to the log records
+FIELDS = ['table', 'gsi', 'phase', 'decision']
+
+# Maximum number of records waiting to be written when log-async is set
+LOG_QUEUE_SIZE = 10000
+
+# Lines tracked by the sampling filter before its counts are reset
+SAMPLING_MAX_LINES = 10000
+
+# Fields of the table or GSI being checked, per thread
+CONTEXT = threading.local()
+
+# Listener writing the queued records when log-async is set, until it is
+# started. Threads do not survive the daemon fork, so it is started by
+# start_listener()
+LISTENER = None
+
+
+class BraceMessage(object):
+    """ Log message formatted with str.format when it is written """
+    def __init__(self, fmt, args):
+        """ Store the format string and its arguments
+
+        :type fmt: str
+        :param fmt: Format string, e.g. '{0} - Consumed read units: {1:.2f}%'
+        :type args: tuple
+        :param args: Positional arguments to the format string
+        """
+        self.fmt = fmt
+        self.args = args
+
+    def __str__(self):
+        return self.fmt.format(*self.args)
+
+
+class StructuredLogger(logging.LoggerAdapter):
+    """ Logger with deferred formatting and structured fields
+
+    Arguments are formatted into the message with str.format, and only if
+    the level is enabled:
+
+        logger.debug('{0} - Table status is {1}', table_name, status)
+
+    The table, gsi, phase and decision keyword arguments are attached to
+    the record as fields, for the JSON log format. The table and GSI being
+    checked are added automatically, see set_context().
+    """
+    def __init__(self, logger):
+        logging.LoggerAdapter.__init__(self, logger, {})
+
+    def log(self, level, msg, *args, **kwargs):
+        """ Log a message if the level is enabled
+
+        :type level: int
+        :param level: Log level
+        :type msg: str
+        :param msg: Message, or format string if there are arguments
+        """
+        if not self.logger.isEnabledFor(level):
+            return
+
+        fields = dict(getattr(CONTEXT, 'fields', {}))
+        for field in FIELDS:
+            if field in kwargs:
+                fields[field] = kwargs.pop(field)
+
+        if args:
+            msg = BraceMessage(msg, args)
+
+        extra = kwargs.pop('extra', {})
+        extra['fields'] = fields
+        self.logger.log(level, msg, extra=extra, **kwargs)
+
+    def debug(self, msg, *args, **kwargs):
+        """ Log a message with level DEBUG """
+        self.log(logging.DEBUG, msg, *args, **kwargs)
+
+    def info(self, msg, *args, **kwargs):
+        """ Log a message with level INFO """
+        self.log(logging.INFO, msg, *args, **kwargs)
+
+    def warning(self, msg, *args, **kwargs):
+        """ Log a message with level WARNING """
+        self.log(logging.WARNING, msg, *args, **kwargs)
+
+    warn = warning
+
+    def error(self, msg, *args, **kwargs):
+        """ Log a message with level ERROR """
+        self.log(logging.ERROR, msg, *args, **kwargs)
+
+    def exception(self, msg, *args, **kwargs):
+        """ Log a message with level ERROR and the current exception """
+        kwargs['exc_info'] = True
+        self.log(logging.ERROR, msg, *args, **kwargs)
+
+    def critical(self, msg, *args, **kwargs):
+        """ Log a message with level CRITICAL """
+        self.log(logging.CRITICAL, msg, *args, **kwargs)
+
+
+class JsonFormatter(logging.Formatter):
+    """ Format records as one JSON object per line """
+    def __init__(self, dry_run=False):
+        """ Create the formatter
+
+        :type dry_run: bool
+        :param dry_run: Mark the records as written in dry-run mode
+        """
+        logging.Formatter.__init__(self)
+        self.dry_run = dry_run
+
+    def format(self, record):
+        """ Format a record
+
+        :type record: logging.LogRecord
+        :param record: Record to format
+        :returns: str -- JSON object
+        """
+        entry = {
+            'time': self.formatTime(record),
+            'level': record.levelname,
+            'logger': record.name,
+            'message': record.getMessage()
+        }
+        for field, value in getattr(record, 'fields', {}).items():
+            if value is not None:
+                entry[field] = value
+        if self.dry_run:
+            entry['dry_run'] = True
+        if record.exc_info:
+            entry['exception'] = self.formatException(record.exc_info)
+        elif record.exc_text:
+            entry['exception'] = record.exc_text
+
+        return json.dumps(entry, sort_keys=True)
+
+
+class SamplingFilter(logging.Filter):
+    """ Let through one in every rate repetitions of a line per table
+
+    Lines are compared on their format string, so that lines differing
+    only in their values count as repetitions. Warnings and errors are
+    never sampled.
+    """
+    def __init__(self, rate=1):
+        """ Create the filter
+
+        :type rate: int
+        :param rate: Let through one in every rate repetitions
+        """
+        logging.Filter.__init__(self)
+        self.rate = rate
+        self.counts = {}
+
+    def filter(self, record):
+        """ Tell if the record should be written
+
+        :type record: logging.LogRecord
+        :param record: Record to filter
+        :returns: bool -- True if the record should be written
+        """
+        if self.rate <= 1 or record.levelno >= logging.WARNING:
+            return True
+
+        if len(self.counts) > SAMPLING_MAX_LINES:
+            self.counts = {}
+
+        fields = getattr(record, 'fields', {})
+        key = (
+            fields.get('table'),
+            fields.get('gsi'),
+            getattr(record.msg, 'fmt', record.msg))
+        count = self.counts.get(key, 0)
+        self.counts[key] = count + 1
+
+        return count % self.rate == 0
+
+
+class NonBlockingQueueHandler(QueueHandler):
+    """ Queue handler dropping records instead of blocking """
+    def enqueue(self, record):
+        """ Queue a record, dropping it if the queue is full
+
+        :type record: logging.LogRecord
+        :param record: Record to queue
+        """
+        try:
+            self.queue.put_nowait(record)
+        except Queue.Full:
+            pass
+
+    def prepare(self, record):
+        """ Format the message before it is queued
+
+        The arguments are formatted in the calling thread, as they might
+        change before the record is written.
+
+        :type record: logging.LogRecord
+        :param record: Record to queue
+        :returns: logging.LogRecord -- The record
+        """
+        record.msg = record.getMessage()
+        record.args = None
+        if record.exc_info:
+            record.exc_text = logging.Formatter().formatException(
+                record.exc_info)
+            record.exc_info = None
+
+        return record
+
+
+class LevelQueueListener(QueueListener):
+    """ Queue listener respecting the levels of its handlers """
+    def handle(self, record):
+        """ Pass a record to the handlers accepting its level
+
+        :type record: logging.LogRecord
+        :param record: Record to write
+        """
+        record = self.prepare(record)
+        for handler in self.handlers:
+            if record.levelno >= handler.level:
+                handler.handle(record)
+
+
+def set_context(table_name=None, gsi_name=None):
+    """ Set the table and GSI fields of the records logged by this thread
+
+    :type table_name: str
+    :param table_name: Name of the DynamoDB table, None to clear
+    :type gsi_name: str
+    :param gsi_name: Name of the GSI
+    """
+    CONTEXT.fields = {'table': table_name, 'gsi': gsi_name}
+
+
+def __make_async(logger):
+    """ Move the handlers of a logger behind a queue
+
+    The records are written by a background thread, so that slow disks
+    never block the caller.
+
+    :type logger: logging.Logger
+    :param logger: Logger to make asynchronous
+    """
+    global LISTENER
+
+    handlers = list(logger.handlers)
+    log_queue = Queue.Queue(maxsize=LOG_QUEUE_SIZE)
+    LISTENER = LevelQueueListener(log_queue, *handlers)
+
+    for handler in handlers:
+        logger.removeHandler(handler)
+    logger.addHandler(NonBlockingQueueHandler(log_queue))
+
+
+def start_listener():
+    """ Start writing the queued records when log-async is set
+
+    Call this in the process doing the work, i.e. after daemonizing. The
+    records logged before are written once the listener has started.
+    """
+    global LISTENER
+
+    if LISTENER is None:
+        return
+
+    listener = LISTENER
+    LISTENER = None
+    listener.start()
+    atexit.register(listener.stop)
+
+
 LOG_CONFIG = {
     'version': 1,
     'disable_existing_LOGGERs': False,
@@ -95,6 +374,25 @@ else:
         if 'file' in LOG_CONFIG['handlers']:
             LOG_CONFIG['handlers']['file']['formatter'] = 'dry-run'
 
+    # One JSON object per line
+    if config_handler.get_logging_option('log_format') == 'json':
+        LOG_CONFIG['formatters']['json'] = {
+            '()': JsonFormatter,
+            'dry_run': bool(config_handler.get_global_option('dry_run'))
+        }
+        for handler in LOG_CONFIG['handlers'].values():
+            handler['formatter'] = 'json'
+
+    # Sample repetitive lines
+    if config_handler.get_logging_option('log_sample_rate') > 1:
+        LOG_CONFIG['filters'] = {
+            'sampling': {
+                '()': SamplingFilter,
+                'rate': config_handler.get_logging_option('log_sample_rate')
+            }
+        }
+        LOG_CONFIG['loggers']['dynamic-dynamodb']['filters'] = ['sampling']
+
     try:
         dictconfig.dictConfig(LOG_CONFIG)
     except ValueError as error:
@@ -103,4 +401,7 @@ else:
     except:
         raise
 
-LOGGER = logging.getLogger('dynamic-dynamodb')
+    if config_handler.get_logging_option('log_async'):
+        __make_async(logging.getLogger('dynamic-dynamodb'))
+
+LOGGER = StructuredLogger(logging.getLogger('dynamic-dynamodb'))
@@ -0,0 +1,359 @@
+# -*- coding: utf-8 -*-
+""" Metrics on the daemon internals
+
+When metrics-port is set, the metrics are served in the Prometheus text
+exposition format on http://<metrics-host>:<metrics-port>/metrics.
+
+Counters and histograms are kept in one shard per thread. A thread only
+ever writes to its own shard, so recording a metric takes no locks. The
+shards are summed when the metrics are scraped. Gauges are plain dict
+assignments, where the latest value wins.
+"""
+import re
+import threading
+import time
+import BaseHTTPServer
+
+from dynamic_dynamodb.log_handler import LOGGER as logger
+from dynamic_dynamodb.config_handler import get_global_option
+
+PREFIX = 'dynamic_dynamodb_'
+
+# Upper bounds of the histogram buckets, in seconds
+BUCKETS = [
+    0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120]
+
+HELP = {
+    'cycle_duration_seconds': 'Duration of a check of all tables',
+    'api_calls_total': 'AWS API calls',
+    'api_errors_total': 'Failed AWS API calls',
+    'api_call_duration_seconds': 'Duration of AWS API calls',
+    'api_rate_limit_wait_seconds':
+        'Time AWS API calls waited for their rate limit',
+    'api_throttled_total': 'AWS API calls throttled by AWS',
+    'api_timeouts_total': 'AWS API calls timed out',
+    'deferred_tables': 'Tables deferred to the next check by the API budget',
+    'leader': '1 if this instance holds its lease, 0 if it is standing by',
+    'retries_total': 'Retried AWS calls by error kind',
+    'table_failures_total': 'Failed checks of a table',
+    'table_deadlines_exceeded_total':
+        'Checks of a table abandoned at the table deadline',
+    'provisioned_units': 'Provisioned capacity units',
+    'consumed_units_percent': 'Consumed capacity in percent of provisioned',
+    'throttled_events': 'Throttled events in the lookback period',
+    'scaling_decisions_total': 'Decisions to change the provisioning',
+    'queue_depth': 'Number of items waiting in internal queues'
+}
+
+# Per thread counter and histogram shards
+SHARDS = []
+SHARDS_LOCK = threading.Lock()
+LOCAL = threading.local()
+
+# Gauges, {(name, labels): value}
+GAUGES = {}
+
+# Gauges read when the metrics are scraped, {(name, labels): function}
+GAUGE_CALLBACKS = {}
+
+
+class MetricsRequestHandler(BaseHTTPServer.BaseHTTPRequestHandler):
+    """ Serve the metrics """
+    def do_GET(self):
+        """ Send the metrics """
+        if self.path.split('?')[0] not in ['/', '/metrics']:
+            self.send_response(404)
+            self.send_header('Content-Length', '0')
+            self.end_headers()
+            return
+
+        body = render()
+        self.send_response(200)
+        self.send_header('Content-Type', 'text/plain; version=0.0.4')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        """ Send the request log to our logger instead of stderr """
+        logger.debug('Metrics: {0} - {1}'.format(
+            self.client_address[0], format % args))
+
+
+class Timer(object):
+    """ Context manager adding its duration to a histogram """
+    def __init__(self, name, **labels):
+        """ Create a timer
+
+        :type name: str
+        :param name: Histogram name, without the prefix
+        """
+        self.name = name
+        self.labels = labels
+        self.start = None
+
+    def __enter__(self):
+        self.start = time.time()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        observe(self.name, time.time() - self.start, **self.labels)
+
+
+def inc(name, value=1, **labels):
+    """ Increase a counter
+
+    :type name: str
+    :param name: Metric name, without the prefix
+    :type value: float
+    :param value: Amount to increase the counter with
+    """
+    counters = __get_shard()['counters']
+    key = (name, __label_key(labels))
+    counters[key] = counters.get(key, 0) + value
+
+
+def observe(name, value, **labels):
+    """ Add an observation to a histogram
+
+    :type name: str
+    :param name: Metric name, without the prefix
+    :type value: float
+    :param value: Observed value
+    """
+    histograms = __get_shard()['histograms']
+    key = (name, __label_key(labels))
+    try:
+        histogram = histograms[key]
+    except KeyError:
+        histogram = histograms[key] = [[0] * len(BUCKETS), 0, 0.0]
+
+    for index, bound in enumerate(BUCKETS):
+        if value <= bound:
+            histogram[0][index] += 1
+            break
+    histogram[1] += 1
+    histogram[2] += value
+
+
+def set_gauge(name, value, **labels):
+    """ Set a gauge
+
+    :type name: str
+    :param name: Metric name, without the prefix
+    :type value: float
+    :param value: Current value
+    """
+    GAUGES[(name, __label_key(labels))] = value
+
+
+def register_gauge(name, function, **labels):
+    """ Register a gauge that is read when the metrics are scraped
+
+    :type name: str
+    :param name: Metric name, without the prefix
+    :type function: function
+    :param function: Function without arguments returning the value
+    """
+    GAUGE_CALLBACKS[(name, __label_key(labels))] = function
+
+
+def record_capacity(
+        table_name, gsi_name, kind,
+        provisioned_units, consumed_percent, throttled_events):
+    """ Set the capacity gauges of a table or GSI
+
+    :type table_name: str
+    :param table_name: Name of the DynamoDB table
+    :type gsi_name: str
+    :param gsi_name: Name of the GSI, None for tables
+    :type kind: str
+    :param kind: reads or writes
+    :type provisioned_units: int
+    :param provisioned_units: Provisioned units
+    :type consumed_percent: float
+    :param consumed_percent: Consumed units in percent of provisioned
+    :type throttled_events: int
+    :param throttled_events: Throttled events in the lookback period
+    """
+    labels = {'table': table_name, 'gsi': gsi_name or '', 'kind': kind}
+    set_gauge('provisioned_units', provisioned_units, **labels)
+    set_gauge('consumed_units_percent', consumed_percent, **labels)
+    set_gauge('throttled_events', throttled_events, **labels)
+
+
+def record_scaling_decision(table_name, gsi_name, kind, direction, reason):
+    """ Count a decision to change the provisioning
+
+    :type table_name: str
+    :param table_name: Name of the DynamoDB table
+    :type gsi_name: str
+    :param gsi_name: Name of the GSI, None for tables
+    :type kind: str
+    :param kind: reads or writes
+    :type direction: str
+    :param direction: up or down
+    :type reason: str
+    :param reason: Reason as logged, e.g. 'due to consumed threshold
+        being exceeded'
+    """
+    reason = re.sub(
+        r'^due to |( threshold)? being exceeded$', '', reason.lower())
+    inc(
+        'scaling_decisions_total',
+        table=table_name,
+        gsi=gsi_name or '',
+        kind=kind,
+        direction=direction,
+        reason=re.sub(r'[^a-z0-9]+', '_', reason).strip('_'))
+
+
+def render():
+    """ Render all metrics in the Prometheus text format
+
+    :returns: str -- Metrics
+    """
+    counters = {}
+    histograms = {}
+    for shard in list(SHARDS):
+        for key, value in dict(shard['counters']).items():
+            counters[key] = counters.get(key, 0) + value
+
+        for key, histogram in dict(shard['histograms']).items():
+            total = histograms.setdefault(key, [[0] * len(BUCKETS), 0, 0.0])
+            for index, count in enumerate(histogram[0]):
+                total[0][index] += count
+            total[1] += histogram[1]
+            total[2] += histogram[2]
+
+    gauges = dict(GAUGES)
+    for key, function in GAUGE_CALLBACKS.items():
+        try:
+            gauges[key] = function()
+        except Exception as error:
+            logger.debug('Metrics: Could not read {0}: {1}'.format(
+                key[0], error))
+
+    lines = []
+    lines.extend(__render_samples(counters, 'counter'))
+    lines.extend(__render_samples(gauges, 'gauge'))
+
+    for name in sorted(set([key[0] for key in histograms])):
+        lines.extend(__render_header(name, 'histogram'))
+        for key in sorted([key for key in histograms if key[0] == name]):
+            buckets, count, total = histograms[key]
+            cumulative = 0
+            for bound, bucket_count in zip(BUCKETS, buckets):
+                cumulative += bucket_count
+                lines.append('{0}{1}_bucket{2} {3}'.format(
+                    PREFIX, name,
+                    __format_labels(key[1] + (('le', repr(bound)),)),
+                    cumulative))
+            lines.append('{0}{1}_bucket{2} {3}'.format(
+                PREFIX, name,
+                __format_labels(key[1] + (('le', '+Inf'),)),
+                count))
+            lines.append('{0}{1}_count{2} {3}'.format(
+                PREFIX, name, __format_labels(key[1]), count))
+            lines.append('{0}{1}_sum{2} {3!r}'.format(
+                PREFIX, name, __format_labels(key[1]), total))
+
+    return '\n'.join(lines) + '\n'
+
+
+def start():
+    """ Start the metrics endpoint if it is enabled
+
+    :returns: threading.Thread or None
+    """
+    port = get_global_option('metrics_port')
+    if not port:
+        return None
+
+    host = get_global_option('metrics_host')
+    server = BaseHTTPServer.HTTPServer((host, port), MetricsRequestHandler)
+    logger.info('Serving metrics on http://{0}:{1:d}/metrics'.format(
+        host, port))
+
+    thread = threading.Thread(target=server.serve_forever, name='metrics')
+    thread.daemon = True
+    thread.start()
+
+    return thread
+
+
+def __get_shard():
+    """ Get the counters and histograms of the current thread
+
+    :returns: dict -- Shard with counters and histograms
+    """
+    try:
+        return LOCAL.shard
+    except AttributeError:
+        LOCAL.shard = {'counters': {}, 'histograms': {}}
+        with SHARDS_LOCK:
+            SHARDS.append(LOCAL.shard)
+        return LOCAL.shard
+
+
+def __label_key(labels):
+    """ Get a hashable, sorted representation of the labels
+
+    :type labels: dict
+    :param labels: Label names and values
+    :returns: tuple -- ((name, value), ...)
+    """
+    return tuple(sorted(labels.items()))
+
+
+def __format_labels(labels):
+    """ Format labels for the text format
+
+    :type labels: tuple
+    :param labels: ((name, value), ...)
+    :returns: str -- {name="value",...} or an empty string
+    """
+    if not labels:
+        return ''
+
+    return '{{{0}}}'.format(','.join([
+        '{0}="{1}"'.format(
+            name,
+            str(value).replace('\\', '\\\\').replace('"', '\\"').replace(
+                '\n', '\\n'))
+        for name, value in labels]))
+
+
+def __render_header(name, metric_type):
+    """ Get the HELP and TYPE lines of a metric
+
+    :type name: str
+    :param name: Metric name, without the prefix
+    :type metric_type: str
+    :param metric_type: counter, gauge or histogram
+    :returns: list -- Lines
+    """
+    return [
+        '# HELP {0}{1} {2}'.format(PREFIX, name, HELP.get(name, name)),
+        '# TYPE {0}{1} {2}'.format(PREFIX, name, metric_type)]
+
+
+def __render_samples(samples, metric_type):
+    """ Render counters or gauges
+
+    :type samples: dict
+    :param samples: {(name, labels): value}
+    :type metric_type: str
+    :param metric_type: counter or gauge
+    :returns: list -- Lines
+    """
+    lines = []
+    for name in sorted(set([key[0] for key in samples])):
+        lines.extend(__render_header(name, metric_type))
+        for key in sorted([key for key in samples if key[0] == name]):
+            if samples[key] is None:
+                continue
+            lines.append('{0}{1}{2} {3!r}'.format(
+                PREFIX, name, __format_labels(key[1]), float(samples[key])))
+
+    return lines
@@ -0,0 +1,114 @@
+# -*- coding: utf-8 -*-
+""" On-demand profiling of a running daemon
+
+SIGUSR1 (or --daemon profile) turns on cProfile for the next profile-cycles
+checks. The statistics are written in pstats format to profile-dir when
+the checks are done, and can be read with the pstats module or tools such
+as snakeviz. Another SIGUSR1 while profiling stops the profiler early.
+
+SIGQUIT (or --daemon dump-stacks) writes the stack of every thread to the
+log.
+"""
+import cProfile
+import os.path
+import sys
+import threading
+import time
+import traceback
+
+from dynamic_dynamodb.log_handler import LOGGER as logger
+from dynamic_dynamodb.config_handler import get_global_option
+
+# Active profiler, and the number of checks left to profile
+PROFILER = None
+CYCLES_LEFT = 0
+
+# Set by the signal handler, acted upon at the start of the next check
+TOGGLE_REQUESTED = threading.Event()
+
+
+def toggle(signum=None, frame=None):
+    """ Request profiling to start or stop, usable as a signal handler
+
+    The profiler is only switched at the check boundaries, so that the
+    signal handler does not need to touch the profiler.
+
+    :type signum: int
+    :param signum: Signal number
+    :type frame: frame
+    :param frame: Current stack frame
+    """
+    TOGGLE_REQUESTED.set()
+
+
+def start_cycle():
+    """ Handle profiling requests at the start of a check """
+    global PROFILER
+    global CYCLES_LEFT
+
+    if not TOGGLE_REQUESTED.is_set():
+        return
+    TOGGLE_REQUESTED.clear()
+
+    if PROFILER:
+        logger.info('Profiling stopped on request')
+        __write_stats()
+        return
+
+    CYCLES_LEFT = get_global_option('profile_cycles')
+    PROFILER = cProfile.Profile()
+    PROFILER.enable()
+    logger.info('Profiling the next {0:d} checks'.format(CYCLES_LEFT))
+
+
+def end_cycle():
+    """ Stop profiling after the requested number of checks """
+    global CYCLES_LEFT
+
+    if not PROFILER:
+        return
+
+    CYCLES_LEFT -= 1
+    if CYCLES_LEFT <= 0:
+        __write_stats()
+
+
+def dump_stacks(signum=None, frame=None):
+    """ Write the stack of every thread to the log
+
+    Usable as a signal handler.
+
+    :type signum: int
+    :param signum: Signal number
+    :type frame: frame
+    :param frame: Current stack frame
+    """
+    names = dict([
+        (thread.ident, thread.name) for thread in threading.enumerate()])
+
+    for thread_id, stack in sys._current_frames().items():
+        logger.warning('Stack of thread {0} ({1:d}):\n{2}'.format(
+            names.get(thread_id, 'unknown'),
+            thread_id,
+            ''.join(traceback.format_stack(stack)).rstrip()))
+
+
+def __write_stats():
+    """ Stop the profiler and write its statistics to profile-dir """
+    global PROFILER
+
+    PROFILER.disable()
+    path = os.path.join(
+        os.path.expanduser(get_global_option('profile_dir')),
+        'dynamic-dynamodb.{0}.{1}.prof'.format(
+            get_global_option('instance'),
+            time.strftime('%Y%m%d-%H%M%S')))
+
+    try:
+        PROFILER.dump_stats(path)
+        logger.info('Profile written to {0}'.format(path))
+    except IOError as error:
+        logger.error('Could not write the profile to {0}: {1}'.format(
+            path, error))
+
+    PROFILER = None
@@ -0,0 +1,257 @@
+# -*- coding: utf-8 -*-
+""" Retry policy for the AWS calls
+
+Errors are classified as throttling, transient or fatal. Throttling and
+transient errors are retried up to retry-attempts times, waiting a random
+time between zero and retry-base-delay * 2 ** attempt seconds, capped at
+retry-max-delay ("full jitter"). Fatal errors, such as validation errors
+or missing tables, are raised right away.
+
+Each table evaluation has a deadline of table-deadline seconds, kept per
+thread for the statistics and DynamoDB calls made while evaluating the
+table. A retry that would wait past the deadline is not made, and once the
+deadline has passed every AWS call raises DeadlineExceeded, so the table is
+abandoned for the check. With api-socket-timeout set on the connections, a
+single hung request cannot stall the check of the other tables either.
+
+Tables whose evaluation fails table-failure-threshold times in a row are
+suspended. They are skipped for one check, then for twice as many checks
+after each new failure, up to MAX_SUSPENDED_CHECKS checks.
+"""
+import functools
+import httplib
+import random
+import socket
+import ssl
+import threading
+import time
+
+from boto.exception import BotoServerError
+
+from dynamic_dynamodb import metrics
+from dynamic_dynamodb.log_handler import LOGGER as logger
+from dynamic_dynamodb.config_handler import get_global_option
+
+THROTTLING = 'throttling'
+TRANSIENT = 'transient'
+FATAL = 'fatal'
+
+# Error codes AWS uses when throttling API calls
+THROTTLING_ERRORS = [
+    'Throttling',
+    'ThrottlingException',
+    'RequestLimitExceeded',
+    'TooManyRequestsException',
+    'ProvisionedThroughputExceededException'
+]
+
+# Error codes of errors that may go away when retried
+TRANSIENT_ERRORS = [
+    'InternalFailure',
+    'InternalServerError',
+    'RequestTimeout',
+    'RequestTimeoutException',
+    'ServiceUnavailable',
+    'ServiceUnavailableException'
+]
+
+# Errors raised when the connection to AWS fails
+NETWORK_ERRORS = (socket.error, httplib.HTTPException)
+
+# Maximum number of checks a failing table is skipped
+MAX_SUSPENDED_CHECKS = 16
+
+# Consecutive failures and suspension per table, {name: {...}}
+FAILURES = {}
+
+# Deadline of the table evaluation in progress, per thread
+LOCAL = threading.local()
+
+
+class DeadlineExceeded(Exception):
+    """ The deadline of the table evaluation has passed """
+    pass
+
+
+def classify(error):
+    """ Classify an error
+
+    :type error: Exception
+    :param error: Error raised by an AWS call
+    :returns: str -- THROTTLING, TRANSIENT or FATAL
+    """
+    if isinstance(error, NETWORK_ERRORS):
+        return TRANSIENT
+
+    if not isinstance(error, BotoServerError):
+        return FATAL
+
+    if getattr(error, 'error_code', None) in THROTTLING_ERRORS:
+        return THROTTLING
+
+    if (getattr(error, 'error_code', None) in TRANSIENT_ERRORS or
+            (error.status and int(error.status) >= 500)):
+        return TRANSIENT
+
+    return FATAL
+
+
+def backoff_delay(attempt, base_delay=None, max_delay=None):
+    """ Get a random delay before a retry
+
+    :type attempt: int
+    :param attempt: Number of failed attempts so far, minus one
+    :type base_delay: float
+    :param base_delay: Seconds, defaults to retry-base-delay
+    :type max_delay: float
+    :param max_delay: Seconds, defaults to retry-max-delay
+    :returns: float -- Seconds to wait
+    """
+    if base_delay is None:
+        base_delay = get_global_option('retry_base_delay')
+    if max_delay is None:
+        max_delay = get_global_option('retry_max_delay')
+
+    return random.uniform(0, min(max_delay, base_delay * 2 ** attempt))
+
+
+def set_deadline(seconds):
+    """ Set the deadline of the evaluation in progress in this thread
+
+    :type seconds: float
+    :param seconds: Seconds from now, None to clear the deadline
+    """
+    if seconds:
+        LOCAL.deadline = time.time() + seconds
+    else:
+        LOCAL.deadline = None
+
+
+def time_left():
+    """ Get the time left until the deadline of this thread
+
+    :returns: float or None -- Seconds, None if there is no deadline
+    """
+    deadline = getattr(LOCAL, 'deadline', None)
+    if deadline is None:
+        return None
+
+    return deadline - time.time()
+
+
+def check_deadline(operation):
+    """ Make sure the deadline of this thread has not passed
+
+    :type operation: str
+    :param operation: Call about to be made, for the error message
+    :raises: DeadlineExceeded -- If the deadline has passed
+    """
+    left = time_left()
+    if left is not None and left <= 0:
+        raise DeadlineExceeded(
+            'Table deadline passed {0:.1f} seconds ago, not calling '
+            '{1}'.format(-left, operation))
+
+
+def is_timeout(error):
+    """ Tell if an error is a socket timeout
+
+    :type error: Exception
+    :param error: Error raised by an AWS call
+    :returns: bool -- True if the request timed out
+    """
+    if isinstance(error, socket.timeout):
+        return True
+
+    # Timeouts on HTTPS connections are raised as SSL errors
+    return isinstance(error, ssl.SSLError) and 'timed out' in str(error)
+
+
+def call(function, *args, **kwargs):
+    """ Call a function, retrying throttling and transient errors
+
+    :type function: function
+    :param function: Function making AWS calls
+    :returns: The return value of the function
+    """
+    attempts = get_global_option('retry_attempts')
+    for attempt in xrange(attempts):
+        try:
+            return function(*args, **kwargs)
+        except Exception as error:
+            kind = classify(error)
+            if kind == FATAL or attempt >= attempts - 1:
+                raise
+
+            delay = backoff_delay(attempt)
+            left = time_left()
+            if left is not None and delay >= left:
+                logger.warning(
+                    'Not retrying {0} past the table deadline',
+                    function.__name__)
+                raise
+
+            metrics.inc('retries_total', kind=kind)
+            logger.warning(
+                'Retrying {0} in {1:.2f} seconds after {2} error: {3}',
+                function.__name__, delay, kind, error)
+            time.sleep(delay)
+
+
+def retried(function):
+    """ Decorator retrying throttling and transient errors, see call() """
+    @functools.wraps(function)
+    def wrapper(*args, **kwargs):
+        """ Call the function with retries """
+        return call(function, *args, **kwargs)
+    return wrapper
+
+
+def is_suspended(name):
+    """ Tell if a failing table should be skipped in this check
+
+    Counts the check as one of the skipped checks.
+
+    :type name: str
+    :param name: Name of the table
+    :returns: bool -- True if the table should be skipped
+    """
+    failures = FAILURES.get(name)
+    if not failures or not failures['skip']:
+        return False
+
+    failures['skip'] -= 1
+    logger.warning(
+        '{0} - Skipping the table after {1:d} failed checks, '
+        '{2:d} more checks to skip',
+        name, failures['count'], failures['skip'])
+    return True
+
+
+def record_failure(name):
+    """ Count a failed evaluation, suspending the table if it keeps failing
+
+    :type name: str
+    :param name: Name of the table
+    """
+    failures = FAILURES.setdefault(name, {'count': 0, 'skip': 0})
+    failures['count'] += 1
+    metrics.inc('table_failures_total', table=name)
+
+    threshold = get_global_option('table_failure_threshold')
+    if failures['count'] >= threshold:
+        failures['skip'] = min(
+            MAX_SUSPENDED_CHECKS, 2 ** (failures['count'] - threshold))
+        logger.error(
+            '{0} - Failed {1:d} checks in a row, skipping it for the next '
+            '{2:d} checks',
+            name, failures['count'], failures['skip'])
+
+
+def record_success(name):
+    """ Reset the failures of a table
+
+    :type name: str
+    :param name: Name of the table
+    """
+    FAILURES.pop(name, None)
@@ -0,0 +1,109 @@
+# -*- coding: utf-8 -*-
+""" Sharding of the tables across Dynamic DynamoDB instances
+
+Instances sharing a configuration can split the tables between them. Each
+instance is started with its own shard-index, from 0 to shard-count - 1, and
+only checks the tables of its shard.
+
+The tables are assigned with consistent hashing. Each shard owns
+VIRTUAL_NODES points on a hash ring, and a table belongs to the shard owning
+the first point after the hash of the table name. Going from N to N + 1
+shards only moves about 1 / (N + 1) of the tables, all to the new shard.
+"""
+import bisect
+import hashlib
+
+from dynamic_dynamodb.log_handler import LOGGER as logger
+from dynamic_dynamodb.config_handler import get_global_option
+
+# Points per shard on the hash ring, evening out the shard sizes
+VIRTUAL_NODES = 128
+
+# Hash rings per shard count, {shard_count: (points, shards)}
+RINGS = {}
+
+
+def build_ring(shard_count):
+    """ Build the hash ring of a number of shards
+
+    :type shard_count: int
+    :param shard_count: Number of shards
+    :returns: (list, list) -- Sorted points on the ring and the shard
+        owning each point
+    """
+    if shard_count in RINGS:
+        return RINGS[shard_count]
+
+    nodes = sorted([
+        (__hash('shard-{0:d}-{1:d}'.format(shard, node)), shard)
+        for shard in xrange(shard_count)
+        for node in xrange(VIRTUAL_NODES)
+    ])
+    ring = ([point for point, _ in nodes], [shard for _, shard in nodes])
+    RINGS[shard_count] = ring
+
+    return ring
+
+
+def shard_of(table_name, shard_count):
+    """ Get the shard a table belongs to
+
+    :type table_name: str
+    :param table_name: Name of the DynamoDB table
+    :type shard_count: int
+    :param shard_count: Number of shards
+    :returns: int -- Shard index
+    """
+    if shard_count <= 1:
+        return 0
+
+    points, shards = build_ring(shard_count)
+    position = bisect.bisect(points, __hash(table_name))
+
+    # Wrap around to the first point of the ring
+    return shards[position % len(points)]
+
+
+def owns(table_name):
+    """ Tell if a table belongs to the shard of this instance
+
+    :type table_name: str
+    :param table_name: Name of the DynamoDB table
+    :returns: bool -- True if this instance checks the table
+    """
+    return shard_of(
+        table_name,
+        get_global_option('shard_count')) == get_global_option('shard_index')
+
+
+def select(tables):
+    """ Keep the tables belonging to the shard of this instance
+
+    :type tables: list
+    :param tables: [(table_name, table_key), ...]
+    :returns: list -- [(table_name, table_key), ...]
+    """
+    if get_global_option('shard_count') <= 1:
+        return list(tables)
+
+    selected = [
+        (table_name, table_key) for table_name, table_key in tables
+        if owns(table_name)]
+    logger.debug(
+        'Shard {0:d} of {1:d} checks {2:d} of {3:d} tables',
+        get_global_option('shard_index'),
+        get_global_option('shard_count'),
+        len(selected),
+        len(tables))
+
+    return selected
+
+
+def __hash(key):
+    """ Hash a key to a point on the ring
+
+    :type key: str
+    :param key: Table name or virtual node name
+    :returns: int -- 64 bit hash
+    """
+    return int(hashlib.md5(key.encode('utf-8')).hexdigest()[:16], 16)
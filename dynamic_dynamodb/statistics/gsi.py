@@ -3,16 +3,18 @@
 from datetime import datetime, timedelta
 
 from boto.exception import JSONResponseError, BotoServerError
-from retrying import retry
 
+from dynamic_dynamodb import retry_policy
 from dynamic_dynamodb.aws import dynamodb
+from dynamic_dynamodb.statistics import robust
 from dynamic_dynamodb.log_handler import LOGGER as logger
 from dynamic_dynamodb.aws.cloudwatch import (
     CLOUDWATCH_CONNECTION as cloudwatch_connection)
 
 
 def get_consumed_read_units_percent(
-        table_name, gsi_name, lookback_window_start=15, lookback_period=5):
+        table_name, gsi_name, lookback_window_start=15, lookback_period=5,
+        statistic='average'):
     """ Returns the number of consumed read units in percent
 
     :type table_name: str
@@ -23,26 +25,23 @@ def get_consumed_read_units_percent(
     :param lookback_window_start: Relative start time for the CloudWatch metric
     :type lookback_period: int
     :param lookback_period: Number of minutes to look at
+    :type statistic: str
+    :param statistic: How to aggregate the per-minute consumption,
+        see statistics.robust
     :returns: float -- Number of consumed reads as a
         percentage of provisioned reads
     """
     try:
-        metrics = __get_aws_metric(
+        consumed_read_units = __get_consumed_units(
             table_name,
             gsi_name,
             lookback_window_start,
             lookback_period,
-            'ConsumedReadCapacityUnits')
+            'ConsumedReadCapacityUnits',
+            statistic)
     except BotoServerError:
         raise
 
-    if metrics:
-        lookback_seconds = lookback_period * 60
-        consumed_read_units = (
-            float(metrics[0]['Sum']) / float(lookback_seconds))
-    else:
-        consumed_read_units = 0
-
     try:
         gsi_read_units = dynamodb.get_provisioned_gsi_read_units(
             table_name, gsi_name)
@@ -53,8 +52,9 @@ def get_consumed_read_units_percent(
     except JSONResponseError:
         raise
 
-    logger.info('{0} - GSI: {1} - Consumed read units: {2:.2f}%'.format(
-        table_name, gsi_name, consumed_read_units_percent))
+    logger.info(
+        '{0} - GSI: {1} - Consumed read units: {2:.2f}%',
+        table_name, gsi_name, consumed_read_units_percent)
     return consumed_read_units_percent
 
 
@@ -87,8 +87,9 @@ def get_throttled_read_event_count(
     else:
         throttled_read_events = 0
 
-    logger.info('{0} - GSI: {1} - Read throttle count: {2:d}'.format(
-        table_name, gsi_name, throttled_read_events))
+    logger.info(
+        '{0} - GSI: {1} - Read throttle count: {2:d}',
+        table_name, gsi_name, throttled_read_events)
     return throttled_read_events
 
 
@@ -135,8 +136,8 @@ def get_throttled_by_provisioned_read_event_percent(
 
     logger.info(
         '{0} - GSI: {1} - Throttled read percent '
-        'by provision: {2:.2f}%'.format(
-            table_name, gsi_name, throttled_by_provisioned_read_percent))
+        'by provision: {2:.2f}%',
+        table_name, gsi_name, throttled_by_provisioned_read_percent)
     return throttled_by_provisioned_read_percent
 
 
@@ -183,13 +184,14 @@ def get_throttled_by_consumed_read_percent(
 
     logger.info(
         '{0} - GSI: {1} - Throttled read percent '
-        'by consumption: {2:.2f}%'.format(
-            table_name, gsi_name, throttled_by_consumed_read_percent))
+        'by consumption: {2:.2f}%',
+        table_name, gsi_name, throttled_by_consumed_read_percent)
     return throttled_by_consumed_read_percent
 
 
 def get_consumed_write_units_percent(
-        table_name, gsi_name, lookback_window_start=15, lookback_period=5):
+        table_name, gsi_name, lookback_window_start=15, lookback_period=5,
+        statistic='average'):
     """ Returns the number of consumed write units in percent
 
     :type table_name: str
@@ -200,26 +202,23 @@ def get_consumed_write_units_percent(
     :param lookback_window_start: Relative start time for the CloudWatch metric
     :type lookback_period: int
     :param lookback_period: Number of minutes to look at
+    :type statistic: str
+    :param statistic: How to aggregate the per-minute consumption,
+        see statistics.robust
     :returns: float -- Number of consumed writes as a
         percentage of provisioned writes
     """
     try:
-        metrics = __get_aws_metric(
+        consumed_write_units = __get_consumed_units(
             table_name,
             gsi_name,
             lookback_window_start,
             lookback_period,
-            'ConsumedWriteCapacityUnits')
+            'ConsumedWriteCapacityUnits',
+            statistic)
     except BotoServerError:
         raise
 
-    if metrics:
-        lookback_seconds = lookback_period * 60
-        consumed_write_units = (
-            float(metrics[0]['Sum']) / float(lookback_seconds))
-    else:
-        consumed_write_units = 0
-
     try:
         gsi_write_units = dynamodb.get_provisioned_gsi_write_units(
             table_name, gsi_name)
@@ -230,8 +229,9 @@ def get_consumed_write_units_percent(
     except JSONResponseError:
         raise
 
-    logger.info('{0} - GSI: {1} - Consumed write units: {2:.2f}%'.format(
-        table_name, gsi_name, consumed_write_units_percent))
+    logger.info(
+        '{0} - GSI: {1} - Consumed write units: {2:.2f}%',
+        table_name, gsi_name, consumed_write_units_percent)
     return consumed_write_units_percent
 
 
@@ -264,8 +264,9 @@ def get_throttled_write_event_count(
     else:
         throttled_write_events = 0
 
-    logger.info('{0} - GSI: {1} - Write throttle count: {2:d}'.format(
-        table_name, gsi_name, throttled_write_events))
+    logger.info(
+        '{0} - GSI: {1} - Write throttle count: {2:d}',
+        table_name, gsi_name, throttled_write_events)
     return throttled_write_events
 
 
@@ -312,8 +313,8 @@ def get_throttled_by_provisioned_write_event_percent(
 
     logger.info(
         '{0} - GSI: {1} - Throttled write percent '
-        'by provision: {2:.2f}%'.format(
-            table_name, gsi_name, throttled_by_provisioned_write_percent))
+        'by provision: {2:.2f}%',
+        table_name, gsi_name, throttled_by_provisioned_write_percent)
     return throttled_by_provisioned_write_percent
 
 
@@ -361,21 +362,131 @@ def get_throttled_by_consumed_write_percent(
 
     logger.info(
         '{0} - GSI: {1} - Throttled write percent '
-        'by consumption: {2:.2f}%'.format(
-            table_name, gsi_name, throttled_by_consumed_write_percent))
+        'by consumption: {2:.2f}%',
+        table_name, gsi_name, throttled_by_consumed_write_percent)
     return throttled_by_consumed_write_percent
 
 
-@retry(
-    wait='exponential_sleep',
-    wait_exponential_multiplier=1000,
-    wait_exponential_max=10000,
-    stop_max_attempt_number=10)
+def get_consumed_read_units_history(
+        table_name, gsi_name, lookback_window_start, lookback_period, minutes):
+    """ Returns the consumed read units per second for each minute
+
+    The history ends where the lookback window ends, leaving out the latest
+    minutes that CloudWatch may not have complete data for yet.
+
+    :type table_name: str
+    :param table_name: Name of the DynamoDB table
+    :type gsi_name: str
+    :param gsi_name: Name of the GSI
+    :type lookback_window_start: int
+    :param lookback_window_start: Relative start time of the lookback window
+    :type lookback_period: int
+    :param lookback_period: Length of the lookback window in minutes
+    :type minutes: int
+    :param minutes: Number of minutes of history to fetch
+    :returns: list -- Consumed read units per second, oldest first
+    """
+    metrics = __get_aws_metric(
+        table_name,
+        gsi_name,
+        lookback_window_start - lookback_period + minutes,
+        minutes,
+        'ConsumedReadCapacityUnits',
+        period=60)
+
+    return [
+        float(metric['Sum']) / 60
+        for metric in sorted(metrics or [], key=lambda m: m['Timestamp'])]
+
+
+def get_consumed_write_units_history(
+        table_name, gsi_name, lookback_window_start, lookback_period, minutes):
+    """ Returns the consumed write units per second for each minute
+
+    The history ends where the lookback window ends, leaving out the latest
+    minutes that CloudWatch may not have complete data for yet.
+
+    :type table_name: str
+    :param table_name: Name of the DynamoDB table
+    :type gsi_name: str
+    :param gsi_name: Name of the GSI
+    :type lookback_window_start: int
+    :param lookback_window_start: Relative start time of the lookback window
+    :type lookback_period: int
+    :param lookback_period: Length of the lookback window in minutes
+    :type minutes: int
+    :param minutes: Number of minutes of history to fetch
+    :returns: list -- Consumed write units per second, oldest first
+    """
+    metrics = __get_aws_metric(
+        table_name,
+        gsi_name,
+        lookback_window_start - lookback_period + minutes,
+        minutes,
+        'ConsumedWriteCapacityUnits',
+        period=60)
+
+    return [
+        float(metric['Sum']) / 60
+        for metric in sorted(metrics or [], key=lambda m: m['Timestamp'])]
+
+
+def __get_consumed_units(
+        table_name, gsi_name, lookback_window_start, lookback_period,
+        metric_name, statistic):
+    """ Returns the consumed units per second during the lookback period
+
+    :type table_name: str
+    :param table_name: Name of the DynamoDB table
+    :type gsi_name: str
+    :param gsi_name: Name of the GSI
+    :type lookback_window_start: int
+    :param lookback_window_start: Relative start time for the CloudWatch metric
+    :type lookback_period: int
+    :param lookback_period: Number of minutes to look at
+    :type metric_name: str
+    :param metric_name: Name of the metric to retrieve from CloudWatch
+    :type statistic: str
+    :param statistic: How to aggregate the per-minute consumption
+    :returns: float -- Consumed units per second
+    """
+    if not statistic or statistic == 'average':
+        metrics = __get_aws_metric(
+            table_name,
+            gsi_name,
+            lookback_window_start,
+            lookback_period,
+            metric_name)
+        if not metrics:
+            return 0
+
+        return float(metrics[0]['Sum']) / float(lookback_period * 60)
+
+    metrics = __get_aws_metric(
+        table_name,
+        gsi_name,
+        lookback_window_start,
+        lookback_period,
+        metric_name,
+        period=60)
+    consumed_units = [
+        float(metric['Sum']) / 60
+        for metric in sorted(metrics or [], key=lambda m: m['Timestamp'])]
+
+    # CloudWatch leaves out the minutes without any consumption
+    consumed_units = [0.0] * (
+        lookback_period - len(consumed_units)) + consumed_units
+
+    return robust.aggregate(consumed_units, statistic)
+
+
+@retry_policy.retried
 def __get_aws_metric(table_name,
                      gsi_name,
                      lookback_window_start,
                      lookback_period,
-                     metric_name):
+                     metric_name,
+                     period=None):
     """ Returns a  metric list from the AWS CloudWatch service, may return
     None if no metric exists
 
@@ -389,6 +500,9 @@ def __get_aws_metric(table_name,
     :type lookback_period: Length of the lookback period in minutes
     :type metric_name: str
     :param metric_name: Name of the metric to retrieve from CloudWatch
+    :type period: int
+    :param period: Length of each data point in seconds. Defaults to the
+        whole lookback period
     :returns: list --
         A list of time series data for the given metric, may be None if
         there was no data
@@ -400,7 +514,7 @@ def __get_aws_metric(table_name,
             minutes=lookback_window_start - lookback_period)
 
         return cloudwatch_connection.get_metric_statistics(
-            period=lookback_period * 60,
+            period=period or lookback_period * 60,
             start_time=start_time,
             end_time=end_time,
             metric_name=metric_name,
@@ -414,8 +528,6 @@ def __get_aws_metric(table_name,
     except BotoServerError as error:
         logger.error(
             'Unknown boto error. Status: "{0}". '
-            'Reason: "{1}". Message: {2}'.format(
-                error.status,
-                error.reason,
-                error.message))
+            'Reason: "{1}". Message: {2}',
+            error.status, error.reason, error.message)
         raise
@@ -0,0 +1,99 @@
+# -*- coding: utf-8 -*-
+""" Robust aggregation of per-minute consumption
+
+The consumed capacity is normally the sum over the lookback period divided
+by its length, so a single busy minute moves the whole average. The
+statistics in this module are less sensitive to such outliers. They are
+selected with the consumed-statistic option.
+"""
+import math
+
+# Share of the values cut from each end by the trimmed mean
+TRIM_FRACTION = 0.2
+
+# Weight of the latest value in the EWMA
+EWMA_ALPHA = 0.3
+
+# Values over this many times the EWMA are treated as spikes
+EWMA_SPIKE_FACTOR = 3.0
+
+
+def aggregate(values, statistic):
+    """ Aggregate a series of values
+
+    :type values: list
+    :param values: Values, oldest first
+    :type statistic: str
+    :param statistic: One of the keys in STATISTICS
+    :returns: float -- Aggregated value, 0 for an empty series
+    """
+    if not values:
+        return 0.0
+
+    return STATISTICS[statistic]([float(value) for value in values])
+
+
+def __average(values):
+    """ Arithmetic mean """
+    return sum(values) / len(values)
+
+
+def __median(values):
+    """ Median """
+    return __percentile(values, 50)
+
+
+def __p90(values):
+    """ 90th percentile """
+    return __percentile(values, 90)
+
+
+def __trimmed_mean(values):
+    """ Mean after cutting TRIM_FRACTION of the values from each end """
+    values = sorted(values)
+    trim = int(len(values) * TRIM_FRACTION)
+    if trim:
+        values = values[trim:-trim]
+
+    return sum(values) / len(values)
+
+
+def __ewma(values):
+    """ Exponentially weighted moving average with spike rejection
+
+    Values over EWMA_SPIKE_FACTOR times the current average are limited to
+    that level before they are added.
+    """
+    average = values[0]
+    for value in values[1:]:
+        if average > 0:
+            value = min(value, average * EWMA_SPIKE_FACTOR)
+        average = EWMA_ALPHA * value + (1 - EWMA_ALPHA) * average
+
+    return average
+
+
+def __percentile(values, percent):
+    """ Percentile with linear interpolation between the closest values
+
+    :type values: list
+    :param values: Values
+    :type percent: float
+    :param percent: Percentile, 0-100
+    :returns: float -- Percentile value
+    """
+    values = sorted(values)
+    position = (len(values) - 1) * percent / 100.0
+    lower = int(math.floor(position))
+    upper = int(math.ceil(position))
+
+    return values[lower] + (values[upper] - values[lower]) * (
+        position - lower)
+
+STATISTICS = {
+    'average': __average,
+    'median': __median,
+    'trimmed-mean': __trimmed_mean,
+    'p90': __p90,
+    'ewma': __ewma
+}
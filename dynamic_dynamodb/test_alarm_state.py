@@ -0,0 +1,55 @@
+# -*- coding: utf-8 -*-
+""" Testing the throughput alarm state tracking """
+import unittest
+
+from dynamic_dynamodb.core import alarm_state
+
+
+class TestAlarmState(unittest.TestCase):
+    """ Test alarm state transitions """
+
+    def setUp(self):
+        """ Reset the alarm states """
+        alarm_state.STATES.clear()
+
+    def test_initial_state(self):
+        """ Ensure that alarms start as INSUFFICIENT """
+        self.assertEqual(
+            alarm_state.get_state('my_table', None, 'high-throughput-alarm'),
+            alarm_state.INSUFFICIENT)
+
+    def test_notify_on_transition_only(self):
+        """ Ensure that an active alarm is only notified once """
+        result = alarm_state.evaluate(
+            'my_table', None, 'high-throughput-alarm', True, 0)
+        self.assertEqual(result, alarm_state.ALARM)
+        result = alarm_state.evaluate(
+            'my_table', None, 'high-throughput-alarm', True, 0)
+        self.assertEqual(result, None)
+
+    def test_recovery(self):
+        """ Ensure that OK is notified when an alarm clears """
+        alarm_state.evaluate('my_table', 'my_gsi', 'low', True, 0)
+        result = alarm_state.evaluate('my_table', 'my_gsi', 'low', False, 0)
+        self.assertEqual(result, alarm_state.OK)
+        result = alarm_state.evaluate('my_table', 'my_gsi', 'low', False, 0)
+        self.assertEqual(result, None)
+
+    def test_no_recovery_from_insufficient(self):
+        """ Ensure that OK is not notified for never triggered alarms """
+        result = alarm_state.evaluate('my_table', None, 'low', False, 0)
+        self.assertEqual(result, None)
+        self.assertEqual(
+            alarm_state.get_state('my_table', None, 'low'), alarm_state.OK)
+
+    def test_reminder(self):
+        """ Ensure that active alarms are repeated after the interval """
+        alarm_state.STATES[('my_table', None, 'high')] = (
+            alarm_state.ALARM, 0)
+        result = alarm_state.evaluate('my_table', None, 'high', True, 3600)
+        self.assertEqual(result, alarm_state.ALARM)
+        result = alarm_state.evaluate('my_table', None, 'high', True, 3600)
+        self.assertEqual(result, None)
+
+if __name__ == '__main__':
+    unittest.main(verbosity=2)
@@ -0,0 +1,118 @@
+# -*- coding: utf-8 -*-
+""" Testing the API call accounting """
+import unittest
+
+from dynamic_dynamodb.aws import api_accountant
+
+
+class TestTokenBucket(unittest.TestCase):
+    """ Test the rate limiting """
+
+    def test_burst(self):
+        """ Ensure that a full bucket does not wait """
+        bucket = api_accountant.TokenBucket(100)
+
+        waits = [bucket.acquire() for _ in range(100)]
+
+        self.assertEqual(max(waits), 0)
+
+    def test_wait(self):
+        """ Ensure that an empty bucket waits for a token """
+        bucket = api_accountant.TokenBucket(100)
+        bucket.tokens = 0
+
+        self.assertTrue(bucket.acquire() > 0)
+
+    def test_drain(self):
+        """ Ensure that a drained bucket makes the next call wait """
+        bucket = api_accountant.TokenBucket(100)
+        bucket.drain()
+
+        self.assertTrue(bucket.tokens <= -100)
+
+
+class TestParseRateLimits(unittest.TestCase):
+    """ Test the api-rate-limits option """
+
+    def test_parse(self):
+        """ Ensure that one bucket is created per operation """
+        buckets = api_accountant.parse_rate_limits(
+            'describe_table:10, update_table:0.5')
+
+        self.assertEqual(sorted(buckets), ['describe_table', 'update_table'])
+        self.assertEqual(buckets['update_table'].rate, 0.5)
+        self.assertEqual(buckets['update_table'].capacity, 1)
+
+    def test_malformatted(self):
+        """ Ensure that malformatted limits are rejected """
+        for rate_limits in ['describe_table', 'describe_table:x', 'a:0']:
+            self.assertRaises(
+                ValueError, api_accountant.parse_rate_limits, rate_limits)
+
+
+class TestPrioritize(unittest.TestCase):
+    """ Test the table ordering and deferral """
+
+    def setUp(self):
+        api_accountant.TABLE_STATE.clear()
+        api_accountant.TABLE_COSTS.clear()
+        api_accountant.DEFERRALS.clear()
+        api_accountant.CYCLE_CALLS.clear()
+
+        for table_name, throttled, consumed in [
+                ('busy', 0, 50.0),
+                ('idle', 0, 0.0),
+                ('throttled', 5, 100.0)]:
+            api_accountant.set_table(table_name)
+            api_accountant.observe(table_name, consumed, throttled)
+            api_accountant.TABLE_COSTS[table_name] = 10
+        api_accountant.set_table(None)
+
+        self.tables = [('busy', 'b'), ('idle', 'i'), ('throttled', 't')]
+        self.budget = api_accountant.get_global_option
+
+    def tearDown(self):
+        api_accountant.get_global_option = self.budget
+
+    def __set_budget(self, budget):
+        """ Set the api-cycle-budget option """
+        api_accountant.get_global_option = lambda option: budget
+
+    def test_order(self):
+        """ Ensure that throttled tables go first and idle tables last """
+        self.__set_budget(None)
+
+        selected, deferred = api_accountant.prioritize(self.tables)
+
+        self.assertEqual(
+            [table_name for table_name, _ in selected],
+            ['throttled', 'busy', 'idle'])
+        self.assertEqual(deferred, [])
+
+    def test_defer(self):
+        """ Ensure that the tables over budget are deferred """
+        self.__set_budget(25)
+
+        selected, deferred = api_accountant.prioritize(self.tables)
+
+        self.assertEqual(
+            [table_name for table_name, _ in selected],
+            ['throttled', 'busy'])
+        self.assertEqual(deferred, [('idle', 'i')])
+
+    def test_max_deferrals(self):
+        """ Ensure that idle tables are not deferred forever """
+        self.__set_budget(25)
+
+        for _ in range(api_accountant.MAX_DEFERRALS):
+            api_accountant.prioritize(self.tables)
+        selected, deferred = api_accountant.prioritize(self.tables)
+
+        self.assertEqual(
+            [table_name for table_name, _ in selected],
+            ['throttled', 'idle'])
+        self.assertEqual(deferred, [('busy', 'b')])
+
+
+if __name__ == '__main__':
+    unittest.main(verbosity=2)
@@ -0,0 +1,167 @@
+# -*- coding: utf-8 -*-
+""" Testing the billing mode advisor """
+import unittest
+
+from dynamic_dynamodb.core import billing_advisor
+
+
+def make_sample(read_units, peak_reads, provisioned_reads=None):
+    """ Return a one hour sample without writes """
+    return {
+        'timestamp': 0,
+        'hours': 1.0,
+        'read_units': read_units,
+        'write_units': 0,
+        'peak_reads': peak_reads,
+        'peak_writes': 0,
+        'provisioned_reads': provisioned_reads,
+        'provisioned_writes': provisioned_reads and 1,
+        'gsi_peaks': {}
+    }
+
+
+class FakeDynamoDB(object):
+    """ DynamoDB calls of the billing advisor """
+    def __init__(self, billing_mode):
+        self.billing_mode = billing_mode
+        self.lookups = 0
+        self.switches = []
+
+    def get_table_billing_mode(self, table_name):
+        """ Return the billing mode """
+        self.lookups += 1
+        return self.billing_mode, None
+
+    def get_table_status(self, table_name):
+        """ Return the table status """
+        return 'ACTIVE'
+
+    def table_gsis(self, table_name):
+        """ Return the GSIs """
+        return [{u'IndexName': u'my_gsi'}]
+
+    def update_table_billing_mode(
+            self, table_name, billing_mode, reads, writes, gsi_units):
+        """ Record the switch """
+        self.switches.append((billing_mode, reads, writes, gsi_units))
+
+
+class TestBillingAdvisor(unittest.TestCase):
+    """ Test the billing mode cost model """
+
+    def test_provisioned_cost(self):
+        """ Ensure that the provisioned cost uses the provisioning """
+        provisioned_cost, _ = billing_advisor.estimate_monthly_costs(
+            [make_sample(0, 0, 100)] * 24, 1.0, 5.0, 0.25, 1.25)
+        self.assertAlmostEqual(provisioned_cost, 105.0)
+
+    def test_on_demand_cost(self):
+        """ Ensure that the on-demand cost follows the consumption """
+        _, on_demand_cost = billing_advisor.estimate_monthly_costs(
+            [make_sample(1000000, 1, 100)] * 24, 1.0, 5.0, 0.25, 1.25)
+        self.assertAlmostEqual(
+            on_demand_cost, 0.25 * billing_advisor.HOURS_PER_MONTH)
+
+    def test_on_demand_table_estimate(self):
+        """ Ensure that on-demand tables are priced for their peak """
+        provisioned_cost, _ = billing_advisor.estimate_monthly_costs(
+            [make_sample(0, 7)], 1.0, 5.0, 0.25, 1.25)
+        # 7 units at 70% utilization needs 10 reads, and at least 1 write
+        self.assertAlmostEqual(provisioned_cost, 15.0)
+
+    def test_recommend_margin(self):
+        """ Ensure that a switch needs a clear saving """
+        self.assertEqual(
+            billing_advisor.recommend('PROVISIONED', 100, 90),
+            'PROVISIONED')
+        self.assertEqual(
+            billing_advisor.recommend('PROVISIONED', 100, 50),
+            'PAY_PER_REQUEST')
+        self.assertEqual(
+            billing_advisor.recommend('PAY_PER_REQUEST', 50, 100),
+            'PROVISIONED')
+
+
+class TestBillingModeSwitch(unittest.TestCase):
+    """ Test the billing mode cache and the switch """
+
+    def setUp(self):
+        self.originals = dict(
+            (name, getattr(billing_advisor, name)) for name in [
+                'dynamodb', 'lease', 'sns', 'get_table_option',
+                'get_gsi_option'])
+        self.dynamodb = FakeDynamoDB(billing_advisor.PAY_PER_REQUEST)
+        billing_advisor.dynamodb = self.dynamodb
+        billing_advisor.lease = FakeLease()
+        billing_advisor.sns = FakeSNS()
+        billing_advisor.get_table_option = lambda key_name, option: {
+            'gsis': {'my_.*': {}},
+            'min_provisioned_reads': 5,
+            'max_provisioned_writes': 100}.get(option)
+        billing_advisor.get_gsi_option = \
+            lambda key_name, gsi_key, option: {
+                'min_provisioned_writes': 20,
+                'max_provisioned_reads': 10}.get(option)
+        billing_advisor.BILLING_MODES.clear()
+        billing_advisor.HISTORY.clear()
+        billing_advisor.LAST_SWITCH.clear()
+
+    def tearDown(self):
+        for name, value in self.originals.items():
+            setattr(billing_advisor, name, value)
+        billing_advisor.BILLING_MODES.clear()
+        billing_advisor.HISTORY.clear()
+        billing_advisor.LAST_SWITCH.clear()
+
+    def test_cached_billing_mode(self):
+        """ Ensure that the billing mode is looked up once an interval """
+        self.assertTrue(billing_advisor.is_on_demand('my_table'))
+        billing_advisor.get_billing_mode('my_table')
+        self.assertEqual(self.dynamodb.lookups, 1)
+
+        billing_mode, last_switch, looked_up = \
+            billing_advisor.BILLING_MODES['my_table']
+        billing_advisor.BILLING_MODES['my_table'] = (
+            billing_mode,
+            last_switch,
+            looked_up - billing_advisor.SAMPLE_INTERVAL)
+        billing_advisor.get_billing_mode('my_table')
+        self.assertEqual(self.dynamodb.lookups, 2)
+
+    def test_switch_to_provisioned(self):
+        """ Ensure that the GSIs are sized from the same day of samples """
+        old_sample = make_sample(0, 700)
+        old_sample['gsi_peaks'] = {'my_gsi': (700, 700)}
+        sample = make_sample(0, 7)
+        sample['peak_writes'] = 700
+        sample['gsi_peaks'] = {'my_gsi': (70, 7)}
+        billing_advisor.HISTORY['my_table'] = (
+            [old_sample] + [sample] * billing_advisor.MIN_HISTORY_HOURS)
+        billing_advisor.get_billing_mode('my_table')
+
+        switch = getattr(billing_advisor, '__switch')
+        self.assertTrue(switch(
+            'my_table', 'my_key', billing_advisor.PROVISIONED, None))
+        self.assertEqual(
+            self.dynamodb.switches,
+            [(billing_advisor.PROVISIONED, 10, 100, {u'my_gsi': (10, 20)})])
+
+        # The billing mode is looked up again after the switch
+        billing_advisor.get_billing_mode('my_table')
+        self.assertEqual(self.dynamodb.lookups, 2)
+
+
+class FakeLease(object):
+    """ Lease held by this instance """
+    def is_leader(self):
+        """ Return True """
+        return True
+
+
+class FakeSNS(object):
+    """ SNS without notifications """
+    def publish_table_notification(self, *args, **kwargs):
+        """ Ignore the notification """
+
+if __name__ == '__main__':
+    unittest.main(verbosity=2)
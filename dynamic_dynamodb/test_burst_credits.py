@@ -0,0 +1,50 @@
+# -*- coding: utf-8 -*-
+""" Testing the burst credit model """
+import unittest
+
+from dynamic_dynamodb.core import burst_credits
+
+
+class TestBurstCredits(unittest.TestCase):
+    """ Test the burst credit estimates """
+
+    def test_estimate_credits(self):
+        """ Ensure that unused capacity is saved as credits """
+        credits = burst_credits.estimate_credits(100, [50, 50])
+        self.assertEqual(credits, 6000)
+
+    def test_estimate_credits_cap(self):
+        """ Ensure that credits are capped at 300 seconds """
+        credits = burst_credits.estimate_credits(100, [0] * 10)
+        self.assertEqual(credits, 30000)
+
+    def test_estimate_credits_spent(self):
+        """ Ensure that credits are spent and never negative """
+        credits = burst_credits.estimate_credits(100, [50, 200, 200])
+        self.assertEqual(credits, 0)
+
+    def test_absorb_spike(self):
+        """ Ensure that a spike is absorbed by full credits """
+        result = burst_credits.get_provisioning(
+            100, 150, [0] * 10 + [120], 90, 300, 'test')
+        self.assertEqual(result, 100)
+
+    def test_scale_ahead(self):
+        """ Ensure that we scale up when credits are running out """
+        result = burst_credits.get_provisioning(
+            100, 150, [100] * 10 + [180], 90, 300, 'test')
+        self.assertEqual(result, 200)
+
+    def test_no_history(self):
+        """ Ensure that the proposal is kept without history """
+        result = burst_credits.get_provisioning(100, 150, [], 90, 300, 'test')
+        self.assertEqual(result, 150)
+
+    def test_within_provisioning(self):
+        """ Ensure that the proposal is kept below the provisioning """
+        result = burst_credits.get_provisioning(
+            100, 120, [95] * 10, 90, 300, 'test')
+        self.assertEqual(result, 120)
+
+if __name__ == '__main__':
+    unittest.main(verbosity=2)
@@ -153,5 +153,29 @@ class TestCalculators(unittest.TestCase):
         result = calculators.increase_writes_in_units(20, 10, 25, 'test')
         self.assertEqual(result, 25)
 
+    def test_target_tracking_units(self):
+        """ Ensure that target tracking reaches the target in one step """
+        result = calculators.target_tracking_units(
+            100, 300, 0, 5, 75, 1.0, None, None, 'test')
+        self.assertEqual(result, 400)
+
+    def test_target_tracking_units_throttled(self):
+        """ Ensure that throttled events are added to the demand """
+        result = calculators.target_tracking_units(
+            100, 60, 3000, 5, 50, 1.0, None, None, 'test')
+        self.assertEqual(result, 140)
+
+    def test_target_tracking_units_damping(self):
+        """ Ensure that the damping factor is applied """
+        result = calculators.target_tracking_units(
+            100, 300, 0, 5, 75, 0.5, None, None, 'test')
+        self.assertEqual(result, 250)
+
+    def test_target_tracking_units_hit_max_value(self):
+        """ Check that max values are honoured """
+        result = calculators.target_tracking_units(
+            100, 300, 0, 5, 75, 1.0, None, 200, 'test')
+        self.assertEqual(result, 200)
+
 if __name__ == '__main__':
     unittest.main(verbosity=2)
@@ -0,0 +1,200 @@
+# -*- coding: utf-8 -*-
+""" Testing the capacity budget allocation """
+import unittest
+
+from dynamic_dynamodb.aws import dynamodb
+from dynamic_dynamodb.core import capacity_budget, gsi_coupling
+
+
+def make_request(
+        table_name, current_reads, current_writes, reads, writes,
+        throttled=False, priority=0):
+    """ Return a request dict as built by capacity_budget.request() """
+    return {
+        'table_name': table_name,
+        'table_key': table_name,
+        'gsi_name': None,
+        'gsi_key': None,
+        'current_reads': current_reads,
+        'current_writes': current_writes,
+        'reads': reads,
+        'writes': writes,
+        'throttled': throttled,
+        'priority': priority
+    }
+
+
+class TestAllocate(unittest.TestCase):
+    """ Test the capacity budget allocation """
+
+    def allocate(self, requests, max_reads=None, max_writes=None,
+                 monthly_cost=None):
+        """ Allocate with 100 reads and 100 writes already provisioned """
+        allocations = capacity_budget.allocate(
+            requests, 100, 100, max_reads, max_writes, monthly_cost, 1, 5)
+        return dict(
+            (req['table_name'], (reads, writes))
+            for req, reads, writes in allocations)
+
+    def test_within_budget(self):
+        """ Ensure that all increases are granted when they fit """
+        result = self.allocate(
+            [make_request('a', 10, 10, 20, 20),
+             make_request('b', 10, 10, 30, 10)],
+            max_reads=200,
+            max_writes=200)
+        self.assertEqual(result, {'a': (20, 20), 'b': (30, 10)})
+
+    def test_throttled_first(self):
+        """ Ensure that throttled tables get their increases first """
+        result = self.allocate(
+            [make_request('a', 10, 10, 20, 10, priority=10),
+             make_request('b', 10, 10, 20, 10, throttled=True)],
+            max_reads=110)
+        self.assertEqual(result, {'a': (10, 10), 'b': (20, 10)})
+
+    def test_priority(self):
+        """ Ensure that higher priorities go first and partial grants """
+        result = self.allocate(
+            [make_request('a', 10, 10, 30, 10),
+             make_request('b', 10, 10, 20, 10, priority=1)],
+            max_reads=115)
+        self.assertEqual(result, {'a': (15, 10), 'b': (20, 10)})
+
+    def test_decrease_frees_budget(self):
+        """ Ensure that decreases make room for increases """
+        result = self.allocate(
+            [make_request('a', 10, 10, 30, 10),
+             make_request('b', 50, 10, 30, 10)],
+            max_reads=100)
+        self.assertEqual(result, {'a': (30, 10), 'b': (30, 10)})
+
+    def test_monthly_cost(self):
+        """ Ensure that the monthly cost limits the increases """
+        # 100 reads at 1 and 100 writes at 5 cost 600 a month
+        result = self.allocate(
+            [make_request('a', 10, 10, 20, 20)],
+            monthly_cost=630)
+        self.assertEqual(result, {'a': (20, 14)})
+
+
+class FakeConnection(object):
+    """ DynamoDB connection with two tables of 10 reads and 5 writes """
+    def __init__(self):
+        self.calls = 0
+
+    def list_tables(self, *args):
+        """ List the tables """
+        self.calls += 1
+        return {u'TableNames': [u'a', u'b']}
+
+    def describe_table(self, table_name):
+        """ Describe a table """
+        self.calls += 1
+        return {u'Table': {u'ProvisionedThroughput': {
+            u'ReadCapacityUnits': 10, u'WriteCapacityUnits': 5}}}
+
+
+class TestAccountProvisioning(unittest.TestCase):
+    """ Test the cached account provisioning """
+
+    def setUp(self):
+        self.connection = dynamodb.DYNAMODB_CONNECTION
+        self.fake = FakeConnection()
+        dynamodb.DYNAMODB_CONNECTION = self.fake
+        dynamodb.ACCOUNT_PROVISIONING = (0, None)
+
+    def tearDown(self):
+        dynamodb.DYNAMODB_CONNECTION = self.connection
+        dynamodb.ACCOUNT_PROVISIONING = (0, None)
+
+    def test_cached(self):
+        """ Ensure that the tables are only described once per TTL """
+        self.assertEqual(
+            dynamodb.get_account_provisioning(), {'reads': 20, 'writes': 10})
+        calls = self.fake.calls
+        dynamodb.get_account_provisioning()
+
+        self.assertEqual(self.fake.calls, calls)
+
+    def test_add(self):
+        """ Ensure that granted changes are added to the cached total """
+        dynamodb.get_account_provisioning()
+        dynamodb.add_account_provisioning(5, -2)
+
+        self.assertEqual(
+            dynamodb.get_account_provisioning(), {'reads': 25, 'writes': 8})
+
+    def test_expired(self):
+        """ Ensure that the total is read again after the TTL """
+        dynamodb.get_account_provisioning()
+        dynamodb.ACCOUNT_PROVISIONING = (
+            0, dynamodb.ACCOUNT_PROVISIONING[1])
+        calls = self.fake.calls
+        dynamodb.get_account_provisioning()
+
+        self.assertEqual(self.fake.calls, calls * 2)
+
+
+class FakeDynamoDB(object):
+    """ Stand-in for the dynamodb module recording the updates """
+    def __init__(self, outcome):
+        self.outcome = outcome
+        self.updates = []
+
+    def get_account_provisioning(self):
+        """ Return the account provisioning """
+        return {'reads': 100, 'writes': 100}
+
+    def add_account_provisioning(self, reads, writes):
+        """ Ignore changes of the account provisioning """
+        pass
+
+    def update_table_provisioning(
+            self, table_name, key_name, reads, writes, cooldown_state=None):
+        """ Record the update """
+        self.updates.append((table_name, reads, writes, cooldown_state))
+        return self.outcome
+
+
+class TestApply(unittest.TestCase):
+    """ Test applying the allocation """
+
+    def setUp(self):
+        self.dynamodb = capacity_budget.dynamodb
+        del capacity_budget.REQUESTS[:]
+
+    def tearDown(self):
+        capacity_budget.dynamodb = self.dynamodb
+        del capacity_budget.REQUESTS[:]
+
+    def test_cooldown_state_passed(self):
+        """ Ensure that the update gets the cooldown state of the request """
+        capacity_budget.dynamodb = FakeDynamoDB('updated')
+        state = {}
+        capacity_budget.request(
+            'my_table', 'my_table', None, None, 10, 10, 20, 10, False, 0,
+            state)
+
+        capacity_budget.apply()
+
+        self.assertEqual(
+            capacity_budget.dynamodb.updates, [('my_table', 20, 10, state)])
+        self.assertEqual(capacity_budget.REQUESTS, [])
+
+    def test_coupling_after_grant(self):
+        """ Ensure that the GSIs only follow granted table write increases """
+        gsi_coupling.GRANTED_INCREASES.clear()
+        for outcome, granted in [('failed', {}), ('updated', {'t': 20})]:
+            capacity_budget.dynamodb = FakeDynamoDB(outcome)
+            capacity_budget.request(
+                't', 't', None, None, 10, 10, 10, 20, False, 0)
+
+            capacity_budget.apply()
+
+            self.assertEqual(gsi_coupling.GRANTED_INCREASES, granted)
+        gsi_coupling.GRANTED_INCREASES.clear()
+
+
+if __name__ == '__main__':
+    unittest.main(verbosity=2)
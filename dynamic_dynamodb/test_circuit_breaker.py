@@ -0,0 +1,136 @@
+# -*- coding: utf-8 -*-
+""" Testing the circuit breaker """
+import unittest
+
+import requests
+
+from dynamic_dynamodb.core import circuit_breaker
+
+
+class FakeResponse(object):
+    """ HTTP response """
+    def __init__(self, status_code, states=None):
+        self.status_code = status_code
+        self.states = states
+
+    def json(self):
+        """ Return the decoded body """
+        if self.states is None:
+            raise ValueError('No JSON object could be decoded')
+        return self.states
+
+
+class FakeSession(object):
+    """ requests session answering from a dict of responses """
+    def __init__(self, responses):
+        self.responses = responses
+        self.calls = []
+
+    def get(self, url, auth=None, timeout=None, headers=None):
+        """ Record the call and return the response for the URL """
+        self.calls.append((url, headers))
+        response = self.responses[url]
+        if isinstance(response, Exception):
+            raise response
+        return response
+
+
+class TestCircuitBreaker(unittest.TestCase):
+    """ Test the circuit breaker lookups """
+
+    def setUp(self):
+        self.originals = dict(
+            (name, getattr(circuit_breaker, name)) for name in [
+                'SESSION', 'get_global_option', 'get_table_option',
+                'get_gsi_option'])
+        self.global_options = {
+            'circuit_breaker_url': 'http://cb/state',
+            'circuit_breaker_batch_url': None,
+            'circuit_breaker_timeout': 500,
+            'circuit_breaker_cache_ttl': 0
+        }
+        circuit_breaker.get_global_option = self.global_options.get
+        circuit_breaker.get_table_option = lambda table_key, option: None
+        circuit_breaker.get_gsi_option = \
+            lambda table_key, gsi_key, option: None
+        self.session = FakeSession({
+            'http://cb/state': FakeResponse(200),
+            'http://cb/batch': FakeResponse(
+                200, {'my_table': 'closed', 'my_table:my_gsi': 'OPEN'})
+        })
+        circuit_breaker.SESSION = self.session
+        circuit_breaker.CACHE.clear()
+        circuit_breaker.BATCH_CACHE.clear()
+
+    def tearDown(self):
+        for name, value in self.originals.items():
+            setattr(circuit_breaker, name, value)
+        circuit_breaker.CACHE.clear()
+        circuit_breaker.BATCH_CACHE.clear()
+
+    def test_closed(self):
+        """ Ensure that a 2xx response closes the circuit """
+        self.assertFalse(circuit_breaker.is_open('my_table', 'my_key'))
+        self.assertEqual(
+            self.session.calls,
+            [('http://cb/state', {'x-table-name': 'my_table'})])
+
+    def test_open(self):
+        """ Ensure that errors and other status codes open the circuit """
+        self.session.responses['http://cb/state'] = FakeResponse(503)
+        self.assertTrue(circuit_breaker.is_open('my_table', 'my_key'))
+
+        self.session.responses['http://cb/state'] = \
+            requests.exceptions.Timeout('timed out')
+        self.assertTrue(circuit_breaker.is_open('my_table', 'my_key'))
+
+    def test_cache_ttl(self):
+        """ Ensure that responses are cached for the TTL """
+        self.global_options['circuit_breaker_cache_ttl'] = 60
+        circuit_breaker.is_open('my_table', 'my_key')
+        circuit_breaker.is_open('my_table', 'my_key')
+        circuit_breaker.is_open('other_table', 'my_key')
+        self.assertEqual(len(self.session.calls), 2)
+
+        # Expire the cached states
+        for key, (timestamp, value) in circuit_breaker.CACHE.items():
+            circuit_breaker.CACHE[key] = (timestamp - 61, value)
+        circuit_breaker.is_open('my_table', 'my_key')
+        self.assertEqual(len(self.session.calls), 3)
+
+    def test_no_cache(self):
+        """ Ensure that nothing is cached without a TTL """
+        circuit_breaker.is_open('my_table', 'my_key')
+        circuit_breaker.is_open('my_table', 'my_key')
+        self.assertEqual(len(self.session.calls), 2)
+
+    def test_batch(self):
+        """ Ensure that the batch states are used and shared """
+        self.global_options['circuit_breaker_batch_url'] = 'http://cb/batch'
+        self.global_options['circuit_breaker_cache_ttl'] = 60
+        self.assertFalse(circuit_breaker.is_open('my_table', 'my_key'))
+        self.assertTrue(circuit_breaker.is_open(
+            'my_table', 'my_key', 'my_gsi', 'gsi_key'))
+        self.assertEqual(self.session.calls, [('http://cb/batch', None)])
+
+    def test_batch_fallback(self):
+        """ Ensure that missing tables fall back to the URL """
+        self.global_options['circuit_breaker_batch_url'] = 'http://cb/batch'
+        self.session.responses['http://cb/state'] = FakeResponse(503)
+        self.assertTrue(circuit_breaker.is_open('other_table', 'my_key'))
+        self.assertEqual(
+            [url for url, _ in self.session.calls],
+            ['http://cb/batch', 'http://cb/state'])
+
+    def test_batch_only(self):
+        """ Ensure that the batch endpoint works without a URL """
+        self.global_options['circuit_breaker_url'] = None
+        self.global_options['circuit_breaker_batch_url'] = 'http://cb/batch'
+        self.assertFalse(circuit_breaker.is_open('other_table', 'my_key'))
+
+        # Invalid JSON fails the batch call, opening the circuit
+        self.session.responses['http://cb/batch'] = FakeResponse(200)
+        self.assertTrue(circuit_breaker.is_open('my_table', 'my_key'))
+
+if __name__ == '__main__':
+    unittest.main(verbosity=2)
@@ -0,0 +1,42 @@
+# -*- coding: utf-8 -*-
+""" Testing the cooldown gate """
+import time
+import unittest
+
+from dynamic_dynamodb.core import cooldown
+
+
+class TestCooldown(unittest.TestCase):
+    """ Test the cooldown gate """
+
+    def test_no_previous_change(self):
+        """ Ensure that the first change is let through """
+        self.assertEqual(
+            cooldown.gate('reads', 10, 20, {}, 60, 60, 'my_table'), 20)
+
+    def test_increase_within_cooldown(self):
+        """ Ensure that an increase right after a change is held back """
+        state = {}
+        cooldown.record('reads', state)
+        self.assertEqual(
+            cooldown.gate('reads', 10, 20, state, 60, 0, 'my_table'), 10)
+        self.assertEqual(
+            cooldown.gate('reads', 10, 5, state, 60, 0, 'my_table'), 5)
+
+    def test_decrease_within_cooldown(self):
+        """ Ensure that a decrease right after a change is held back """
+        state = {}
+        cooldown.record('writes', state)
+        self.assertEqual(
+            cooldown.gate('writes', 10, 5, state, 0, 60, 'my_table'), 10)
+        self.assertEqual(
+            cooldown.gate('reads', 10, 5, state, 0, 60, 'my_table'), 5)
+
+    def test_cooldown_passed(self):
+        """ Ensure that changes go through after the cooldown """
+        state = {'reads': time.time() - 120}
+        self.assertEqual(
+            cooldown.gate('reads', 10, 5, state, 60, 60, 'my_table'), 5)
+
+if __name__ == '__main__':
+    unittest.main(verbosity=2)
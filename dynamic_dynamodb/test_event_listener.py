@@ -0,0 +1,162 @@
+# -*- coding: utf-8 -*-
+""" Testing the Dynamic DynamoDB event listener """
+import json
+import unittest
+from StringIO import StringIO
+
+from dynamic_dynamodb import event_listener
+from dynamic_dynamodb.event_listener import parse_notification
+
+
+class TestParseNotification(unittest.TestCase):
+    """ Test parsing of alarm notifications """
+
+    def test_simple_table(self):
+        """ Ensure that the simple format works for tables """
+        result = parse_notification('{"table": "my_table"}')
+        self.assertEqual(result, ('my_table', None))
+
+    def test_simple_gsi(self):
+        """ Ensure that the simple format works for GSIs """
+        result = parse_notification('{"table": "my_table", "gsi": "my_gsi"}')
+        self.assertEqual(result, ('my_table', 'my_gsi'))
+
+    def test_sns_wrapped_alarm(self):
+        """ Ensure that SNS notifications with CloudWatch alarms work """
+        alarm = {
+            'AlarmName': 'my_table-throttled',
+            'NewStateValue': 'ALARM',
+            'Trigger': {
+                'Dimensions': [
+                    {'name': 'TableName', 'value': 'my_table'},
+                    {'name': 'GlobalSecondaryIndexName', 'value': 'my_gsi'}
+                ]
+            }
+        }
+        body = json.dumps({
+            'Type': 'Notification',
+            'Message': json.dumps(alarm)
+        })
+        result = parse_notification(body)
+        self.assertEqual(result, ('my_table', 'my_gsi'))
+
+    def test_alarm_back_to_ok(self):
+        """ Ensure that alarms leaving the ALARM state are ignored """
+        alarm = {
+            'NewStateValue': 'OK',
+            'Trigger': {
+                'Dimensions': [{'name': 'TableName', 'value': 'my_table'}]
+            }
+        }
+        self.assertEqual(parse_notification(json.dumps(alarm)), None)
+
+    def test_subscription_confirmation(self):
+        """ Ensure that subscription confirmations are not queued """
+        body = json.dumps({
+            'Type': 'SubscriptionConfirmation',
+            'SubscribeURL': 'https://sns.example.com/confirm'
+        })
+        self.assertEqual(parse_notification(body), None)
+
+    def test_missing_table_name(self):
+        """ Ensure that alarms without a table dimension are rejected """
+        self.assertRaises(
+            ValueError,
+            parse_notification,
+            '{"NewStateValue": "ALARM", "Trigger": {"Dimensions": []}}')
+
+    def test_invalid_json(self):
+        """ Ensure that invalid JSON is rejected """
+        self.assertRaises(ValueError, parse_notification, 'not json')
+
+    def test_sns_without_message(self):
+        """ Ensure that SNS notifications without a message are rejected """
+        self.assertRaises(
+            ValueError, parse_notification, '{"Type": "Notification"}')
+        self.assertRaises(
+            ValueError,
+            parse_notification,
+            '{"Type": "Notification", "Message": 5}')
+
+    def test_malformed_trigger(self):
+        """ Ensure that malformed alarm triggers are rejected """
+        self.assertRaises(
+            ValueError, parse_notification, '{"Trigger": ["TableName"]}')
+        self.assertRaises(
+            ValueError,
+            parse_notification,
+            '{"Trigger": {"Dimensions": ["TableName"]}}')
+
+    def test_invalid_names(self):
+        """ Ensure that table and GSI names must be strings """
+        self.assertRaises(ValueError, parse_notification, '{"table": 5}')
+        self.assertRaises(
+            ValueError, parse_notification, '{"table": "t", "gsi": ["g"]}')
+
+
+class FakeHandler(event_listener.AlarmRequestHandler):
+    """ Request handler without a connection """
+    def __init__(self, body):
+        self.headers = FakeHeaders({'content-length': str(len(body))})
+        self.rfile = StringIO(body)
+        self.status_codes = []
+
+    def send_response(self, code, message=None):
+        """ Record the status code """
+        self.status_codes.append(code)
+
+    def send_header(self, keyword, value):
+        """ Ignore the headers """
+
+    def end_headers(self):
+        """ Ignore the end of the headers """
+
+
+class FakeHeaders(object):
+    """ Request headers """
+    def __init__(self, headers):
+        self.headers = headers
+
+    def getheader(self, name):
+        """ Return a header value """
+        return self.headers.get(name)
+
+
+class TestAlarmRequestHandler(unittest.TestCase):
+    """ Test the HTTP responses of the event listener """
+
+    def post(self, body):
+        """ POST a body and return the response status code """
+        handler = FakeHandler(body)
+        handler.do_POST()
+        return handler.status_codes[0]
+
+    def tearDown(self):
+        while not event_listener.EVENT_QUEUE.empty():
+            event_listener.EVENT_QUEUE.get_nowait()
+
+    def test_accepted(self):
+        """ Ensure that valid notifications are queued """
+        self.assertEqual(self.post('{"table": "my_table"}'), 202)
+        self.assertEqual(
+            event_listener.EVENT_QUEUE.get_nowait(), ('my_table', None))
+
+    def test_no_action(self):
+        """ Ensure that notifications without action are not queued """
+        self.assertEqual(self.post('{"NewStateValue": "OK"}'), 204)
+
+    def test_malformed(self):
+        """ Ensure that malformed bodies get a 400 response """
+        for body in [
+                'not json',
+                '[]',
+                '{"Type": "Notification"}',
+                '{"Type": "Notification", "Message": "[1]"}',
+                '{"Trigger": {"Dimensions": {"name": "TableName"}}}',
+                '{"Trigger": {"Dimensions": [null]}}',
+                '{"table": null}']:
+            self.assertEqual(self.post(body), 400, body)
+        self.assertTrue(event_listener.EVENT_QUEUE.empty())
+
+if __name__ == '__main__':
+    unittest.main(verbosity=2)
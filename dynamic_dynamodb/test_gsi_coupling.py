@@ -0,0 +1,73 @@
+# -*- coding: utf-8 -*-
+""" Testing the GSI write coupling """
+import unittest
+
+from dynamic_dynamodb.core import gsi_coupling
+
+
+class TestGsiCoupling(unittest.TestCase):
+    """ Test the GSI write coupling """
+
+    def setUp(self):
+        """ Reset the coupling state """
+        gsi_coupling.TABLE_WRITES.clear()
+        gsi_coupling.PENDING_INCREASES.clear()
+        gsi_coupling.GRANTED_INCREASES.clear()
+        gsi_coupling.RATIOS.clear()
+
+    def test_no_pending_increase(self):
+        """ Ensure that nothing is proposed without a table increase """
+        gsi_coupling.observe_table_writes('my_table', 100)
+        gsi_coupling.observe_gsi_writes('my_table', 'my_gsi', 50)
+        self.assertEqual(
+            gsi_coupling.get_gsi_write_units('my_table', 'my_gsi'), 0)
+
+    def test_follow_table_increase(self):
+        """ Ensure that the GSI follows the table using the learned ratio """
+        gsi_coupling.observe_table_writes('my_table', 100)
+        gsi_coupling.observe_gsi_writes('my_table', 'my_gsi', 50)
+        gsi_coupling.table_writes_increased('my_table', 300)
+        self.assertEqual(
+            gsi_coupling.get_gsi_write_units('my_table', 'my_gsi'), 150)
+
+    def test_ratio_smoothing(self):
+        """ Ensure that the ratio is a moving average """
+        gsi_coupling.observe_table_writes('my_table', 100)
+        gsi_coupling.observe_gsi_writes('my_table', 'my_gsi', 50)
+        gsi_coupling.observe_gsi_writes('my_table', 'my_gsi', 100)
+        self.assertAlmostEqual(
+            gsi_coupling.RATIOS[('my_table', 'my_gsi')], 0.6)
+
+    def test_clear_pending_increase(self):
+        """ Ensure that an increase only applies to one check """
+        gsi_coupling.observe_table_writes('my_table', 100)
+        gsi_coupling.observe_gsi_writes('my_table', 'my_gsi', 50)
+        gsi_coupling.table_writes_increased('my_table', 300)
+        gsi_coupling.clear_pending_increase('my_table')
+        self.assertEqual(
+            gsi_coupling.get_gsi_write_units('my_table', 'my_gsi'), 0)
+
+    def test_granted_increase(self):
+        """ Ensure that a granted increase applies to the next check """
+        gsi_coupling.observe_table_writes('my_table', 100)
+        gsi_coupling.observe_gsi_writes('my_table', 'my_gsi', 50)
+        gsi_coupling.table_writes_granted('my_table', 300)
+        self.assertEqual(
+            gsi_coupling.get_gsi_write_units('my_table', 'my_gsi'), 0)
+
+        gsi_coupling.clear_pending_increase('my_table')
+        self.assertEqual(
+            gsi_coupling.get_gsi_write_units('my_table', 'my_gsi'), 150)
+
+        gsi_coupling.clear_pending_increase('my_table')
+        self.assertEqual(
+            gsi_coupling.get_gsi_write_units('my_table', 'my_gsi'), 0)
+
+    def test_idle_table(self):
+        """ Ensure that idle tables do not update the ratio """
+        gsi_coupling.observe_table_writes('my_table', 0)
+        gsi_coupling.observe_gsi_writes('my_table', 'my_gsi', 50)
+        self.assertNotIn(('my_table', 'my_gsi'), gsi_coupling.RATIOS)
+
+if __name__ == '__main__':
+    unittest.main(verbosity=2)
@@ -0,0 +1,133 @@
+# -*- coding: utf-8 -*-
+""" Testing the decision journal """
+import os
+import shutil
+import tempfile
+import unittest
+
+from dynamic_dynamodb import journal
+
+
+def make_record(when, table_name='my_table', provisioned=10, updated=20):
+    """ Create a journal record """
+    return {
+        'time': when,
+        'table': table_name,
+        'gsi': None,
+        'key': '^{0}$'.format(table_name),
+        'outcome': 'updated',
+        'reads': {
+            'provisioned': provisioned,
+            'consumed_percent': 95.0,
+            'throttled': 2,
+            'updated': updated
+        },
+        'writes': {
+            'provisioned': 5,
+            'consumed_percent': 10.0,
+            'throttled': 0,
+            'updated': 5
+        }
+    }
+
+
+class TestJournal(unittest.TestCase):
+    """ Test writing and querying the journal """
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.index_interval = journal.INDEX_INTERVAL
+        journal.INDEX_INTERVAL = 1024
+
+    def tearDown(self):
+        journal.INDEX_INTERVAL = self.index_interval
+        shutil.rmtree(self.directory)
+
+    def __write(self, times, segment_size=4096, retention=None, tables=None):
+        """ Write records at the given times """
+        writer = journal.JournalWriter(
+            self.directory, segment_size, retention)
+        for number, when in enumerate(times):
+            table_name = 'my_table'
+            if tables:
+                table_name = tables[number % len(tables)]
+            writer.write(make_record(when, table_name))
+        writer.close()
+
+    def test_rotation(self):
+        """ Ensure that segments are rotated with a sparse index """
+        self.__write(range(1000, 1200))
+
+        segments = journal.list_segments(self.directory)
+        self.assertTrue(len(segments) > 1)
+        self.assertEqual(segments[0][0], 1000.0)
+        for _, path in segments:
+            self.assertTrue(os.path.exists(journal.index_path(path)))
+            with open(journal.index_path(path)) as index:
+                self.assertTrue(len(index.readlines()) > 1)
+
+    def test_query_time_range(self):
+        """ Ensure that queries return exactly the records in the range """
+        self.__write(range(1000, 1200))
+
+        times = [
+            record['time'] for record in
+            journal.query(self.directory, since=1050, until=1149)]
+
+        self.assertEqual(times, range(1050, 1150))
+
+    def test_query_table(self):
+        """ Ensure that queries can be limited to some tables """
+        self.__write(range(1000, 1010), tables=['orders', 'users'])
+
+        tables = set([
+            record['table'] for record in
+            journal.query(self.directory, table_regexp='^ord')])
+
+        self.assertEqual(tables, set(['orders']))
+
+    def test_continue_segment(self):
+        """ Ensure that a reopened journal continues the latest segment """
+        self.__write([1000, 1001], segment_size=1024 * 1024)
+        self.__write([1002, 1003], segment_size=1024 * 1024)
+
+        self.assertEqual(len(journal.list_segments(self.directory)), 1)
+        self.assertEqual(
+            [record['time'] for record in journal.query(self.directory)],
+            [1000, 1001, 1002, 1003])
+
+    def test_retention(self):
+        """ Ensure that expired segments are removed """
+        day = 24 * 60 * 60
+        self.__write([0, day, 3 * day], segment_size=1, retention=1)
+
+        self.assertEqual(
+            [start for start, _ in journal.list_segments(self.directory)],
+            [day, 3 * day])
+
+    def test_summarize(self):
+        """ Ensure that decisions are counted per table """
+        records = [
+            make_record(1000),
+            make_record(1001, updated=5),
+            make_record(1002, table_name='other')]
+
+        summary = journal.summarize(records)
+
+        self.assertEqual(summary['my_table']['decisions'], 2)
+        self.assertEqual(summary['my_table']['reads_up'], 1)
+        self.assertEqual(summary['my_table']['reads_down'], 1)
+        self.assertEqual(summary['my_table']['writes_up'], 0)
+        self.assertEqual(summary['my_table']['outcomes'], {'updated': 2})
+        self.assertEqual(summary['other']['decisions'], 1)
+
+    def test_parse_time(self):
+        """ Ensure that absolute and relative times are parsed """
+        self.assertEqual(journal.parse_time('1970-01-02'), 86400)
+        self.assertEqual(journal.parse_time('1970-01-01T01:00'), 3600)
+        self.assertEqual(journal.parse_time('2h', now=10000), 2800)
+        self.assertRaises(ValueError, journal.parse_time, 'yesterday')
+
+
+if __name__ == '__main__':
+    unittest.main(verbosity=2)
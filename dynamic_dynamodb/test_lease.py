@@ -0,0 +1,73 @@
+# -*- coding: utf-8 -*-
+""" Testing the leases """
+import fcntl
+import os
+import shutil
+import tempfile
+import unittest
+
+from dynamic_dynamodb import lease
+
+
+class TestFileLease(unittest.TestCase):
+    """ Test the file lease backend """
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.get_global_option = lease.get_global_option
+        lease.get_global_option = {
+            'lease_backend': 'file',
+            'lease_dir': self.directory,
+            'lease_duration': 60,
+            'shard_index': 0,
+            'shard_count': 1,
+            'instance': 'default'
+        }.get
+
+    def tearDown(self):
+        lease.release()
+        lease.get_global_option = self.get_global_option
+        shutil.rmtree(self.directory)
+
+    def __lock(self):
+        """ Take the lease as another instance """
+        lock_file = open(os.path.join(
+            self.directory, '{0}.lock'.format(lease.get_lease_name())), 'a')
+        fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        return lock_file
+
+    def test_take(self):
+        """ Ensure that a free lease is taken and kept """
+        self.assertFalse(lease.is_leader())
+
+        self.assertTrue(lease.renew())
+        self.assertTrue(lease.is_leader())
+        self.assertTrue(lease.renew())
+
+    def test_standby(self):
+        """ Ensure that a lease held by another instance is not taken """
+        other = self.__lock()
+
+        self.assertFalse(lease.renew())
+        self.assertFalse(lease.is_leader())
+
+        other.close()
+        self.assertTrue(lease.renew())
+
+    def test_release(self):
+        """ Ensure that a released lease can be taken by another instance """
+        lease.renew()
+        lease.release()
+
+        self.assertFalse(lease.is_leader())
+        self.__lock().close()
+
+    def test_no_backend(self):
+        """ Ensure that an instance without lease is always the leader """
+        lease.get_global_option = {}.get
+
+        self.assertTrue(lease.is_leader())
+
+
+if __name__ == '__main__':
+    unittest.main(verbosity=2)
@@ -0,0 +1,183 @@
+# -*- coding: utf-8 -*-
+""" Testing the structured logging """
+import json
+import logging
+import unittest
+
+from dynamic_dynamodb import log_handler
+
+
+class RecordingHandler(logging.Handler):
+    """ Handler keeping the records it receives """
+    def __init__(self):
+        logging.Handler.__init__(self)
+        self.records = []
+
+    def emit(self, record):
+        self.records.append(record)
+
+
+class ExitRegistry(object):
+    """ Stand-in for atexit recording the handlers """
+    def __init__(self, handlers):
+        self.handlers = handlers
+
+    def register(self, handler):
+        """ Record the handler """
+        self.handlers.append(handler)
+
+
+class TestStructuredLogger(unittest.TestCase):
+    """ Test the deferred formatting and the fields """
+
+    def setUp(self):
+        self.handler = RecordingHandler()
+        self.raw_logger = logging.getLogger('test-log-handler')
+        self.raw_logger.propagate = False
+        self.raw_logger.setLevel(logging.INFO)
+        self.raw_logger.addHandler(self.handler)
+        self.logger = log_handler.StructuredLogger(self.raw_logger)
+        log_handler.set_context()
+
+    def tearDown(self):
+        self.raw_logger.removeHandler(self.handler)
+        log_handler.set_context()
+
+    def test_deferred_formatting(self):
+        """ Ensure that the arguments are formatted with str.format """
+        self.logger.info('{0} - Consumed read units: {1:.2f}%', 'T', 12.345)
+
+        self.assertEqual(
+            self.handler.records[0].getMessage(),
+            'T - Consumed read units: 12.35%')
+
+    def test_disabled_level(self):
+        """ Ensure that nothing is formatted below the level """
+        class Explosive(object):
+            """ Argument failing when formatted """
+            def __format__(self, spec):
+                raise AssertionError('Formatted')
+
+        self.logger.debug('{0}', Explosive())
+
+        self.assertEqual(self.handler.records, [])
+
+    def test_fields(self):
+        """ Ensure that the context and keyword fields are attached """
+        log_handler.set_context('my-table', 'my-gsi')
+        self.logger.info('Scaling', decision='scale-up')
+
+        self.assertEqual(
+            self.handler.records[0].fields,
+            {'table': 'my-table', 'gsi': 'my-gsi', 'decision': 'scale-up'})
+
+
+class TestJsonFormatter(unittest.TestCase):
+    """ Test the JSON log format """
+
+    def test_format(self):
+        """ Ensure that the fields are written and None fields skipped """
+        record = logging.LogRecord(
+            'dynamic-dynamodb', logging.INFO, __file__, 1,
+            log_handler.BraceMessage('{0} - done', ('T',)), None, None)
+        record.fields = {'table': 'T', 'gsi': None}
+
+        entry = json.loads(
+            log_handler.JsonFormatter(dry_run=True).format(record))
+
+        self.assertEqual(entry['message'], 'T - done')
+        self.assertEqual(entry['table'], 'T')
+        self.assertEqual(entry['level'], 'INFO')
+        self.assertTrue(entry['dry_run'])
+        self.assertNotIn('gsi', entry)
+
+
+class TestSamplingFilter(unittest.TestCase):
+    """ Test the per table sampling """
+
+    def __record(self, table_name, level=logging.INFO, value=1):
+        """ Create a record for a table """
+        record = logging.LogRecord(
+            'dynamic-dynamodb', level, __file__, 1,
+            log_handler.BraceMessage('{0} - value {1}', (table_name, value)),
+            None, None)
+        record.fields = {'table': table_name}
+        return record
+
+    def test_sampling(self):
+        """ Ensure that one in every rate repetitions is let through """
+        sampling = log_handler.SamplingFilter(rate=3)
+
+        passed = [
+            sampling.filter(self.__record('a', value=value))
+            for value in range(6)]
+
+        self.assertEqual(passed, [True, False, False, True, False, False])
+
+    def test_tables_sampled_separately(self):
+        """ Ensure that each table has its own count """
+        sampling = log_handler.SamplingFilter(rate=3)
+
+        self.assertTrue(sampling.filter(self.__record('a')))
+        self.assertTrue(sampling.filter(self.__record('b')))
+
+    def test_warnings_not_sampled(self):
+        """ Ensure that warnings are always let through """
+        sampling = log_handler.SamplingFilter(rate=3)
+
+        for _ in range(3):
+            self.assertTrue(
+                sampling.filter(self.__record('a', level=logging.WARNING)))
+
+
+class TestAsyncLogging(unittest.TestCase):
+    """ Test the log-async queue """
+
+    def setUp(self):
+        self.original_listener = log_handler.LISTENER
+        self.original_atexit = log_handler.atexit
+        self.exit_handlers = []
+        log_handler.atexit = ExitRegistry(self.exit_handlers)
+        self.handler = RecordingHandler()
+        self.raw_logger = logging.getLogger('test-log-handler-async')
+        self.raw_logger.propagate = False
+        self.raw_logger.setLevel(logging.DEBUG)
+        self.raw_logger.addHandler(self.handler)
+        getattr(log_handler, '__make_async')(self.raw_logger)
+        self.listener = log_handler.LISTENER
+
+    def tearDown(self):
+        for handler in list(self.raw_logger.handlers):
+            self.raw_logger.removeHandler(handler)
+        log_handler.LISTENER = self.original_listener
+        log_handler.atexit = self.original_atexit
+
+    def test_start_listener(self):
+        """ Ensure that records queued before the start are written """
+        self.raw_logger.info('before start')
+        self.assertEqual(self.handler.records, [])
+
+        log_handler.start_listener()
+        self.assertEqual(log_handler.LISTENER, None)
+        self.assertEqual(self.exit_handlers, [self.listener.stop])
+        self.raw_logger.info('after start')
+        self.listener.stop()
+
+        self.assertEqual(
+            [record.getMessage() for record in self.handler.records],
+            ['before start', 'after start'])
+
+    def test_handler_level(self):
+        """ Ensure that the listener respects the handler levels """
+        self.handler.setLevel(logging.WARNING)
+        log_handler.start_listener()
+        self.raw_logger.info('dropped')
+        self.raw_logger.warning('written')
+        self.listener.stop()
+
+        self.assertEqual(
+            [record.getMessage() for record in self.handler.records],
+            ['written'])
+
+if __name__ == '__main__':
+    unittest.main(verbosity=2)
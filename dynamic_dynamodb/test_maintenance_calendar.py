@@ -0,0 +1,98 @@
+# -*- coding: utf-8 -*-
+""" Testing the maintenance window calendar """
+import datetime
+import unittest
+
+from dynamic_dynamodb.aws import dynamodb
+from dynamic_dynamodb.config import maintenance_calendar
+
+# 2014-06-02 is a Monday
+MONDAY = datetime.datetime(2014, 6, 2)
+
+
+def at(days, hours, minutes=0):
+    """ Return a time in the week starting MONDAY """
+    return MONDAY + datetime.timedelta(
+        days=days, hours=hours, minutes=minutes)
+
+
+class TestMaintenanceCalendar(unittest.TestCase):
+    """ Test the maintenance window calendar """
+
+    def test_daily_windows(self):
+        """ Ensure that windows without days apply every day """
+        calendar = maintenance_calendar.parse('22:00-23:59,00:00-06:00')
+        self.assertTrue(calendar.is_open(at(2, 23, 59)))
+        self.assertTrue(calendar.is_open(at(6, 6)))
+        self.assertFalse(calendar.is_open(at(6, 6, 1)))
+        self.assertFalse(calendar.is_open(at(3, 12)))
+
+    def test_overnight_weekdays(self):
+        """ Ensure that overnight windows belong to their start day """
+        calendar = maintenance_calendar.parse('Fri-Sat 22:00-02:00')
+        self.assertTrue(calendar.is_open(at(4, 23)))
+        self.assertTrue(calendar.is_open(at(6, 1)))
+        self.assertFalse(calendar.is_open(at(6, 23)))
+        self.assertFalse(calendar.is_open(at(0, 1)))
+
+    def test_timezone(self):
+        """ Ensure that windows are in the configured timezone """
+        calendar = maintenance_calendar.parse('Mon 00:00-00:59', 'UTC+02:00')
+        self.assertTrue(calendar.is_open(at(-1, 22, 30)))
+        self.assertFalse(calendar.is_open(at(0, 0, 30)))
+
+    def test_next_window_start(self):
+        """ Ensure that the next start wraps around the week """
+        calendar = maintenance_calendar.parse(
+            'Mon 10:00-11:00,Wed 10:00-11:00')
+        self.assertEqual(calendar.next_window_start(at(0, 9)), at(0, 10))
+        self.assertEqual(calendar.next_window_start(at(0, 10)), at(2, 10))
+        self.assertEqual(calendar.next_window_start(at(3, 0)), at(7, 10))
+        self.assertEqual(
+            maintenance_calendar.parse('00:00-22:59').next_window_start(
+                at(1, 5)),
+            at(2, 0))
+
+    def test_invalid(self):
+        """ Ensure that invalid windows are rejected """
+        for windows in ['10:00', 'Mon-Foo 10:00-11:00', '25:00-26:00']:
+            self.assertRaises(
+                ValueError, maintenance_calendar.parse, windows)
+        self.assertRaises(
+            ValueError, maintenance_calendar.parse, '10:00-11:00', 'Foo/Bar')
+
+
+class TestNextWindowStart(unittest.TestCase):
+    """ Test the cached start of the next maintenance window """
+
+    def setUp(self):
+        self.get_next_window_start = getattr(
+            dynamodb, '__get_next_window_start')
+        dynamodb.NEXT_WINDOW_STARTS.clear()
+
+    def tearDown(self):
+        dynamodb.NEXT_WINDOW_STARTS.clear()
+
+    def test_cached(self):
+        """ Ensure that a start in the future is served from the cache """
+        start = datetime.datetime.utcnow() + datetime.timedelta(hours=1)
+        dynamodb.NEXT_WINDOW_STARTS[('00:00-23:59', 'UTC')] = start
+        self.assertEqual(
+            self.get_next_window_start('my_table', '00:00-23:59', 'UTC'),
+            start)
+
+    def test_window_open(self):
+        """ Ensure that passed starts are dropped when the window opens """
+        dynamodb.NEXT_WINDOW_STARTS[('00:00-23:59', 'UTC')] = MONDAY
+        self.assertEqual(
+            self.get_next_window_start('my_table', '00:00-23:59', 'UTC'),
+            None)
+        self.assertEqual(dynamodb.NEXT_WINDOW_STARTS, {})
+
+    def test_malformatted(self):
+        """ Ensure that malformatted windows are left to the update """
+        self.assertEqual(
+            self.get_next_window_start('my_table', '10:00', 'UTC'), None)
+
+if __name__ == '__main__':
+    unittest.main(verbosity=2)
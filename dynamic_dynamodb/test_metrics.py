@@ -0,0 +1,55 @@
+# -*- coding: utf-8 -*-
+""" Testing the metrics """
+import threading
+import unittest
+
+from dynamic_dynamodb import metrics
+
+
+class TestMetrics(unittest.TestCase):
+    """ Test the metrics rendering """
+
+    def test_counter_shards(self):
+        """ Ensure that counters from all threads are summed """
+        metrics.inc('test_counter', table='a')
+        thread = threading.Thread(
+            target=metrics.inc,
+            args=('test_counter', 2),
+            kwargs={'table': 'a'})
+        thread.start()
+        thread.join()
+
+        self.assertIn(
+            'dynamic_dynamodb_test_counter{table="a"} 3.0',
+            metrics.render().splitlines())
+
+    def test_histogram(self):
+        """ Ensure that histogram buckets are cumulative """
+        metrics.observe('test_histogram', 0.02)
+        metrics.observe('test_histogram', 200)
+        lines = metrics.render().splitlines()
+
+        self.assertIn(
+            'dynamic_dynamodb_test_histogram_bucket{le="0.01"} 0', lines)
+        self.assertIn(
+            'dynamic_dynamodb_test_histogram_bucket{le="0.025"} 1', lines)
+        self.assertIn(
+            'dynamic_dynamodb_test_histogram_bucket{le="120"} 1', lines)
+        self.assertIn(
+            'dynamic_dynamodb_test_histogram_bucket{le="+Inf"} 2', lines)
+        self.assertIn('dynamic_dynamodb_test_histogram_count 2', lines)
+
+    def test_scaling_decision_reason(self):
+        """ Ensure that the logged reasons are turned into labels """
+        metrics.record_scaling_decision(
+            'my_table', 'my_gsi', 'writes', 'up',
+            'due to throttled events threshold being exceeded')
+
+        self.assertIn(
+            'dynamic_dynamodb_scaling_decisions_total{direction="up",'
+            'gsi="my_gsi",kind="writes",reason="throttled_events",'
+            'table="my_table"} 1.0',
+            metrics.render().splitlines())
+
+if __name__ == '__main__':
+    unittest.main(verbosity=2)
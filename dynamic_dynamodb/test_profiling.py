@@ -0,0 +1,133 @@
+# -*- coding: utf-8 -*-
+""" Testing the on-demand profiling """
+import os
+import pstats
+import shutil
+import tempfile
+import threading
+import unittest
+
+from dynamic_dynamodb import profiling
+
+
+class FakeLogger(object):
+    """ Logger recording the warnings """
+    def __init__(self):
+        self.warnings = []
+
+    def info(self, message, *args):
+        """ Ignore the message """
+
+    def error(self, message, *args):
+        """ Ignore the message """
+
+    def warning(self, message, *args):
+        """ Record the message """
+        self.warnings.append(message)
+
+
+class TestProfiling(unittest.TestCase):
+    """ Test the profiler toggling and the stack dumps """
+
+    def setUp(self):
+        self.original_get_global_option = profiling.get_global_option
+        self.original_logger = profiling.logger
+        self.profile_dir = tempfile.mkdtemp()
+        profiling.get_global_option = {
+            'profile_cycles': 2,
+            'profile_dir': self.profile_dir,
+            'instance': 'test'}.get
+        profiling.logger = FakeLogger()
+
+    def tearDown(self):
+        if profiling.PROFILER:
+            profiling.PROFILER.disable()
+        profiling.PROFILER = None
+        profiling.CYCLES_LEFT = 0
+        profiling.TOGGLE_REQUESTED.clear()
+        profiling.get_global_option = self.original_get_global_option
+        profiling.logger = self.original_logger
+        shutil.rmtree(self.profile_dir)
+
+    def run_cycle(self):
+        """ Run one check """
+        profiling.start_cycle()
+        sum(range(100))
+        profiling.end_cycle()
+
+    def test_not_requested(self):
+        """ Ensure that nothing is profiled without a request """
+        self.run_cycle()
+        self.assertEqual(profiling.PROFILER, None)
+        self.assertEqual(os.listdir(self.profile_dir), [])
+
+    def test_profile_cycles(self):
+        """ Ensure that profiling stops after profile-cycles checks """
+        profiling.toggle()
+        self.run_cycle()
+        self.assertNotEqual(profiling.PROFILER, None)
+        self.assertEqual(profiling.CYCLES_LEFT, 1)
+        self.assertEqual(os.listdir(self.profile_dir), [])
+
+        self.run_cycle()
+        self.assertEqual(profiling.PROFILER, None)
+
+        files = os.listdir(self.profile_dir)
+        self.assertEqual(len(files), 1)
+        self.assertTrue(files[0].startswith('dynamic-dynamodb.test.'))
+        self.assertTrue(files[0].endswith('.prof'))
+
+        # The statistics are readable by pstats
+        stats = pstats.Stats(os.path.join(self.profile_dir, files[0]))
+        self.assertTrue(stats.total_calls > 0)
+
+    def test_stop_early(self):
+        """ Ensure that a second toggle stops the profiler early """
+        profiling.toggle()
+        profiling.start_cycle()
+        self.assertNotEqual(profiling.PROFILER, None)
+
+        profiling.toggle()
+        profiling.start_cycle()
+        self.assertEqual(profiling.PROFILER, None)
+        self.assertEqual(len(os.listdir(self.profile_dir)), 1)
+
+        # The next check is not profiled
+        profiling.end_cycle()
+        self.run_cycle()
+        self.assertEqual(profiling.PROFILER, None)
+        self.assertEqual(len(os.listdir(self.profile_dir)), 1)
+
+    def test_unwritable_dir(self):
+        """ Ensure that a failed write still stops the profiler """
+        profiling.get_global_option = {
+            'profile_cycles': 1,
+            'profile_dir': os.path.join(self.profile_dir, 'missing'),
+            'instance': 'test'}.get
+        profiling.toggle()
+        self.run_cycle()
+        self.assertEqual(profiling.PROFILER, None)
+
+    def test_dump_stacks(self):
+        """ Ensure that the stack of every thread is logged """
+        event = threading.Event()
+        thread = threading.Thread(target=event.wait, name='test-waiter')
+        thread.start()
+        try:
+            profiling.dump_stacks()
+        finally:
+            event.set()
+            thread.join()
+
+        warnings = profiling.logger.warnings
+        self.assertTrue([
+            warning for warning in warnings
+            if warning.startswith('Stack of thread MainThread') and
+            'test_dump_stacks' in warning])
+        self.assertTrue([
+            warning for warning in warnings
+            if warning.startswith('Stack of thread test-waiter') and
+            'wait' in warning])
+
+if __name__ == '__main__':
+    unittest.main(verbosity=2)
@@ -0,0 +1,176 @@
+# -*- coding: utf-8 -*-
+""" Testing the retry policy """
+import socket
+import ssl
+import unittest
+
+from boto.exception import BotoServerError, JSONResponseError
+
+from dynamic_dynamodb import retry_policy
+
+
+def aws_error(status, error_code):
+    """ Create a DynamoDB error """
+    return JSONResponseError(
+        status, 'Reason', {'__type': 'com.amazon#{0}'.format(error_code)})
+
+
+class TestClassify(unittest.TestCase):
+    """ Test the error classification """
+
+    def test_throttling(self):
+        """ Ensure that throttling errors are recognized """
+        self.assertEqual(
+            retry_policy.classify(aws_error(400, 'ThrottlingException')),
+            retry_policy.THROTTLING)
+
+    def test_transient(self):
+        """ Ensure that server and network errors are transient """
+        self.assertEqual(
+            retry_policy.classify(aws_error(500, 'InternalServerError')),
+            retry_policy.TRANSIENT)
+        self.assertEqual(
+            retry_policy.classify(BotoServerError(503, 'Unavailable')),
+            retry_policy.TRANSIENT)
+        self.assertEqual(
+            retry_policy.classify(socket.timeout('timed out')),
+            retry_policy.TRANSIENT)
+
+    def test_timeout(self):
+        """ Ensure that socket timeouts are recognized """
+        self.assertTrue(retry_policy.is_timeout(socket.timeout('timed out')))
+        self.assertTrue(retry_policy.is_timeout(
+            ssl.SSLError('The read operation timed out')))
+        self.assertFalse(retry_policy.is_timeout(socket.error('refused')))
+
+    def test_fatal(self):
+        """ Ensure that client errors are fatal """
+        self.assertEqual(
+            retry_policy.classify(aws_error(400, 'ValidationException')),
+            retry_policy.FATAL)
+        self.assertEqual(
+            retry_policy.classify(ValueError('bug')), retry_policy.FATAL)
+
+
+class TestCall(unittest.TestCase):
+    """ Test the retries """
+
+    def setUp(self):
+        self.get_global_option = retry_policy.get_global_option
+        self.sleep = retry_policy.time.sleep
+        options = {
+            'retry_attempts': 3,
+            'retry_base_delay': 0.5,
+            'retry_max_delay': 10.0
+        }
+        retry_policy.get_global_option = options.get
+        self.sleeps = []
+        retry_policy.time.sleep = self.sleeps.append
+
+    def tearDown(self):
+        retry_policy.get_global_option = self.get_global_option
+        retry_policy.time.sleep = self.sleep
+        retry_policy.set_deadline(None)
+
+    def __failing(self, errors):
+        """ Create a function raising the errors, then returning ok """
+        errors = list(errors)
+
+        def function():
+            """ Raise the next error """
+            if errors:
+                raise errors.pop(0)
+            return 'ok'
+        return function
+
+    def test_retry_until_success(self):
+        """ Ensure that transient errors are retried """
+        function = self.__failing([
+            aws_error(400, 'ThrottlingException'),
+            aws_error(500, 'InternalServerError')])
+
+        self.assertEqual(retry_policy.call(function), 'ok')
+        self.assertEqual(len(self.sleeps), 2)
+        self.assertTrue(0 <= self.sleeps[0] <= 0.5)
+        self.assertTrue(0 <= self.sleeps[1] <= 1.0)
+
+    def test_give_up(self):
+        """ Ensure that the last error is raised after the last attempt """
+        function = self.__failing(
+            [aws_error(400, 'ThrottlingException')] * 3)
+
+        self.assertRaises(JSONResponseError, retry_policy.call, function)
+        self.assertEqual(len(self.sleeps), 2)
+
+    def test_fatal_not_retried(self):
+        """ Ensure that fatal errors are raised right away """
+        function = self.__failing([aws_error(400, 'ValidationException')])
+
+        self.assertRaises(JSONResponseError, retry_policy.call, function)
+        self.assertEqual(self.sleeps, [])
+
+    def test_deadline(self):
+        """ Ensure that no retry waits past the deadline """
+        retry_policy.set_deadline(0.000001)
+        function = self.__failing([aws_error(500, 'InternalServerError')])
+
+        self.assertRaises(JSONResponseError, retry_policy.call, function)
+        self.assertEqual(self.sleeps, [])
+
+    def test_deadline_passed(self):
+        """ Ensure that no call is made once the deadline has passed """
+        retry_policy.LOCAL.deadline = retry_policy.time.time() - 1
+
+        self.assertRaises(
+            retry_policy.DeadlineExceeded,
+            retry_policy.check_deadline, 'dynamodb describe_table')
+        self.assertRaises(
+            retry_policy.DeadlineExceeded,
+            retry_policy.call, retry_policy.check_deadline, 'cloudwatch')
+        self.assertEqual(self.sleeps, [])
+
+        retry_policy.set_deadline(None)
+        retry_policy.check_deadline('dynamodb describe_table')
+
+
+class TestSuspension(unittest.TestCase):
+    """ Test the suspension of failing tables """
+
+    def setUp(self):
+        self.get_global_option = retry_policy.get_global_option
+        retry_policy.get_global_option = {'table_failure_threshold': 2}.get
+        retry_policy.FAILURES.clear()
+
+    def tearDown(self):
+        retry_policy.get_global_option = self.get_global_option
+        retry_policy.FAILURES.clear()
+
+    def __skipped_checks(self):
+        """ Count the checks skipped before the table is checked again """
+        skipped = 0
+        while retry_policy.is_suspended('my_table'):
+            skipped += 1
+        return skipped
+
+    def test_suspension(self):
+        """ Ensure that the suspension doubles with each failure """
+        retry_policy.record_failure('my_table')
+        self.assertEqual(self.__skipped_checks(), 0)
+
+        retry_policy.record_failure('my_table')
+        self.assertEqual(self.__skipped_checks(), 1)
+
+        retry_policy.record_failure('my_table')
+        self.assertEqual(self.__skipped_checks(), 2)
+
+    def test_success_resets(self):
+        """ Ensure that a successful check resets the failures """
+        retry_policy.record_failure('my_table')
+        retry_policy.record_failure('my_table')
+        retry_policy.record_success('my_table')
+
+        self.assertEqual(self.__skipped_checks(), 0)
+
+
+if __name__ == '__main__':
+    unittest.main(verbosity=2)
@@ -0,0 +1,43 @@
+# -*- coding: utf-8 -*-
+""" Testing the robust consumption statistics """
+import unittest
+
+from dynamic_dynamodb.statistics import robust
+
+# Five quiet minutes and one backfill minute
+SERIES = [10, 12, 10, 11, 10, 100]
+
+
+class TestRobustStatistics(unittest.TestCase):
+    """ Test the robust aggregations """
+
+    def test_average(self):
+        """ Ensure that the average is moved by the outlier """
+        self.assertAlmostEqual(robust.aggregate(SERIES, 'average'), 25.5)
+
+    def test_median(self):
+        """ Ensure that the median ignores the outlier """
+        self.assertAlmostEqual(robust.aggregate(SERIES, 'median'), 10.5)
+
+    def test_trimmed_mean(self):
+        """ Ensure that the trimmed mean cuts the outlier """
+        self.assertAlmostEqual(
+            robust.aggregate(SERIES, 'trimmed-mean'), 10.75)
+
+    def test_p90(self):
+        """ Ensure that p90 interpolates between the closest values """
+        self.assertAlmostEqual(
+            robust.aggregate(range(11), 'p90'), 9.0)
+
+    def test_ewma_spike_rejection(self):
+        """ Ensure that the EWMA limits spikes """
+        result = robust.aggregate(SERIES, 'ewma')
+        self.assertTrue(result < 20)
+        self.assertTrue(result > 10)
+
+    def test_empty(self):
+        """ Ensure that an empty series gives 0 """
+        self.assertEqual(robust.aggregate([], 'median'), 0.0)
+
+if __name__ == '__main__':
+    unittest.main(verbosity=2)
@@ -0,0 +1,79 @@
+# -*- coding: utf-8 -*-
+""" Testing the compiled scale dicts """
+import unittest
+
+from dynamic_dynamodb.config import scale_table
+from dynamic_dynamodb.core.table import scale_reader, scale_reader_decrease
+
+
+def reference_increase(scale, current_value):
+    """ The scale_reader implementation before the scales were compiled """
+    scale_value = 0
+    for limits in sorted(scale.keys()):
+        if current_value < limits:
+            return scale_value
+        scale_value = scale.get(limits)
+    return scale_value
+
+
+def reference_decrease(scale, current_value):
+    """ The scale_reader_decrease implementation before the scales were
+    compiled """
+    scale_value = 0
+    for limits in sorted(scale.keys(), reverse=True):
+        if current_value > limits:
+            return scale_value
+        scale_value = scale.get(limits)
+    return scale_value
+
+SCALE = {0: 0, 0.25: 5, 1.5: 20, 10: 50}
+VALUES = [-1, 0, 0.1, 0.25, 1, 1.5, 2, 10, 100]
+
+
+class TestScaleTable(unittest.TestCase):
+    """ Test the compiled scale lookups """
+
+    def test_compile(self):
+        """ Ensure that the thresholds are sorted """
+        scale = scale_table.compile_scale(SCALE)
+        self.assertEqual(scale, SCALE)
+        self.assertEqual(scale.thresholds, [0, 0.25, 1.5, 10])
+        self.assertEqual(scale.values, [0, 5, 20, 50])
+        self.assertEqual(scale_table.compile_scale(None), None)
+        self.assertEqual(scale_table.compile_scale({}), None)
+
+    def test_compile_invalid(self):
+        """ Ensure that invalid scales are rejected """
+        for scale in [{'a': 1}, {1: 'a'}, {1: -5}, {True: 1}, [1, 2]]:
+            self.assertRaises(ValueError, scale_table.compile_scale, scale)
+
+    def test_lookup_increase(self):
+        """ Ensure that increases match the uncompiled lookup """
+        scale = scale_table.compile_scale(SCALE)
+        for value in VALUES:
+            self.assertEqual(
+                scale_reader(scale, value), reference_increase(SCALE, value))
+        self.assertEqual(scale_reader(None, 5), 0)
+
+    def test_lookup_decrease(self):
+        """ Ensure that decreases match the uncompiled lookup """
+        scale = scale_table.compile_scale(SCALE)
+        for value in VALUES:
+            self.assertEqual(
+                scale_reader_decrease(scale, value),
+                reference_decrease(SCALE, value))
+        self.assertEqual(scale_reader_decrease(None, 5), 0)
+
+    def test_lookup_many(self):
+        """ Ensure that the vectorized lookups match the single lookups """
+        self.assertEqual(
+            scale_table.lookup_increase_many(SCALE, VALUES),
+            [reference_increase(SCALE, value) for value in VALUES])
+        self.assertEqual(
+            scale_table.lookup_decrease_many(SCALE, VALUES),
+            [reference_decrease(SCALE, value) for value in VALUES])
+        self.assertEqual(
+            scale_table.lookup_increase_many(None, VALUES), [0] * 9)
+
+if __name__ == '__main__':
+    unittest.main(verbosity=2)
@@ -0,0 +1,88 @@
+# -*- coding: utf-8 -*-
+""" Testing the Dynamic DynamoDB scaling policies """
+import math
+import unittest
+
+from dynamic_dynamodb.core import scaling_policies
+
+OPTIONS = {
+    'pid_kp': 0.0,
+    'pid_ki': 1.0,
+    'pid_kd': 0.0,
+    'scaling_deadband': 10,
+    'target_tracking_damping': 1.0
+}
+
+
+class TestScalingPolicies(unittest.TestCase):
+    """ Test the scaling policies """
+
+    def test_target_tracking_increase(self):
+        """ Ensure that target tracking scales up to the target """
+        result = scaling_policies.calculate(
+            'target-tracking', 100, 140, 0, 5, 70, OPTIONS, {}, 'test')
+        self.assertEqual(result, 200)
+
+    def test_target_tracking_decrease(self):
+        """ Ensure that target tracking scales down to the target """
+        result = scaling_policies.calculate(
+            'target-tracking', 100, 35, 0, 5, 70, OPTIONS, {}, 'test')
+        self.assertEqual(result, 50)
+
+    def test_deadband(self):
+        """ Ensure that small changes are ignored """
+        result = scaling_policies.calculate(
+            'target-tracking', 100, 75, 0, 5, 70, OPTIONS, {}, 'test')
+        self.assertEqual(result, 100)
+
+    def test_pid_state(self):
+        """ Ensure that the PID controller keeps its state """
+        state = {}
+        result = scaling_policies.calculate(
+            'pid', 100, 140, 0, 5, 70, OPTIONS, state, 'test')
+        self.assertEqual(result, 200)
+        self.assertIn('error', state)
+        self.assertIn('previous_error', state)
+
+    def test_pid_throttled(self):
+        """ Ensure that throttled demand is included """
+        result = scaling_policies.calculate(
+            'pid', 100, 70, 21000, 5, 70, OPTIONS, {}, 'test')
+        self.assertEqual(result, 200)
+
+    def pid(self, consumed_units_percent, state, kp, ki, kd):
+        """ Run the PID controller at 100 units with the given gains """
+        options = dict(OPTIONS, pid_kp=kp, pid_ki=ki, pid_kd=kd)
+        return scaling_policies.calculate(
+            'pid', 100, consumed_units_percent, 0, 5, 70, options, state,
+            'test')
+
+    def test_pid_first_check(self):
+        """ Ensure that P and D are zero without previous errors """
+        # Only the integral term, half of the log(2) error
+        result = self.pid(140, {}, 0.5, 0.5, 0.25)
+        self.assertEqual(result, 142)
+
+    def test_pid_proportional(self):
+        """ Ensure that the P term follows the change of the error """
+        result = self.pid(
+            140, {'error': 0.0, 'previous_error': 0.0}, 0.5, 0.0, 0.0)
+        self.assertEqual(result, 142)
+
+    def test_pid_derivative(self):
+        """ Ensure that the D term follows the change of the error rate """
+        result = self.pid(
+            140, {'error': 0.0, 'previous_error': 0.0}, 0.0, 0.0, 0.25)
+        self.assertEqual(result, 119)
+
+    def test_pid_all_terms(self):
+        """ Ensure that all terms add up and the errors are shifted """
+        state = {'error': math.log(2), 'previous_error': 0.0}
+        # P: -2 * 0.5, I: -1 * 0.5 and D: -3 * 0.25 times log(2)
+        result = self.pid(35, state, 0.5, 0.5, 0.25)
+        self.assertEqual(result, 22)
+        self.assertAlmostEqual(state['previous_error'], math.log(2))
+        self.assertAlmostEqual(state['error'], -math.log(2))
+
+if __name__ == '__main__':
+    unittest.main(verbosity=2)
@@ -0,0 +1,70 @@
+# -*- coding: utf-8 -*-
+""" Testing the sharding of the tables """
+import unittest
+
+from dynamic_dynamodb import sharding
+
+TABLES = ['table_{0:d}'.format(number) for number in range(5000)]
+
+
+class TestSharding(unittest.TestCase):
+    """ Test the consistent hashing of the tables """
+
+    def test_single_shard(self):
+        """ Ensure that one shard owns all tables """
+        self.assertEqual(
+            set([sharding.shard_of(table, 1) for table in TABLES]), set([0]))
+
+    def test_balance(self):
+        """ Ensure that the tables are spread evenly over the shards """
+        counts = [0] * 4
+        for table in TABLES:
+            counts[sharding.shard_of(table, 4)] += 1
+
+        for count in counts:
+            self.assertTrue(
+                abs(count - len(TABLES) / 4) < len(TABLES) / 4 * 0.2,
+                counts)
+
+    def test_stable(self):
+        """ Ensure that a table always belongs to the same shard """
+        sharding.RINGS.clear()
+        first = [sharding.shard_of(table, 3) for table in TABLES]
+        sharding.RINGS.clear()
+
+        self.assertEqual(
+            [sharding.shard_of(table, 3) for table in TABLES], first)
+
+    def test_add_shard(self):
+        """ Ensure that adding a shard only moves tables to the new shard """
+        for shard_count in [1, 2, 4, 8]:
+            moved = 0
+            for table in TABLES:
+                before = sharding.shard_of(table, shard_count)
+                after = sharding.shard_of(table, shard_count + 1)
+                if before != after:
+                    self.assertEqual(after, shard_count)
+                    moved += 1
+
+            expected = len(TABLES) / (shard_count + 1.0)
+            self.assertTrue(
+                abs(moved - expected) < expected * 0.25, moved)
+
+    def test_select(self):
+        """ Ensure that the shards split the tables between them """
+        get_global_option = sharding.get_global_option
+        tables = [(table, 'key') for table in TABLES[:500]]
+        selected = []
+        try:
+            for shard_index in range(3):
+                options = {'shard_index': shard_index, 'shard_count': 3}
+                sharding.get_global_option = options.get
+                selected.extend(sharding.select(tables))
+        finally:
+            sharding.get_global_option = get_global_option
+
+        self.assertEqual(sorted(selected), sorted(tables))
+
+
+if __name__ == '__main__':
+    unittest.main(verbosity=2)
@@ -0,0 +1,123 @@
+# -*- coding: utf-8 -*-
+""" Testing the SNS notification dispatcher """
+import atexit
+import Queue
+import unittest
+
+from boto.exception import BotoServerError
+
+from dynamic_dynamodb.aws import sns
+
+
+class FakeConnection(object):
+    """ SNS connection recording the published messages """
+    def __init__(self, failures=0):
+        self.failures = failures
+        self.published = []
+
+    def publish(self, topic, message, subject):
+        """ Record the message, failing the first attempts """
+        if self.failures:
+            self.failures -= 1
+            raise BotoServerError(500, 'Internal error')
+
+        self.published.append((topic, subject, message))
+
+
+class TestSNS(unittest.TestCase):
+    """ Test coalescing, retries and the size limit """
+
+    def setUp(self):
+        self.originals = dict(
+            (name, getattr(sns, name)) for name in [
+                'SNS_CONNECTION', 'SNS_QUEUE', 'PUBLISH_BACKOFF',
+                'get_global_option'])
+        self.connection = FakeConnection()
+        sns.SNS_CONNECTION = self.connection
+        sns.PUBLISH_BACKOFF = 0
+        sns.get_global_option = {'sns_coalesce_window': 60}.get
+
+    def tearDown(self):
+        for name, value in self.originals.items():
+            setattr(sns, name, value)
+
+    def test_coalesce(self):
+        """ Ensure that messages are deduplicated and coalesced per topic """
+        publish = getattr(sns, '__publish')
+        publish('topic-a', 'first', 'Subject 1')
+        publish('topic-a', 'first', 'Subject 1')
+        publish('topic-a', 'second', 'Subject 2')
+        publish('topic-b', 'third', 'Subject 3')
+        self.assertEqual(self.connection.published, [])
+
+        getattr(sns, '__flush')()
+        self.assertEqual(
+            sorted(self.connection.published),
+            [('topic-a',
+              'Dynamic DynamoDB - 2 notifications',
+              'Subject 1\nfirst\n\nSubject 2\nsecond'),
+             ('topic-b', 'Subject 3', 'third')])
+
+    def test_flush_at_exit(self):
+        """ Ensure that the queued messages are sent at exit """
+        self.assertTrue(getattr(sns, '__flush') in [
+            handler for handler, _, _ in atexit._exithandlers])
+
+    def test_queue_full(self):
+        """ Ensure that messages are dropped when the queue is full """
+        sns.SNS_QUEUE = Queue.Queue(maxsize=1)
+        original_ensure_dispatcher = getattr(sns, '__ensure_dispatcher')
+        setattr(sns, '__ensure_dispatcher', lambda: None)
+        try:
+            getattr(sns, '__publish')('topic', 'first')
+            getattr(sns, '__publish')('topic', 'second')
+        finally:
+            setattr(sns, '__ensure_dispatcher', original_ensure_dispatcher)
+
+        self.assertEqual(sns.SNS_QUEUE.get_nowait(), ('topic', 'first', None))
+        self.assertTrue(sns.SNS_QUEUE.empty())
+
+    def test_retry(self):
+        """ Ensure that failed publishes are retried """
+        self.connection.failures = sns.PUBLISH_ATTEMPTS - 1
+        getattr(sns, '__send')('topic', [('Subject', 'message')])
+        self.assertEqual(
+            self.connection.published, [('topic', 'Subject', 'message')])
+
+    def test_give_up(self):
+        """ Ensure that publishing gives up after PUBLISH_ATTEMPTS """
+        self.connection.failures = sns.PUBLISH_ATTEMPTS
+        getattr(sns, '__send')('topic', [('Subject', 'message')])
+        self.assertEqual(self.connection.published, [])
+        self.assertEqual(self.connection.failures, 0)
+
+    def test_split_digest(self):
+        """ Ensure that large digests are split below the size limit """
+        message = 'x' * (sns.MAX_MESSAGE_BYTES / 3)
+        getattr(sns, '__send')(
+            'topic', [('Subject {0:d}'.format(i), message) for i in range(4)])
+
+        self.assertEqual(len(self.connection.published), 2)
+        self.assertEqual(
+            self.connection.published[0][1],
+            'Dynamic DynamoDB - 2 notifications (1/2)')
+        for _, _, digest in self.connection.published:
+            self.assertTrue(len(digest) <= sns.MAX_MESSAGE_BYTES)
+        self.assertEqual(
+            sum([digest.count('Subject') for _, _, digest in
+                 self.connection.published]),
+            4)
+
+    def test_truncate(self):
+        """ Ensure that a single large message is truncated """
+        getattr(sns, '__send')(
+            'topic', [('Subject', u'é' * sns.MAX_MESSAGE_BYTES)])
+
+        _, subject, message = self.connection.published[0]
+        self.assertEqual(subject, 'Subject')
+        self.assertTrue(message.endswith(sns.TRUNCATED_MARKER))
+        self.assertTrue(
+            len(message.encode('utf-8')) <= sns.MAX_MESSAGE_BYTES)
+
+if __name__ == '__main__':
+    unittest.main(verbosity=2)
@@ -0,0 +1,174 @@
+# -*- coding: utf-8 -*-
+""" Testing the throttle watcher """
+import unittest
+
+from dynamic_dynamodb.core import throttle_watcher
+
+OPTIONS = {
+    'throttled_reads_upper_threshold': 10,
+    'throttled_writes_upper_threshold': 10,
+    'enable_reads_up_scaling': True,
+    'enable_writes_up_scaling': True,
+    'increase_reads_with': 50,
+    'increase_reads_unit': 'percent',
+    'increase_writes_with': 5,
+    'increase_writes_unit': 'units',
+    'max_provisioned_reads': 0,
+    'max_provisioned_writes': 0
+}
+
+
+class Stub(object):
+    """ Object with the given attributes """
+    def __init__(self, **attributes):
+        self.__dict__.update(attributes)
+
+
+class TestThrottleWatcher(unittest.TestCase):
+    """ Test the throttle detection and the emergency scale-ups """
+
+    def setUp(self):
+        self.originals = dict(
+            (name, getattr(throttle_watcher, name)) for name in [
+                'get_global_option', 'get_table_option', 'get_gsi_option',
+                'lease', 'billing_advisor', 'table_stats', 'gsi_stats',
+                'event_listener', 'dynamodb', 'table', 'gsi', 'journal'])
+        self.events = []
+        self.updates = []
+        self.journaled = []
+        self.throttled_events = {'reads': 0, 'writes': 0}
+
+        throttle_watcher.get_global_option = {
+            'throttle_watcher_cooldown': 300}.get
+        throttle_watcher.get_table_option = \
+            lambda table_key, option: OPTIONS.get(option)
+        throttle_watcher.get_gsi_option = \
+            lambda table_key, gsi_key, option: OPTIONS.get(option)
+        throttle_watcher.lease = Stub(is_leader=lambda: True)
+        throttle_watcher.billing_advisor = Stub(
+            is_on_demand=lambda table_name: False)
+        throttle_watcher.table_stats = Stub(
+            get_throttled_read_event_count=(
+                lambda table_name, start, period:
+                self.throttled_events['reads']),
+            get_throttled_write_event_count=(
+                lambda table_name, start, period:
+                self.throttled_events['writes']))
+        throttle_watcher.gsi_stats = Stub(
+            get_throttled_read_event_count=(
+                lambda table_name, gsi_name, start, period:
+                self.throttled_events['reads']),
+            get_throttled_write_event_count=(
+                lambda table_name, gsi_name, start, period:
+                self.throttled_events['writes']))
+        throttle_watcher.event_listener = Stub(
+            put_event=lambda event: self.events.append(event) or True)
+        throttle_watcher.dynamodb = Stub(
+            get_provisioned_table_read_units=lambda table_name: 100,
+            get_provisioned_table_write_units=lambda table_name: 10,
+            get_provisioned_gsi_read_units=lambda table_name, gsi_name: 40,
+            get_provisioned_gsi_write_units=lambda table_name, gsi_name: 20)
+        throttle_watcher.table = Stub(
+            emergency_scale_up=(
+                lambda *args: self.updates.append(args) or 'updated'))
+        throttle_watcher.gsi = Stub(
+            emergency_scale_up=(
+                lambda *args: self.updates.append(args) or 'updated'))
+
+        throttle_watcher.journal = Stub(
+            clear=lambda: None,
+            observe=lambda *args: None,
+            write=lambda *args: self.journaled.append(args))
+
+        throttle_watcher.WATCHED.clear()
+        throttle_watcher.LAST_SCALE_UP.clear()
+
+    def tearDown(self):
+        for name, value in self.originals.items():
+            setattr(throttle_watcher, name, value)
+        throttle_watcher.WATCHED.clear()
+        throttle_watcher.LAST_SCALE_UP.clear()
+
+    def test_not_throttled(self):
+        """ Ensure that nothing is queued without throttling """
+        throttle_watcher.watch_table('my_table', 'my_key')
+        self.throttled_events['reads'] = 10
+        throttle_watcher.check()
+        self.assertEqual(self.events, [])
+
+    def test_table_throttled(self):
+        """ Ensure that a throttled table is queued for the main loop """
+        throttle_watcher.watch_table('my_table', 'my_key')
+        self.throttled_events['reads'] = 11
+        throttle_watcher.check()
+        self.assertEqual(self.events, [('my_table', None, ('reads',))])
+        self.assertEqual(self.updates, [])
+
+    def test_cooldown(self):
+        """ Ensure that the watcher cooldown holds back new scale-ups """
+        throttle_watcher.watch_table('my_table', 'my_key')
+        self.throttled_events['writes'] = 11
+        throttle_watcher.check()
+        throttle_watcher.check()
+        self.assertEqual(self.events, [('my_table', None, ('writes',))])
+
+        throttle_watcher.LAST_SCALE_UP[('my_table', None)] -= 301
+        throttle_watcher.check()
+        self.assertEqual(len(self.events), 2)
+
+    def test_queue_full(self):
+        """ Ensure that a dropped event does not start the cooldown """
+        throttle_watcher.event_listener = Stub(put_event=lambda event: False)
+        throttle_watcher.watch_table('my_table', 'my_key')
+        self.throttled_events['reads'] = 11
+        throttle_watcher.check()
+        self.assertEqual(throttle_watcher.LAST_SCALE_UP, {})
+
+    def test_standby(self):
+        """ Ensure that standbys leave the scale-ups to the leader """
+        throttle_watcher.lease = Stub(is_leader=lambda: False)
+        throttle_watcher.watch_table('my_table', 'my_key')
+        self.throttled_events['reads'] = 11
+        throttle_watcher.check()
+        self.assertEqual(self.events, [])
+
+    def test_gsi_throttled(self):
+        """ Ensure that a throttled GSI is queued with its name """
+        throttle_watcher.watch_gsi('my_table', 'my_key', 'my_gsi', 'gsi_key')
+        self.throttled_events['reads'] = 11
+        self.throttled_events['writes'] = 11
+        throttle_watcher.check()
+        self.assertEqual(
+            self.events, [('my_table', 'my_gsi', ('reads', 'writes'))])
+
+    def test_scale_up_table(self):
+        """ Ensure that table scale-ups go through the core update """
+        cooldown_state = {}
+        outcome = throttle_watcher.scale_up(
+            'my_table', 'my_key', None, None, ('reads',), cooldown_state)
+        self.assertEqual(outcome, 'updated')
+        self.assertEqual(
+            self.updates, [('my_table', 'my_key', 150, 10, cooldown_state)])
+        self.assertEqual(
+            self.journaled,
+            [('my_table', None, 'my_key', 150, 10,
+              'throttle-watcher-updated')])
+
+    def test_scale_up_gsi(self):
+        """ Ensure that GSI scale-ups go through the core update """
+        cooldown_state = {}
+        throttle_watcher.scale_up(
+            'my_table', 'my_key', 'my_gsi', 'gsi_key', ('writes',),
+            cooldown_state)
+        self.assertEqual(
+            self.updates,
+            [('my_table', 'my_key', 'my_gsi', 'gsi_key', 40, 25,
+              cooldown_state)])
+        self.assertEqual(
+            self.journaled,
+            [('my_table', 'my_gsi', 'gsi_key', 40, 25,
+              'throttle-watcher-updated')])
+
+
+if __name__ == '__main__':
+    unittest.main(verbosity=2)
@@ -0,0 +1,53 @@
+# -*- coding: utf-8 -*-
+""" Testing the timing report """
+import unittest
+
+from dynamic_dynamodb import timing
+
+
+class TestTiming(unittest.TestCase):
+    """ Test the timing spans and report """
+
+    def tearDown(self):
+        timing.set_target(None)
+
+    def test_record_needs_target(self):
+        """ Ensure that spans outside of the checks are ignored """
+        timing.set_target(None)
+        timing.record('reads', 1.0)
+        self.assertNotIn((None, 'reads'), timing.CURRENT_CYCLE)
+
+        timing.set_target('my_table', 'my_gsi')
+        with timing.span('reads'):
+            pass
+        self.assertIn(('my_table:my_gsi', 'reads'), timing.CURRENT_CYCLE)
+
+    def test_report_order(self):
+        """ Ensure that the slowest tables and phases come first """
+        cycles = [
+            {
+                ('fast', 'reads'): 1.0,
+                ('slow', 'reads'): 2.0,
+                ('slow', 'update'): 3.0,
+                ('slow', 'aws:dynamodb:describe_table'): 5.0
+            },
+            {
+                ('fast', 'reads'): 1.0,
+                ('slow', 'reads'): 2.0
+            }
+        ]
+        lines = timing.report(cycles)
+
+        self.assertEqual(
+            lines[1],
+            '  slow: 3.500 s per check (aws:dynamodb:describe_table '
+            '2.500 s, reads 2.000 s, update 1.500 s)')
+        self.assertEqual(lines[2], '  fast: 1.000 s per check (reads 1.000 s)')
+        self.assertEqual(lines[4], '  reads: 3.000 s per check')
+
+    def test_empty_report(self):
+        """ Ensure that a report without checks says so """
+        self.assertEqual(len(timing.report([])), 1)
+
+if __name__ == '__main__':
+    unittest.main(verbosity=2)
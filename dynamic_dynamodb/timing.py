@@ -0,0 +1,182 @@
+# -*- coding: utf-8 -*-
+""" Timing of the phases of each check
+
+The time spent in each phase of a check (circuit breaker, alarms, reads,
+writes, update) and in each AWS call is added up per table or GSI. The
+table or GSI currently being checked is kept per thread, so only the spans
+of the main loop are attributed. Spans nest, an AWS call made while
+deciding on the reads is counted both as the AWS call and as reads.
+
+The totals of the last timing-report-cycles checks are kept. The report of
+the slowest tables and phases is written to the log on SIGUSR2, or with
+--daemon timing-report for a running daemon.
+"""
+import collections
+import functools
+import threading
+import time
+
+from dynamic_dynamodb.log_handler import LOGGER as logger
+from dynamic_dynamodb.config_handler import get_global_option
+
+# Number of tables and phases listed in the report
+REPORT_SIZE = 10
+
+# Totals of the finished checks, {(target, phase): seconds}
+CYCLES = collections.deque(maxlen=get_global_option('timing_report_cycles'))
+
+# Totals of the check in progress
+CURRENT_CYCLE = {}
+
+LOCAL = threading.local()
+
+
+class Span(object):
+    """ Context manager adding its duration to a phase """
+    def __init__(self, phase):
+        """ Create a span
+
+        :type phase: str
+        :param phase: Name of the phase
+        """
+        self.phase = phase
+        self.start = None
+
+    def __enter__(self):
+        self.start = time.time()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        record(self.phase, time.time() - self.start)
+
+
+def set_target(table_name, gsi_name=None):
+    """ Set the table or GSI spans in this thread are attributed to
+
+    :type table_name: str
+    :param table_name: Name of the DynamoDB table, None to stop recording
+    :type gsi_name: str
+    :param gsi_name: Name of the GSI
+    """
+    if table_name and gsi_name:
+        LOCAL.target = '{0}:{1}'.format(table_name, gsi_name)
+    else:
+        LOCAL.target = table_name
+
+
+def span(phase):
+    """ Time a block of code
+
+    :type phase: str
+    :param phase: Name of the phase
+    :returns: Span
+    """
+    return Span(phase)
+
+
+def timed(phase):
+    """ Decorator timing each call of a function
+
+    :type phase: str
+    :param phase: Name of the phase
+    """
+    def decorator(function):
+        """ Wrap the function in a span """
+        @functools.wraps(function)
+        def wrapper(*args, **kwargs):
+            """ Call the function in a span """
+            with Span(phase):
+                return function(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+def record(phase, seconds):
+    """ Add time to a phase of the current table or GSI
+
+    Nothing is recorded outside of the checks.
+
+    :type phase: str
+    :param phase: Name of the phase
+    :type seconds: float
+    :param seconds: Time spent
+    """
+    target = getattr(LOCAL, 'target', None)
+    if not target:
+        return
+
+    key = (target, phase)
+    CURRENT_CYCLE[key] = CURRENT_CYCLE.get(key, 0.0) + seconds
+
+
+def end_cycle():
+    """ Finish the current check and start a new one """
+    global CURRENT_CYCLE
+
+    CYCLES.append(CURRENT_CYCLE)
+    CURRENT_CYCLE = {}
+    set_target(None)
+
+
+def report(cycles=None):
+    """ List the slowest tables and phases
+
+    :type cycles: list
+    :param cycles: Totals per check, defaults to the latest checks
+    :returns: list -- Lines of the report
+    """
+    if cycles is None:
+        cycles = list(CYCLES)
+
+    if not cycles:
+        return ['No finished checks to report on yet']
+
+    tables = {}
+    phases = {}
+    table_phases = {}
+    for cycle in cycles:
+        for (target, phase), seconds in cycle.items():
+            table_phases.setdefault(target, {})
+            table_phases[target][phase] = \
+                table_phases[target].get(phase, 0.0) + seconds
+            phases[phase] = phases.get(phase, 0.0) + seconds
+
+    # Top level phases do not overlap, so they add up to the table time
+    for target in table_phases:
+        tables[target] = sum([
+            seconds for phase, seconds in table_phases[target].items()
+            if not phase.startswith('aws:')])
+
+    lines = ['Slowest tables and GSIs over the last {0:d} checks:'.format(
+        len(cycles))]
+    for target in sorted(tables, key=tables.get, reverse=True)[:REPORT_SIZE]:
+        slowest = sorted(
+            table_phases[target].items(),
+            key=lambda item: item[1],
+            reverse=True)[:3]
+        lines.append('  {0}: {1:.3f} s per check ({2})'.format(
+            target,
+            tables[target] / len(cycles),
+            ', '.join([
+                '{0} {1:.3f} s'.format(phase, seconds / len(cycles))
+                for phase, seconds in slowest])))
+
+    lines.append('Slowest phases over the last {0:d} checks:'.format(
+        len(cycles)))
+    for phase in sorted(phases, key=phases.get, reverse=True)[:REPORT_SIZE]:
+        lines.append('  {0}: {1:.3f} s per check'.format(
+            phase, phases[phase] / len(cycles)))
+
+    return lines
+
+
+def log_report(signum=None, frame=None):
+    """ Write the report to the log, usable as a signal handler
+
+    :type signum: int
+    :param signum: Signal number
+    :type frame: frame
+    :param frame: Current stack frame
+    """
+    for line in report():
+        logger.info('Timing report: {0}'.format(line))